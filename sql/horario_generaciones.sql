@@ -2,6 +2,8 @@ create table if not exists public.horario_generaciones (
   nivel text not null,
   version_num integer not null,
   generation_index integer not null check (generation_index between 1 and 5),
+  -- {"formato", "datos" (base64, codec_horario), "grados" (id de cada columna)};
+  -- las filas antiguas tienen el texto base64 o la lista anidada, sin grados
   horario jsonb not null,
   created_at timestamptz not null default now(),
   primary key (nivel, version_num, generation_index)
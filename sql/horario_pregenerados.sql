@@ -0,0 +1,24 @@
+-- Pre-generación especulativa (pregeneracion.py). Un resultado por huella de
+-- la instancia: el pipeline lo consume con DELETE ... RETURNING, así que lo
+-- usa un solo "Generar" aunque lo pidan varios procesos o workers.
+
+create table if not exists public.horario_pregenerados (
+  huella text primary key,
+  nivel text not null,
+  version_num integer not null,
+  -- resultado del generador sin "horario" (se rehace desde matriz_cursos)
+  resultado jsonb not null,
+  created_at timestamptz not null default now()
+);
+
+create index if not exists horario_pregenerados_nivel_version_idx
+  on public.horario_pregenerados (nivel, version_num);
+
+-- (nivel, versión) generados a mano: se vuelven a pre-generar ante cambios
+-- sin destino explícito, sin importar qué proceso los generó
+create table if not exists public.pregeneracion_objetivos (
+  nivel text not null,
+  version_num integer not null,
+  created_at timestamptz not null default now(),
+  primary key (nivel, version_num)
+);
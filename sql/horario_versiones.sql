@@ -0,0 +1,14 @@
+create table if not exists public.horario_versiones (
+  nivel text not null,
+  version_num integer not null,
+  -- null = base completa; si no, delta contra esta versión
+  base_version integer,
+  -- {"set": [[grado_id, dia, bloque, curso_id, docente_id], ...], "del": [[grado_id, dia, bloque], ...]}
+  cambios jsonb not null,
+  created_at timestamptz not null default now(),
+  primary key (nivel, version_num)
+);
+
+create index if not exists horario_versiones_bases_idx
+  on public.horario_versiones (nivel, version_num)
+  where base_version is null;
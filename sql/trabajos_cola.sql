@@ -0,0 +1,123 @@
+-- Cola de generación compartida entre nodos (cola_trabajos.ColaSupabase).
+-- Los workers (worker_solver.py) reclaman con FOR UPDATE SKIP LOCKED, mandan
+-- latidos mientras resuelven y publican progreso en trabajos_eventos; el
+-- backend web lo reenvía a los clientes SSE.
+
+create table if not exists public.trabajos_cola (
+  id uuid primary key default gen_random_uuid(),
+  -- huella de la instancia (PipelineGeneracion.clave): pedidos idénticos se unen
+  clave text,
+  payload jsonb not null,
+  estado text not null default 'pendiente'
+    check (estado in ('pendiente', 'en_curso', 'listo', 'error')),
+  worker text,
+  intentos integer not null default 0,
+  resultado jsonb,
+  error text,
+  creado timestamptz not null default now(),
+  latido timestamptz,
+  terminado timestamptz
+);
+
+create unique index if not exists trabajos_cola_clave_activa_idx
+  on public.trabajos_cola (clave)
+  where estado in ('pendiente', 'en_curso');
+
+create index if not exists trabajos_cola_pendientes_idx
+  on public.trabajos_cola (creado)
+  where estado = 'pendiente';
+
+create index if not exists trabajos_cola_en_curso_idx
+  on public.trabajos_cola (latido)
+  where estado = 'en_curso';
+
+create table if not exists public.trabajos_eventos (
+  seq bigserial primary key,
+  trabajo_id uuid not null references public.trabajos_cola (id) on delete cascade,
+  evento text not null,
+  datos jsonb,
+  creado timestamptz not null default now()
+);
+
+create index if not exists trabajos_eventos_trabajo_idx
+  on public.trabajos_eventos (trabajo_id, seq);
+
+-- Encola, o devuelve el trabajo activo con la misma clave
+create or replace function public.encolar_trabajo(p_payload jsonb, p_clave text)
+returns table (id uuid, nuevo boolean)
+language plpgsql as $$
+begin
+  return query
+    insert into public.trabajos_cola (payload, clave)
+    values (p_payload, p_clave)
+    on conflict (clave) where estado in ('pendiente', 'en_curso') do nothing
+    returning trabajos_cola.id, true;
+  if not found then
+    return query
+      select t.id, false from public.trabajos_cola t
+      where t.clave = p_clave and t.estado in ('pendiente', 'en_curso')
+      limit 1;
+  end if;
+end $$;
+
+-- El pendiente más antiguo; los que otro worker tiene bloqueados se saltean
+create or replace function public.reclamar_trabajo(p_worker text)
+returns setof public.trabajos_cola
+language sql as $$
+  update public.trabajos_cola t
+  set estado = 'en_curso', worker = p_worker, latido = now(), intentos = t.intentos + 1
+  where t.id = (
+    select c.id from public.trabajos_cola c
+    where c.estado = 'pendiente'
+    order by c.creado
+    for update skip locked
+    limit 1
+  )
+  returning t.*;
+$$;
+
+-- false si el trabajo ya no es de este worker (se lo dio por muerto)
+create or replace function public.latido_trabajo(p_id uuid, p_worker text)
+returns boolean
+language plpgsql as $$
+begin
+  update public.trabajos_cola set latido = now()
+  where id = p_id and worker = p_worker and estado = 'en_curso';
+  return found;
+end $$;
+
+-- Trabajos sin latido hace p_segundos: vuelven a la cola, o fallan si ya
+-- agotaron los intentos
+create or replace function public.recuperar_trabajos_vencidos(p_segundos integer, p_max_intentos integer)
+returns integer
+language plpgsql as $$
+declare
+  n integer;
+begin
+  update public.trabajos_cola
+  set estado = case when intentos >= p_max_intentos then 'error' else 'pendiente' end,
+      error = case when intentos >= p_max_intentos then 'El worker dejó de responder' else error end,
+      terminado = case when intentos >= p_max_intentos then now() else terminado end,
+      worker = null
+  where estado = 'en_curso' and latido < now() - make_interval(secs => p_segundos);
+  get diagnostics n = row_count;
+  return n;
+end $$;
+
+create index if not exists trabajos_cola_terminados_idx
+  on public.trabajos_cola (terminado)
+  where estado in ('listo', 'error');
+
+-- Borra los trabajos terminados hace más de p_segundos; sus eventos se van
+-- por el on delete cascade
+create or replace function public.limpiar_trabajos_terminados(p_segundos integer)
+returns integer
+language plpgsql as $$
+declare
+  n integer;
+begin
+  delete from public.trabajos_cola
+  where estado in ('listo', 'error') and terminado < now() - make_interval(secs => p_segundos);
+  get diagnostics n = row_count;
+  return n;
+end $$;
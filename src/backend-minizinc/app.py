@@ -4,29 +4,48 @@ from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from supabase import create_client
-from generador_python import generar_horario
+from arranque import calentar_en_segundo_plano, estado as estado_arranque, obtener_supabase
+from pipeline_horario import (
+    NUM_DIAS,
+    PipelineGeneracion,
+    cargar_instancia,
+    cargar_registros_horario,
+    ultimo_numero_horario,
+)
+from indice_horario import obtener_indice
+from cola_trabajos import obtener_cola, tarea_remota
+from trabajos import desuscribir, esperar_trabajo, lanzar_o_unirse, suscribir
+from pregeneracion import PreGenerador
+from escenarios import EscenarioInvalido, evaluar_escenarios, validar_escenarios
+from cuellos_botella import analizar_cuellos
+from codec_horario import empaquetar_payload, negociar
+from salida_horario import DIAS_BD
+from versiones_horario import cambios_entre, cargar_version
+from validacion_horario import ReglasHorario, invalidar_indices_conflictos, obtener_indice_conflictos, validar_lote
+from telemetria import exportar as exportar_metricas, instrumentar_flask, observar_pipeline
 import traceback
+import hashlib
 import json
-import threading
-import time
-import uuid
-from queue import Queue, Empty
-import unicodedata
+from queue import Empty
 
 app = Flask(__name__)
 
+ORIGENES_PERMITIDOS = ["https://gestion-de-horarios.vercel.app", "http://localhost:5173"]
+
 # CORS dinámico para dev y prod
 CORS(
     app,
-    origins=["https://gestion-de-horarios.vercel.app", "http://localhost:5173"],
+    origins=ORIGENES_PERMITIDOS,
     supports_credentials=True,
 )
 
+# Latencia por endpoint para /metrics
+instrumentar_flask(app)
+
 @app.after_request
 def after_request(response):
     origin = request.headers.get("Origin")
-    if origin in ["http://localhost:5173", "https://gestion-de-horarios.vercel.app"]:
+    if origin in ORIGENES_PERMITIDOS:
         response.headers["Access-Control-Allow-Origin"] = origin
         response.headers["Access-Control-Allow-Credentials"] = "true"
     response.headers["Access-Control-Allow-Headers"] = request.headers.get(
@@ -43,8 +62,7 @@ def options_any(path):
     resp = Response(status=204)
     origin = request.headers.get("Origin")
 
-    allowed = ["https://gestion-de-horarios.vercel.app", "http://localhost:5173"]
-    if origin in allowed:
+    if origin in ORIGENES_PERMITIDOS:
         resp.headers["Access-Control-Allow-Origin"] = origin
         resp.headers["Access-Control-Allow-Credentials"] = "true"
 
@@ -61,253 +79,77 @@ def options_any(path):
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Supabase
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise Exception("❌ SUPABASE_URL o SUPABASE_KEY no están definidos.")
-supabase = create_client(supabase_url, supabase_key)
-
-# Constantes
-DIAS = ["lunes", "martes", "mi\u00e9rcoles", "jueves", "viernes"]
-NUM_BLOQUES = 8  # default; en runtime se ajusta por version
-
-# Jobs en memoria para progreso SSE
-_jobs = {}
-_jobs_lock = threading.Lock()
-
-def _push_event(job_id, event, payload):
-    with _jobs_lock:
-        job = _jobs.get(job_id)
-        if not job:
-            return
-        job["queue"].put((event, payload))
-
-def _cleanup_job(job_id, delay=300):
-    def _drop():
-        time.sleep(delay)
-        with _jobs_lock:
-            _jobs.pop(job_id, None)
-    t = threading.Thread(target=_drop, daemon=True)
-    t.start()
+# Supabase y OR-Tools se inicializan en el primer uso (arranque.py); con
+# gunicorn --preload el warm-up corre una vez en el master (gunicorn.conf.py).
+# WARMUP=1 lo lanza en segundo plano al importar (servidor de desarrollo).
+if os.getenv("WARMUP", "0") == "1":
+    calentar_en_segundo_plano()
+
+# Limite de espera del endpoint sincrono (el job sigue corriendo si se supera)
+GENERACION_TIMEOUT = float(os.getenv("GENERACION_TIMEOUT", "300"))
+
+# Pre-generacion especulativa ante cambios de datos (opt-in). Sus hilos son
+# de cada proceso: arrancan en post_worker_init (gunicorn.conf.py) o en el
+# primer uso, nunca al importar (con --preload quedarian en el master, fuera
+# del alcance de los workers). Los resultados y objetivos van a la BD; con
+# COLA_TRABAJOS los resuelve worker_solver.py.
+PREGENERACION = os.getenv("PREGENERACION", "0") == "1"
+PREGENERACION_TOKEN = os.getenv("PREGENERACION_TOKEN")
+pregenerador = PreGenerador(obtener_supabase)
+# Un cambio de datos detectado (audit_logs o webhook) invalida los indices de /validar-movimiento
+pregenerador.al_cambiar.append(invalidar_indices_conflictos)
+
+def iniciar_pregeneracion():
+    """Arranca (una vez por proceso) los hilos de pre-generacion."""
+    if PREGENERACION:
+        pregenerador.iniciar()
+        pregenerador.vigilar_auditoria()
+    return pregenerador
 
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok", "message": "Backend activo"}), 200
 
-def obtener_nuevo_numero_horario(nivel: str) -> int:
-    """
-    Devuelve un número incremental de versión.
-    OJO: por el UNIQUE (grado_id, dia, bloque) no se guardan múltiples versiones en paralelo.
-    """
-    resp = supabase.table("horarios").select("version_num").eq("nivel", nivel).execute()
-    versiones = sorted({item["version_num"] for item in (resp.data or []) if item.get("version_num") is not None})
-    return (max(versiones) + 1) if versiones else 1
-
-def _num_bloques_from_version(version):
-    try:
-        return 7 if int(version) == 1 else 8
-    except Exception:
-        return NUM_BLOQUES
-
-def _normalize_text(texto):
-    if texto is None:
-        return ""
-    return unicodedata.normalize("NFD", str(texto)).encode("ascii", "ignore").decode("ascii").lower()
-
-def construir_restricciones_disponibilidad(sb, nivel):
-    rows = (
-        sb.table("restricciones_docente")
-        .select("docente_id,dia,bloque")
-        .eq("nivel", nivel)
-        .execute()
-        .data
-        or []
-    )
-
-    bloque_one_based = any(int(r.get("bloque", 0)) == 1 for r in rows)
-    disponibilidad = {}
-    for r in rows:
-        try:
-            doc = str(r.get("docente_id"))
-            dia = _normalize_text(r.get("dia"))
-            b = int(r.get("bloque"))
-        except Exception:
-            continue
-        b0 = b - 1 if bloque_one_based else b
-        disponibilidad.setdefault(doc, {})[f"{dia}-{b0}"] = True
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    cuerpo, tipo = exportar_metricas()
+    return Response(cuerpo, content_type=tipo)
 
-    return {"disponibilidad": disponibilidad}
-
-def cargar_patrones_division(sb, nivel, version):
-    try:
-        rows = (
-            sb.table("horas_curso_grado_division")
-            .select("curso_id,grado_id,patron")
-            .eq("nivel", nivel)
-            .eq("version_num", version)
-            .execute()
-            .data
-            or []
-        )
-    except Exception:
-        rows = []
-    patrones = {}
-    for r in rows:
-        try:
-            curso_id = int(r.get("curso_id"))
-            grado_id = int(r.get("grado_id"))
-            patron_raw = str(r.get("patron") or "").strip()
-            if not patron_raw:
-                continue
-            partes = [int(x) for x in patron_raw.split("+") if x.strip().isdigit()]
-            if not partes:
-                continue
-            patrones[f"{curso_id}-{grado_id}"] = partes
-        except Exception:
-            continue
-    return patrones
+@app.route("/ready", methods=["GET"])
+def ready():
+    # Listo = OR-Tools cargado y cliente de Supabase creado; si no, dispara el warm-up
+    estado = estado_arranque()
+    if not estado["listo"]:
+        calentar_en_segundo_plano()
+        return jsonify(estado), 503
+    return jsonify(estado), 200
 
 @app.route("/generar-horario-general", methods=["POST", "OPTIONS"])
 @app.route("/generar-horario-general/", methods=["POST", "OPTIONS"])
 def generar_horario_general():
     try:
-        # Lee body (si no viene JSON válido, esto levanta)
+        # Lee body (si no viene JSON valido, esto levanta)
         data = request.get_json(force=True, silent=False)
-
-        docentes = data.get("docentes", [])
-        asignaciones = data.get("asignaciones", {})
-        restricciones = data.get("restricciones", {})
-        horas_curso_grado = data.get("horas_curso_grado", {})
-        nivel = data.get("nivel", "Secundaria")
-        overwrite = bool(data.get("overwrite", False))  # por defecto NO sobrescribe
-        version = data.get("version") or data.get("version_num") or 1
-        num_bloques = _num_bloques_from_version(version)
-
-        if not docentes or not asignaciones or not horas_curso_grado:
+        pipeline = PipelineGeneracion(obtener_supabase(), data, hooks=[iniciar_pregeneracion().hook, observar_pipeline])
+        if pipeline.faltan_datos():
             raise ValueError("Faltan datos requeridos para generar el horario.")
 
-        print("[INFO] Generando horario para nivel: " + str(nivel))
-        print("[API][DEBUG] restricciones keys:", (restricciones or {}).keys())
-        print("[API][DEBUG] tiene disponibilidad?:", "disponibilidad" in (restricciones or {}))
-        if isinstance((restricciones or {}).get("disponibilidad"), dict):
-            disp = (restricciones or {}).get("disponibilidad") or {}
-            print("[API][DEBUG] disponibilidad docentes:", list(disp.keys())[:5])
-            if disp:
-                first = next(iter(disp))
-                print("[API][DEBUG] sample docente", first, "keys:", list((disp.get(first) or {}).keys())[:10])
-        else:
-            print("[API][DEBUG] disponibilidad tipo:", type((restricciones or {}).get("disponibilidad")))
-
-        if not (restricciones or {}).get("disponibilidad"):
-            restricciones = construir_restricciones_disponibilidad(supabase, nivel)
-            print("[API][DEBUG] disponibilidad cargada desde BD. docentes:", list(restricciones.get("disponibilidad", {}).keys())[:5])
-        patrones_division = cargar_patrones_division(supabase, nivel, version)
-        resultado = generar_horario(
-            docentes,
-            asignaciones,
-            restricciones,
-            horas_curso_grado,
-            nivel=nivel,
-            version=version,
-            patrones_division=patrones_division,
-        )
-
-        horario_dict = resultado.get("horario", {})  # {dia_idx: {bloque_idx: {grado_id: curso_id}}}
-        total_asignados = resultado.get("total_bloques_asignados", 0)
-        nueva_version = obtener_nuevo_numero_horario(nivel)
-
-        # Prepara registros para tabla 'horarios'
-        registros = []
-        for dia_key, bloques in (horario_dict or {}).items():
-            try:
-                dia_idx = int(dia_key)
-            except Exception:
-                continue
-            if not (0 <= dia_idx < len(DIAS)):
-                continue
-            dia_nombre = DIAS[dia_idx]
-
-            for blq_key, grados in (bloques or {}).items():
-                try:
-                    bloque_idx = int(blq_key)
-                except Exception:
-                    continue
-                if not (0 <= bloque_idx < num_bloques):
-                    continue
-
-                for grado_key, curso_id in (grados or {}).items():
-                    # 0 significa vacío
-                    if not isinstance(curso_id, int) or curso_id <= 0:
-                        continue
-                    try:
-                        grado_id = int(grado_key)
-                    except Exception:
-                        continue
-
-                    # asignaciones usa claves string
-                    docente_id = (
-                        asignaciones
-                        .get(str(curso_id), {})
-                        .get(str(grado_id), {})
-                        .get("docente_id")
-                    )
-                    if docente_id:
-                        registros.append({
-                            "docente_id": int(docente_id),
-                            "curso_id": int(curso_id),
-                            "grado_id": int(grado_id),
-                            "dia": dia_nombre,           # 'lunes'..'viernes'
-                            "bloque": int(bloque_idx),   # 0..7
-                            "nivel": nivel,
-                            "version_num": int(nueva_version)
-                        })
-
-        # Persistencia robusta evitando duplicados
-        if registros:
-            # Si quieres intentar UPSERT primero (cuando tu UNIQUE sea (grado_id, dia, bloque)):
-            CONFLICT_COLS = ["grado_id", "dia", "bloque"]  # Si tu UNIQUE incluye nivel, agrega "nivel" aqui.
-
-            if overwrite:
-                # Estrategia clara y consistente: borra e inserta todo el nivel
-                supabase.table("horarios").delete().eq("nivel", nivel).eq("version_num", nueva_version).execute()
-                supabase.table("horarios").insert(registros).execute()
-                print("[OK] Horario sobrescrito para " + str(nivel) + ". Filas: " + str(len(registros)))
-            else:
-                # Intenta UPSERT; si tu indice no coincide (42P10) o hay 23505 por otro UNIQUE, cae a delete+insert
-                try:
-                    supabase.table("horarios").upsert(registros, on_conflict=CONFLICT_COLS).execute()
-                    print("[OK] Horario cargado por UPSERT. Filas: " + str(len(registros)))
-                except Exception as e:
-                    msg = str(e)
-                    if "42P10" in msg or "23505" in msg:
-                        print("[WARN] Fallback a delete+insert por conflicto de indice unico.")
-                        supabase.table("horarios").delete().eq("nivel", nivel).eq("version_num", nueva_version).execute()
-                        supabase.table("horarios").insert(registros).execute()
-                    else:
-                        raise
-        else:
-            print("[WARN] No se generaron registros (todo vacio).")
-        # Devuelve matriz para el front (5 días × NUM_BLOQUES × (5 ó 6 grados))
-        grados_ids = list(range(6, 12)) if nivel == "Primaria" else list(range(1, 6))
-        horario_lista = [
-            [
-                [
-                    (horario_dict.get(d, {}).get(b, {}).get(g, 0))
-                    for g in grados_ids
-                ]
-                for b in range(num_bloques)
-            ]
-            for d in range(5)
-        ]
-
-        return jsonify({
-            "horario": horario_lista,
-            "asignaciones_exitosas": resultado.get("asignaciones_exitosas", 0),
-            "asignaciones_fallidas": resultado.get("asignaciones_fallidas", 0),
-            "total_bloques_asignados": total_asignados,
-            "version": nueva_version
-        }), 200
+        # Mismo sistema de jobs que el endpoint con progreso: lanzar (o unirse
+        # al job identico en curso) y esperar
+        job_id, _ = lanzar_o_unirse(_tarea_generacion(pipeline, data), pipeline.clave())
+        job = esperar_trabajo(job_id, timeout=GENERACION_TIMEOUT)
+        if job is None:
+            return jsonify({
+                "error": "La generacion supero el tiempo de espera; sigue en curso.",
+                "job_id": job_id
+            }), 504
+        if job["status"] == "error":
+            raise job["exception"]
+        # El resultado se comparte entre pedidos unidos: se codifica por respuesta
+        formato = negociar(request.headers.get("Accept"), request.args.get("formato"))
+        resp = jsonify(empaquetar_payload(job["result"], formato))
+        resp.headers["Vary"] = "Accept"
+        return resp, 200
 
     except Exception as e:
         print("[ERROR] Excepción general:", repr(e))
@@ -317,190 +159,238 @@ def generar_horario_general():
             "trace": traceback.format_exc()
         }), 500
 
+def _ejecutar_pipeline(pipeline, progress_cb):
+    pipeline.progress_callback = progress_cb
+    return pipeline.ejecutar()
+
+def _tarea_generacion(pipeline, data):
+    # Con COLA_TRABAJOS resuelve un worker (worker_solver.py); este proceso
+    # solo sigue el trabajo y reenvia su progreso a los suscriptores
+    cola = obtener_cola()
+    if cola is not None:
+        # El pipeline corre en el worker: su hook de pre-generacion no llega a este proceso
+        if PREGENERACION:
+            pregenerador.registrar_objetivo(pipeline.nivel, pipeline.version)
+        return tarea_remota(cola, data, pipeline.clave())
+    return lambda progress_cb: _ejecutar_pipeline(pipeline, progress_cb)
+
 @app.route("/generar-horario-general-job", methods=["POST"])
 def generar_horario_job():
     try:
         data = request.get_json(force=True, silent=False)
-
-        docentes = data.get("docentes", [])
-        asignaciones = data.get("asignaciones", {})
-        restricciones = data.get("restricciones", {})
-        horas_curso_grado = data.get("horas_curso_grado", {})
-        nivel = data.get("nivel", "Secundaria")
-        overwrite = bool(data.get("overwrite", False))
-        version = data.get("version") or data.get("version_num") or 1
-        num_bloques = _num_bloques_from_version(version)
-
-        if not docentes or not asignaciones or not horas_curso_grado:
+        pipeline = PipelineGeneracion(obtener_supabase(), data, hooks=[iniciar_pregeneracion().hook, observar_pipeline])
+        if pipeline.faltan_datos():
             return jsonify({"error": "Faltan datos requeridos para generar el horario."}), 400
 
-        print("[API][DEBUG] restricciones keys:", (restricciones or {}).keys())
-        print("[API][DEBUG] tiene disponibilidad?:", "disponibilidad" in (restricciones or {}))
-        if isinstance((restricciones or {}).get("disponibilidad"), dict):
-            disp = (restricciones or {}).get("disponibilidad") or {}
-            print("[API][DEBUG] disponibilidad docentes:", list(disp.keys())[:5])
-            if disp:
-                first = next(iter(disp))
-                print("[API][DEBUG] sample docente", first, "keys:", list((disp.get(first) or {}).keys())[:10])
-        else:
-            print("[API][DEBUG] disponibilidad tipo:", type((restricciones or {}).get("disponibilidad")))
-
-        if not (restricciones or {}).get("disponibilidad"):
-            restricciones = construir_restricciones_disponibilidad(supabase, nivel)
-            print("[API][DEBUG] disponibilidad cargada desde BD. docentes:", list(restricciones.get("disponibilidad", {}).keys())[:5])
-
-        job_id = str(uuid.uuid4())
-        q = Queue()
-        with _jobs_lock:
-            _jobs[job_id] = {"queue": q, "status": "running", "result": None, "error": None}
-
-        def _progress_cb(pct, stage=""):
-            _push_event(job_id, "progress", {"progress": int(pct), "stage": stage})
-            try:
-                print(f"[PROGRESS] {int(pct)}% {stage}", flush=True)
-            except Exception:
-                pass
-
-        def _run():
-            try:
-                _progress_cb(2, "preparando")
-                patrones_division = cargar_patrones_division(supabase, nivel, version)
-                resultado = generar_horario(
-                    docentes,
-                    asignaciones,
-                    restricciones,
-                    horas_curso_grado,
-                    nivel=nivel,
-                    version=version,
-                    patrones_division=patrones_division,
-                    progress_callback=_progress_cb
-                )
-                horario_dict = resultado.get("horario", {})
-                total_asignados = resultado.get("total_bloques_asignados", 0)
-                nueva_version = obtener_nuevo_numero_horario(nivel)
-
-                registros = []
-                for dia_key, bloques in (horario_dict or {}).items():
-                    try:
-                        dia_idx = int(dia_key)
-                    except Exception:
-                        continue
-                    if not (0 <= dia_idx < len(DIAS)):
-                        continue
-                    dia_nombre = DIAS[dia_idx]
-
-                    for blq_key, grados in (bloques or {}).items():
-                        try:
-                            bloque_idx = int(blq_key)
-                        except Exception:
-                            continue
-                        if not (0 <= bloque_idx < num_bloques):
-                            continue
-
-                        for grado_key, curso_id in (grados or {}).items():
-                            if not isinstance(curso_id, int) or curso_id <= 0:
-                                continue
-                            try:
-                                grado_id = int(grado_key)
-                            except Exception:
-                                continue
-
-                            docente_id = (
-                                asignaciones
-                                .get(str(curso_id), {})
-                                .get(str(grado_id), {})
-                                .get("docente_id")
-                            )
-                            if docente_id:
-                                registros.append({
-                                    "docente_id": int(docente_id),
-                                    "curso_id": int(curso_id),
-                                    "grado_id": int(grado_id),
-                                    "dia": dia_nombre,
-                                    "bloque": int(bloque_idx),
-                                    "nivel": nivel,
-                                    "version_num": int(nueva_version)
-                                })
-
-                if registros:
-                    CONFLICT_COLS = ["grado_id", "dia", "bloque"]
-                    if overwrite:
-                        supabase.table("horarios").delete().eq("nivel", nivel).eq("version_num", nueva_version).execute()
-                        supabase.table("horarios").insert(registros).execute()
-                    else:
-                        try:
-                            supabase.table("horarios").upsert(registros, on_conflict=CONFLICT_COLS).execute()
-                        except Exception as e:
-                            msg = str(e)
-                            if "42P10" in msg or "23505" in msg:
-                                supabase.table("horarios").delete().eq("nivel", nivel).eq("version_num", nueva_version).execute()
-                                supabase.table("horarios").insert(registros).execute()
-                            else:
-                                raise
-
-                grados_ids = list(range(6, 12)) if nivel == "Primaria" else list(range(1, 6))
-                horario_lista = [
-                    [
-                        [
-                            (horario_dict.get(d, {}).get(b, {}).get(g, 0))
-                            for g in grados_ids
-                        ]
-                        for b in range(num_bloques)
-                    ]
-                    for d in range(5)
-                ]
-
-                payload = {
-                    "horario": horario_lista,
-                    "asignaciones_exitosas": resultado.get("asignaciones_exitosas", 0),
-                    "asignaciones_fallidas": resultado.get("asignaciones_fallidas", 0),
-                    "total_bloques_asignados": total_asignados,
-                    "version": nueva_version
-                }
-                with _jobs_lock:
-                    _jobs[job_id]["status"] = "done"
-                    _jobs[job_id]["result"] = payload
-                _push_event(job_id, "done", {"result": payload})
-            except Exception as e:
-                with _jobs_lock:
-                    _jobs[job_id]["status"] = "error"
-                    _jobs[job_id]["error"] = str(e)
-                _push_event(job_id, "error", {"error": str(e)})
-            finally:
-                _cleanup_job(job_id, delay=300)
-
-        t = threading.Thread(target=_run, daemon=True)
-        t.start()
-
-        return jsonify({"job_id": job_id}), 202
+        job_id, nuevo = lanzar_o_unirse(_tarea_generacion(pipeline, data), pipeline.clave())
+        return jsonify({"job_id": job_id, "compartido": not nuevo}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/generar-horario-general-job/<job_id>/events", methods=["GET"])
 def generar_horario_job_events(job_id):
-    with _jobs_lock:
-        job = _jobs.get(job_id)
-    if not job:
+    # Cada cliente tiene su cola: varios pedidos unidos al mismo job ven el mismo stream
+    cola = suscribir(job_id)
+    if cola is None:
         return jsonify({"error": "Job no encontrado"}), 404
 
+    # EventSource no permite headers: el formato del horario va por ?formato=
+    formato = negociar(request.headers.get("Accept"), request.args.get("formato"))
+
     def stream():
-        while True:
-            try:
-                event, payload = job["queue"].get(timeout=20)
-            except Empty:
-                yield ": ping\n\n"
-                continue
-            yield f"event: {event}\n"
-            yield f"data: {json.dumps(payload)}\n\n"
-            if event in ("done", "error"):
-                break
+        try:
+            while True:
+                try:
+                    event, payload = cola.get(timeout=20)
+                except Empty:
+                    yield ": ping\n\n"
+                    continue
+                if event == "done":
+                    payload = {"result": empaquetar_payload(payload.get("result"), formato)}
+                yield f"event: {event}\n"
+                yield f"data: {json.dumps(payload)}\n\n"
+                if event in ("done", "error"):
+                    break
+        finally:
+            desuscribir(job_id, cola)
 
     resp = Response(stream_with_context(stream()), mimetype="text/event-stream")
     resp.headers["Cache-Control"] = "no-cache"
     resp.headers["X-Accel-Buffering"] = "no"
     return resp
 
+# Analisis que resuelven varias veces (escenarios, cuellos de botella): van
+# por el mismo sistema de jobs que la generacion (worker con COLA_TRABAJOS,
+# single-flight, SSE en /generar-horario-general-job/<id>/events) y cada
+# uno tiene su propio tope de tiempo total
+ANALISIS = {"escenarios": evaluar_escenarios, "cuellos": analizar_cuellos}
+
+def _tarea_analisis(tipo, data):
+    clave = tipo + ":" + hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    cola = obtener_cola()
+    if cola is not None:
+        return tarea_remota(cola, {"analisis": {"tipo": tipo, "data": data}}, clave), clave
+    return (lambda progress_cb: ANALISIS[tipo](obtener_supabase(), data)), clave
+
+def _responder_analisis(tipo, data):
+    tarea, clave = _tarea_analisis(tipo, data)
+    job_id, _ = lanzar_o_unirse(tarea, clave)
+    job = esperar_trabajo(job_id, timeout=GENERACION_TIMEOUT)
+    if job is None:
+        return jsonify({"error": "El analisis supero el tiempo de espera; sigue en curso.", "job_id": job_id}), 504
+    if job["status"] == "error":
+        raise job["exception"]
+    return jsonify(job["result"]), 200
+
+@app.route("/escenarios", methods=["POST"])
+def escenarios():
+    # Que pasa si: base + N escenarios con cambios chicos; no persiste nada
+    try:
+        data = request.get_json(force=True, silent=False)
+        pipeline = PipelineGeneracion(obtener_supabase(), data)
+        # Solo los errores del request son 400; se validan antes de lanzar el job
+        validar_escenarios(data, pipeline.num_bloques, pipeline.num_dias)
+        return _responder_analisis("escenarios", data)
+    except EscenarioInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route("/cuellos-botella", methods=["POST"])
+def cuellos_botella():
+    # Holguras por docente/grado y, si es infactible, que cambio unico la destraba
+    try:
+        data = request.get_json(force=True, silent=False)
+        if PipelineGeneracion(obtener_supabase(), data).faltan_datos():
+            return jsonify({"error": "Faltan datos requeridos para el analisis."}), 400
+        return _responder_analisis("cuellos", data)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route("/pregenerar", methods=["POST"])
+def pregenerar():
+    # Webhook: {"nivel", "version"} programa esa instancia; sin body, todos los objetivos conocidos
+    if not PREGENERACION:
+        return jsonify({"error": "Pre-generacion deshabilitada (PREGENERACION=1)"}), 503
+    if PREGENERACION_TOKEN and request.headers.get("X-Pregeneracion-Token") != PREGENERACION_TOKEN:
+        return jsonify({"error": "Token invalido"}), 401
+    data = request.get_json(silent=True) or {}
+    # Los Database Webhooks de Supabase mandan {"table", "record", ...}
+    registro = data.get("record") or {}
+    nivel = data.get("nivel") or registro.get("nivel")
+    version = data.get("version") or registro.get("version_num")
+    programadas = iniciar_pregeneracion().datos_cambiaron(nivel, version)
+    return jsonify({
+        "programadas": [{"nivel": n, "version": v} for n, v in programadas],
+        "debounce_s": pregenerador.debounce
+    }), 202
+
+def _indice_version(nivel, version):
+    return obtener_indice(nivel, version, cargar=lambda: cargar_registros_horario(obtener_supabase(), nivel, version))
+
+@app.route("/horarios/<nivel>/<int:version>/docente/<int:docente_id>", methods=["GET"])
+def horario_docente(nivel, version, docente_id):
+    indice = _indice_version(nivel, version)
+    return jsonify({
+        "docente_id": docente_id,
+        "horario": indice["docentes"].get(docente_id, [])
+    }), 200
+
+@app.route("/horarios/<nivel>/<int:version>/docentes", methods=["GET"])
+def horario_docentes(nivel, version):
+    # ?ids=1,2,3 (sin ids devuelve todos los docentes de la version)
+    indice = _indice_version(nivel, version)
+    ids = request.args.get("ids")
+    if ids:
+        try:
+            seleccion = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            return jsonify({"error": "ids debe ser una lista de enteros separados por coma"}), 400
+    else:
+        seleccion = list(indice["docentes"].keys())
+    return jsonify({
+        "docentes": {str(d): indice["docentes"].get(d, []) for d in seleccion}
+    }), 200
+
+@app.route("/horarios/<nivel>/<int:version>/curso/<int:curso_id>", methods=["GET"])
+def horario_curso(nivel, version, curso_id):
+    indice = _indice_version(nivel, version)
+    return jsonify({
+        "curso_id": curso_id,
+        "horario": indice["cursos"].get(curso_id, [])
+    }), 200
+
+@app.route("/horarios/<nivel>/<int:version>/grados/libres", methods=["GET"])
+def horario_grados_libres(nivel, version):
+    indice = _indice_version(nivel, version)
+    return jsonify({
+        "grados_libres": {str(g): libres for g, libres in indice["grados_libres"].items()}
+    }), 200
+
+@app.route("/validar-movimiento", methods=["POST"])
+def validar_movimiento():
+    # {"grado_id", "desde": {"dia", "bloque"}, "hasta": {...}, "intercambiar", "previos": [...]} contra una version guardada;
+    # con "celdas" valida un horario manual completo de una pasada
+    try:
+        data = request.get_json(force=True, silent=False) or {}
+        nivel = data.get("nivel", "Secundaria")
+        version = int(data.get("version") or 1)
+        num_dias = int(data.get("num_dias") or NUM_DIAS)
+        sb = obtener_supabase()
+        if "celdas" in data:
+            reglas = ReglasHorario.desde_instancia(cargar_instancia(sb, nivel, version, num_dias))
+            return jsonify(validar_lote(data["celdas"], reglas)), 200
+        horario_version = data.get("horario_version") or ultimo_numero_horario(sb, nivel)
+        if horario_version is None:
+            return jsonify({"error": "No hay horarios guardados para " + str(nivel)}), 404
+        indice = obtener_indice_conflictos(
+            nivel, horario_version, version,
+            cargar=lambda: (cargar_version(sb, nivel, horario_version), cargar_instancia(sb, nivel, version, num_dias)),
+            num_dias=num_dias,
+        )
+        previos = [(p["grado_id"], p["desde"], p["hasta"]) for p in data.get("previos") or []]
+        resultado = indice.validar(
+            data["grado_id"], data["desde"], data["hasta"],
+            intercambiar=bool(data.get("intercambiar")), previos=previos,
+        )
+        return jsonify(dict(resultado, horario_version=int(horario_version))), 200
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route("/horarios/<nivel>/diff", methods=["GET"])
+def horario_diff(nivel):
+    # ?from=3&to=5: celdas distintas entre dos versiones (base + deltas, cacheadas)
+    try:
+        desde = int(request.args["from"])
+        hasta = int(request.args["to"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "from y to deben ser numeros de version"}), 400
+    try:
+        sb = obtener_supabase()
+        antes, despues = cargar_version(sb, nivel, desde), cargar_version(sb, nivel, hasta)
+        # Sin base en horario_versiones ni filas en 'horarios': la version no existe
+        faltan = [v for v, celdas in ((desde, antes), (hasta, despues)) if not celdas]
+        if faltan:
+            return jsonify({"error": f"No hay horario {nivel} version {faltan[0]}"}), 404
+        cambios = cambios_entre(antes, despues, dias=DIAS_BD)
+        return jsonify({
+            "nivel": nivel,
+            "from": desde,
+            "to": hasta,
+            "total": len(cambios),
+            "cambios": cambios
+        }), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
 # Run local / Railway
 if __name__ == "__main__":
+    iniciar_pregeneracion()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# arranque.py
+#
+# Inicialización diferida de las dependencias pesadas (OR-Tools, cliente de
+# Supabase). Importar app.py ya no las carga: se cargan en el primer uso, en
+# el warm-up de gunicorn (gunicorn.conf.py) o cuando /ready lo pide.
+
+import os
+import threading
+import time
+
+_estado = {
+    "solver": False,
+    "db": False,
+    "tiempos": {},  # segundos que tomó cada inicialización
+    "error_db": None,
+}
+_lock = threading.Lock()
+_supabase = None
+_hilo_warmup = None
+
+
+def calentar_solver():
+    """Importa OR-Tools y arma un modelo mínimo (carga la librería nativa)."""
+    if _estado["solver"]:
+        return
+    t0 = time.perf_counter()
+    from ortools.sat.python import cp_model
+
+    model = cp_model.CpModel()
+    x = model.NewBoolVar("x")
+    model.Add(x == 1)
+    model.Proto()
+    with _lock:
+        _estado["solver"] = True
+        _estado["tiempos"]["solver"] = round(time.perf_counter() - t0, 4)
+
+
+def obtener_supabase():
+    """
+    Cliente de Supabase compartido; se crea en el primer uso. Con HORARIO_DB
+    (memoria o sqlite:///ruta.db) se usa el repositorio local en su lugar.
+    """
+    global _supabase
+    if _supabase is not None:
+        return _supabase
+    with _lock:
+        if _supabase is None and os.getenv("HORARIO_DB"):
+            from repositorio_local import cliente_desde_url
+
+            _supabase = cliente_desde_url(os.getenv("HORARIO_DB"))
+            _estado["db"] = True
+            _estado["error_db"] = None
+        if _supabase is None:
+            url = os.getenv("SUPABASE_URL")
+            key = os.getenv("SUPABASE_KEY")
+            if not url or not key:
+                _estado["error_db"] = "SUPABASE_URL o SUPABASE_KEY no están definidos."
+                raise RuntimeError("❌ " + _estado["error_db"])
+            t0 = time.perf_counter()
+            from supabase import create_client
+
+            from telemetria import instrumentar_supabase
+
+            _supabase = instrumentar_supabase(create_client(url, key))
+            _estado["db"] = True
+            _estado["error_db"] = None
+            _estado["tiempos"]["db"] = round(time.perf_counter() - t0, 4)
+    return _supabase
+
+
+def calentar(db=True):
+    """Warm-up completo; los errores del cliente quedan en el estado, no se propagan."""
+    calentar_solver()
+    if db:
+        try:
+            obtener_supabase()
+        except Exception as e:
+            _estado["error_db"] = str(e)
+
+
+def calentar_en_segundo_plano(db=True):
+    """Lanza calentar() en un hilo, salvo que ya haya uno en curso."""
+    global _hilo_warmup
+    with _lock:
+        if _hilo_warmup is not None and _hilo_warmup.is_alive():
+            return
+        _hilo_warmup = threading.Thread(target=calentar, kwargs={"db": db}, daemon=True, name="warmup")
+        _hilo_warmup.start()
+
+
+def estado():
+    with _lock:
+        return {
+            "listo": _estado["solver"] and _estado["db"],
+            "solver": _estado["solver"],
+            "db": _estado["db"],
+            "error_db": _estado["error_db"],
+            "tiempos": dict(_estado["tiempos"]),
+        }
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# asgi.py
+#
+# Entrada ASGI del backend (gunicorn.conf.py usa workers de uvicorn):
+#   gunicorn asgi:app
+#
+# El stream de eventos de los jobs (/generar-horario-general-job/<id>/events)
+# se sirve acá, async, sobre broker_eventos: miles de clientes SSE ociosos
+# no ocupan hilos. Todo lo demás pasa a la app Flask por a2wsgi, en un pool
+# de HILOS_WSGI hilos (el endpoint síncrono ocupa uno mientras espera).
+#
+# El endpoint SSE de Flask sigue existiendo para correr solo con WSGI
+# (python app.py o gunicorn app:app con workers sync).
+
+import asyncio
+import json
+import os
+import re
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+from app import ORIGENES_PERMITIDOS, app as app_flask
+from broker_eventos import BrokerEventos
+from codec_horario import negociar
+from telemetria import SUSCRIPTORES_SSE
+
+PING_S = float(os.getenv("SSE_PING_S", "20"))
+HILOS_WSGI = int(os.getenv("HILOS_WSGI", "32"))
+
+_RUTA_EVENTOS = re.compile(r"^/generar-horario-general-job/([^/]+)/events/?$")
+
+_wsgi = WSGIMiddleware(app_flask, workers=HILOS_WSGI)
+broker = BrokerEventos()
+
+
+def _headers(scope):
+    return {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+def _cors(headers):
+    origin = headers.get("origin")
+    if origin not in ORIGENES_PERMITIDOS:
+        return []
+    return [(b"access-control-allow-origin", origin.encode("latin-1")), (b"access-control-allow-credentials", b"true")]
+
+
+async def _json(send, status, cuerpo, extra):
+    datos = json.dumps(cuerpo).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(datos)).encode())] + extra,
+    })
+    await send({"type": "http.response.body", "body": datos})
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def eventos_job(scope, receive, send, job_id):
+    headers = _headers(scope)
+    # EventSource no permite headers: el formato del horario va por ?formato=
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    formato = negociar(headers.get("accept"), (query.get("formato") or [None])[0])
+
+    suscripcion = broker.suscribir(job_id)
+    if suscripcion is None:
+        await _json(send, 404, {"error": "Job no encontrado"}, _cors(headers))
+        return
+    canal, cola = suscripcion
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ] + _cors(headers),
+    })
+    desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+    SUSCRIPTORES_SSE.inc()
+    try:
+        while True:
+            siguiente = asyncio.ensure_future(cola.get())
+            listos, _ = await asyncio.wait(
+                {siguiente, desconexion}, timeout=PING_S, return_when=asyncio.FIRST_COMPLETED
+            )
+            if siguiente not in listos:
+                siguiente.cancel()
+                if desconexion in listos:
+                    return
+                await send({"type": "http.response.body", "body": b": ping\n\n", "more_body": True})
+                continue
+            indice = siguiente.result()
+            await send({"type": "http.response.body", "body": canal.sse(indice, formato), "more_body": True})
+            if canal.final(indice):
+                break
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        SUSCRIPTORES_SSE.dec()
+        desconexion.cancel()
+        broker.desuscribir(job_id, cola)
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "GET":
+        ruta = _RUTA_EVENTOS.match(scope["path"])
+        if ruta:
+            return await eventos_job(scope, receive, send, ruta.group(1))
+    return await _wsgi(scope, receive, send)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# asignacion_aulas.py
+#
+# Asignación de aulas como fase posterior al solver. El modelo CP-SAT no
+# conoce las aulas: un docente con aula_id dicta en su aula, así que dos
+# docentes que comparten aula (o un tipo de aula escaso, p.ej. Laboratorio)
+# pueden quedar a la misma hora. Cada celda (día, bloque) es independiente:
+# un emparejamiento de costo mínimo entre las clases de esa celda y las aulas
+#   aula propia del docente          costo 0
+#   otra aula del mismo tipo         costo OTRA_AULA
+#   sin aula (choque)                costo SIN_AULA
+# Las clases de docentes sin aula_id se dictan en el aula del grado y no
+# entran al emparejamiento.
+#
+# Un choque (clases que se quedan sin aula) se devuelve también como cortes
+# para volver a resolver: las clases de los docentes de ese tipo de aula no
+# pueden superar la cantidad de aulas del tipo (opciones_solver "cortes",
+# aplicar_cortes en generador_python.py). Las aulas no cambian con la hora,
+# así que el corte se emite para todas las celdas: con cortes solo en la
+# celda del choque, el re-solve lo corre a otra celda y hacen falta varias
+# rondas.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+TIPO_DEFAULT = "Teorica"
+OTRA_AULA = 1
+SIN_AULA = 1000
+# Hilos para las celdas. Con 40 celdas de pocas clases el flujo es de
+# microsegundos y el costo de los hilos domina: por defecto en serie.
+PARALELO = int(os.getenv("AULAS_PARALELO", "1"))
+
+
+def cargar_aulas(sb, nivel, version):
+    """Aulas del nivel/versión; [] si la tabla no existe o falla la consulta."""
+    try:
+        return (
+            sb.table("aulas")
+            .select("id,nombre,tipo")
+            .eq("nivel", nivel)
+            .eq("version_num", version)
+            .execute()
+            .data
+            or []
+        )
+    except Exception:
+        return []
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def candidatas_por_docente(docentes, aulas):
+    """
+    {docente_id: (tipo, [(aula_id, costo), ...])} solo para docentes con un
+    aula_id que existe: su aula primero y después las demás de su tipo.
+    """
+    tipos = {}
+    por_tipo = {}
+    for aula in aulas:
+        aula_id = int(aula["id"])
+        tipo = aula.get("tipo") or TIPO_DEFAULT
+        tipos[aula_id] = tipo
+        por_tipo.setdefault(tipo, []).append(aula_id)
+    candidatas = {}
+    for doc in docentes:
+        doc_id, aula_id = _entero(doc.get("id")), _entero(doc.get("aula_id"))
+        if doc_id is None or aula_id not in tipos:
+            continue
+        tipo = tipos[aula_id]
+        candidatas[doc_id] = (
+            tipo,
+            [(aula_id, 0)] + [(otra, OTRA_AULA) for otra in por_tipo[tipo] if otra != aula_id],
+        )
+    return candidatas
+
+
+def emparejar(clases, candidatas):
+    """
+    clases: [docente_id, ...] de una celda. Devuelve [aula_id o None] en el
+    mismo orden, con el mínimo de clases sin aula y, entre esos, el mínimo
+    de clases fuera del aula propia.
+    """
+    propias = [candidatas[doc][1][0][0] for doc in clases]
+    if len(set(propias)) == len(propias):
+        return propias  # caso común: cada docente en su aula
+
+    from ortools.graph.python import min_cost_flow
+
+    aulas = sorted({a for doc in clases for a, _ in candidatas[doc][1]})
+    nodo_aula = {a: len(clases) + i for i, a in enumerate(aulas)}
+    fuente, sumidero = len(clases) + len(aulas), len(clases) + len(aulas) + 1
+    flujo = min_cost_flow.SimpleMinCostFlow()
+    arcos = []
+    for i, doc in enumerate(clases):
+        flujo.add_arc_with_capacity_and_unit_cost(fuente, i, 1, 0)
+        flujo.add_arc_with_capacity_and_unit_cost(i, sumidero, 1, SIN_AULA)
+        for aula, costo in candidatas[doc][1]:
+            arcos.append((flujo.add_arc_with_capacity_and_unit_cost(i, nodo_aula[aula], 1, costo), i, aula))
+    for aula in aulas:
+        flujo.add_arc_with_capacity_and_unit_cost(nodo_aula[aula], sumidero, 1, 0)
+    flujo.set_node_supply(fuente, len(clases))
+    flujo.set_node_supply(sumidero, -len(clases))
+    if flujo.solve() != flujo.OPTIMAL:
+        raise RuntimeError("Flujo de asignación de aulas sin solución óptima")
+
+    asignadas = [None] * len(clases)
+    for arco, i, aula in arcos:
+        if flujo.flow(arco):
+            asignadas[i] = aula
+    return asignadas
+
+
+def asignar_aulas(resultado, docentes, aulas, paralelo=None):
+    """
+    Aulas para un resultado del generador (matriz_cursos/matriz_docentes).
+    Devuelve {"asignadas": [...], "choques": [...], "cortes": [...]}; sin
+    choques, cortes queda vacío.
+    """
+    candidatas = candidatas_por_docente(docentes, aulas)
+    cursos, docs, grados = resultado["matriz_cursos"], resultado["matriz_docentes"], resultado["grados"]
+    num_dias, num_bloques, num_grados = cursos.shape
+    celdas = [(d, b) for d in range(num_dias) for b in range(num_bloques)]
+
+    def _celda(celda):
+        d, b = celda
+        clases = [g for g in range(num_grados) if cursos[d, b, g] and int(docs[d, b, g]) in candidatas]
+        return clases, emparejar([int(docs[d, b, g]) for g in clases], candidatas)
+
+    paralelo = PARALELO if paralelo is None else paralelo
+    if paralelo > 1:
+        with ThreadPoolExecutor(max_workers=paralelo) as pool:
+            por_celda = list(pool.map(_celda, celdas))
+    else:
+        por_celda = [_celda(celda) for celda in celdas]
+
+    aulas_por_tipo = {}
+    for aula in aulas:
+        tipo = aula.get("tipo") or TIPO_DEFAULT
+        aulas_por_tipo[tipo] = aulas_por_tipo.get(tipo, 0) + 1
+
+    asignadas, choques = [], []
+    for (d, b), (clases, aulas_celda) in zip(celdas, por_celda):
+        sin_aula = []
+        for g, aula in zip(clases, aulas_celda):
+            fila = {
+                "grado_id": int(grados[g]), "dia": d, "bloque": b,
+                "curso_id": int(cursos[d, b, g]), "docente_id": int(docs[d, b, g]), "aula_id": aula,
+            }
+            asignadas.append(fila)
+            if aula is None:
+                sin_aula.append(fila)
+        if not sin_aula:
+            continue
+        # Todas las aulas candidatas de un docente son de un tipo: el choque es de ese tipo
+        for tipo in sorted({candidatas[f["docente_id"]][0] for f in sin_aula}):
+            choques.append({
+                "dia": d, "bloque": b, "tipo": tipo, "aulas": aulas_por_tipo[tipo],
+                "sin_aula": [f for f in sin_aula if candidatas[f["docente_id"]][0] == tipo],
+            })
+
+    # Cortes para todos los docentes del tipo (no solo los de la celda del choque)
+    cortes = []
+    for tipo in sorted({c["tipo"] for c in choques}):
+        docentes_tipo = sorted(doc for doc, (t, _) in candidatas.items() if t == tipo)
+        cortes += [
+            {"dia": d, "bloque": b, "docentes": docentes_tipo, "max": aulas_por_tipo[tipo]} for d, b in celdas
+        ]
+    if choques:
+        print(f"[AULAS] {len(choques)} choques de aula: {[(c['dia'], c['bloque'], c['tipo']) for c in choques]}")
+    return {"asignadas": asignadas, "choques": choques, "cortes": cortes}
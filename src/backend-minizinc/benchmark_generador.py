@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# benchmark_generador.py
+#
+# Benchmark del generador CP-SAT sobre instancias sintéticas reproducibles.
+#
+# Uso:
+#   python benchmark_generador.py
+#   python benchmark_generador.py --instancias mediana --configs base,redundantes --repeticiones 3
+#   python benchmark_generador.py --json resultados.json
+#   python benchmark_generador.py --grupos 10,30,60   (escalado por grupos/secciones)
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from configuracion_solver import PRESETS, resolver_opciones
+from generador_python import construir_esqueleto, generar_horario, parchear_modelo, preparar_datos
+
+# Horas por curso en cada grado (mismo perfil en todos los grados)
+PERFILES = {
+    "pequena": [5, 4, 4, 3, 3, 2, 2, 2],
+    "mediana": [5, 5, 4, 4, 3, 3, 3, 2, 2, 2],
+    "grande": [5, 5, 5, 4, 4, 3, 3, 3, 2, 2, 2],
+}
+
+# Un caso por preset, más variantes puntuales
+CONFIGURACIONES = {nombre: {"preset": nombre} for nombre in PRESETS}
+CONFIGURACIONES.update({
+    "simetrias": {"preset": "base", "romper_simetrias": True},
+    "simetrias_cpsat": {"preset": "base", "romper_simetrias": True, "symmetry_level": 4},
+    "dos_fases": {"preset": "base", "motor": "dos_fases"},
+    "dos_fases_completo": {"preset": "completo", "motor": "dos_fases"},
+})
+
+
+def instancia_sintetica(nombre="mediana", grados=(1, 2, 3, 4, 5), densidad=0.85, version=2, semilla=0):
+    """
+    Instancia tipo secundaria: cada curso lo dicta un docente en dos grados
+    consecutivos, y cursos con iguales horas se agrupan por docente para que
+    existan asignaciones intercambiables y grados con el mismo perfil.
+    """
+    rnd = random.Random(semilla)
+    horas = PERFILES[nombre]
+    num_bloques = 7 if int(version) == 1 else 8
+    dias = ["lunes", "martes", "miercoles", "jueves", "viernes"]
+
+    asignaciones, horas_curso_grado = {}, {}
+    docentes_ids = set()
+    # Ids de docente por curso en tramos de paso: un docente cada dos grados
+    paso = max(10, (len(grados) + 1) // 2)
+    for c, h in enumerate(horas, start=1):
+        # Cursos de 2h comparten docente de a pares -> asignaciones intercambiables
+        base_doc = 100 + (c if h != 2 else 50 + c // 2) * paso
+        for i, g in enumerate(grados):
+            doc = base_doc + i // 2
+            docentes_ids.add(doc)
+            asignaciones.setdefault(str(c), {})[str(g)] = {"docente_id": doc}
+            horas_curso_grado.setdefault(str(c), {})[str(g)] = h
+
+    disponibilidad = {}
+    for doc in sorted(docentes_ids):
+        disponibilidad[str(doc)] = {
+            f"{dia}-{b}": True
+            for dia in dias
+            for b in range(num_bloques)
+            if rnd.random() < densidad
+        }
+
+    docentes = [{"id": d, "nombre": f"Docente {d}", "jornada_total": 40} for d in sorted(docentes_ids)]
+    return {
+        "docentes": docentes,
+        "asignaciones": asignaciones,
+        "restricciones": {"disponibilidad": disponibilidad},
+        "horas_curso_grado": horas_curso_grado,
+        "nivel": "Secundaria",
+        "version": version,
+    }
+
+
+def ejecutar_caso(instancia, opciones_solver, silencioso=True):
+    salida = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(salida) if silencioso else contextlib.nullcontext():
+        resultado = generar_horario(
+            [dict(d) for d in instancia["docentes"]],
+            instancia["asignaciones"],
+            instancia["restricciones"],
+            instancia["horas_curso_grado"],
+            nivel=instancia["nivel"],
+            version=instancia["version"],
+            patrones_division=instancia.get("patrones_division"),
+            opciones_solver=opciones_solver,
+        )
+    return {
+        "status": resultado.get("status"),
+        "segundos": time.perf_counter() - t0,
+        "asignados": resultado.get("total_bloques_asignados", 0),
+        "fallidos": resultado.get("asignaciones_fallidas", 0),
+    }
+
+
+def correr_benchmark(instancias, configs, repeticiones=1, max_time=30.0, workers=8, semillas=(0,), densidad=0.85):
+    filas = []
+    for nombre in instancias:
+        for semilla in semillas:
+            instancia = instancia_sintetica(nombre, densidad=densidad, semilla=semilla)
+            for config in configs:
+                opciones = dict(CONFIGURACIONES[config], max_time_in_seconds=max_time, num_search_workers=workers)
+                corridas = [ejecutar_caso(instancia, opciones) for _ in range(repeticiones)]
+                tiempos = [c["segundos"] for c in corridas]
+                filas.append({
+                    "instancia": nombre,
+                    "semilla": semilla,
+                    "config": config,
+                    "status": corridas[-1]["status"],
+                    "asignados": corridas[-1]["asignados"],
+                    "mediana_s": statistics.median(tiempos),
+                    "max_s": max(tiempos),
+                })
+    return filas
+
+
+def resumen_por_config(filas):
+    """Tiempo total (suma de medianas) y casos resueltos por config, mejor primero."""
+    resumen = {}
+    for f in filas:
+        r = resumen.setdefault(f["config"], {"config": f["config"], "total_s": 0.0, "resueltos": 0, "casos": 0})
+        r["total_s"] += f["mediana_s"]
+        r["casos"] += 1
+        r["resueltos"] += f["status"] in ("OPTIMAL", "FEASIBLE", "INFEASIBLE")
+    return sorted(resumen.values(), key=lambda r: (-r["resueltos"], r["total_s"]))
+
+
+def medir_arranque(repeticiones=3):
+    """
+    Mediana, en procesos nuevos, de 'import app' (sin OR-Tools ni Supabase)
+    y del warm-up posterior del solver (arranque.calentar_solver).
+    """
+    codigo = (
+        "import time; t0 = time.perf_counter(); import app; t1 = time.perf_counter(); "
+        "import arranque; arranque.calentar_solver(); print(t1 - t0, time.perf_counter() - t1)"
+    )
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    medidas = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", codigo], cwd=carpeta, capture_output=True, text=True, check=True
+        ).stdout.split()
+        medidas.append((float(salida[-2]), float(salida[-1])))
+    return {
+        "import_app_s": round(statistics.median(m[0] for m in medidas), 3),
+        "calentar_solver_s": round(statistics.median(m[1] for m in medidas), 3),
+    }
+
+
+def medir_modelo(instancia, opciones_solver=None):
+    """Segundos de preparar datos + esqueleto + parche (sin caché ni solver) y restricciones."""
+    opciones = resolver_opciones(opciones_solver)
+    num_bloques = 7 if int(instancia["version"]) == 1 else 8
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        datos = preparar_datos(
+            [dict(d) for d in instancia["docentes"]], instancia["asignaciones"], instancia["restricciones"],
+            instancia["horas_curso_grado"], instancia["nivel"], num_bloques,
+        )
+        model, refs = construir_esqueleto(
+            datos["map_asignaciones"], {}, instancia["version"], num_bloques,
+            datos["r_limitar_docente_grado"], opciones,
+        )
+        parchear_modelo(
+            model, refs, datos["map_asignaciones"], datos["bloqueos"], datos["bloqueos_por_docente"],
+            {}, instancia["version"], num_bloques, opciones,
+        )
+    return time.perf_counter() - t0, len(model.Proto().constraints)
+
+
+def escalar_grupos(grupos=(10, 30, 60), nombre="mediana", max_time=60.0, workers=8, semilla=0, densidad=0.9):
+    """
+    Misma instancia con 10, 30, 60... grupos (grados o secciones). El modelo
+    se agrupa por grado, docente y docente-grado: el tiempo de construcción
+    debe crecer casi lineal con los grupos.
+    """
+    filas = []
+    for n in grupos:
+        instancia = instancia_sintetica(nombre, grados=tuple(range(1, n + 1)), densidad=densidad, semilla=semilla)
+        modelo_s, restricciones = medir_modelo(instancia)
+        caso = ejecutar_caso(instancia, {"max_time_in_seconds": max_time, "num_search_workers": workers})
+        filas.append({
+            "grupos": n,
+            "asignaciones": sum(len(por_grado) for por_grado in instancia["asignaciones"].values()),
+            "docentes": len(instancia["docentes"]),
+            "restricciones": restricciones,
+            "modelo_s": modelo_s,
+            "status": caso["status"],
+            "total_s": caso["segundos"],
+        })
+    return filas
+
+
+def imprimir_escalado(filas):
+    print(f"{'grupos':>6} {'asign':>6} {'docentes':>8} {'restric':>8} {'modelo_s':>9} {'status':<11} {'total_s':>8}")
+    for f in filas:
+        print(
+            f"{f['grupos']:>6} {f['asignaciones']:>6} {f['docentes']:>8} {f['restricciones']:>8} "
+            f"{f['modelo_s']:>9.3f} {f['status']:<11} {f['total_s']:>8.3f}"
+        )
+
+
+def imprimir_tabla(filas):
+    print(f"{'instancia':<10} {'sem':>3} {'config':<22} {'status':<11} {'asign':>6} {'mediana_s':>10} {'max_s':>8}")
+    for f in filas:
+        print(
+            f"{f['instancia']:<10} {f['semilla']:>3} {f['config']:<22} {f['status']:<11} {f['asignados']:>6} "
+            f"{f['mediana_s']:>10.3f} {f['max_s']:>8.3f}"
+        )
+    print()
+    print(f"{'config':<22} {'resueltos':>9} {'total_s':>9}")
+    for r in resumen_por_config(filas):
+        print(f"{r['config']:<22} {r['resueltos']:>4}/{r['casos']:<4} {r['total_s']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del generador de horarios")
+    parser.add_argument("--instancias", default=",".join(PERFILES))
+    parser.add_argument("--configs", default=",".join(CONFIGURACIONES))
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--max-time", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--semillas", default="0", help="lista separada por coma")
+    parser.add_argument("--densidad", type=float, default=0.85, help="fraccion de bloques disponibles por docente")
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    parser.add_argument("--grupos", help="escalado: cantidades de grupos separadas por coma (p.ej. 10,30,60)")
+    args = parser.parse_args()
+
+    if args.grupos:
+        filas = escalar_grupos(
+            [int(x) for x in args.grupos.split(",")],
+            nombre=args.instancias.split(",")[0] if args.instancias != ",".join(PERFILES) else "mediana",
+            max_time=args.max_time,
+            workers=args.workers,
+            semilla=int(args.semillas.split(",")[0]),
+        )
+        imprimir_escalado(filas)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"escalado": filas}, f, indent=2)
+        return
+
+    filas = correr_benchmark(
+        args.instancias.split(","),
+        args.configs.split(","),
+        repeticiones=args.repeticiones,
+        max_time=args.max_time,
+        workers=args.workers,
+        semillas=[int(x) for x in args.semillas.split(",")],
+        densidad=args.densidad,
+    )
+    imprimir_tabla(filas)
+    arranque = medir_arranque()
+    print()
+    print(f"arranque: import app {arranque['import_app_s']:.3f} s | calentar solver {arranque['calentar_solver_s']:.3f} s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"arranque": arranque, "filas": filas}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
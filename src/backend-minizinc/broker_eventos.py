@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# broker_eventos.py
+#
+# Fan-out async de los eventos de los jobs para el servidor ASGI (asgi.py).
+# Por job hay un solo canal: un oyente registrado en trabajos.py que agenda
+# cada evento en el event loop, y de ahí se reparte a las colas asyncio de
+# todos los clientes. Un cliente SSE ocioso cuesta una corrutina y una cola;
+# no hay hilos por conexión.
+#
+# Cada evento se serializa una vez por formato (codec_horario) y se
+# reutiliza para todos los suscriptores.
+
+import asyncio
+import json
+
+import trabajos
+from codec_horario import empaquetar_payload
+
+FINALES = ("done", "error")
+
+
+class Canal:
+    """Eventos de un job vistos desde el loop y sus suscriptores."""
+
+    def __init__(self):
+        self.eventos = []
+        self.suscriptores = set()
+        self.oyente = None
+        self._sse = {}
+
+    def sse(self, indice, formato):
+        """Bytes SSE del evento indice, con el horario empaquetado según formato."""
+        clave = (indice, formato)
+        if clave not in self._sse:
+            evento, payload = self.eventos[indice]
+            if evento == "done":
+                payload = {"result": empaquetar_payload(payload.get("result"), formato)}
+            self._sse[clave] = f"event: {evento}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+        return self._sse[clave]
+
+    def final(self, indice):
+        return self.eventos[indice][0] in FINALES
+
+
+class BrokerEventos:
+    """Un canal por job; se usa siempre desde el mismo event loop."""
+
+    def __init__(self):
+        self._canales = {}
+
+    def suscribir(self, job_id):
+        """(canal, cola de índices de evento) o None si el job no existe."""
+        canal = self._canales.get(job_id)
+        if canal is None:
+            loop = asyncio.get_running_loop()
+            canal = Canal()
+
+            def _oyente(evento, payload):
+                # Hilo del job: solo se agenda, el reparto corre en el loop
+                loop.call_soon_threadsafe(self._difundir, job_id, canal, evento, payload)
+
+            if not trabajos.escuchar(job_id, _oyente):
+                return None
+            canal.oyente = _oyente
+            self._canales[job_id] = canal
+        cola = asyncio.Queue()
+        for indice in range(len(canal.eventos)):
+            cola.put_nowait(indice)
+        canal.suscriptores.add(cola)
+        return canal, cola
+
+    def desuscribir(self, job_id, cola):
+        canal = self._canales.get(job_id)
+        if canal is None:
+            return
+        canal.suscriptores.discard(cola)
+        if not canal.suscriptores:
+            trabajos.dejar_de_escuchar(job_id, canal.oyente)
+            del self._canales[job_id]
+
+    def _difundir(self, job_id, canal, evento, payload):
+        if self._canales.get(job_id) is not canal:
+            return  # canal cerrado mientras el evento estaba en camino
+        canal.eventos.append((evento, payload))
+        indice = len(canal.eventos) - 1
+        for cola in canal.suscriptores:
+            cola.put_nowait(indice)
+
+    def canales(self):
+        return len(self._canales)
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+# carga_http.py
+#
+# Prueba de carga HTTP del backend: reproduce una mezcla de pedidos
+# (generación síncrona, jobs con N suscriptores SSE, vistas por docente,
+# diffs, health) con la concurrencia pedida y reporta throughput,
+# percentiles de latencia, tasa de error y RSS máximo.
+#
+# Uso:
+#   python carga_http.py --local --concurrencia 8 --duracion 30
+#   python carga_http.py --url http://localhost:8000 --pid <pid de gunicorn> \
+#       --mezcla sync=3,job=3,docente=3,health=1 --suscriptores 3
+#
+# --local levanta la app en este proceso sobre el repositorio local
+# (HORARIO_DB=memoria), sin Supabase. Contra un gunicorn real, --pid mide
+# el RSS del master y sus workers.
+
+import argparse
+import json
+import os
+import random
+import resource
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmark_generador import instancia_sintetica
+
+MEZCLA_DEFAULT = "sync=3,job=3,docente=2,diff=1,health=1"
+
+
+# --- Pedidos ---
+
+def _pedir(url, metodo="GET", cuerpo=None, timeout=300):
+    datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else None
+    req = urllib.request.Request(url, data=datos, method=metodo, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status, json.loads(resp.read() or b"null")
+
+
+def _leer_sse(url, timeout=300):
+    """Lee el stream hasta 'done' o 'error'; devuelve el último evento."""
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        evento = None
+        for linea in resp:
+            linea = linea.decode("utf-8").strip()
+            if linea.startswith("event:"):
+                evento = linea.split(":", 1)[1].strip()
+                if evento in ("done", "error"):
+                    return evento
+    return evento
+
+
+class Escenario:
+    """Estado compartido entre los clientes: payloads y versiones ya generadas."""
+
+    def __init__(self, base, tamanos, variantes, max_time, suscriptores, semilla=0):
+        self.base = base.rstrip("/")
+        self.suscriptores = suscriptores
+        self.rnd = random.Random(semilla)
+        self.payloads = []
+        for tamano in tamanos:
+            for v in range(variantes):
+                inst = instancia_sintetica(tamano, semilla=v)
+                self.payloads.append({
+                    "docentes": inst["docentes"],
+                    "asignaciones": inst["asignaciones"],
+                    "restricciones": inst["restricciones"],
+                    "horas_curso_grado": inst["horas_curso_grado"],
+                    "nivel": inst["nivel"],
+                    "version": inst["version"],
+                    "opciones_solver": {"max_time_in_seconds": max_time},
+                })
+        self.docentes = sorted({d["id"] for p in self.payloads for d in p["docentes"]})
+        self.versiones = []
+        self._lock = threading.Lock()
+
+    def _payload(self):
+        with self._lock:
+            return self.rnd.choice(self.payloads)
+
+    def _version_generada(self, payload, data):
+        if isinstance(data, dict) and data.get("version"):
+            with self._lock:
+                self.versiones.append((payload["nivel"], int(data["version"])))
+
+    def _version_al_azar(self):
+        with self._lock:
+            return self.rnd.choice(self.versiones) if self.versiones else None
+
+    # Cada pedido devuelve True si fue exitoso
+
+    def sync(self):
+        payload = self._payload()
+        status, data = _pedir(self.base + "/generar-horario-general", "POST", payload)
+        self._version_generada(payload, data)
+        return status == 200
+
+    def job(self):
+        payload = self._payload()
+        status, data = _pedir(self.base + "/generar-horario-general-job", "POST", payload)
+        if status != 202:
+            return False
+        url = f"{self.base}/generar-horario-general-job/{data['job_id']}/events"
+        resultados = [None] * max(self.suscriptores, 1)
+
+        def _suscribir(i):
+            try:
+                resultados[i] = _leer_sse(url)
+            except Exception:
+                resultados[i] = "error"
+
+        hilos = [threading.Thread(target=_suscribir, args=(i,)) for i in range(1, len(resultados))]
+        for h in hilos:
+            h.start()
+        _suscribir(0)
+        for h in hilos:
+            h.join()
+        return all(r == "done" for r in resultados)
+
+    def docente(self):
+        version = self._version_al_azar()
+        if version is None:
+            return self.health()
+        nivel, v = version
+        status, _ = _pedir(f"{self.base}/horarios/{nivel}/{v}/docente/{self.rnd.choice(self.docentes)}")
+        return status == 200
+
+    def diff(self):
+        version = self._version_al_azar()
+        if version is None:
+            return self.health()
+        nivel, v = version
+        status, _ = _pedir(f"{self.base}/horarios/{nivel}/diff?from={max(v - 1, 1)}&to={v}")
+        return status == 200
+
+    def health(self):
+        status, _ = _pedir(self.base + "/health")
+        return status == 200
+
+
+# --- Ejecución ---
+
+def parsear_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip()
+        if nombre not in ("sync", "job", "docente", "diff", "health"):
+            raise ValueError(f"tipo de pedido desconocido: {nombre!r}")
+        mezcla[nombre] = float(peso or 1)
+    return {k: v for k, v in mezcla.items() if v > 0}
+
+
+def _rss_kb(pid):
+    """RSS actual (kB) del proceso y sus hijos directos (workers de gunicorn)."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    total = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next(int(l.split()[1]) for l in f if l.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            continue
+    return total
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    orden = sorted(valores)
+    k = min(len(orden) - 1, max(0, int(round(p / 100 * (len(orden) - 1)))))
+    return orden[k]
+
+
+def correr_carga(escenario, mezcla, concurrencia, duracion=None, pedidos=None, pids=None):
+    """
+    concurrencia clientes en paralelo, cada uno elige el tipo según los pesos
+    de la mezcla. Corta por duración (s) o por total de pedidos.
+    """
+    tipos, pesos = list(mezcla), list(mezcla.values())
+    muestras = {t: [] for t in tipos}
+    errores = {t: 0 for t in tipos}
+    lock = threading.Lock()
+    contador = iter(range(pedidos)) if pedidos else None
+    fin = time.perf_counter() + duracion if duracion else None
+    rss_max = {"kb": 0}
+    corriendo = threading.Event()
+    corriendo.set()
+
+    def _cliente(i):
+        rnd = random.Random(i)
+        while True:
+            if fin is not None and time.perf_counter() >= fin:
+                return
+            if contador is not None:
+                with lock:
+                    if next(contador, None) is None:
+                        return
+            tipo = rnd.choices(tipos, pesos)[0]
+            t0 = time.perf_counter()
+            try:
+                ok = getattr(escenario, tipo)()
+            except (urllib.error.URLError, OSError, ValueError):
+                ok = False
+            with lock:
+                muestras[tipo].append(time.perf_counter() - t0)
+                if not ok:
+                    errores[tipo] += 1
+
+    def _muestrear_rss():
+        while corriendo.is_set():
+            rss_max["kb"] = max(rss_max["kb"], sum(_rss_kb(p) for p in pids or []))
+            time.sleep(0.5)
+
+    t0 = time.perf_counter()
+    monitor = threading.Thread(target=_muestrear_rss, daemon=True)
+    monitor.start()
+    clientes = [threading.Thread(target=_cliente, args=(i,)) for i in range(concurrencia)]
+    for c in clientes:
+        c.start()
+    for c in clientes:
+        c.join()
+    corriendo.clear()
+    segundos = time.perf_counter() - t0
+
+    total = sum(len(v) for v in muestras.values())
+    total_errores = sum(errores.values())
+    return {
+        "concurrencia": concurrencia,
+        "segundos": round(segundos, 2),
+        "pedidos": total,
+        "throughput_rps": round(total / segundos, 2) if segundos else 0,
+        "tasa_error": round(total_errores / total, 4) if total else 0,
+        "rss_max_mb": round(rss_max["kb"] / 1024, 1) if pids else None,
+        "rss_max_cliente_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "por_tipo": {
+            t: {
+                "pedidos": len(muestras[t]),
+                "errores": errores[t],
+                "p50_ms": _ms(percentil(muestras[t], 50)),
+                "p90_ms": _ms(percentil(muestras[t], 90)),
+                "p99_ms": _ms(percentil(muestras[t], 99)),
+                "max_ms": _ms(max(muestras[t]) if muestras[t] else None),
+            }
+            for t in tipos
+        },
+    }
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000, 1)
+
+
+def servidor_local():
+    """Levanta la app (repositorio en memoria) en un hilo; devuelve la URL base."""
+    os.environ.setdefault("HORARIO_DB", "memoria")
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}"
+
+
+def imprimir_reporte(reporte):
+    print(
+        f"[CARGA] {reporte['pedidos']} pedidos en {reporte['segundos']}s "
+        f"({reporte['throughput_rps']} req/s, concurrencia {reporte['concurrencia']}), "
+        f"error {reporte['tasa_error'] * 100:.1f}%, RSS máx servidor {reporte['rss_max_mb']} MB"
+    )
+    for tipo, m in reporte["por_tipo"].items():
+        print(
+            f"[CARGA]   {tipo:8s} n={m['pedidos']:5d} err={m['errores']:4d} "
+            f"p50={m['p50_ms']}ms p90={m['p90_ms']}ms p99={m['p99_ms']}ms max={m['max_ms']}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP del generador de horarios")
+    parser.add_argument("--url", help="URL base del backend")
+    parser.add_argument("--local", action="store_true", help="levanta la app en este proceso (HORARIO_DB=memoria)")
+    parser.add_argument("--pid", type=int, action="append", default=[], help="proceso(s) del servidor a medir (RSS)")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--duracion", type=float, default=30, help="segundos (ignorado con --pedidos)")
+    parser.add_argument("--pedidos", type=int, help="total de pedidos en vez de duración")
+    parser.add_argument("--mezcla", default=MEZCLA_DEFAULT, help="pesos por tipo: sync,job,docente,diff,health")
+    parser.add_argument("--suscriptores", type=int, default=2, help="streams SSE por job")
+    parser.add_argument("--tamanos", default="pequena,mediana", help="instancias sintéticas a usar")
+    parser.add_argument("--variantes", type=int, default=3, help="instancias distintas por tamaño")
+    parser.add_argument("--max-time", type=float, default=10, help="límite del solver por pedido (s)")
+    parser.add_argument("--salida", help="guarda el reporte en JSON")
+    args = parser.parse_args()
+
+    if args.local:
+        base, pids = servidor_local(), [os.getpid()]
+    elif args.url:
+        base, pids = args.url, args.pid
+    else:
+        parser.error("indicar --url o --local")
+
+    escenario = Escenario(
+        base, [t.strip() for t in args.tamanos.split(",") if t.strip()], args.variantes,
+        args.max_time, args.suscriptores,
+    )
+    reporte = correr_carga(
+        escenario, parsear_mezcla(args.mezcla), args.concurrencia,
+        duracion=None if args.pedidos else args.duracion, pedidos=args.pedidos, pids=pids,
+    )
+    imprimir_reporte(reporte)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
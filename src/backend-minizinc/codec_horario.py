@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# codec_horario.py
+#
+# Codificación compacta del horario (matriz dias x bloques x grados de ids
+# de curso) para respuestas, SSE y horario_generaciones. El mismo formato lo
+# lee el front (src/services/horarioCodec.js).
+#
+#   cabecera (8 bytes, little-endian):
+#     "HZ" | version (u8) | compresion (u8: 0 nada, 1 gzip, 2 zstd)
+#     | dias (u8) | bloques (u8) | grados (u16)
+#   cuerpo: dias*bloques*grados uint16 LE en orden (dia, bloque, grado),
+#     0 = vacío; comprimido según la cabecera.
+#
+# En JSON viaja como texto base64 junto a "horario_formato". El formato se
+# negocia por Accept (application/x-horario-u16[+gzip|+zstd]) o, en SSE,
+# por ?formato=; sin negociación se sigue enviando la lista anidada.
+# En la columna jsonb de horario_generaciones se guarda un objeto
+# {"formato", "datos" (base64), "grados" (id de cada columna)}.
+
+import base64
+import gzip
+import struct
+
+import numpy as np
+
+try:  # opcional: solo si está instalado 'zstandard'
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"HZ"
+VERSION = 1
+_CABECERA = struct.Struct("<2sBBBBH")
+_COMPRESIONES = {"": 0, "gzip": 1, "zstd": 2}
+_NOMBRES_COMPRESION = {v: k for k, v in _COMPRESIONES.items()}
+
+FORMATO_JSON = "json"
+MEDIA_TYPE = "application/x-horario-"
+
+
+def formatos_disponibles():
+    formatos = ["u16", "u16+gzip"]
+    if zstandard is not None:
+        formatos.append("u16+zstd")
+    return formatos
+
+
+def _compresion_de(formato):
+    base, _, compresion = formato.partition("+")
+    if base != "u16" or compresion not in _COMPRESIONES:
+        raise ValueError(f"formato de horario no soportado: {formato!r}")
+    if compresion == "zstd" and zstandard is None:
+        raise ValueError("formato u16+zstd requiere el paquete 'zstandard'")
+    return compresion
+
+
+def codificar(horario, formato="u16+gzip"):
+    """Lista anidada (o array) dias x bloques x grados -> bytes."""
+    compresion = _compresion_de(formato)
+    matriz = np.asarray(horario, dtype=np.int64)
+    if matriz.size == 0:
+        matriz = matriz.reshape(0, 0, 0)
+    if matriz.ndim != 3:
+        raise ValueError("el horario debe ser una matriz dias x bloques x grados")
+    if matriz.size and (matriz.min() < 0 or matriz.max() > 0xFFFF):
+        raise ValueError("ids de curso fuera de rango para uint16")
+    dias, bloques, grados = matriz.shape
+    cuerpo = matriz.astype("<u2").tobytes()
+    if compresion == "gzip":
+        cuerpo = gzip.compress(cuerpo, mtime=0)
+    elif compresion == "zstd":
+        cuerpo = zstandard.ZstdCompressor().compress(cuerpo)
+    cabecera = _CABECERA.pack(MAGIC, VERSION, _COMPRESIONES[compresion], dias, bloques, grados)
+    return cabecera + cuerpo
+
+
+def decodificar(datos):
+    """bytes -> lista anidada dias x bloques x grados."""
+    magic, version, compresion, dias, bloques, grados = _CABECERA.unpack_from(datos)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("horario codificado inválido")
+    cuerpo = bytes(datos[_CABECERA.size:])
+    nombre = _NOMBRES_COMPRESION.get(compresion)
+    if nombre == "gzip":
+        cuerpo = gzip.decompress(cuerpo)
+    elif nombre == "zstd":
+        if zstandard is None:
+            raise ValueError("horario comprimido con zstd y 'zstandard' no está instalado")
+        cuerpo = zstandard.ZstdDecompressor().decompress(cuerpo)
+    elif nombre is None:
+        raise ValueError(f"compresión desconocida: {compresion}")
+    return np.frombuffer(cuerpo, dtype="<u2").reshape(dias, bloques, grados).tolist()
+
+
+def a_texto(horario, formato="u16+gzip"):
+    return base64.b64encode(codificar(horario, formato)).decode("ascii")
+
+
+def a_almacenamiento(horario, grados=None, formato="u16+gzip"):
+    """Valor para horario_generaciones.horario: el horario empaquetado con sus columnas."""
+    return {
+        "formato": formato,
+        "datos": a_texto(horario, formato),
+        "grados": list(grados) if grados is not None else None,
+    }
+
+
+def horario_de(valor):
+    """
+    Acepta la lista anidada (formato histórico), el texto base64 empaquetado
+    o el objeto de a_almacenamiento.
+    """
+    if isinstance(valor, dict):
+        valor = valor["datos"]
+    if isinstance(valor, str):
+        return decodificar(base64.b64decode(valor))
+    return valor
+
+
+def negociar(accept=None, formato=None):
+    """
+    Formato pedido por el cliente: ?formato= tiene prioridad, luego Accept en
+    el orden en que viene. Devuelve FORMATO_JSON si no pide (o no hay) uno
+    soportado.
+    """
+    disponibles = formatos_disponibles()
+    if formato:
+        return formato if formato in disponibles else FORMATO_JSON
+    for parte in (accept or "").split(","):
+        tipo = parte.split(";", 1)[0].strip().lower()
+        if tipo.startswith(MEDIA_TYPE) and tipo[len(MEDIA_TYPE):] in disponibles:
+            return tipo[len(MEDIA_TYPE):]
+    return FORMATO_JSON
+
+
+def empaquetar_payload(payload, formato):
+    """Copia del payload con "horario" codificado (sin tocar el original, que se comparte)."""
+    if formato == FORMATO_JSON or not isinstance(payload, dict) or not isinstance(payload.get("horario"), list):
+        return payload
+    return dict(payload, horario=a_texto(payload["horario"], formato), horario_formato=formato)
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+# cola_trabajos.py
+#
+# Cola durable de generaciones compartida entre nodos. El backend web
+# encola (en vez de resolver en su propio proceso) y los workers de
+# worker_solver.py reclaman, resuelven y publican progreso y resultado.
+#
+# COLA_TRABAJOS elige el backend:
+#   supabase            -> tablas trabajos_cola / trabajos_eventos en Postgres
+#                          (sql/trabajos_cola.sql; reclamo con SKIP LOCKED)
+#   sqlite:///ruta.db   -> archivo SQLite, para un solo host o pruebas locales
+# Sin COLA_TRABAJOS los jobs corren en el proceso web como siempre.
+#
+# Un worker manda latidos mientras resuelve; si deja de hacerlo por
+# COLA_VENCIMIENTO_S, cualquier worker devuelve el trabajo a la cola (hasta
+# COLA_MAX_INTENTOS intentos) y el resultado tardío del worker perdido se
+# descarta. Los trabajos terminados (y sus eventos) se borran pasados
+# COLA_RETENCION_S; el web los sigue solo mientras los espera.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+LATIDO_S = float(os.getenv("COLA_LATIDO_S", "5"))
+VENCIMIENTO_S = float(os.getenv("COLA_VENCIMIENTO_S", "30"))
+MAX_INTENTOS = int(os.getenv("COLA_MAX_INTENTOS", "3"))
+SONDEO_S = float(os.getenv("COLA_SONDEO_S", "0.5"))
+ESPERA_MAX_S = float(os.getenv("COLA_ESPERA_MAX_S", "3600"))
+RETENCION_S = float(os.getenv("COLA_RETENCION_S", "3600"))
+
+_ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    clave TEXT,
+    payload TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    worker TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    resultado TEXT,
+    error TEXT,
+    creado REAL NOT NULL,
+    latido REAL,
+    terminado REAL
+);
+CREATE INDEX IF NOT EXISTS trabajos_pendientes_idx ON trabajos (estado, creado);
+CREATE INDEX IF NOT EXISTS trabajos_terminados_idx ON trabajos (estado, terminado);
+CREATE TABLE IF NOT EXISTS eventos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    trabajo_id TEXT NOT NULL,
+    evento TEXT NOT NULL,
+    datos TEXT
+);
+CREATE INDEX IF NOT EXISTS eventos_trabajo_idx ON eventos (trabajo_id, seq);
+"""
+
+
+class ColaSQLite:
+    """Cola en un archivo SQLite; BEGIN IMMEDIATE serializa los reclamos entre procesos."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=30, isolation_level=None)
+        if ruta != ":memory:":
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(_ESQUEMA_SQLITE)
+
+    def _transaccion(self, funcion):
+        with self._lock:
+            cursor = self._conexion.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = funcion(cursor)
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return resultado
+
+    def encolar(self, payload, clave=None):
+        def _encolar(c):
+            if clave is not None:
+                fila = c.execute(
+                    "SELECT id FROM trabajos WHERE clave = ? AND estado IN ('pendiente', 'en_curso')", (clave,)
+                ).fetchone()
+                if fila:
+                    return fila[0], False
+            trabajo_id = str(uuid.uuid4())
+            c.execute(
+                "INSERT INTO trabajos (id, clave, payload, creado) VALUES (?, ?, ?, ?)",
+                (trabajo_id, clave, json.dumps(payload), time.time()),
+            )
+            return trabajo_id, True
+        return self._transaccion(_encolar)
+
+    def reclamar(self, worker):
+        def _reclamar(c):
+            fila = c.execute(
+                "SELECT id, clave, payload, intentos FROM trabajos WHERE estado = 'pendiente' ORDER BY creado LIMIT 1"
+            ).fetchone()
+            if fila is None:
+                return None
+            c.execute(
+                "UPDATE trabajos SET estado = 'en_curso', worker = ?, latido = ?, intentos = intentos + 1 WHERE id = ?",
+                (worker, time.time(), fila[0]),
+            )
+            return {"id": fila[0], "clave": fila[1], "payload": json.loads(fila[2]), "intentos": fila[3] + 1}
+        return self._transaccion(_reclamar)
+
+    def _actualizar_propio(self, trabajo_id, worker, asignaciones, valores):
+        def _actualizar(c):
+            c.execute(
+                f"UPDATE trabajos SET {asignaciones} WHERE id = ? AND worker = ? AND estado = 'en_curso'",
+                (*valores, trabajo_id, worker),
+            )
+            return c.rowcount > 0
+        return self._transaccion(_actualizar)
+
+    def latido(self, trabajo_id, worker):
+        return self._actualizar_propio(trabajo_id, worker, "latido = ?", (time.time(),))
+
+    def terminar(self, trabajo_id, worker, resultado):
+        return self._actualizar_propio(
+            trabajo_id, worker, "estado = 'listo', resultado = ?, terminado = ?", (json.dumps(resultado), time.time())
+        )
+
+    def fallar(self, trabajo_id, worker, error):
+        return self._actualizar_propio(
+            trabajo_id, worker, "estado = 'error', error = ?, terminado = ?", (str(error), time.time())
+        )
+
+    def publicar(self, trabajo_id, evento, datos):
+        self._transaccion(lambda c: c.execute(
+            "INSERT INTO eventos (trabajo_id, evento, datos) VALUES (?, ?, ?)",
+            (trabajo_id, evento, json.dumps(datos)),
+        ))
+
+    def eventos(self, trabajo_id, desde=0):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT seq, evento, datos FROM eventos WHERE trabajo_id = ? AND seq > ? ORDER BY seq",
+                (trabajo_id, desde),
+            ).fetchall()
+        return [(seq, evento, json.loads(datos) if datos else None) for seq, evento, datos in filas]
+
+    def estado(self, trabajo_id):
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT estado, resultado, error, worker, intentos FROM trabajos WHERE id = ?", (trabajo_id,)
+            ).fetchone()
+        if fila is None:
+            return None
+        return {
+            "estado": fila[0],
+            "resultado": json.loads(fila[1]) if fila[1] else None,
+            "error": fila[2],
+            "worker": fila[3],
+            "intentos": fila[4],
+        }
+
+    def recuperar_vencidos(self, vencimiento_s=VENCIMIENTO_S, max_intentos=MAX_INTENTOS):
+        def _recuperar(c):
+            limite = time.time() - vencimiento_s
+            c.execute(
+                "UPDATE trabajos SET estado = 'error', error = 'El worker dejó de responder', terminado = ?, "
+                "worker = NULL WHERE estado = 'en_curso' AND latido < ? AND intentos >= ?",
+                (time.time(), limite, max_intentos),
+            )
+            fallidos = c.rowcount
+            c.execute(
+                "UPDATE trabajos SET estado = 'pendiente', worker = NULL WHERE estado = 'en_curso' AND latido < ?",
+                (limite,),
+            )
+            return fallidos + c.rowcount
+        return self._transaccion(_recuperar)
+
+    def pendientes(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM trabajos WHERE estado = 'pendiente'").fetchone()[0]
+
+    def limpiar_terminados(self, retencion_s=RETENCION_S):
+        def _limpiar(c):
+            filtro = "estado IN ('listo', 'error') AND terminado < ?"
+            limite = time.time() - retencion_s
+            c.execute(f"DELETE FROM eventos WHERE trabajo_id IN (SELECT id FROM trabajos WHERE {filtro})", (limite,))
+            c.execute(f"DELETE FROM trabajos WHERE {filtro}", (limite,))
+            return c.rowcount
+        return self._transaccion(_limpiar)
+
+
+class ColaSupabase:
+    """Cola en Postgres vía el cliente de Supabase; lo sensible a la hora corre en las funciones SQL."""
+
+    def __init__(self, sb):
+        self.sb = sb
+
+    def encolar(self, payload, clave=None):
+        for _ in range(3):
+            filas = self.sb.rpc("encolar_trabajo", {"p_payload": payload, "p_clave": clave}).execute().data or []
+            if filas:
+                return filas[0]["id"], bool(filas[0]["nuevo"])
+            # El trabajo con esa clave terminó entre el insert y el select: reintentar
+        raise RuntimeError("No se pudo encolar el trabajo")
+
+    def reclamar(self, worker):
+        filas = self.sb.rpc("reclamar_trabajo", {"p_worker": worker}).execute().data or []
+        if not filas:
+            return None
+        fila = filas[0]
+        return {"id": fila["id"], "clave": fila.get("clave"), "payload": fila["payload"], "intentos": fila["intentos"]}
+
+    def latido(self, trabajo_id, worker):
+        return bool(self.sb.rpc("latido_trabajo", {"p_id": trabajo_id, "p_worker": worker}).execute().data)
+
+    def _actualizar_propio(self, trabajo_id, worker, valores):
+        from datetime import datetime, timezone
+
+        valores = dict(valores, terminado=datetime.now(timezone.utc).isoformat())
+        filas = (
+            self.sb.table("trabajos_cola").update(valores)
+            .eq("id", trabajo_id).eq("worker", worker).eq("estado", "en_curso")
+            .execute().data
+        )
+        return bool(filas)
+
+    def terminar(self, trabajo_id, worker, resultado):
+        return self._actualizar_propio(trabajo_id, worker, {"estado": "listo", "resultado": resultado})
+
+    def fallar(self, trabajo_id, worker, error):
+        return self._actualizar_propio(trabajo_id, worker, {"estado": "error", "error": str(error)})
+
+    def publicar(self, trabajo_id, evento, datos):
+        self.sb.table("trabajos_eventos").insert({"trabajo_id": trabajo_id, "evento": evento, "datos": datos}).execute()
+
+    def eventos(self, trabajo_id, desde=0):
+        filas = (
+            self.sb.table("trabajos_eventos").select("seq,evento,datos")
+            .eq("trabajo_id", trabajo_id).gt("seq", desde).order("seq")
+            .execute().data or []
+        )
+        return [(f["seq"], f["evento"], f["datos"]) for f in filas]
+
+    def estado(self, trabajo_id):
+        filas = (
+            self.sb.table("trabajos_cola").select("estado,resultado,error,worker,intentos")
+            .eq("id", trabajo_id).limit(1)
+            .execute().data or []
+        )
+        return filas[0] if filas else None
+
+    def recuperar_vencidos(self, vencimiento_s=VENCIMIENTO_S, max_intentos=MAX_INTENTOS):
+        datos = self.sb.rpc(
+            "recuperar_trabajos_vencidos", {"p_segundos": int(vencimiento_s), "p_max_intentos": max_intentos}
+        ).execute().data
+        return int(datos or 0)
+
+    def pendientes(self):
+        respuesta = (
+            self.sb.table("trabajos_cola").select("id", count="exact")
+            .eq("estado", "pendiente").limit(1)
+            .execute()
+        )
+        return int(respuesta.count or 0)
+
+    def limpiar_terminados(self, retencion_s=RETENCION_S):
+        # Los eventos se van por el on delete cascade
+        datos = self.sb.rpc("limpiar_trabajos_terminados", {"p_segundos": int(retencion_s)}).execute().data
+        return int(datos or 0)
+
+
+def cola_desde_url(url):
+    """'supabase' -> ColaSupabase; 'sqlite:///ruta.db' / 'ruta.db' -> ColaSQLite."""
+    if url == "supabase":
+        from arranque import obtener_supabase
+
+        return ColaSupabase(obtener_supabase())
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return ColaSQLite(url)
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola():
+    """Cola configurada en COLA_TRABAJOS, o None si los jobs corren en el proceso web."""
+    global _cola
+    url = os.getenv("COLA_TRABAJOS")
+    if not url:
+        return None
+    with _cola_lock:
+        if _cola is None:
+            _cola = cola_desde_url(url)
+            print(f"[COLA] generaciones vía cola compartida ({url.split(':', 1)[0]})")
+    return _cola
+
+
+# --- Lado web: seguir un trabajo encolado ---
+
+def seguir_trabajo(cola, trabajo_id, progress_cb, sondeo_s=SONDEO_S, espera_max_s=ESPERA_MAX_S):
+    """Reenvía el progreso publicado por el worker y devuelve su resultado (o levanta su error)."""
+    desde = 0
+    limite = time.monotonic() + espera_max_s
+    while True:
+        for seq, evento, datos in cola.eventos(trabajo_id, desde):
+            desde = seq
+            if evento == "progress" and datos:
+                progress_cb(datos.get("progress", 0), datos.get("stage", ""))
+        info = cola.estado(trabajo_id)
+        if info is None:
+            raise RuntimeError(f"El trabajo {trabajo_id} ya no está en la cola")
+        if info["estado"] == "listo":
+            return info["resultado"]
+        if info["estado"] == "error":
+            raise RuntimeError(info["error"] or "Error en el worker")
+        if time.monotonic() >= limite:
+            raise TimeoutError(f"El trabajo {trabajo_id} sigue en la cola tras {espera_max_s:.0f}s")
+        time.sleep(sondeo_s)
+
+
+def tarea_remota(cola, data, clave=None, sondeo_s=SONDEO_S):
+    """tarea(progress_cb) para trabajos.lanzar_o_unirse que resuelve en un worker."""
+    def tarea(progress_cb):
+        trabajo_id, nuevo = cola.encolar(data, clave)
+        print(f"[COLA] {'encolado' if nuevo else 'unido al'} trabajo {trabajo_id}")
+        progress_cb(0, "en cola")
+        return seguir_trabajo(cola, trabajo_id, progress_cb, sondeo_s)
+    # El job web solo sigue al worker: no cuenta como trabajo en curso de este proceso
+    tarea.remota = True
+    return tarea
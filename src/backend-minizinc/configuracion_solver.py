@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# configuracion_solver.py
+#
+# Presets de configuración del CP-SAT, seleccionables por request con
+# opciones_solver = {"preset": "<nombre>", ...overrides}.
+# Los valores por defecto se eligieron con benchmark_generador.py.
+
+PRESETS = {
+    # Comportamiento histórico: búsqueda por defecto y sin restricciones extra
+    "base": {
+        "estrategia": None,
+        "redundantes": False,
+        "romper_simetrias": False,
+    },
+    # Ramifica primero en los docentes con menos holgura de disponibilidad
+    "restringidos_primero": {
+        "estrategia": "docentes_restringidos",
+        "redundantes": False,
+        "romper_simetrias": False,
+    },
+    # Restricciones implícitas: carga diaria por docente, totales diarios por
+    # grado y número de días de dictado por asignación
+    "redundantes": {
+        "estrategia": None,
+        "redundantes": True,
+        "romper_simetrias": False,
+    },
+    "completo": {
+        "estrategia": "docentes_restringidos",
+        "redundantes": True,
+        "romper_simetrias": True,
+    },
+}
+
+# benchmark_generador.py --semillas 0,1,2 --densidad 0.75 (20 s, 1 núcleo):
+#   completo 15.8 s | redundantes 17.3 s | restringidos_primero 23.3 s | base 25.0 s
+# Con densidad 0.85 los cuatro quedan dentro de un 10% entre sí.
+# La ruptura de simetrías da resultados mixtos y no está medida con muchos
+# patrones de división: por defecto el mejor preset sin ella; "completo" a pedido.
+PRESET_DEFAULT = "redundantes"
+
+MOTORES = ("monolitico", "dos_fases")
+
+# Objetivos de calidad, en el orden lexicográfico por defecto (optimizacion_etapas.py)
+ETAPAS_CALIDAD = ("huecos_docentes", "balance_diario")
+
+DEFAULTS = {
+    "motor": "monolitico",
+    "max_time_in_seconds": 30.0,
+    "num_search_workers": 8,
+    "symmetry_level": None,
+    # Semilla de búsqueda: el generador por lotes la varía por generation_index
+    "random_seed": None,
+    # Reusar el esqueleto del modelo entre requests con la misma forma (esqueleto_modelo.py)
+    "cache_modelo": True,
+    # Etapas de calidad tras la factibilidad (True = ETAPAS_CALIDAD), cada una con su límite
+    "etapas": None,
+    "tiempo_etapa_s": 10.0,
+    # Cortes por celda de la fase de aulas (asignacion_aulas.py); solo el motor monolítico
+    "cortes": None,
+}
+
+
+def resolver_opciones(opciones_solver=None):
+    """
+    Combina DEFAULTS + preset + overrides explícitos del request.
+    Un preset desconocido es un error del cliente (ValueError).
+    """
+    opciones_solver = dict(opciones_solver or {})
+    nombre = opciones_solver.pop("preset", None) or PRESET_DEFAULT
+    if nombre not in PRESETS:
+        raise ValueError(f"Preset de solver desconocido: {nombre!r}. Opciones: {', '.join(PRESETS)}")
+    opciones = dict(DEFAULTS)
+    opciones.update(PRESETS[nombre])
+    opciones.update(opciones_solver)
+    opciones["preset"] = nombre
+    if opciones["motor"] not in MOTORES:
+        raise ValueError(f"Motor de solver desconocido: {opciones['motor']!r}. Opciones: {', '.join(MOTORES)}")
+    etapas = ETAPAS_CALIDAD if opciones["etapas"] is True else tuple(opciones["etapas"] or ())
+    desconocidas = [e for e in etapas if e not in ETAPAS_CALIDAD]
+    if desconocidas:
+        raise ValueError(f"Etapa de calidad desconocida: {desconocidas[0]!r}. Opciones: {', '.join(ETAPAS_CALIDAD)}")
+    opciones["etapas"] = etapas
+    return opciones
+
+
+def aplicar_parametros(solver, opciones):
+    solver.parameters.max_time_in_seconds = float(opciones["max_time_in_seconds"])
+    solver.parameters.num_search_workers = int(opciones["num_search_workers"])
+    if opciones.get("symmetry_level") is not None:
+        solver.parameters.symmetry_level = int(opciones["symmetry_level"])
+    if opciones.get("random_seed") is not None:
+        solver.parameters.random_seed = int(opciones["random_seed"])
+    if opciones.get("pista"):
+        # La pista solo cubre las x: que la repare en vez de descartarla
+        solver.parameters.repair_hint = True
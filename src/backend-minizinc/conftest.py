@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+# Los tests usan el repositorio local (repositorio_local.py), no una Supabase real
+os.environ.setdefault("HORARIO_DB", "memoria")
+
+
+@pytest.fixture
+def generar():
+    """
+    generar(inst, **opciones): resuelve una instancia de benchmark_generador.
+    auto=False fija el motor y las opciones, sin depender del modelo_tiempos.json entrenado.
+    """
+    from generador_python import generar_horario
+
+    def _generar(inst, **opciones):
+        opciones = dict({"max_time_in_seconds": 20, "num_search_workers": 1, "auto": False}, **opciones)
+        return generar_horario(
+            [dict(d) for d in inst["docentes"]], inst["asignaciones"], inst["restricciones"],
+            inst["horas_curso_grado"], nivel=inst["nivel"], version=inst["version"], opciones_solver=opciones,
+        )
+
+    return _generar
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+# cuellos_botella.py
+#
+# Análisis de cuellos de botella (POST /cuellos-botella): qué docentes y
+# grados están más ajustados y, si la instancia es infactible, qué cambio
+# único la destraba (liberar una celda de disponibilidad o bajar una hora).
+#
+# 1. Holguras, sin solver: por docente celdas libres (máscaras) - horas; por
+#    grado celdas cubiertas por algún docente del grado - horas.
+# 2. Sondeos: un solo modelo (esqueleto cacheado, preset "base") en el que
+#    cada celda bloqueada y cada "horas completas" queda detrás de un literal
+#    que se asume verdadero. Si es infactible, CP-SAT devuelve un núcleo de
+#    literales; solo quitar uno del núcleo puede destrabarla, así que se
+#    reintenta el mismo modelo soltando cada literal del núcleo, con la
+#    solución totalmente relajada como pista. Cada sondeo infactible trae
+#    otro núcleo y los candidatos se reducen a la intersección.
+#
+# Los cambios se devuelven en el formato de escenarios.py, listos para
+# probarlos con /escenarios.
+#
+# Todo el análisis tiene un tope (CUELLOS_TIEMPO_TOTAL_S): cada resolución
+# recibe a lo sumo lo que queda; si se agota, los sondeos se cortan y la
+# salida lo marca con "sin_tiempo".
+
+import os
+import time
+
+from configuracion_solver import resolver_opciones
+from disponibilidad import DIAS
+from esqueleto_modelo import obtener_esqueleto
+from generador_python import construir_esqueleto, forma_modelo, normalizar_entrada, parchear_modelo
+from pipeline_horario import PipelineGeneracion
+from telemetria import solver_activo
+
+SONDEO_S = float(os.getenv("CUELLOS_SONDEO_S", "5"))
+MAX_SONDEOS = int(os.getenv("CUELLOS_MAX_SONDEOS", "40"))
+TIEMPO_TOTAL_S = float(os.getenv("CUELLOS_TIEMPO_TOTAL_S", "120"))
+FACTIBLES = ("OPTIMAL", "FEASIBLE")
+# Sin ruptura de simetrías ni redundantes: ambas se derivan de las horas y
+# de la disponibilidad, que aquí dejan de ser fijas
+OPCIONES_SONDEO = {"preset": "base"}
+
+
+def holguras(datos, num_bloques):
+    """{"docentes": [...], "grados": [...]} ordenados de menor a mayor holgura."""
+    bloqueos = datos["bloqueos"]
+    num_dias = datos["num_dias"]
+    total = num_dias * num_bloques
+    horas_docente, horas_grado, docentes_grado = {}, {}, {}
+    for req in datos["map_asignaciones"]:
+        horas_docente[req["docente"]] = horas_docente.get(req["docente"], 0) + req["horas"]
+        horas_grado[req["grado"]] = horas_grado.get(req["grado"], 0) + req["horas"]
+        docentes_grado.setdefault(req["grado"], set()).add(req["docente"])
+
+    docentes = []
+    for doc, horas in horas_docente.items():
+        libres = total - datos["bloqueos_por_docente"].get(doc, 0)
+        docentes.append({
+            "docente_id": doc,
+            "horas": horas,
+            "libres": libres,
+            "holgura": libres - horas,
+            "saturacion": round(horas / libres, 3) if libres else None,
+        })
+
+    grados = []
+    for grado, horas in horas_grado.items():
+        # Celdas en las que al menos un docente del grado puede dictar
+        cobertura = sum(
+            1
+            for d in range(num_dias)
+            for b in range(num_bloques)
+            if any((doc, d, b) not in bloqueos for doc in docentes_grado[grado])
+        )
+        grados.append({
+            "grado_id": grado,
+            "horas": horas,
+            "cobertura": cobertura,
+            "holgura": cobertura - horas,
+            "saturacion": round(horas / total, 3),
+        })
+
+    docentes.sort(key=lambda f: (f["holgura"], f["docente_id"]))
+    grados.sort(key=lambda f: (f["holgura"], -f["saturacion"], f["grado_id"]))
+    return {"docentes": docentes, "grados": grados}
+
+
+def modelo_relajable(datos, patrones_division, version, num_bloques):
+    """
+    Modelo con las restricciones candidatas detrás de literales: celda
+    bloqueada de un docente (el literal fuerza x = 0) y horas de una
+    asignación sin patrón (el literal exige las completas; negado, una menos).
+    Devuelve (model, x_idx, candidatos) con candidatos = [(literal, cambio, docente)].
+    """
+    opciones = resolver_opciones(OPCIONES_SONDEO)
+    map_asignaciones = datos["map_asignaciones"]
+    r_limitar = datos["r_limitar_docente_grado"]
+    num_dias = datos["num_dias"]
+
+    def _construir():
+        return construir_esqueleto(
+            map_asignaciones, patrones_division, version, num_bloques, r_limitar, opciones, num_dias
+        )
+
+    forma = forma_modelo(map_asignaciones, patrones_division, version, num_bloques, r_limitar, opciones, num_dias)
+    model, refs, _ = obtener_esqueleto(forma, _construir)
+    # Sin bloqueos: todas las x quedan libres y la disponibilidad va por literales
+    parchear_modelo(model, refs, map_asignaciones, set(), {}, patrones_division, version, num_bloques, opciones)
+
+    # Los dominios con una hora menos salen de parchear otro clon del mismo
+    # esqueleto: las reglas de desglose quedan en un solo lugar
+    relajables = [idx for idx in refs["desglose"] if map_asignaciones[idx]["horas"] > 0]
+    reducidas = [
+        dict(req, horas=req["horas"] - 1) if idx in refs["desglose"] and req["horas"] > 0 else req
+        for idx, req in enumerate(map_asignaciones)
+    ]
+    menos_una, _, _ = obtener_esqueleto(forma, _construir)
+    parchear_modelo(menos_una, refs, reducidas, set(), {}, patrones_division, version, num_bloques, opciones)
+
+    proto, proto_menos = model.Proto(), menos_una.Proto()
+    x_idx = refs["x_idx"]
+    candidatos = []
+    for idx in relajables:
+        req = map_asignaciones[idx]
+        lit = model.NewBoolVar(f"horas_completas_{idx}")
+        cts = [refs["horas"][idx], *(refs["horas_dia"][(idx, d)] for d in range(num_dias)), *refs["desglose"][idx]]
+        for ct in cts:
+            copia = proto.constraints.add()
+            copia.CopyFrom(proto.constraints[ct])
+            copia.linear.domain[:] = proto_menos.constraints[ct].linear.domain
+            copia.enforcement_literal.append(-lit.Index() - 1)
+            proto.constraints[ct].enforcement_literal.append(lit.Index())
+        cambio = {"tipo": "horas", "curso_id": req["curso"], "grado_id": req["grado"], "horas": req["horas"] - 1}
+        candidatos.append((lit, cambio, req["docente"]))
+
+    reqs_por_docente = refs["reqs_por_docente"]
+    for doc, d, b in sorted(datos["bloqueos"]):
+        if doc not in reqs_por_docente:
+            continue
+        lit = model.NewBoolVar(f"bloqueo_{doc}_{d}_{b}")
+        for idx in reqs_por_docente[doc]:
+            model.AddImplication(lit, model.GetBoolVarFromProtoIndex(int(x_idx[idx, d, b])).Not())
+        cambio = {"tipo": "liberar", "docente_id": doc, "dia": DIAS[d], "bloques": [b]}
+        candidatos.append((lit, cambio, doc))
+    return model, x_idx, candidatos
+
+
+def _resolver(model, asumidos, segundos, pista=None):
+    from ortools.sat.python import cp_model
+
+    model.ClearAssumptions()
+    model.AddAssumptions(asumidos)
+    model.ClearHints()
+    if pista is not None:
+        indices, valores = pista
+        model.Proto().solution_hint.vars.extend(indices)
+        model.Proto().solution_hint.values.extend(valores)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(segundos)
+    # El núcleo de infactibilidad solo es confiable con un worker
+    solver.parameters.num_search_workers = 1
+    with solver_activo(1):
+        status = solver.Solve(model)
+    return solver, solver.StatusName(status)
+
+
+def sondear(
+    datos, patrones_division, version, num_bloques, limite_s,
+    sondeo_s=SONDEO_S, max_sondeos=MAX_SONDEOS, fin=None,
+):
+    """
+    Estado de la instancia, núcleo de infactibilidad y cambios únicos que la
+    destraban. fin (time.monotonic()) acota todo: ninguna resolución pasa de ahí.
+    """
+    fin = time.monotonic() + TIEMPO_TOTAL_S if fin is None else fin
+
+    def _restante(segundos):
+        return min(segundos, fin - time.monotonic())
+
+    model, x_idx, candidatos = modelo_relajable(datos, patrones_division, version, num_bloques)
+    literales = [lit for lit, _, _ in candidatos]
+    salida = {"status": "UNKNOWN", "factible": False, "candidatos": len(candidatos)}
+    if _restante(limite_s) <= 0:
+        salida["sin_tiempo"] = True
+        return salida
+    solver, status = _resolver(model, literales, _restante(limite_s))
+    salida.update(status=status, factible=status in FACTIBLES)
+    if status != "INFEASIBLE":
+        return salida
+
+    por_indice = {lit.Index(): i for i, (lit, _, _) in enumerate(candidatos)}
+    nucleo = [por_indice[v] for v in solver.SufficientAssumptionsForInfeasibility() if v in por_indice]
+    salida["nucleo"] = [candidatos[i][1] for i in nucleo]
+    salida["desbloquean"], salida["indeterminados"] = [], []
+
+    # Todo relajado a la vez: si ni así hay solución, ningún cambio único alcanza
+    if _restante(limite_s) <= 0:
+        salida["sin_tiempo"] = True
+        return salida
+    relajado, status_relajado = _resolver(model, [], _restante(limite_s))
+    salida["relajado_factible"] = status_relajado in FACTIBLES
+    if not salida["relajado_factible"]:
+        return salida
+    indices = [int(v) for v in x_idx.ravel()]
+    pista = (indices, [int(relajado.Value(model.GetBoolVarFromProtoIndex(i))) for i in indices])
+
+    # Primero los cambios de los docentes más ajustados. Un sondeo infactible
+    # trae su propio núcleo: lo que no esté en él tampoco destraba solo
+    holgura = {f["docente_id"]: f["holgura"] for f in holguras(datos, num_bloques)["docentes"]}
+    pendientes = sorted(nucleo, key=lambda i: (holgura.get(candidatos[i][2], 0), i))
+    sondeos = 0
+    while pendientes and sondeos < max_sondeos:
+        if _restante(sondeo_s) <= 0:
+            salida["sin_tiempo"] = True
+            break
+        i = pendientes.pop(0)
+        asumidos = [lit for j, lit in enumerate(literales) if j != i]
+        t0 = time.perf_counter()
+        solver, status_sondeo = _resolver(model, asumidos, _restante(sondeo_s), pista)
+        sondeos += 1
+        fila = dict(candidatos[i][1], segundos=round(time.perf_counter() - t0, 3))
+        if status_sondeo in FACTIBLES:
+            salida["desbloquean"].append(fila)
+        elif status_sondeo == "INFEASIBLE":
+            otro = {por_indice[v] for v in solver.SufficientAssumptionsForInfeasibility() if v in por_indice}
+            if otro:
+                pendientes = [j for j in pendientes if j in otro]
+        else:
+            salida["indeterminados"].append(fila)
+    salida["sondeos"] = sondeos
+    return salida
+
+
+def analizar_cuellos(sb, data, tiempo_total_s=TIEMPO_TOTAL_S):
+    """Holguras por docente y grado + sondeos de factibilidad sobre la instancia del request."""
+    t0 = time.perf_counter()
+    fin = time.monotonic() + tiempo_total_s
+    pipeline = PipelineGeneracion(sb, data).preparar()
+    datos = normalizar_entrada(
+        [dict(d) for d in pipeline.docentes],
+        pipeline.asignaciones,
+        pipeline.restricciones,
+        pipeline.horas_curso_grado,
+        pipeline.nivel,
+        pipeline.num_bloques,
+        pipeline.num_dias,
+    )
+    limite_s = float((pipeline.opciones_solver or {}).get("max_time_in_seconds", 30))
+    resultado = holguras(datos, pipeline.num_bloques)
+    resultado.update(
+        sondear(datos, pipeline.patrones_division, pipeline.version, pipeline.num_bloques, limite_s, fin=fin)
+    )
+    resultado["avisos"] = pipeline.avisos
+    resultado["segundos"] = round(time.perf_counter() - t0, 3)
+    print(
+        f"[CUELLOS] {resultado['status']} en {resultado['segundos']}s; "
+        f"núcleo {len(resultado.get('nucleo', []))}, destraban {len(resultado.get('desbloquean', []))}"
+    )
+    return resultado
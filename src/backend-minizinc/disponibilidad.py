@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# disponibilidad.py
+#
+# Disponibilidad de docentes como máscara de bits: un byte por día (bit b =
+# bloque b disponible), 5 días -> 40 bits (con sábado, 48). Formatos
+# aceptados por docente en restricciones["disponibilidad"]:
+#   - entero:  máscara (bit d*8 + b)
+#   - texto:   los bytes de la máscara en base64 (byte d = día d; 5 como mínimo)
+#   - dict:    formato histórico {"lunes-0": true, ...}, se convierte una vez
+# Docente ausente, None o dict vacío = sin restricciones (disponibilidad
+# total), como en el formato histórico. Una máscara se aplica tal cual:
+# 0 significa que no tiene ningún bloque disponible.
+
+import base64
+import unicodedata
+
+DIAS = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+BITS_POR_DIA = 8
+_BYTES = 5
+
+_INDICE_DIA = {dia: d for d, dia in enumerate(DIAS)}
+
+
+def _normalizar_dia(texto):
+    return unicodedata.normalize("NFD", str(texto)).encode("ascii", "ignore").decode("ascii").strip().lower()
+
+
+def indice_dia(nombre):
+    """Índice 0-6 del día (acepta tildes y mayúsculas) o None."""
+    return _INDICE_DIA.get(_normalizar_dia(nombre))
+
+
+def bit(d, b):
+    return 1 << (d * BITS_POR_DIA + b)
+
+
+def mascara_desde_dict(celdas):
+    """{"lunes-0": true, "miércoles-3": true, ...} -> máscara. Claves inválidas se ignoran."""
+    mascara = 0
+    for clave, permitido in (celdas or {}).items():
+        if not permitido:
+            continue
+        dia, _, bloque = str(clave).rpartition("-")
+        d = indice_dia(dia)
+        try:
+            b = int(bloque)
+        except ValueError:
+            continue
+        if d is not None and 0 <= b < BITS_POR_DIA:
+            mascara |= bit(d, b)
+    return mascara
+
+
+def mascara_a_base64(mascara):
+    mascara = int(mascara)
+    return base64.b64encode(mascara.to_bytes(max(_BYTES, (mascara.bit_length() + 7) // 8), "little")).decode("ascii")
+
+
+def mascara_desde_base64(texto):
+    return int.from_bytes(base64.b64decode(texto), "little")
+
+
+def a_mascara(valor):
+    """Convierte cualquiera de los formatos aceptados a máscara entera."""
+    if isinstance(valor, bool):
+        raise ValueError("disponibilidad: se esperaba máscara, base64 o dict, no booleano")
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str):
+        return mascara_desde_base64(valor)
+    if isinstance(valor, dict):
+        return mascara_desde_dict(valor)
+    if valor is None:
+        return 0
+    raise ValueError(f"disponibilidad: formato no soportado ({type(valor).__name__})")
+
+
+def mascaras_disponibilidad(disponibilidad):
+    """
+    {docente: cualquier formato} -> {docente_id (int): máscara}. Omite los
+    docentes sin restricciones (None o dict vacío) y los ids no numéricos.
+    """
+    mascaras = {}
+    if not isinstance(disponibilidad, dict):
+        return mascaras
+    for doc, valor in disponibilidad.items():
+        try:
+            doc_id = int(doc)
+        except (TypeError, ValueError):
+            continue
+        if not doc_id or valor is None or valor == {}:
+            continue
+        mascaras[doc_id] = a_mascara(valor)
+    return mascaras
+
+
+def bloqueos_desde_mascaras(mascaras, num_dias, num_bloques):
+    """Celdas (docente, dia, bloque) NO disponibles de los docentes con máscara."""
+    bloqueos = set()
+    for doc, mascara in mascaras.items():
+        for d in range(num_dias):
+            byte = (mascara >> (d * BITS_POR_DIA)) & 0xFF
+            for b in range(num_bloques):
+                if not (byte >> b) & 1:
+                    bloqueos.add((doc, d, b))
+    return bloqueos
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# escenarios.py
+#
+# Análisis "qué pasa si" (POST /escenarios): una instancia base y N
+# escenarios, cada uno con unos pocos cambios sobre la base. La base se
+# carga, valida y prechequea una sola vez (PipelineGeneracion.preparar) y
+# se resuelve primero; los escenarios se resuelven en paralelo con la
+# solución base como pista (warm start). Nada se guarda en la base de datos.
+# Todo el análisis tiene un tope de tiempo (ESCENARIOS_TIEMPO_TOTAL_S): cada
+# resolución recibe a lo sumo lo que queda y los escenarios que no alcanzan
+# a empezar vuelven con status "SIN_TIEMPO".
+#
+# Cambios soportados:
+#   {"tipo": "bloquear", "docente_id": 7, "dia": "viernes", "bloques": [0, 1]}  (sin bloques: todo el día)
+#   {"tipo": "liberar",  "docente_id": 7, "dia": "viernes", "bloques": [0, 1]}
+#   {"tipo": "horas",    "curso_id": 3, "grado_id": 2, "horas": 5}
+#   {"tipo": "docente",  "curso_id": 3, "grado_id": 2, "docente_id": 9}
+
+import copy
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from configuracion_solver import DEFAULTS
+from disponibilidad import bit, indice_dia
+from generador_python import NUM_DIAS, generar_horario, pista_de_resultado
+from pipeline_horario import PipelineGeneracion, avisos_capacidad
+from salida_horario import registros_horarios
+from versiones_horario import celdas_de_registros, diferencia
+
+MAX_ESCENARIOS = int(os.getenv("MAX_ESCENARIOS", "50"))
+PARALELO = int(os.getenv("ESCENARIOS_PARALELO", str(min(4, os.cpu_count() or 1))))
+TIEMPO_TOTAL_S = float(os.getenv("ESCENARIOS_TIEMPO_TOTAL_S", "120"))
+FACTIBLES = ("OPTIMAL", "FEASIBLE")
+SIN_TIEMPO = "SIN_TIEMPO"
+
+
+class EscenarioInvalido(ValueError):
+    """Error de validación del request (400); cualquier otra excepción es un error interno."""
+
+
+def _mascara_completa(num_bloques, num_dias):
+    return sum(bit(d, b) for d in range(num_dias) for b in range(num_bloques))
+
+
+def _celdas(dia, bloques, num_bloques, num_dias):
+    d = indice_dia(dia)
+    if d is None or d >= num_dias:
+        raise EscenarioInvalido(f"Día inválido: {dia!r}")
+    bloques = range(num_bloques) if bloques is None else bloques
+    return [bit(d, int(b)) for b in bloques if 0 <= int(b) < num_bloques]
+
+
+def aplicar_cambios(base, cambios, num_bloques, num_dias=NUM_DIAS):
+    """
+    Copia de la entrada base (asignaciones, horas_curso_grado, restricciones
+    con máscaras) con los cambios aplicados. EscenarioInvalido si un cambio
+    es inválido (tipo desconocido, campos faltantes o no numéricos).
+    """
+    variante = {
+        "asignaciones": copy.deepcopy(base["asignaciones"]),
+        "horas_curso_grado": copy.deepcopy(base["horas_curso_grado"]),
+        "restricciones": dict(base["restricciones"], disponibilidad=dict(base["restricciones"].get("disponibilidad") or {})),
+    }
+    if not isinstance(cambios or [], list):
+        raise EscenarioInvalido("cambios debe ser una lista.")
+    for cambio in cambios or []:
+        if not isinstance(cambio, dict):
+            raise EscenarioInvalido(f"Cambio inválido: {cambio!r}")
+        try:
+            _aplicar(variante, cambio, num_bloques, num_dias)
+        except EscenarioInvalido:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            # Campo faltante (KeyError) o no numérico (int() de None o de texto)
+            raise EscenarioInvalido(f"Cambio inválido {cambio!r}: {e!r}") from e
+    return variante
+
+
+def _aplicar(variante, cambio, num_bloques, num_dias):
+    mascaras = variante["restricciones"]["disponibilidad"]
+    tipo = cambio.get("tipo")
+    if tipo in ("bloquear", "liberar"):
+        doc = int(cambio["docente_id"])
+        # Sin máscara = sin restricciones: se parte de la semana completa
+        mascara = mascaras.get(doc, _mascara_completa(num_bloques, num_dias))
+        for celda in _celdas(cambio.get("dia"), cambio.get("bloques"), num_bloques, num_dias):
+            mascara = mascara & ~celda if tipo == "bloquear" else mascara | celda
+        mascaras[doc] = mascara
+    elif tipo == "horas":
+        curso, grado = str(cambio["curso_id"]), str(cambio["grado_id"])
+        variante["horas_curso_grado"].setdefault(curso, {})[grado] = int(cambio["horas"])
+    elif tipo == "docente":
+        curso, grado = str(cambio["curso_id"]), str(cambio["grado_id"])
+        variante["asignaciones"].setdefault(curso, {})[grado] = {"docente_id": int(cambio["docente_id"])}
+    else:
+        raise EscenarioInvalido(f"Tipo de cambio desconocido: {tipo!r}")
+
+
+def _resolver(pipeline, entrada, opciones_solver):
+    t0 = time.perf_counter()
+    resultado = generar_horario(
+        [dict(d) for d in pipeline.docentes],
+        entrada["asignaciones"],
+        entrada["restricciones"],
+        entrada["horas_curso_grado"],
+        nivel=pipeline.nivel,
+        version=pipeline.version,
+        patrones_division=pipeline.patrones_division,
+        opciones_solver=opciones_solver,
+        num_dias=pipeline.num_dias,
+    )
+    return resultado, round(time.perf_counter() - t0, 3)
+
+
+def _celdas_resultado(resultado, nivel):
+    return celdas_de_registros(registros_horarios(resultado, nivel, 0))
+
+
+def _resumen(resultado, segundos):
+    return {
+        "status": resultado.get("status"),
+        "factible": resultado.get("status") in FACTIBLES,
+        "deficit": int(resultado.get("asignaciones_fallidas", 0)),
+        "segundos": segundos,
+    }
+
+
+def validar_escenarios(data, num_bloques, num_dias=NUM_DIAS):
+    """
+    Valida la lista de escenarios y sus cambios sin cargar nada de la BD
+    (los cambios se aplican sobre una base vacía). EscenarioInvalido si algo
+    no cumple; se llama antes de lanzar el trabajo para responder 400.
+    """
+    escenarios = (data or {}).get("escenarios") or []
+    if not isinstance(escenarios, list) or not escenarios:
+        raise EscenarioInvalido("escenarios debe ser una lista no vacía.")
+    if len(escenarios) > MAX_ESCENARIOS:
+        raise EscenarioInvalido(f"Demasiados escenarios ({len(escenarios)} > {MAX_ESCENARIOS}).")
+    vacia = {"asignaciones": {}, "horas_curso_grado": {}, "restricciones": {}}
+    for escenario in escenarios:
+        if not isinstance(escenario, dict):
+            raise EscenarioInvalido(f"Escenario inválido: {escenario!r}")
+        aplicar_cambios(vacia, escenario.get("cambios"), num_bloques, num_dias)
+    return escenarios
+
+
+def _sin_tiempo(nombre):
+    return {"nombre": nombre, "status": SIN_TIEMPO, "factible": False, "deficit": None, "segundos": 0.0}
+
+
+def evaluar_escenarios(sb, data, paralelo=PARALELO, tiempo_total_s=TIEMPO_TOTAL_S):
+    """
+    {"base": resumen, "escenarios": [resumen + cambios de celdas vs. la base]}.
+    Nada corre después de tiempo_total_s (contado desde la llamada).
+    """
+    limite = time.monotonic() + tiempo_total_s
+    pipeline = PipelineGeneracion(sb, data)
+    escenarios = validar_escenarios(data, pipeline.num_bloques, pipeline.num_dias)
+    pipeline.preparar()
+    base = {
+        "asignaciones": pipeline.asignaciones,
+        "horas_curso_grado": pipeline.horas_curso_grado,
+        "restricciones": pipeline.restricciones,
+    }
+    variantes = [aplicar_cambios(base, e.get("cambios"), pipeline.num_bloques, pipeline.num_dias) for e in escenarios]
+
+    def _opciones(opciones):
+        # Cada resolución recibe a lo sumo el tiempo que le queda al análisis;
+        # con el límite fijo, el predictor (auto) ya no lo agranda
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return None
+        tope = float(opciones.get("max_time_in_seconds") or DEFAULTS["max_time_in_seconds"])
+        return dict(opciones, max_time_in_seconds=min(tope, restante))
+
+    # Núcleos repartidos entre los escenarios simultáneos, salvo que el request los fije
+    paralelo = max(1, min(paralelo, len(variantes)))
+    opciones = dict(pipeline.opciones_solver)
+    opciones_base = _opciones(opciones)
+    if opciones_base is None:
+        resultado_base, segundos_base, celdas_base = {"status": SIN_TIEMPO}, 0.0, None
+    else:
+        resultado_base, segundos_base = _resolver(pipeline, base, opciones_base)
+        celdas_base = _celdas_resultado(resultado_base, pipeline.nivel)
+    print(f"[ESCENARIOS] base {resultado_base.get('status')} en {segundos_base}s; {len(variantes)} escenarios")
+
+    opciones_variante = dict(opciones)
+    opciones_variante.setdefault("num_search_workers", max(1, (os.cpu_count() or 1) // paralelo))
+    if resultado_base.get("status") in FACTIBLES:
+        opciones_variante["pista"] = pista_de_resultado(resultado_base)
+
+    def _evaluar(i):
+        nombre = escenarios[i].get("nombre") or f"escenario {i + 1}"
+        opciones_i = _opciones(opciones_variante) if celdas_base is not None else None
+        if opciones_i is None:
+            return _sin_tiempo(nombre)
+        resultado, segundos = _resolver(pipeline, variantes[i], opciones_i)
+        resumen = _resumen(resultado, segundos)
+        resumen["nombre"] = nombre
+        resumen["avisos"] = avisos_capacidad(
+            variantes[i]["asignaciones"], variantes[i]["horas_curso_grado"], pipeline.num_bloques, pipeline.num_dias
+        )
+        if resumen["factible"]:
+            cambios = diferencia(celdas_base, _celdas_resultado(resultado, pipeline.nivel))
+            resumen["celdas_cambiadas"] = len(cambios["set"]) + len(cambios["del"])
+            resumen["cambios"] = cambios
+        return resumen
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=paralelo) as pool:
+        resultados = list(pool.map(_evaluar, range(len(variantes))))
+    sin_tiempo = sum(r["status"] == SIN_TIEMPO for r in resultados)
+    print(
+        f"[ESCENARIOS] {len(variantes)} escenarios en {time.perf_counter() - t0:.2f}s ({paralelo} en paralelo)"
+        + (f"; {sin_tiempo} sin tiempo" if sin_tiempo else "")
+    )
+
+    return {
+        "base": dict(_resumen(resultado_base, segundos_base), avisos=pipeline.avisos),
+        "escenarios": resultados,
+    }
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# esqueleto_modelo.py
+#
+# Cache de "esqueletos" del modelo CP-SAT. Para una misma forma de instancia
+# (nivel/bloques, lista de asignaciones, patrones, reglas y preset) el modelo
+# es idéntico salvo por la disponibilidad y las horas, que en el esqueleto
+# quedan como dominios de variables y lados derechos de restricciones.
+# Cada request clona el esqueleto y solo parchea esos valores.
+
+import threading
+from collections import OrderedDict
+
+from telemetria import contar_cache
+
+MAX_ESQUELETOS = 8
+
+_esqueletos = OrderedDict()
+_esqueletos_lock = threading.Lock()
+estadisticas = {"aciertos": 0, "fallos": 0}
+
+
+def obtener_esqueleto(forma, construir):
+    """
+    Devuelve (modelo clonado, refs, reutilizado). construir() -> (modelo, refs)
+    arma el esqueleto cuando la forma no está en cache. El esqueleto guardado
+    nunca se modifica: siempre se entrega un clon.
+    """
+    with _esqueletos_lock:
+        entrada = _esqueletos.get(forma)
+        if entrada is not None:
+            _esqueletos.move_to_end(forma)
+            estadisticas["aciertos"] += 1
+    contar_cache("esqueleto", entrada is not None)
+    if entrada is not None:
+        modelo, refs = entrada
+        return modelo.Clone(), refs, True
+
+    modelo, refs = construir()
+    with _esqueletos_lock:
+        estadisticas["fallos"] += 1
+        _esqueletos[forma] = (modelo, refs)
+        _esqueletos.move_to_end(forma)
+        while len(_esqueletos) > MAX_ESQUELETOS:
+            _esqueletos.popitem(last=False)
+    return modelo.Clone(), refs, False
+
+
+def limpiar_esqueletos():
+    with _esqueletos_lock:
+        _esqueletos.clear()
+
+
+def fijar_dominio_variable(proto, indice, minimo, maximo):
+    proto.variables[indice].domain[:] = [minimo, maximo]
+
+
+def fijar_dominio_restriccion(proto, indice, intervalos):
+    """Dominio de una restricción lineal: [(lo, hi), ...] disjuntos y ordenados."""
+    proto.constraints[indice].linear.domain[:] = [v for intervalo in intervalos for v in intervalo]
+
@@ -1,9 +1,10 @@
 from ortools.sat.python import cp_model
 from itertools import product
 
-NUM_DIAS = 5
+from salida_horario import DIAS_BD, NUM_DIAS, grados_de_nivel
+
 NUM_BLOQUES = 8
-DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes"]
+DIAS = DIAS_BD[:NUM_DIAS]
 
 def dividir_horas(horas):
     if horas <= 1:
@@ -16,10 +17,9 @@ def dividir_horas(horas):
     if horas == 7: return [[2, 2, 3], [2, 3, 2], [3, 2, 2]]
     return [[horas]]
 
-def generar_horario(docentes, asignaciones, restricciones, horas_curso_grado, nivel="Secundaria"):
+def generar_horario(docentes, asignaciones, restricciones, horas_curso_grado, nivel="Secundaria", num_dias=NUM_DIAS):
     model = cp_model.CpModel()
 
-    grados_ids = list(range(1, 6)) if nivel == "Secundaria" else list(range(6, 12))
     curso_grado_combos = []
     docente_grado = {}
 
@@ -30,10 +30,18 @@ def generar_horario(docentes, asignaciones, restricciones, horas_curso_grado, ni
                 curso_grado_combos.append((int(curso_id), int(grado)))
                 docente_grado[(int(curso_id), int(grado))] = asignaciones[curso_id][grado]['docente_id']
 
+    grados_ids = grados_de_nivel(nivel, {g for _, g in curso_grado_combos})
+    # Agrupados una vez: las restricciones por grado/docente no recorren todos los combos
+    combos_por_grado = {}
+    combos_por_docente = {}
+    for combo, doc in docente_grado.items():
+        combos_por_grado.setdefault(combo[1], []).append(combo)
+        combos_por_docente.setdefault(doc, []).append(combo)
+
     x = {
         (curso_id, grado, d, b): model.NewBoolVar(f"x_{curso_id}_{grado}_{d}_{b}")
         for curso_id, grado in curso_grado_combos
-        for d in range(NUM_DIAS)
+        for d in range(num_dias)
         for b in range(NUM_BLOQUES)
     }
 
@@ -42,7 +50,7 @@ def generar_horario(docentes, asignaciones, restricciones, horas_curso_grado, ni
         combinaciones = dividir_horas(horas)
         uso_vars = []
 
-        for d in range(NUM_DIAS):
+        for d in range(num_dias):
             for comb in combinaciones:
                 if any(seg == 1 for seg in comb): continue
                 inicios_validos = [range(NUM_BLOQUES - l + 1) for l in comb]
@@ -60,32 +68,30 @@ def generar_horario(docentes, asignaciones, restricciones, horas_curso_grado, ni
 
         if uso_vars:
             model.Add(sum(uso_vars) >= 1)
-            model.Add(sum(x[curso_id, grado, d, b] for d in range(NUM_DIAS) for b in range(NUM_BLOQUES)) == horas)
+            model.Add(sum(x[curso_id, grado, d, b] for d in range(num_dias) for b in range(NUM_BLOQUES)) == horas)
         else:
             print(f"[!] Sin combinación válida para curso {curso_id}, grado {grado} (horas: {horas})")
 
-    for d in range(NUM_DIAS):
+    for d in range(num_dias):
         for b in range(NUM_BLOQUES):
             for grado in grados_ids:
                 model.Add(
-                    sum(x[c_id, grado, d, b]
-                        for (c_id, g) in curso_grado_combos if g == grado) <= 1
+                    sum(x[c_id, g, d, b]
+                        for (c_id, g) in combos_por_grado.get(grado, [])) <= 1
                 )
 
-    docentes_ids = set(docente_grado.values())
-    for d in range(NUM_DIAS):
+    for d in range(num_dias):
         for b in range(NUM_BLOQUES):
-            for doc_id in docentes_ids:
+            for combos in combos_por_docente.values():
                 model.Add(
                     sum(x[c_id, g, d, b]
-                        for (c_id, g), doc in docente_grado.items()
-                        if doc == doc_id) <= 1
+                        for (c_id, g) in combos) <= 1
                 )
 
     model.Maximize(
         sum(x[c, g, d, b]
             for (c, g) in curso_grado_combos
-            for d in range(NUM_DIAS)
+            for d in range(num_dias)
             for b in range(NUM_BLOQUES))
     )
 
@@ -93,14 +99,14 @@ def generar_horario(docentes, asignaciones, restricciones, horas_curso_grado, ni
     solver.parameters.max_time_in_seconds = 60.0
     status = solver.Solve(model)
 
-    horario = {d: {b: {} for b in range(NUM_BLOQUES)} for d in range(NUM_DIAS)}
+    horario = {d: {b: {} for b in range(NUM_BLOQUES)} for d in range(num_dias)}
     total_bloques = 0
     horas_asignadas = {}
 
     if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
         for (curso_id, grado) in curso_grado_combos:
             count = 0
-            for d in range(NUM_DIAS):
+            for d in range(num_dias):
                 for b in range(NUM_BLOQUES):
                     if solver.Value(x[curso_id, grado, d, b]):
                         horario[d][b][grado] = curso_id
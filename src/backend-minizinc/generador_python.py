@@ -4,7 +4,24 @@
 import unicodedata
 import time
 from collections import Counter
-from ortools.sat.python import cp_model
+import numpy as np
+
+from salida_horario import (
+    construir_matrices,
+    extraer_valores,
+    grados_de_nivel,
+    horario_desde_matriz,
+    matriz_cursos,
+    matriz_docentes,
+    metricas,
+)
+from simetrias import romper_simetrias
+from disponibilidad import bloqueos_desde_mascaras, mascaras_disponibilidad
+from esqueleto_modelo import fijar_dominio_restriccion, fijar_dominio_variable, obtener_esqueleto
+from configuracion_solver import aplicar_parametros, resolver_opciones
+from optimizacion_etapas import medir, optimizar_por_etapas
+from predictor_tiempos import ajustar_opciones, caracteristicas, registrar_corrida
+from telemetria import SOLVER_STATUS, observar_modelo, solver_activo
 
 DIAS = ["lunes", "martes", "miercoles", "jueves", "viernes"]
 NUM_DIAS = 5
@@ -23,35 +40,33 @@ def normalizar_texto(texto):
         return ""
     return unicodedata.normalize("NFD", texto).encode("ascii", "ignore").decode("ascii").lower()
 
-# --- NUEVO MODELO CP-SAT ---
+def obtener_patron(patrones_division, req):
+    """Patrón de división (lista de horas por día) de una asignación, o None."""
+    key = f"{req['curso']}-{req['grado']}"
+    raw = (patrones_division or {}).get(key)
+    if not raw:
+        return None
+    if isinstance(raw, str):
+        partes = [int(x) for x in raw.split("+") if x.strip().isdigit()]
+        return partes or None
+    if isinstance(raw, (list, tuple)):
+        try:
+            partes = [int(x) for x in raw]
+            return partes or None
+        except Exception:
+            return None
+    return None
 
-def generar_horario_cp(
-    docentes,
-    asignaciones,
-    restricciones,
-    horas_curso_grado,
-    nivel="Secundaria",
-    version=1,
-    patrones_division=None,
-    progress_callback=None,
-):
+
+def normalizar_entrada(docentes, asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias=NUM_DIAS):
     """
-    Genera un horario escolar utilizando Programación por Restricciones (CP-SAT).
-    Garantiza que no haya choques y respeta la disponibilidad.
+    Normaliza la entrada del generador: lista de asignaciones (curso, grado,
+    docente, horas), bloqueos de disponibilidad (docente, dia, bloque) y reglas.
+    Sin logs; la usan preparar_datos y la huella de instancia.
     """
-    print("[CP-SAT] Iniciando modelado matemático...")
-    t0 = time.time()
-    
-    # 1. Preparación y Limpieza de Datos
-    # ---------------------------------------------------------
-    model = cp_model.CpModel()
-    num_bloques = 7 if int(version) == 1 else 8
-    patrones_division = patrones_division or {}
-    
     # Mapeo de IDs para facilitar el uso en el modelo
-    # Diccionarios para acceso rápido
     map_asignaciones = [] # Lista de tuplas (curso_id, grado_id, docente_id, horas)
-    
+
     # Normalizar docentes
     docente_ids = set()
     for d in docentes:
@@ -61,10 +76,6 @@ def generar_horario_cp(
 
     # Procesar horas requeridas y asignaciones
     total_horas_requeridas = 0
-    
-    # Estructura auxiliar para guardar info
-    # data_reqs[(curso, grado)] = { 'docente': doc_id, 'horas': n }
-    data_reqs = {}
 
     # Barrido de asignaciones para saber QUÉ curso da QUÉ docente
     temp_asignaciones = {} # (curso_int, grado_int) -> docente_int
@@ -83,7 +94,7 @@ def generar_horario_cp(
             for grado_id, horas in grados.items():
                 g_int = normalizar_entero(grado_id)
                 h_int = normalizar_entero(horas)
-                
+
                 if h_int > 0:
                     docente = temp_asignaciones.get((c_int, g_int), 0)
                     # Solo agregamos si hay docente asignado o si queremos permitir vacantes (asumimos docente necesario)
@@ -96,14 +107,6 @@ def generar_horario_cp(
                         })
                         total_horas_requeridas += h_int
 
-    print(f"[CP-SAT] Total de requerimientos: {len(map_asignaciones)} asignaturas.")
-    print(f"[CP-SAT] Total de horas a programar: {total_horas_requeridas}")
-    print("========== DEBUG ASIGNACIONES ==========")
-    for i, req in enumerate(map_asignaciones[:10]):
-        print(i, req)
-    print("Total asignaciones:", len(map_asignaciones))
-    print("=======================================")
-
     # Procesar Restricciones (Disponibilidad)
     # En tu frontend, "disponibilidad" es una whitelist (horas permitidas).
     disponibilidad_map = (restricciones or {}).get("disponibilidad", {})
@@ -113,67 +116,65 @@ def generar_horario_cp(
         if "limitar_carga_docente_grado" in reglas
         else True
     )
-    if isinstance(disponibilidad_map, dict):
-        print("[CP-SAT][DEBUG] disponibilidad docentes sample:", list(disponibilidad_map.keys())[:5])
-        for _doc_id, _reglas in list(disponibilidad_map.items())[:1]:
-            if isinstance(_reglas, dict):
-                print("[CP-SAT][DEBUG] disponibilidad claves sample:", list(_reglas.keys())[:8])
-                # Log adicional: ver cómo llegan día/bloque y su versión normalizada
-                for _k in list(_reglas.keys())[:8]:
-                    try:
-                        _dia_part, _bloque_part = _k.split("-", 1)
-                        print(
-                            "[CP-SAT][DEBUG] key->",
-                            _k,
-                            "| dia_norm:",
-                            normalizar_texto(_dia_part),
-                            "| bloque_raw:",
-                            _bloque_part,
-                        )
-                    except Exception:
-                        print("[CP-SAT][DEBUG] key formato inesperado:", _k)
-            else:
-                print("[CP-SAT][DEBUG] disponibilidad formato inesperado:", type(_reglas))
-    else:
-        print("[CP-SAT][DEBUG] disponibilidad_map no es dict:", type(disponibilidad_map))
-    # Set de bloqueos (docente, dia, bloque)
-    bloqueos = set() 
-    
+
+    # Disponibilidad -> máscara de bits por docente (una sola conversión, acepta
+    # el formato histórico) y de ahí el set de bloqueos (docente, dia, bloque)
+    mascaras = mascaras_disponibilidad(disponibilidad_map)
+    bloqueos = set()
     if nivel != "Primaria": # Si es primaria asumimos full disponibilidad según tu código original
-        for doc_str, reglas in disponibilidad_map.items():
-            doc_id = normalizar_entero(doc_str)
-            if doc_id == 0:
-                continue
-            # Si no hay reglas, se asume disponibilidad total (no bloqueamos nada).
-            if not reglas:
-                continue
-            for dia_idx, dia_nom in enumerate(DIAS):
-                dia_norm = normalizar_texto(dia_nom)
-                for bloque in range(num_bloques):
-                    # Claves posibles en tu JSON de restricciones (whitelist)
-                    key1 = f"{dia_nom}-{bloque}"
-                    key2 = f"{dia_norm}-{bloque}"
-                    permitido = bool(reglas.get(key1) or reglas.get(key2))
-                    if not permitido:
-                        bloqueos.add((doc_id, dia_idx, bloque))
-    # ---------------- DEBUG BLOQUEOS ----------------
-    print("========== DEBUG DISPONIBILIDAD ==========")
-    print("Total docentes con reglas:", len(disponibilidad_map))
-    print("Total bloqueos generados:", len(bloqueos))
+        bloqueos = bloqueos_desde_mascaras(mascaras, num_dias, num_bloques)
 
     bloqueos_por_docente = {}
     for (doc, d, b) in bloqueos:
         bloqueos_por_docente.setdefault(doc, 0)
         bloqueos_por_docente[doc] += 1
 
+    return {
+        "map_asignaciones": map_asignaciones,
+        "docente_ids": docente_ids,
+        "total_horas_requeridas": total_horas_requeridas,
+        "r_limitar_docente_grado": r_limitar_docente_grado,
+        "bloqueos": bloqueos,
+        "bloqueos_por_docente": bloqueos_por_docente,
+        "disponibilidad_map": disponibilidad_map,
+        "mascaras": mascaras,
+        "num_dias": num_dias,
+    }
+
+
+def preparar_datos(docentes, asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias=NUM_DIAS):
+    """
+    normalizar_entrada + reporte de depuración en el log.
+    Compartido por todos los motores.
+    """
+    datos = normalizar_entrada(docentes, asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias)
+    map_asignaciones = datos["map_asignaciones"]
+    bloqueos_por_docente = datos["bloqueos_por_docente"]
+
+    print(f"[CP-SAT] Total de requerimientos: {len(map_asignaciones)} asignaturas.")
+    print(f"[CP-SAT] Total de horas a programar: {datos['total_horas_requeridas']}")
+    print("========== DEBUG ASIGNACIONES ==========")
+    for i, req in enumerate(map_asignaciones[:10]):
+        print(i, req)
+    print("Total asignaciones:", len(map_asignaciones))
+    print("=======================================")
+
+    mascaras = datos["mascaras"]
+    for _doc_id, _mascara in list(mascaras.items())[:3]:
+        print(f"[CP-SAT][DEBUG] disponibilidad docente {_doc_id}: máscara {_mascara:#012x}")
+    # ---------------- DEBUG BLOQUEOS ----------------
+    print("========== DEBUG DISPONIBILIDAD ==========")
+    print("Total docentes con reglas:", len(mascaras))
+    print("Total bloqueos generados:", len(datos["bloqueos"]))
+
     for doc, cnt in list(bloqueos_por_docente.items())[:10]:
         print(f"Docente {doc} -> bloqueos: {cnt}")
 
     print("==========================================")
     print("========== DEBUG BLOQUES DISPONIBLES ==========")
-    for doc in docente_ids:
+    for doc in datos["docente_ids"]:
         bloqueados = bloqueos_por_docente.get(doc, 0)
-        total = NUM_DIAS * num_bloques
+        total = num_dias * num_bloques
         libres = total - bloqueados
         print(f"Docente {doc}: libres {libres}/{total}")
     print("==============================================")
@@ -182,14 +183,181 @@ def generar_horario_cp(
         doc = req["docente"]
         horas = req["horas"]
         bloqueados = bloqueos_por_docente.get(doc, 0)
-        libres = NUM_DIAS * num_bloques - bloqueados
+        libres = num_dias * num_bloques - bloqueados
         if horas > libres:
             print("⚠ IMPOSIBLE:", req, " libres:", libres)
     print("========================================")
 
+    return datos
+
+
+def construir_salida(valores, map_asignaciones, nivel, total_horas_requeridas, status_name, t0):
+    """
+    Resultado del generador a partir de los valores (asignacion x dia x bloque)
+    de la solución, con el reporte de métricas. Compartido por todos los motores.
+    """
+    grados_ids = grados_de_nivel(nivel, {req["grado"] for req in map_asignaciones})
+    matriz_asignacion, grados = construir_matrices(valores, map_asignaciones, grados_ids)
+    cursos = matriz_cursos(matriz_asignacion, map_asignaciones)
+    horario_salida = horario_desde_matriz(cursos, grados)
+    resumen = metricas(valores, map_asignaciones)
+
+    asignaciones_exitosas = resumen["total_asignados"]
+    fallidos = resumen["fallidos"]
+
+    # Estadísticas básicas para el reporte
+    # Detectar si faltan bloques (lógica simple post-solución)
+    faltan_3h = []
+    # ---- Reporte tipo "METRICAS PARA TESIS" ----
+    try:
+        total_requeridos = total_horas_requeridas
+        total_asignados = asignaciones_exitosas
+        p_hat = (total_asignados / total_requeridos) if total_requeridos else 0.0
+        # Asignaciones con deficit (por curso/grado), ya calculadas sobre la matriz
+        deficit_count = resumen["deficit_count"]
+        conflictos_detectados = 0
+        cumplimiento = "TOTAL" if fallidos == 0 else "PARCIAL"
+
+        print(f"[INFO] Total asignado: {total_asignados} bloques")
+        print("\n================ METRICAS PARA TESIS ================")
+        print(f"Bloques requeridos: {total_requeridos}")
+        print(f"Bloques asignados: {total_asignados}")
+        print(f"Proporcion de asignacion (p̂): {p_hat:.3f} ({p_hat*100:.2f}%)")
+        print(f"Conflictos detectados: {conflictos_detectados}")
+        print(f"Asignaciones exitosas: {len(map_asignaciones)}")
+        print(f"Asignaciones con deficit: {deficit_count}")
+        print(f"Cumplimiento de restricciones duras: {cumplimiento}")
+
+        # Test estadistico Z para proporcion de bloques asignados
+        p0 = 1.0
+        if total_requeridos > 0:
+            var = 1.0 / (4.0 * total_requeridos)
+            se = var ** 0.5
+            z = (p_hat - p0) / se if se > 0 else 0.0
+            print("\n--- Test Estadistico Z para proporcion de bloques asignados ---")
+            print(f"Valor ideal esperado (p0): {p0}")
+            print(f"Varianza estimada (rule of continuity): Var ≈ 1/(4n) = {var:.6f}")
+            print(f"Desviacion estandar (SE): sqrt(Var) = {se:.4f}")
+            print("\nCalculo con formula:")
+            print("Z = (p̂ - p0) / SE")
+            print(f"Z = ({p_hat:.3f} - {p0}) / {se:.4f}")
+            print(f"Z calculado = {z:.3f}")
+            print("\nInterpretacion:")
+            if abs(z) < 1.96:
+                print("La diferencia NO es estadisticamente significativa (p > 0.05).")
+                print("El sistema mantiene un nivel de asignacion estadisticamente compatible con el 100% esperado.")
+            else:
+                print("La diferencia ES estadisticamente significativa (p <= 0.05).")
+                print("El nivel de asignacion se aleja del 100% esperado.")
+
+        t1 = time.time()
+        print(f"\nTiempo de generacion: {t1 - t0:.3f} segundos")
+        print("=====================================================\n")
+    except Exception as _e:
+        print("[WARN] No se pudo generar reporte de metricas:", _e)
+
+    faltan_2h = []
+    
+    return {
+        "horario": horario_salida,
+        "asignaciones_exitosas": asignaciones_exitosas,
+        "asignaciones_fallidas": fallidos,
+        "total_bloques_asignados": asignaciones_exitosas,
+        "faltan_3h": faltan_3h, # CP-SAT maneja esto internamente, devolvemos vacio
+        "faltan_2h": faltan_2h,
+        "status": status_name,
+        "grados": grados,
+        "matriz_cursos": cursos,
+        "matriz_docentes": matriz_docentes(matriz_asignacion, map_asignaciones),
+    }
+
+
+# --- NUEVO MODELO CP-SAT ---
+
+def patron_efectivo(patrones_division, req):
+    """Patrón de la asignación si suma sus horas; si no, None (se ignora)."""
+    patron_vals = obtener_patron(patrones_division, req)
+    if patron_vals and sum(patron_vals) != req["horas"]:
+        return None
+    return patron_vals
+
+
+def _es_especial(req, version):
+    # Versión 1: cursos 9 y 12 de 3h se dictan 2h + 1h
+    return int(version) == 1 and req["horas"] == 3 and req["curso"] in (9, 12)
+
+
+def clave_simetria(patrones_division, req, version):
+    """
+    Lo que distingue a una asignación para la ruptura de simetrías, además de
+    docente, grado y horas. Un patrón que no suma las horas se ignora en el
+    desglose (patron_efectivo) pero igual saca a la asignación de las reglas
+    diarias de la versión 1 (obtener_patron): no es intercambiable con una
+    sin patrón.
+    """
+    return (
+        tuple(patron_efectivo(patrones_division, req) or ()),
+        bool(obtener_patron(patrones_division, req)),
+        _es_especial(req, version),
+    )
+
+
+def forma_modelo(
+    map_asignaciones, patrones_division, version, num_bloques, r_limitar_docente_grado, opciones, num_dias=NUM_DIAS
+):
+    """
+    Clave del esqueleto: todo lo que cambia la estructura del modelo.
+    Disponibilidad y horas quedan fuera (se parchean), salvo que la ruptura de
+    simetrías esté activa: sus grupos dependen de las horas.
+    """
+    con_horas = bool(opciones["romper_simetrias"])
+    return (
+        num_dias,
+        num_bloques,
+        int(version) == 1,
+        r_limitar_docente_grado,
+        bool(opciones["romper_simetrias"]),
+        bool(opciones["redundantes"]),
+        opciones["estrategia"],
+        tuple(
+            (
+                req["curso"],
+                req["grado"],
+                req["docente"],
+                tuple(obtener_patron(patrones_division, req) or ()),
+                patron_efectivo(patrones_division, req) is not None,
+                req["horas"] if con_horas else None,
+            )
+            for req in map_asignaciones
+        ),
+    )
+
+
+def construir_esqueleto(
+    map_asignaciones, patrones_division, version, num_bloques, r_limitar_docente_grado, opciones, num_dias=NUM_DIAS
+):
+    """
+    Arma el modelo sin disponibilidad ni horas: las restricciones que dependen
+    de ellas se crean con dominios amplios y se registran en refs para que
+    parchear_modelo les fije el valor de cada request.
+    """
+    from ortools.sat.python import cp_model
+
+    model = cp_model.CpModel()
+    n = len(map_asignaciones)
+    refs = {
+        "horas": [],           # idx -> restricción sum(x) == horas
+        "horas_dia": {},       # (idx, d) -> dominio de horas_dia (tope diario y "no 1h")
+        "desglose": {},        # idx -> (restricción sum es_3h, restricción sum es_2h)
+        "carga_docente": {},   # (doc, d) -> carga diaria del docente (redundante)
+        "total_grado": {},     # grado -> total semanal del grado (redundante)
+        "dias_dicta": {},      # idx -> días de dictado (redundante)
+    }
+
     # 2. Variables del Modelo
     # ---------------------------------------------------------
-    # x[(index_asignacion, dia, bloque)] -> booleano (1 si se da clase, 0 no)
+    # x[(index_asignacion, dia, bloque)] -> booleano (1 si se da clase, 0 no);
+    # los bloqueos del docente se fijan después como dominio [0, 0]
     x = {}
     # horas_dia[(idx, d)] -> horas de esa asignacion en el dia
     horas_dia = {}
@@ -202,52 +370,37 @@ def generar_horario_cp(
     # es_k_dia[(idx, d, k)] -> 1 si esa asignacion tiene k horas en el dia (patrones)
     es_k_dia = {}
 
-    def _obtener_patron(req):
-        key = f"{req['curso']}-{req['grado']}"
-        raw = patrones_division.get(key)
-        if not raw:
-            return None
-        if isinstance(raw, str):
-            partes = [int(x) for x in raw.split("+") if x.strip().isdigit()]
-            return partes or None
-        if isinstance(raw, (list, tuple)):
-            try:
-                partes = [int(x) for x in raw]
-                return partes or None
-            except Exception:
-                return None
-        return None
-    
-    for idx, req in enumerate(map_asignaciones):
-        for d in range(NUM_DIAS):
+    for idx in range(n):
+        for d in range(num_dias):
             for b in range(num_bloques):
-                # Verificar disponibilidad del docente inmediatamente
-                if (req['docente'], d, b) in bloqueos:
-                    # Si el docente no puede, no creamos variable (es 0 implícito) 
-                    # o la forzamos a 0. Mejor no crearla para ahorrar memoria, 
-                    # pero para lógica de sumas, forzamos a 0.
-                    x[(idx, d, b)] = model.NewBoolVar(f"x_{idx}_{d}_{b}")
-                    model.Add(x[(idx, d, b)] == 0)
-                else:
-                    x[(idx, d, b)] = model.NewBoolVar(f"x_{idx}_{d}_{b}")
+                x[(idx, d, b)] = model.NewBoolVar(f"x_{idx}_{d}_{b}")
+
+    # Indices de las variables x en el proto, para leer la solucion de una vez
+    refs["x_idx"] = np.array(
+        [
+            [[x[(idx, d, b)].Index() for b in range(num_bloques)] for d in range(num_dias)]
+            for idx in range(n)
+        ],
+        dtype=np.int64,
+    ).reshape(n, num_dias, num_bloques)
 
     # 3. Restricciones Duras (Hard Constraints)
     # ---------------------------------------------------------
 
-    # A) Cumplir horas requeridas por asignatura
-    for idx, req in enumerate(map_asignaciones):
-        model.Add(
-            sum(x[(idx, d, b)] for d in range(NUM_DIAS) for b in range(num_bloques)) == req['horas']
+    # A) Cumplir horas requeridas por asignatura (rhs = horas, se parchea)
+    for idx in range(n):
+        ct = model.AddLinearConstraint(
+            sum(x[(idx, d, b)] for d in range(num_dias) for b in range(num_bloques)), 0, num_dias * num_bloques
         )
+        refs["horas"].append(ct.Index())
 
     # B) Choques de Grado: Un grado no puede tener 2 materias al mismo tiempo
-    # Agrupamos asignaciones por grado
     reqs_por_grado = {}
     for idx, req in enumerate(map_asignaciones):
         reqs_por_grado.setdefault(req['grado'], []).append(idx)
-    
+
     for grado, indices in reqs_por_grado.items():
-        for d in range(NUM_DIAS):
+        for d in range(num_dias):
             for b in range(num_bloques):
                 model.Add(sum(x[(idx, d, b)] for idx in indices) <= 1)
             # Sin huecos intermedios: si hay clase despues, debe haber antes
@@ -261,9 +414,9 @@ def generar_horario_cp(
     reqs_por_docente = {}
     for idx, req in enumerate(map_asignaciones):
         reqs_por_docente.setdefault(req['docente'], []).append(idx)
-        
+
     for doc, indices in reqs_por_docente.items():
-        for d in range(NUM_DIAS):
+        for d in range(num_dias):
             for b in range(num_bloques):
                 model.Add(sum(x[(idx, d, b)] for idx in indices) <= 1)
 
@@ -275,23 +428,20 @@ def generar_horario_cp(
             reqs_por_docente_grado.setdefault(key, []).append(idx)
 
         for (doc, grado), indices in reqs_por_docente_grado.items():
-            for d in range(NUM_DIAS):
+            for d in range(num_dias):
                 model.Add(
                     sum(x[(idx, d, b)] for idx in indices for b in range(num_bloques)) <= 3
                 )
 
     # 4. Restricciones de Calidad (Estructura de Bloques)
     # ---------------------------------------------------------
-    
+
     # D) Contigüidad Diaria: Si un curso se da un día, debe ser en bloque continuo.
     # Evita: Clase a las 8am y otra a las 11am con hueco en medio.
     # Lógica: Contamos cuántas veces "empieza" una clase en un día. Debe ser máximo 1 vez.
-    
     for idx, req in enumerate(map_asignaciones):
-        patron_vals = _obtener_patron(req)
-        if patron_vals and sum(patron_vals) != req["horas"]:
-            patron_vals = None
-        for d in range(NUM_DIAS):
+        patron_vals = patron_efectivo(patrones_division, req)
+        for d in range(num_dias):
             # Variables auxiliares para detectar inicios
             # start[b] es 1 si la clase empieza en el bloque b
             starts = []
@@ -314,197 +464,395 @@ def generar_horario_cp(
                     model.Add(horas_dia[(idx, d)] == k).OnlyEnforceIf(var)
                     model.Add(horas_dia[(idx, d)] != k).OnlyEnforceIf(var.Not())
                     es_k_dia[(idx, d, k)] = var
-            else:
-                if not (int(version) == 1 and req['horas'] == 3 and req['curso'] in (9, 12)):
-                    model.Add(horas_dia[(idx, d)] != 1)
-            
+            # Tope diario (max 3h si el curso tiene más de 2h) y prohibición de
+            # días de 1h: ambos dependen de las horas, se parchean
+            ct = model.AddLinearConstraint(horas_dia[(idx, d)], 0, num_bloques)
+            refs["horas_dia"][(idx, d)] = ct.Index()
+
             for b in range(num_bloques):
                 es_inicio = model.NewBoolVar(f"start_{idx}_{d}_{b}")
-                
+
                 if b == 0:
                     # En el bloque 0, empieza si x es 1
                     model.Add(es_inicio == x[(idx, d, b)])
                 else:
                     # En bloque b > 0, empieza si x[b]=1 y x[b-1]=0
-                    # start >= x[b] - x[b-1]
                     # Logica bool: start <-> (x[b] AND NOT x[b-1])
                     model.AddBoolOr([x[(idx, d, b)].Not(), x[(idx, d, b-1)], es_inicio]) # Clausula para implicacion inversa
-                    model.AddImplication(es_inicio, x[(idx, d, b)]) 
+                    model.AddImplication(es_inicio, x[(idx, d, b)])
                     model.AddImplication(es_inicio, x[(idx, d, b-1)].Not())
-                
+
                 starts.append(es_inicio)
-            
+
             # Restricción: Máximo 1 inicio por día (significa 1 bloque continuo)
             model.Add(sum(starts) <= 1)
-            
-            # Opcional: Limitar horas máximas por día para no cansar a alumnos (ej. max 3 horas seguidas)
-            if req['horas'] > 2:
-                model.Add(horas_dia[(idx, d)] <= 3) # Max 3 horas de la misma materia por dia
 
-    # --- 5. ESTRATEGIA DE DEGLOSE DE HORAS (CORREGIDA) ---
+    # --- 5. ESTRATEGIA DE DEGLOSE DE HORAS ---
+    # Con patrón: conteo fijo de días de k horas. Sin patrón: cantidad de días
+    # de 3h y de 2h según las horas (se parchea).
     for idx, req in enumerate(map_asignaciones):
-        patron_vals = _obtener_patron(req)
-        if patron_vals and sum(patron_vals) != req["horas"]:
-            patron_vals = None
+        patron_vals = patron_efectivo(patrones_division, req)
         if patron_vals:
             conteo = Counter(patron_vals)
             for k, cnt in conteo.items():
                 model.Add(
-                    sum(es_k_dia[(idx, d, k)] for d in range(NUM_DIAS)) == cnt
+                    sum(es_k_dia[(idx, d, k)] for d in range(num_dias)) == cnt
                 )
             continue
-        h_total = req['horas']
-        c_id = req['curso']
-        sum_3h = sum(es_3h_dia[(idx, d)] for d in range(NUM_DIAS))
-        sum_2h = sum(es_2h_dia[(idx, d)] for d in range(NUM_DIAS))
-
-        if h_total == 5:
-            model.Add(sum_3h == 1)
-            model.Add(sum_2h == 1)
-        elif h_total == 4:
-            model.Add(sum_3h == 0)
-            model.Add(sum_2h == 2)
-        elif h_total == 3:
-            if int(version) == 1 and c_id in (9, 12):
-                model.Add(sum_3h == 0)
-                model.Add(sum_2h == 1)
-            else:
-                model.Add(sum_3h == 1)
-                model.Add(sum_2h == 0)
-        elif h_total == 2:
-            model.Add(sum_2h == 1)
-            model.Add(sum_3h == 0)
+        sum_3h = sum(es_3h_dia[(idx, d)] for d in range(num_dias))
+        sum_2h = sum(es_2h_dia[(idx, d)] for d in range(num_dias))
+        refs["desglose"][idx] = (
+            model.AddLinearConstraint(sum_3h, 0, num_dias).Index(),
+            model.AddLinearConstraint(sum_2h, 0, num_dias).Index(),
+        )
 
     # --- 6. REGLAS DE DISTRIBUCIÓN DIARIA ---
     if int(version) == 1:
         for grado, indices in reqs_por_grado.items():
             indices_sin_patron = [
                 idx for idx in indices
-                if not _obtener_patron(map_asignaciones[idx])
+                if not obtener_patron(patrones_division, map_asignaciones[idx])
             ]
             if not indices_sin_patron:
                 continue
-            for d in range(NUM_DIAS):
+            for d in range(num_dias):
                 model.Add(sum(es_3h_dia[(idx, d)] for idx in indices_sin_patron) == 1)
                 total_2h_hoy = sum(es_2h_dia[(idx, d)] for idx in indices_sin_patron)
                 model.Add(total_2h_hoy >= 1)
                 model.Add(total_2h_hoy <= 2)
 
+    # --- 7. RUPTURA DE SIMETRÍAS ---
+    if opciones["romper_simetrias"]:
+        def _clave_simetria(idx):
+            return clave_simetria(patrones_division, map_asignaciones[idx], version)
+
+        resumen_simetrias = romper_simetrias(
+            model, map_asignaciones, horas_dia, _clave_simetria, num_dias, num_bloques
+        )
+        print("[CP-SAT] Simetrías:", resumen_simetrias)
+
+    # --- 8. RESTRICCIONES REDUNDANTES (implícitas, ayudan a propagar) ---
+    if opciones["redundantes"]:
+        # a) Carga diaria por docente acotada por su disponibilidad ese día
+        for doc, indices in reqs_por_docente.items():
+            for d in range(num_dias):
+                carga = sum(horas_dia[(idx, d)] for idx in indices)
+                refs["carga_docente"][(doc, d)] = model.AddLinearConstraint(carga, 0, num_bloques).Index()
+        # b) Totales diarios por grado: sin huecos, el día ocupa los bloques 0..T-1
+        for grado, indices in reqs_por_grado.items():
+            totales = []
+            for d in range(num_dias):
+                t_dia = model.NewIntVar(0, num_bloques, f"total_{grado}_{d}")
+                model.Add(t_dia == sum(horas_dia[(idx, d)] for idx in indices))
+                totales.append(t_dia)
+            refs["total_grado"][grado] = model.AddLinearConstraint(
+                sum(totales), 0, num_dias * num_bloques
+            ).Index()
+        # c) Cantidad de días de dictado por asignación según el desglose
+        for idx in range(n):
+            dias_dicta = sum(dicta_dia[(idx, d)] for d in range(num_dias))
+            refs["dias_dicta"][idx] = model.AddLinearConstraint(dias_dicta, 0, num_dias).Index()
+
+    refs["dicta_idx"] = [[dicta_dia[(idx, d)].Index() for d in range(num_dias)] for idx in range(n)]
+    refs["reqs_por_docente"] = reqs_por_docente
+    refs["reqs_por_grado"] = reqs_por_grado
+    return model, refs
+
+
+def parchear_modelo(
+    model, refs, map_asignaciones, bloqueos, bloqueos_por_docente,
+    patrones_division, version, num_bloques, opciones,
+):
+    """Fija sobre el esqueleto la disponibilidad y las horas de esta instancia."""
+    from ortools.sat.python import cp_model
+
+    proto = model.Proto()
+    x_idx = refs["x_idx"]
+    num_dias = x_idx.shape[1]
+    reqs_por_docente = refs["reqs_por_docente"]
+
+    # Disponibilidad: celda bloqueada del docente -> x fijada en 0
+    for idx, req in enumerate(map_asignaciones):
+        for d in range(num_dias):
+            for b in range(num_bloques):
+                maximo = 0 if (req["docente"], d, b) in bloqueos else 1
+                fijar_dominio_variable(proto, int(x_idx[idx, d, b]), 0, maximo)
+
+    for idx, req in enumerate(map_asignaciones):
+        h = req["horas"]
+        patron_vals = patron_efectivo(patrones_division, req)
+        especial = _es_especial(req, version)
+        fijar_dominio_restriccion(proto, refs["horas"][idx], [(h, h)])
+
+        # Max 3 horas de la misma materia por dia si tiene más de 2h; sin
+        # patrón (y salvo el caso especial) un día nunca tiene 1h
+        tope = 3 if h > 2 else num_bloques
+        dominio_dia = [(0, tope)] if patron_vals or especial else [(0, 0), (2, tope)]
+        for d in range(num_dias):
+            fijar_dominio_restriccion(proto, refs["horas_dia"][(idx, d)], dominio_dia)
+
+        if idx in refs["desglose"]:
+            # (días de 3h, días de 2h) según las horas totales
+            if h == 5:
+                d3, d2 = (1, 1), (1, 1)
+            elif h == 4:
+                d3, d2 = (0, 0), (2, 2)
+            elif h == 3 and especial:
+                d3, d2 = (0, 0), (1, 1)
+            elif h == 3:
+                d3, d2 = (1, 1), (0, 0)
+            elif h == 2:
+                d3, d2 = (0, 0), (1, 1)
+            else:
+                d3, d2 = (0, num_dias), (0, num_dias)
+            ct3, ct2 = refs["desglose"][idx]
+            fijar_dominio_restriccion(proto, ct3, [d3])
+            fijar_dominio_restriccion(proto, ct2, [d2])
+
+        if idx in refs["dias_dicta"]:
+            if patron_vals:
+                dias = (len(patron_vals), len(patron_vals))
+            elif especial:
+                dias = (2, 2)
+            elif h in (2, 3):
+                dias = (1, 1)
+            elif h in (4, 5):
+                dias = (2, 2)
+            elif h > 5:
+                dias = ((h + 2) // 3, h // 2)
+            else:
+                dias = (0, num_dias)
+            fijar_dominio_restriccion(proto, refs["dias_dicta"][idx], [dias])
+
+    if refs["carga_docente"]:
+        # Celdas libres por docente y día
+        libres_dia = {
+            (doc, d): num_bloques - sum(1 for b in range(num_bloques) if (doc, d, b) in bloqueos)
+            for doc in reqs_por_docente
+            for d in range(num_dias)
+        }
+        for doc, indices in reqs_por_docente.items():
+            total_doc = sum(map_asignaciones[idx]["horas"] for idx in indices)
+            for d in range(num_dias):
+                resto = sum(libres_dia[(doc, o)] for o in range(num_dias) if o != d)
+                minimo = max(0, total_doc - resto)
+                # Si minimo > libres la instancia ya es infactible por la disponibilidad
+                fijar_dominio_restriccion(
+                    proto, refs["carga_docente"][(doc, d)], [(minimo, max(minimo, libres_dia[(doc, d)]))]
+                )
+    for grado, ct in refs["total_grado"].items():
+        total_grado = sum(map_asignaciones[idx]["horas"] for idx in refs["reqs_por_grado"][grado])
+        fijar_dominio_restriccion(proto, ct, [(total_grado, total_grado)])
+
+    # --- 9. ESTRATEGIA DE BÚSQUEDA ---
+    # Depende de la holgura de cada docente: se rehace en cada request
+    del proto.search_strategy[:]
+    if opciones["estrategia"] == "docentes_restringidos":
+        # Holgura = celdas libres - horas requeridas; menor holgura se decide antes
+        def _holgura(doc):
+            libres = num_dias * num_bloques - bloqueos_por_docente.get(doc, 0)
+            return libres - sum(map_asignaciones[i]["horas"] for i in reqs_por_docente[doc])
+
+        orden = sorted(
+            range(len(map_asignaciones)),
+            key=lambda idx: (_holgura(map_asignaciones[idx]["docente"]), -map_asignaciones[idx]["horas"], idx),
+        )
+        model.AddDecisionStrategy(
+            [model.GetBoolVarFromProtoIndex(refs["dicta_idx"][idx][d]) for idx in orden for d in range(num_dias)],
+            cp_model.CHOOSE_FIRST,
+            cp_model.SELECT_MAX_VALUE,
+        )
+        model.AddDecisionStrategy(
+            [
+                model.GetBoolVarFromProtoIndex(int(x_idx[idx, d, b]))
+                for idx in orden for d in range(num_dias) for b in range(num_bloques)
+            ],
+            cp_model.CHOOSE_FIRST,
+            cp_model.SELECT_MAX_VALUE,
+        )
+
+
+def aplicar_pista(model, x_idx, map_asignaciones, pista):
+    """
+    Parte de una solución previa: pista = [[curso, grado, dia, bloque], ...]
+    con las celdas ocupadas. Se sugiere como warm start y se maximiza la
+    cantidad de celdas que se conservan: la pista sola cubre solo las x y
+    CP-SAT suele abandonarla tras el presolve, devolviendo un horario sin
+    relación con el anterior. El modelo es un clon del esqueleto, así que
+    nada de esto queda en cache. Devuelve la expresión de celdas conservadas.
+    """
+    ocupadas = {tuple(int(v) for v in celda) for celda in pista}
+    _, num_dias, num_bloques = x_idx.shape
+    valores = [
+        int((req["curso"], req["grado"], d, b) in ocupadas)
+        for req in map_asignaciones
+        for d in range(num_dias)
+        for b in range(num_bloques)
+    ]
+    indices = [int(v) for v in x_idx.ravel()]
+    hint = model.Proto().solution_hint
+    del hint.vars[:]
+    del hint.values[:]
+    hint.vars.extend(indices)
+    hint.values.extend(valores)
+    conservadas = sum(model.GetBoolVarFromProtoIndex(i) for i, v in zip(indices, valores) if v)
+    model.Maximize(conservadas)
+    return conservadas
+
+
+def aplicar_cortes(model, x_idx, map_asignaciones, cortes):
+    """
+    Cortes de la fase de aulas (asignacion_aulas.py): en la celda (dia,
+    bloque), las asignaciones de esos docentes no superan max a la vez.
+    """
+    for corte in cortes:
+        docentes = {int(doc) for doc in corte["docentes"]}
+        d, b = int(corte["dia"]), int(corte["bloque"])
+        celda = [
+            model.GetBoolVarFromProtoIndex(int(x_idx[idx, d, b]))
+            for idx, req in enumerate(map_asignaciones)
+            if int(req["docente"]) in docentes
+        ]
+        if len(celda) > int(corte["max"]):
+            model.Add(sum(celda) <= int(corte["max"]))
+
+
+def pista_de_resultado(resultado):
+    """Celdas ocupadas de un resultado del generador, en el formato de aplicar_pista."""
+    cursos, grados = resultado["matriz_cursos"], resultado["grados"]
+    return [
+        [int(cursos[d, b, g]), int(grados[g]), int(d), int(b)]
+        for d, b, g in zip(*np.nonzero(cursos))
+    ]
+
+
+def generar_horario_cp(
+    docentes,
+    asignaciones,
+    restricciones,
+    horas_curso_grado,
+    nivel="Secundaria",
+    version=1,
+    patrones_division=None,
+    progress_callback=None,
+    opciones_solver=None,
+    num_dias=NUM_DIAS,
+):
+    """
+    Genera un horario escolar utilizando Programación por Restricciones (CP-SAT).
+    Garantiza que no haya choques y respeta la disponibilidad.
+
+    opciones_solver (opcional): {"preset": nombre, ...overrides}. Ver
+    configuracion_solver.PRESETS; claves reconocidas:
+      - estrategia: "docentes_restringidos" ramifica primero en los docentes
+        con menos holgura de disponibilidad.
+      - redundantes: agrega restricciones implícitas (carga diaria por docente,
+        totales diarios por grado, días de dictado por asignación).
+      - romper_simetrias: orden lexicográfico entre asignaciones
+        intercambiables y grados idénticos.
+      - symmetry_level: nivel de detección de simetrías propio de CP-SAT (0-4).
+      - max_time_in_seconds / num_search_workers: límites del solver (30 s / 8).
+      - pista: celdas de una solución previa; se parte de ella y se conservan
+        tantas como se pueda (aplicar_pista).
+      - etapas / tiempo_etapa_s: objetivos de calidad que se optimizan en
+        orden después de la solución factible (optimizacion_etapas.py).
+      - cortes: límites por celda devueltos por la asignación de aulas
+        (aplicar_cortes).
+
+    num_dias: días de la semana del horario (5; 6 con sábado).
+    """
+    # Import diferido: importar el módulo no carga OR-Tools (ver arranque.py)
+    from ortools.sat.python import cp_model
+
+    print("[CP-SAT] Iniciando modelado matemático...")
+    t0 = time.time()
+
+    # 1. Preparación y Limpieza de Datos
+    # ---------------------------------------------------------
+    num_bloques = 7 if int(version) == 1 else 8
+    patrones_division = patrones_division or {}
+    opciones = resolver_opciones(opciones_solver)
+
+    datos = preparar_datos(
+        docentes, asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias
+    )
+    map_asignaciones = datos["map_asignaciones"]
+    total_horas_requeridas = datos["total_horas_requeridas"]
+    r_limitar_docente_grado = datos["r_limitar_docente_grado"]
+    bloqueos = datos["bloqueos"]
+    bloqueos_por_docente = datos["bloqueos_por_docente"]
+
+    # 2-4. Modelo: esqueleto (cacheado por forma) + parche de disponibilidad y horas
+    # ---------------------------------------------------------
+    t_modelo = time.perf_counter()
+    def _construir():
+        return construir_esqueleto(
+            map_asignaciones, patrones_division, version, num_bloques, r_limitar_docente_grado, opciones, num_dias
+        )
+
+    if opciones["cache_modelo"]:
+        forma = forma_modelo(
+            map_asignaciones, patrones_division, version, num_bloques, r_limitar_docente_grado, opciones, num_dias
+        )
+        model, refs, reutilizado = obtener_esqueleto(forma, _construir)
+    else:
+        (model, refs), reutilizado = _construir(), False
+    parchear_modelo(
+        model, refs, map_asignaciones, bloqueos, bloqueos_por_docente,
+        patrones_division, version, num_bloques, opciones,
+    )
+    x_idx = refs["x_idx"]
+    if opciones["cortes"]:
+        aplicar_cortes(model, x_idx, map_asignaciones, opciones["cortes"])
+    conservadas = None
+    if opciones.get("pista"):
+        conservadas = aplicar_pista(model, x_idx, map_asignaciones, opciones["pista"])
+    t_modelo = time.perf_counter() - t_modelo
+    observar_modelo(model.Proto(), t_modelo)
+    print(
+        f"[CP-SAT] Modelo {'reutilizado' if reutilizado else 'construido'} en "
+        f"{t_modelo:.3f}s ({len(model.Proto().constraints)} restricciones)"
+    )
+
     # 5. Configuración del Solver
     # ---------------------------------------------------------
     solver = cp_model.CpSolver()
-    # Limite de tiempo para buscar (ajustable)
-    solver.parameters.max_time_in_seconds = 30.0 
-    # Usar todos los núcleos del CPU
-    solver.parameters.num_search_workers = 8 
+    # Limite de tiempo, núcleos y demás parámetros según el preset
+    aplicar_parametros(solver, opciones)
+    print("[CP-SAT] Preset:", opciones["preset"])
 
-    print("[CP-SAT] Variables creadas:", len(x))
+    print("[CP-SAT] Variables creadas:", x_idx.size)
     print("[CP-SAT] Iniciando solver...")
-    status = solver.Solve(model)
+    t_solver = time.perf_counter()
+    with solver_activo(opciones["num_search_workers"]):
+        status = solver.Solve(model)
+    etapas = [{"etapa": "factibilidad", "status": solver.StatusName(status),
+               "segundos": round(time.perf_counter() - t_solver, 3)}]
+
+    # 5b. Calidad por etapas lexicográficas sobre el mismo modelo (optimizacion_etapas.py)
+    if opciones["etapas"] and status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        solver, informe = optimizar_por_etapas(
+            model, solver, x_idx, map_asignaciones, refs["reqs_por_docente"], opciones, conservadas
+        )
+        etapas += informe
 
     # 6. Construcción de la Salida (Formato idéntico al original)
     # ---------------------------------------------------------
-    
-    # Inicializar estructura de salida vacía
-    horario_salida = {d: {b: {} for b in range(num_bloques)} for d in range(NUM_DIAS)}
-    
-    fallidos = 0
-    asignaciones_exitosas = 0
-    
+    # Una sola pasada: valores (asignacion x dia x bloque) -> matriz dia x bloque x grado
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         print(f"[CP-SAT] Solución encontrada: {solver.StatusName(status)}")
-        
-        for idx, req in enumerate(map_asignaciones):
-            c_id = req['curso']
-            g_id = req['grado']
-            d_id = req['docente'] # No se usa en la estructura final visual, pero útil saberlo
-            
-            horas_asignadas_curso = 0
-            for d in range(NUM_DIAS):
-                for b in range(num_bloques):
-                    if solver.Value(x[(idx, d, b)]) == 1:
-                        # Asignar en la estructura
-                        horario_salida[d][b][g_id] = c_id
-                        horas_asignadas_curso += 1
-                        asignaciones_exitosas += 1
-            
-            if horas_asignadas_curso < req['horas']:
-                # Esto no debería pasar si status es FEASIBLE, pero por seguridad
-                fallidos += (req['horas'] - horas_asignadas_curso)
+        valores = extraer_valores(solver, x_idx)
     else:
         print("[CP-SAT] No se encontró solución factible con las restricciones actuales.")
-        fallidos = total_horas_requeridas # Todo falló
-
-    # Estadísticas básicas para el reporte
-    # Detectar si faltan bloques (lógica simple post-solución)
-    faltan_3h = []
-    # ---- Reporte tipo "METRICAS PARA TESIS" ----
-    try:
-        total_requeridos = total_horas_requeridas
-        total_asignados = asignaciones_exitosas
-        p_hat = (total_asignados / total_requeridos) if total_requeridos else 0.0
-        # Contar asignaciones con deficit (por curso/grado)
-        deficit_count = 0
-        for idx, req in enumerate(map_asignaciones):
-            horas_asignadas = 0
-            for d in range(NUM_DIAS):
-                for b in range(num_bloques):
-                    if solver.Value(x[(idx, d, b)]) == 1:
-                        horas_asignadas += 1
-            if horas_asignadas < req["horas"]:
-                deficit_count += 1
-        conflictos_detectados = 0
-        cumplimiento = "TOTAL" if fallidos == 0 else "PARCIAL"
-
-        print(f"[INFO] Total asignado: {total_asignados} bloques")
-        print("\n================ METRICAS PARA TESIS ================")
-        print(f"Bloques requeridos: {total_requeridos}")
-        print(f"Bloques asignados: {total_asignados}")
-        print(f"Proporcion de asignacion (p̂): {p_hat:.3f} ({p_hat*100:.2f}%)")
-        print(f"Conflictos detectados: {conflictos_detectados}")
-        print(f"Asignaciones exitosas: {len(map_asignaciones)}")
-        print(f"Asignaciones con deficit: {deficit_count}")
-        print(f"Cumplimiento de restricciones duras: {cumplimiento}")
-
-        # Test estadistico Z para proporcion de bloques asignados
-        p0 = 1.0
-        if total_requeridos > 0:
-            var = 1.0 / (4.0 * total_requeridos)
-            se = var ** 0.5
-            z = (p_hat - p0) / se if se > 0 else 0.0
-            print("\n--- Test Estadistico Z para proporcion de bloques asignados ---")
-            print(f"Valor ideal esperado (p0): {p0}")
-            print(f"Varianza estimada (rule of continuity): Var ≈ 1/(4n) = {var:.6f}")
-            print(f"Desviacion estandar (SE): sqrt(Var) = {se:.4f}")
-            print("\nCalculo con formula:")
-            print("Z = (p̂ - p0) / SE")
-            print(f"Z = ({p_hat:.3f} - {p0}) / {se:.4f}")
-            print(f"Z calculado = {z:.3f}")
-            print("\nInterpretacion:")
-            if abs(z) < 1.96:
-                print("La diferencia NO es estadisticamente significativa (p > 0.05).")
-                print("El sistema mantiene un nivel de asignacion estadisticamente compatible con el 100% esperado.")
-            else:
-                print("La diferencia ES estadisticamente significativa (p <= 0.05).")
-                print("El nivel de asignacion se aleja del 100% esperado.")
-
-        t1 = time.time()
-        print(f"\nTiempo de generacion: {t1 - t0:.3f} segundos")
-        print("=====================================================\n")
-    except Exception as _e:
-        print("[WARN] No se pudo generar reporte de metricas:", _e)
+        valores = np.zeros(x_idx.shape, dtype=np.int8)
 
-    faltan_2h = []
-    
-    return {
-        "horario": horario_salida,
-        "asignaciones_exitosas": asignaciones_exitosas,
-        "asignaciones_fallidas": fallidos,
-        "total_bloques_asignados": asignaciones_exitosas,
-        "faltan_3h": faltan_3h, # CP-SAT maneja esto internamente, devolvemos vacio
-        "faltan_2h": faltan_2h,
-        "status": solver.StatusName(status)
-    }
+    resultado = construir_salida(
+        valores, map_asignaciones, nivel, total_horas_requeridas, solver.StatusName(status), t0
+    )
+    if opciones["etapas"]:
+        resultado["etapas"] = etapas
+        resultado["calidad"] = medir(valores, map_asignaciones)
+    return resultado
 
 
 def generar_horario(
@@ -516,14 +864,46 @@ def generar_horario(
     version=1,
     patrones_division=None,
     progress_callback=None,
+    opciones_solver=None,
+    num_dias=NUM_DIAS,
 ):
-    return generar_horario_cp(
-        docentes,
-        asignaciones,
-        restricciones,
-        horas_curso_grado,
-        nivel,
-        version,
-        patrones_division,
-        progress_callback,
-    )
+    # Límite, núcleos y motor: los del request o, si no los fija, los que
+    # sugiere el predictor entrenado con corridas anteriores
+    num_bloques = 7 if int(version) == 1 else 8
+    datos = normalizar_entrada(docentes, asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias)
+    rasgos = caracteristicas(datos, patrones_division, version, nivel, num_bloques)
+    opciones_solver = ajustar_opciones(opciones_solver, rasgos)
+    opciones = resolver_opciones(opciones_solver)
+    # Motor seleccionable por request: "monolitico" (default) o "dos_fases"
+    motor = opciones["motor"]
+    t0 = time.perf_counter()
+    if motor == "dos_fases":
+        from solver_dos_fases import generar_horario_dos_fases
+        resultado = generar_horario_dos_fases(
+            docentes,
+            asignaciones,
+            restricciones,
+            horas_curso_grado,
+            nivel,
+            version,
+            patrones_division,
+            progress_callback,
+            opciones_solver,
+            num_dias,
+        )
+    else:
+        resultado = generar_horario_cp(
+            docentes,
+            asignaciones,
+            restricciones,
+            horas_curso_grado,
+            nivel,
+            version,
+            patrones_division,
+            progress_callback,
+            opciones_solver,
+            num_dias,
+        )
+    SOLVER_STATUS.labels(resultado.get("status", "UNKNOWN"), motor).inc()
+    registrar_corrida(rasgos, opciones, resultado, time.perf_counter() - t0)
+    return resultado
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# generar_lote.py
+#
+# Generación por lotes fuera del request Flask: todos los niveles y versiones
+# de una exportación, repartidos en un pool de procesos.
+#
+# Uso:
+#   python generar_lote.py --exportar export.json                 # baja los datos desde Supabase
+#   python generar_lote.py --entrada export.json --salida lote/   # genera a archivos locales
+#   python generar_lote.py --entrada export.json --supabase --generaciones 3
+#
+# Formato de la exportación:
+#   {"instancias": [{"nivel", "version", "docentes", "asignaciones",
+#                    "restricciones", "horas_curso_grado", "patrones_division"}]}
+#
+# Cada instancia produce --generaciones trabajos (generation_index 1..N) que
+# solo difieren en la semilla del solver.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from arranque import obtener_supabase
+from codec_horario import a_almacenamiento
+from generador_python import generar_horario
+from pipeline_horario import (
+    DIAS,
+    NUM_DIAS,
+    cargar_instancia,
+    guardar_cambios,
+    ultimo_numero_horario,
+)
+from salida_horario import horario_lista, registros_horarios
+
+NIVELES = ("Primaria", "Secundaria")
+MAX_GENERACIONES = 5  # CHECK de horario_generaciones.generation_index
+FORMATO_ALMACENAMIENTO = "u16+gzip"  # el front lo decodifica sin dependencias
+
+
+# --- Exportación ---
+
+def exportar_desde_supabase(sb, niveles=NIVELES, versiones=None):
+    """Una instancia por cada (nivel, versión) con horas cargadas en horas_curso_grado."""
+    instancias = []
+    for nivel in niveles:
+        horas_rows = sb.table("horas_curso_grado").select("version_num").eq("nivel", nivel).execute().data or []
+        versiones_nivel = sorted({int(h["version_num"]) for h in horas_rows if h.get("version_num") is not None})
+        for version in versiones_nivel:
+            if versiones and version not in versiones:
+                continue
+            instancias.append(cargar_instancia(sb, nivel, version))
+    return {"instancias": instancias}
+
+
+# --- Trabajos ---
+
+def armar_trabajos(instancias, generaciones=1, opciones_solver=None, workers_por_trabajo=1):
+    if not 1 <= generaciones <= MAX_GENERACIONES:
+        raise ValueError(f"generaciones debe estar entre 1 y {MAX_GENERACIONES}")
+    trabajos = []
+    for instancia in instancias:
+        for gen in range(1, generaciones + 1):
+            opciones = dict(opciones_solver or {})
+            opciones.setdefault("num_search_workers", workers_por_trabajo)
+            opciones["random_seed"] = gen - 1
+            trabajos.append({"instancia": instancia, "generation_index": gen, "opciones_solver": opciones})
+    return trabajos
+
+
+def ejecutar_trabajo(trabajo):
+    """Corre en el proceso hijo; devuelve solo datos serializables."""
+    inst = trabajo["instancia"]
+    salida = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(salida):
+        resultado = generar_horario(
+            [dict(d) for d in inst["docentes"]],
+            inst["asignaciones"],
+            inst.get("restricciones") or {},
+            inst["horas_curso_grado"],
+            nivel=inst["nivel"],
+            version=inst["version"],
+            patrones_division=inst.get("patrones_division"),
+            opciones_solver=trabajo["opciones_solver"],
+            num_dias=inst.get("num_dias", NUM_DIAS),
+        )
+    segundos = time.perf_counter() - t0
+    tiene_matriz = "matriz_cursos" in resultado
+    return {
+        "nivel": inst["nivel"],
+        "version": int(inst["version"]),
+        "generation_index": trabajo["generation_index"],
+        "status": resultado.get("status"),
+        "segundos": round(segundos, 4),
+        "asignados": resultado.get("total_bloques_asignados", 0),
+        "fallidos": resultado.get("asignaciones_fallidas", 0),
+        "horario": horario_lista(resultado, inst.get("grados") or resultado["grados"]) if tiene_matriz else [],
+        "grados": list(inst.get("grados") or resultado["grados"]) if tiene_matriz else [],
+        # version_num (0 aquí) se reemplaza al persistir en 'horarios'
+        "registros": registros_horarios(resultado, inst["nivel"], 0, dias=DIAS) if tiene_matriz else [],
+    }
+
+
+def correr_lote(trabajos, procesos=None):
+    """Reparte los trabajos en un pool; imprime una línea por trabajo terminado."""
+    procesos = procesos or os.cpu_count() or 1
+    resultados = []
+    t0 = time.perf_counter()
+    if procesos == 1:
+        completados = (ejecutar_trabajo(t) for t in trabajos)
+        for r in completados:
+            _imprimir_trabajo(r, len(resultados) + 1, len(trabajos))
+            resultados.append(r)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(ejecutar_trabajo, t) for t in trabajos]
+            for futuro in as_completed(futuros):
+                r = futuro.result()
+                _imprimir_trabajo(r, len(resultados) + 1, len(trabajos))
+                resultados.append(r)
+    total = time.perf_counter() - t0
+    resultados.sort(key=lambda r: (r["nivel"], r["version"], r["generation_index"]))
+    return resultados, resumen_lote(resultados, total, procesos)
+
+
+def _imprimir_trabajo(r, n, total):
+    print(
+        f"[LOTE] {n}/{total} {r['nivel']} v{r['version']} g{r['generation_index']} "
+        f"{r['status']} {r['segundos']:.2f}s asignados={r['asignados']} fallidos={r['fallidos']}"
+    )
+
+
+def resumen_lote(resultados, total_s, procesos):
+    suma = sum(r["segundos"] for r in resultados)
+    return {
+        "trabajos": len(resultados),
+        "procesos": procesos,
+        "total_s": round(total_s, 3),
+        "suma_trabajos_s": round(suma, 3),
+        "trabajos_por_min": round(60.0 * len(resultados) / total_s, 2) if total_s > 0 else 0.0,
+        "aceleracion": round(suma / total_s, 2) if total_s > 0 else 0.0,
+        "por_status": {s: sum(1 for r in resultados if r["status"] == s) for s in {r["status"] for r in resultados}},
+    }
+
+
+# --- Salidas ---
+
+def guardar_en_archivos(resultados, resumen, carpeta):
+    os.makedirs(carpeta, exist_ok=True)
+    for r in resultados:
+        nombre = f"{r['nivel'].lower()}_v{r['version']}_g{r['generation_index']}.json"
+        with open(os.path.join(carpeta, nombre), "w", encoding="utf-8") as f:
+            json.dump(r, f, ensure_ascii=False)
+    with open(os.path.join(carpeta, "resumen.json"), "w", encoding="utf-8") as f:
+        json.dump(resumen, f, indent=2, ensure_ascii=False)
+
+
+def guardar_en_supabase(sb, resultados, escribir_horarios=False):
+    """
+    Cada generación va a horario_generaciones (clave nivel, versión, índice),
+    con el horario empaquetado (codec_horario.a_almacenamiento, que guarda
+    también el grado de cada columna) en vez de la lista anidada.
+    Con escribir_horarios, la generación 1 de cada instancia además se guarda
+    en 'horarios' con un número nuevo, por diferencias y con su fila en
+    horario_versiones, como hace el endpoint.
+    """
+    filas = [
+        {
+            "nivel": r["nivel"],
+            "version_num": r["version"],
+            "generation_index": r["generation_index"],
+            "horario": a_almacenamiento(r["horario"], r["grados"], FORMATO_ALMACENAMIENTO),
+        }
+        for r in resultados
+        if r["registros"]
+    ]
+    if filas:
+        sb.table("horario_generaciones").upsert(filas, on_conflict="nivel,version_num,generation_index").execute()
+        print(f"[LOTE] horario_generaciones: {len(filas)} filas")
+    if not escribir_horarios:
+        return
+    for r in resultados:
+        if r["generation_index"] != 1 or not r["registros"]:
+            continue
+        anterior = ultimo_numero_horario(sb, r["nivel"])
+        nueva_version = (anterior or 0) + 1
+        registros = [dict(reg, version_num=nueva_version) for reg in r["registros"]]
+        guardar_cambios(sb, registros, r["nivel"], nueva_version, anterior)
+
+
+def _cliente_supabase():
+    try:
+        return obtener_supabase()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generación de horarios por lotes")
+    parser.add_argument("--entrada", help="exportación JSON con las instancias")
+    parser.add_argument("--exportar", help="descarga las instancias desde Supabase a este archivo y termina")
+    parser.add_argument("--niveles", default=",".join(NIVELES))
+    parser.add_argument("--versiones", help="lista separada por coma (default: todas)")
+    parser.add_argument("--generaciones", type=int, default=1, help=f"horarios por instancia (1..{MAX_GENERACIONES})")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, default=1, help="num_search_workers de cada trabajo")
+    parser.add_argument("--preset", help="preset de configuracion_solver")
+    parser.add_argument("--max-time", type=float, default=30.0)
+    parser.add_argument("--salida", help="carpeta para los resultados en JSON")
+    parser.add_argument("--supabase", action="store_true", help="guarda en horario_generaciones")
+    parser.add_argument("--horarios", action="store_true", help="con --supabase, guarda la generacion 1 en 'horarios'")
+    args = parser.parse_args()
+
+    niveles = args.niveles.split(",")
+    versiones = [int(v) for v in args.versiones.split(",")] if args.versiones else None
+
+    if args.exportar:
+        export = exportar_desde_supabase(_cliente_supabase(), niveles, versiones)
+        with open(args.exportar, "w", encoding="utf-8") as f:
+            json.dump(export, f, ensure_ascii=False)
+        print(f"[LOTE] {len(export['instancias'])} instancias exportadas a {args.exportar}")
+        return
+    if not args.entrada:
+        parser.error("falta --entrada (o --exportar)")
+
+    with open(args.entrada, encoding="utf-8") as f:
+        instancias = [
+            i for i in json.load(f)["instancias"]
+            if i["nivel"] in niveles and (not versiones or int(i["version"]) in versiones)
+        ]
+    opciones = {"max_time_in_seconds": args.max_time}
+    if args.preset:
+        opciones["preset"] = args.preset
+    trabajos = armar_trabajos(instancias, args.generaciones, opciones, workers_por_trabajo=args.workers)
+    print(f"[LOTE] {len(trabajos)} trabajos en {args.procesos} procesos")
+
+    resultados, resumen = correr_lote(trabajos, procesos=args.procesos)
+    print("[LOTE] resumen:", json.dumps(resumen, ensure_ascii=False))
+
+    if args.salida:
+        guardar_en_archivos(resultados, resumen, args.salida)
+    if args.supabase:
+        guardar_en_supabase(_cliente_supabase(), resultados, escribir_horarios=args.horarios)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# gunicorn.conf.py
+#
+# gunicorn lo lee automáticamente desde el directorio de trabajo (Procfile y
+# Dockerfile arrancan en esta carpeta).
+#
+# Con preload, OR-Tools se importa una sola vez en el master y los workers lo
+# heredan por fork. El cliente de Supabase se crea en cada worker después del
+# fork (sus conexiones no deben compartirse entre procesos). Lo mismo los
+# hilos de pre-generación: se arrancan en cada worker, no en el master.
+
+import os
+import shutil
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# asgi:app corre sobre uvicorn: los streams SSE son async y no ocupan un
+# worker cada uno. Para volver a WSGI: GUNICORN_WORKER_CLASS=sync y app:app.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+
+# Métricas multiproceso (telemetria.py): cada worker escribe en este
+# directorio y /metrics agrega. Se limpia al arrancar, antes de importar la app.
+_metricas_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/horario-metricas")
+shutil.rmtree(_metricas_dir, ignore_errors=True)
+os.makedirs(_metricas_dir, exist_ok=True)
+
+
+def on_starting(server):
+    if preload_app:
+        from arranque import calentar_solver
+
+        calentar_solver()
+
+
+def post_worker_init(worker):
+    from arranque import calentar_en_segundo_plano
+
+    calentar_en_segundo_plano()
+
+    from app import iniciar_pregeneracion
+
+    iniciar_pregeneracion()
+
+
+def child_exit(server, worker):
+    from telemetria import proceso_terminado
+
+    proceso_terminado(worker.pid)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# indice_horario.py
+#
+# Índices invertidos de un horario generado (docente -> clases, curso -> celdas,
+# grado -> bloques libres). Se construyen una vez por versión y se cachean, así
+# las vistas por docente no recorren todo el horario en cada consulta.
+
+import threading
+from collections import OrderedDict
+
+from salida_horario import DIAS_BD, NUM_DIAS
+from telemetria import contar_cache
+
+MAX_INDICES = 32
+
+_indices = OrderedDict()
+_indices_lock = threading.Lock()
+
+
+def construir_indice(registros, num_bloques=None, grados=None, dias=None):
+    """
+    registros: filas de 'horarios' ({docente_id, curso_id, grado_id, dia, bloque, ...}).
+    num_bloques / grados / dias: si no se pasan se infieren de las filas
+    (dias: lunes a viernes, más sábado/domingo si aparecen).
+    """
+    por_docente = {}
+    por_curso = {}
+    ocupadas = {}
+    max_bloque = -1
+    for r in registros:
+        fila = {
+            "dia": r["dia"],
+            "bloque": int(r["bloque"]),
+            "curso_id": int(r["curso_id"]),
+            "grado_id": int(r["grado_id"]),
+            "version_num": r.get("version_num"),
+        }
+        por_docente.setdefault(int(r["docente_id"]), []).append(fila)
+        por_curso.setdefault(fila["curso_id"], []).append(fila)
+        ocupadas.setdefault(fila["grado_id"], set()).add((fila["dia"], fila["bloque"]))
+        max_bloque = max(max_bloque, fila["bloque"])
+
+    if num_bloques is None:
+        num_bloques = max_bloque + 1
+    if dias is None:
+        ultimo = max((DIAS_BD.index(dia) for dia, _ in set().union(*ocupadas.values()) if dia in DIAS_BD), default=0)
+        dias = DIAS_BD[:max(NUM_DIAS, ultimo + 1)]
+    grados = sorted(set(grados or []) | set(ocupadas))
+    orden_dia = {dia: i for i, dia in enumerate(dias)}
+
+    def _orden(f):
+        return (orden_dia.get(f["dia"], len(dias)), f["bloque"], f["grado_id"])
+
+    for filas in por_docente.values():
+        filas.sort(key=_orden)
+    for filas in por_curso.values():
+        filas.sort(key=_orden)
+
+    libres = {
+        g: [
+            {"dia": dia, "bloque": b}
+            for dia in dias
+            for b in range(num_bloques)
+            if (dia, b) not in ocupadas.get(g, ())
+        ]
+        for g in grados
+    }
+    return {"docentes": por_docente, "cursos": por_curso, "grados_libres": libres}
+
+
+def guardar_indice(nivel, version_num, indice):
+    with _indices_lock:
+        _indices[(nivel, int(version_num))] = indice
+        _indices.move_to_end((nivel, int(version_num)))
+        while len(_indices) > MAX_INDICES:
+            _indices.popitem(last=False)
+
+
+def obtener_indice(nivel, version_num, cargar=None):
+    """
+    Devuelve el índice cacheado; si no está y se pasa cargar(), lo construye
+    con las filas que devuelva y lo guarda. Sin filas no se guarda: la
+    versión puede aparecer después.
+    """
+    clave = (nivel, int(version_num))
+    with _indices_lock:
+        indice = _indices.get(clave)
+        if indice is not None:
+            _indices.move_to_end(clave)
+    contar_cache("indice", indice is not None)
+    if indice is not None:
+        return indice
+    if cargar is None:
+        return None
+    registros = cargar()
+    indice = construir_indice(registros)
+    if registros:
+        guardar_indice(nivel, version_num, indice)
+    return indice
+
+
+def invalidar_indice(nivel, version_num=None):
+    with _indices_lock:
+        for clave in [k for k in _indices if k[0] == nivel and (version_num is None or k[1] == int(version_num))]:
+            _indices.pop(clave, None)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# optimizacion_etapas.py
+#
+# Calidad del horario por etapas lexicográficas (opciones_solver "etapas").
+# El modelo no tiene objetivo: cualquier horario factible sirve. Con etapas,
+# después de la solución factible se vuelve a resolver el mismo modelo una
+# vez por objetivo, en orden:
+#   huecos_docentes  horas libres de un docente entre su primera y su última
+#                    clase del día
+#   balance_diario   suma, por docente, de su día más cargado
+# Cada etapa acota los objetivos anteriores a lo ya logrado, parte de la
+# solución anterior como pista y tiene su propio límite de tiempo
+# (tiempo_etapa_s). Si una etapa no encuentra nada se conserva la solución
+# previa: la calidad nunca empeora y la latencia total queda acotada por
+# max_time_in_seconds + etapas * tiempo_etapa_s.
+
+import time
+
+import numpy as np
+
+from configuracion_solver import aplicar_parametros
+from salida_horario import extraer_valores
+from telemetria import solver_activo
+
+FACTIBLES = ("OPTIMAL", "FEASIBLE")
+
+
+def _ocupacion(model, x_idx, reqs_por_docente):
+    """{docente: [[expresión 0/1 por bloque] por día]}: suma de las x de sus asignaciones."""
+    _, num_dias, num_bloques = x_idx.shape
+    return {
+        doc: [
+            [sum(model.GetBoolVarFromProtoIndex(int(x_idx[idx, d, b])) for idx in indices) for b in range(num_bloques)]
+            for d in range(num_dias)
+        ]
+        for doc, indices in reqs_por_docente.items()
+    }
+
+
+def huecos_docentes(model, x_idx, reqs_por_docente):
+    """
+    Bloque b es hueco si el docente está libre en b pero dicta antes y
+    después ese día. antes/despues solo se acotan por abajo: al minimizar
+    quedan en el OR exacto.
+    """
+    huecos = []
+    for doc, dias in _ocupacion(model, x_idx, reqs_por_docente).items():
+        for d, ocupado in enumerate(dias):
+            nb = len(ocupado)
+            antes = [None] + [model.NewBoolVar(f"antes_{doc}_{d}_{b}") for b in range(1, nb)]
+            despues = [model.NewBoolVar(f"despues_{doc}_{d}_{b}") for b in range(nb - 1)] + [None]
+            for b in range(1, nb):
+                model.Add(antes[b] >= ocupado[b - 1])
+                if b > 1:
+                    model.Add(antes[b] >= antes[b - 1])
+            for b in range(nb - 2, -1, -1):
+                model.Add(despues[b] >= ocupado[b + 1])
+                if b < nb - 2:
+                    model.Add(despues[b] >= despues[b + 1])
+            for b in range(1, nb - 1):
+                hueco = model.NewBoolVar(f"hueco_{doc}_{d}_{b}")
+                model.Add(hueco >= antes[b] + despues[b] - ocupado[b] - 1)
+                huecos.append(hueco)
+    return sum(huecos)
+
+
+def balance_diario(model, x_idx, reqs_por_docente):
+    """Suma de la carga del día más cargado de cada docente."""
+    picos = []
+    for doc, dias in _ocupacion(model, x_idx, reqs_por_docente).items():
+        pico = model.NewIntVar(0, len(dias[0]), f"pico_{doc}")
+        for ocupado in dias:
+            model.Add(pico >= sum(ocupado))
+        picos.append(pico)
+    return sum(picos)
+
+
+OBJETIVOS = {"huecos_docentes": huecos_docentes, "balance_diario": balance_diario}
+
+
+def medir(valores, map_asignaciones):
+    """Los mismos objetivos sobre una solución (asignacion x dia x bloque), para el informe."""
+    docentes = sorted({req["docente"] for req in map_asignaciones})
+    if not docentes:
+        return {nombre: 0 for nombre in OBJETIVOS}
+    pos = {doc: i for i, doc in enumerate(docentes)}
+    fila = np.array([pos[req["docente"]] for req in map_asignaciones])
+    ocupacion = np.zeros((len(docentes),) + valores.shape[1:], dtype=np.int32)
+    np.add.at(ocupacion, fila, valores)
+    ocupado = ocupacion > 0
+    nb = ocupado.shape[2]
+    hay = ocupado.any(axis=2)
+    primero = ocupado.argmax(axis=2)
+    ultimo = nb - 1 - ocupado[:, :, ::-1].argmax(axis=2)
+    huecos = np.where(hay, ultimo - primero + 1 - ocupado.sum(axis=2), 0)
+    return {
+        "huecos_docentes": int(huecos.sum()),
+        "balance_diario": int(ocupacion.sum(axis=2).max(axis=1).sum()),
+    }
+
+
+def optimizar_por_etapas(model, solver, x_idx, map_asignaciones, reqs_por_docente, opciones, conservar=None):
+    """
+    solver: el que ya resolvió la etapa de factibilidad (con solución).
+    conservar: expresión a maximizar que ya tiene el modelo (celdas de la
+    pista, aplicar_pista); es el primer nivel del orden lexicográfico.
+    Devuelve (solver con la mejor solución, informe por etapa).
+    """
+    from ortools.sat.python import cp_model
+
+    if conservar is not None:
+        model.Add(conservar >= int(round(solver.ObjectiveValue())))
+    informe = []
+    mejor = solver
+    medidas = medir(extraer_valores(mejor, x_idx), map_asignaciones)
+    for nombre in opciones["etapas"]:
+        expresion = OBJETIVOS[nombre](model, x_idx, reqs_por_docente)
+        # Nunca peor que la solución actual, aunque la etapa no la mejore
+        inicial = medidas[nombre]
+        model.Add(expresion <= inicial)
+        model.Minimize(expresion)
+        # Pista: la mejor solución hasta ahora (las x definen el resto)
+        model.ClearHints()
+        hint = model.Proto().solution_hint
+        valores = extraer_valores(mejor, x_idx)
+        hint.vars.extend(int(i) for i in x_idx.ravel())
+        hint.values.extend(int(v) for v in valores.ravel())
+
+        etapa = cp_model.CpSolver()
+        aplicar_parametros(etapa, dict(opciones, max_time_in_seconds=opciones["tiempo_etapa_s"]))
+        t0 = time.perf_counter()
+        with solver_activo(opciones["num_search_workers"]):
+            status = etapa.StatusName(etapa.Solve(model))
+        fila = {"etapa": nombre, "status": status, "inicial": inicial, "segundos": round(time.perf_counter() - t0, 3)}
+        if status in FACTIBLES:
+            mejor = etapa
+            medidas = medir(extraer_valores(mejor, x_idx), map_asignaciones)
+            # Las etapas siguientes no pueden empeorar este objetivo
+            model.Add(expresion <= medidas[nombre])
+        fila["valor"] = medidas[nombre]
+        informe.append(fila)
+        print(f"[ETAPAS] {nombre}: {fila}")
+    return mejor, informe
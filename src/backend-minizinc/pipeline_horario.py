@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+# pipeline_horario.py
+#
+# Pipeline único de generación (cargar -> validar -> prechequeo -> resolver
+# -> aulas -> persistir -> renderizar). Lo usan tanto el endpoint síncrono como el de
+# jobs con progreso, así cada mejora se aplica a ambos caminos.
+
+import hashlib
+import json
+import time
+
+from asignacion_aulas import asignar_aulas, cargar_aulas
+from configuracion_solver import resolver_opciones
+from disponibilidad import BITS_POR_DIA, bit, indice_dia, mascaras_disponibilidad
+from generador_python import generar_horario, pista_de_resultado
+from indice_horario import construir_indice, guardar_indice
+from pregeneracion import huella_instancia, tomar_pregenerado
+from salida_horario import grados_de_nivel, horario_lista as construir_horario_lista, registros_horarios
+from validacion_horario import IndiceConflictos, ReglasHorario, guardar_indice_conflictos
+from versiones_horario import (
+    cargar_celdas_actuales,
+    cargar_version,
+    cargar_version_guardada,
+    celdas_de_registros,
+    escribir_cambios,
+    guardar_version,
+    registros_de_celdas,
+)
+
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+NUM_DIAS = 5  # default; el request puede pedir otro (num_dias, p.ej. 6 con sábado)
+NUM_BLOQUES = 8  # default; en runtime se ajusta por version
+
+ETAPAS = ("cargar", "validar", "prechequeo", "resolver", "aulas", "persistir", "renderizar")
+# Re-solves con cortes cuando la asignación de aulas encuentra choques
+MAX_RONDAS_AULAS = 2
+
+# Progreso (%) reportado al iniciar cada etapa
+_PROGRESO_ETAPA = {
+    "cargar": (2, "preparando"),
+    "validar": (4, "validando"),
+    "prechequeo": (6, "prechequeo"),
+    "resolver": (10, "resolviendo"),
+    "aulas": (90, "asignando aulas"),
+    "persistir": (92, "guardando"),
+    "renderizar": (98, "finalizando"),
+}
+
+
+def _num_bloques_from_version(version):
+    try:
+        return 7 if int(version) == 1 else 8
+    except Exception:
+        return NUM_BLOQUES
+
+
+def ultimo_numero_horario(sb, nivel):
+    """Versión más alta guardada en 'horarios' para el nivel, o None."""
+    resp = (
+        sb.table("horarios")
+        .select("version_num")
+        .eq("nivel", nivel)
+        .not_.is_("version_num", "null")
+        .order("version_num", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return int(resp.data[0]["version_num"]) if resp.data else None
+
+
+def obtener_nuevo_numero_horario(sb, nivel: str) -> int:
+    """
+    Devuelve un número incremental de versión.
+    OJO: por el UNIQUE (grado_id, dia, bloque) no se guardan múltiples versiones en paralelo.
+    """
+    return (ultimo_numero_horario(sb, nivel) or 0) + 1
+
+
+def construir_restricciones_disponibilidad(sb, nivel):
+    rows = (
+        sb.table("restricciones_docente")
+        .select("docente_id,dia,bloque")
+        .eq("nivel", nivel)
+        .execute()
+        .data
+        or []
+    )
+
+    # Se arma directamente la máscara de bits por docente (ver disponibilidad.py)
+    bloque_one_based = any(int(r.get("bloque", 0)) == 1 for r in rows)
+    disponibilidad = {}
+    for r in rows:
+        try:
+            doc = str(r.get("docente_id"))
+            d = indice_dia(r.get("dia"))
+            b = int(r.get("bloque"))
+        except Exception:
+            continue
+        b0 = b - 1 if bloque_one_based else b
+        mascara = disponibilidad.setdefault(doc, 0)
+        if d is not None and 0 <= b0 < BITS_POR_DIA:
+            disponibilidad[doc] = mascara | bit(d, b0)
+
+    return {"disponibilidad": disponibilidad}
+
+
+def cargar_registros_horario(sb, nivel, version_num):
+    """
+    Filas de una versión. 'horarios' solo tiene la última (las celdas sin
+    cambios pasan a la nueva versión): las anteriores se reconstruyen desde
+    horario_versiones (base + deltas).
+    """
+    return registros_de_celdas(cargar_version(sb, nivel, version_num), nivel, version_num)
+
+
+def cargar_patrones_division(sb, nivel, version):
+    try:
+        rows = (
+            sb.table("horas_curso_grado_division")
+            .select("curso_id,grado_id,patron")
+            .eq("nivel", nivel)
+            .eq("version_num", version)
+            .execute()
+            .data
+            or []
+        )
+    except Exception:
+        rows = []
+    patrones = {}
+    for r in rows:
+        try:
+            curso_id = int(r.get("curso_id"))
+            grado_id = int(r.get("grado_id"))
+            patron_raw = str(r.get("patron") or "").strip()
+            if not patron_raw:
+                continue
+            partes = [int(x) for x in patron_raw.split("+") if x.strip().isdigit()]
+            if not partes:
+                continue
+            patrones[f"{curso_id}-{grado_id}"] = partes
+        except Exception:
+            continue
+    return patrones
+
+
+def cargar_reglas(sb, nivel):
+    """Overrides de reglas del nivel {regla_key: bool}; sin override rige el default del generador."""
+    try:
+        rows = sb.table("restricciones_overrides").select("regla_key,aplica").eq("nivel", nivel).execute().data or []
+    except Exception:
+        rows = []
+    return {r["regla_key"]: bool(r.get("aplica")) for r in rows if r.get("regla_key")}
+
+
+def cargar_instancia(sb, nivel, version, num_dias=NUM_DIAS):
+    """
+    Entrada completa del generador para (nivel, versión) leída desde la BD,
+    con los mismos filtros que aplica el front antes de llamar al endpoint.
+    La BD no guarda los días de la semana: num_dias viene del request.
+    """
+    version = int(version)
+    docentes = (
+        sb.table("docentes")
+        .select("id, nombre, apellido, tipo_profesor, jornada_total, aula_id, nivel, activo, version_num")
+        .eq("activo", True)
+        .eq("nivel", nivel)
+        .eq("version_num", version)
+        .execute()
+        .data
+        or []
+    )
+    horas_rows = (
+        sb.table("horas_curso_grado")
+        .select("curso_id,grado_id,horas")
+        .eq("nivel", nivel)
+        .eq("version_num", version)
+        .execute()
+        .data
+        or []
+    )
+    horas_curso_grado = {}
+    for h in horas_rows:
+        horas_curso_grado.setdefault(str(h["curso_id"]), {})[str(h["grado_id"])] = h["horas"]
+    # Grados (con sus secciones) del nivel: los que tienen horas cargadas
+    grados = grados_de_nivel(nivel, {int(h["grado_id"]) for h in horas_rows})
+    en_nivel = set(grados)
+    asignaciones = {}
+    for a in sb.table("asignaciones").select("docente_id,curso_id,grado_id").execute().data or []:
+        if int(a["grado_id"]) in en_nivel:
+            asignaciones.setdefault(str(a["curso_id"]), {})[str(a["grado_id"])] = {"docente_id": a["docente_id"]}
+    restricciones = construir_restricciones_disponibilidad(sb, nivel)
+    restricciones["reglas"] = cargar_reglas(sb, nivel)
+    return {
+        "nivel": nivel,
+        "version": version,
+        "docentes": docentes,
+        "asignaciones": asignaciones,
+        "restricciones": restricciones,
+        "horas_curso_grado": horas_curso_grado,
+        "patrones_division": cargar_patrones_division(sb, nivel, version),
+        "grados": grados,
+        "num_dias": int(num_dias),
+    }
+
+
+def guardar_registros(sb, registros, nivel, version_num, overwrite=False):
+    """Persistencia robusta evitando duplicados en 'horarios'."""
+    if not registros:
+        print("[WARN] No se generaron registros (todo vacio).")
+        return
+    # Si quieres intentar UPSERT primero (cuando tu UNIQUE sea (grado_id, dia, bloque)):
+    CONFLICT_COLS = ["grado_id", "dia", "bloque"]  # Si tu UNIQUE incluye nivel, agrega "nivel" aqui.
+
+    if overwrite:
+        # Estrategia clara y consistente: borra e inserta todo el nivel
+        sb.table("horarios").delete().eq("nivel", nivel).eq("version_num", version_num).execute()
+        sb.table("horarios").insert(registros).execute()
+        print("[OK] Horario sobrescrito para " + str(nivel) + ". Filas: " + str(len(registros)))
+        return
+    # Intenta UPSERT; si tu indice no coincide (42P10) o hay 23505 por otro UNIQUE, cae a delete+insert
+    try:
+        sb.table("horarios").upsert(registros, on_conflict=CONFLICT_COLS).execute()
+        print("[OK] Horario cargado por UPSERT. Filas: " + str(len(registros)))
+    except Exception as e:
+        msg = str(e)
+        if "42P10" in msg or "23505" in msg:
+            print("[WARN] Fallback a delete+insert por conflicto de indice unico.")
+            sb.table("horarios").delete().eq("nivel", nivel).eq("version_num", version_num).execute()
+            sb.table("horarios").insert(registros).execute()
+        else:
+            raise
+
+
+def guardar_cambios(sb, registros, nivel, nueva_version, anterior, overwrite=False):
+    """
+    Escribe en 'horarios' solo las celdas que cambiaron respecto de 'anterior'
+    y registra nueva_version en 'horario_versiones' como delta.
+    Devuelve False si no había nada que guardar.
+    """
+    if not registros:
+        print("[WARN] No se generaron registros (todo vacio).")
+        return False
+    nuevas = celdas_de_registros(registros)
+    try:
+        actuales = cargar_celdas_actuales(sb, nivel, anterior) if anterior else {}
+        escribir_cambios(sb, nivel, nueva_version, actuales, nuevas, anterior=anterior, overwrite=overwrite)
+    except Exception as e:
+        print("[WARN] Escritura por diferencias fallo, se guarda completo:", repr(e))
+        guardar_registros(sb, registros, nivel, nueva_version, overwrite=overwrite)
+    try:
+        celdas_anterior = cargar_version_guardada(sb, nivel, anterior) if anterior else None
+        guardar_version(sb, nivel, nueva_version, anterior, celdas_anterior, nuevas)
+    except Exception as e:
+        print("[WARN] No se pudo registrar la version en horario_versiones:", repr(e))
+    return True
+
+
+def avisos_capacidad(asignaciones, horas_curso_grado, num_bloques, num_dias=NUM_DIAS):
+    """Docentes con más horas requeridas que celdas en la semana."""
+    capacidad = num_dias * num_bloques
+    horas_por_docente = {}
+    for curso_id, grados in asignaciones.items():
+        for grado_id, datos in (grados or {}).items():
+            doc = (datos or {}).get("docente_id")
+            try:
+                horas = int(horas_curso_grado.get(str(curso_id), {}).get(str(grado_id), 0))
+            except Exception:
+                horas = 0
+            if doc and horas > 0:
+                horas_por_docente[doc] = horas_por_docente.get(doc, 0) + horas
+    return [
+        f"Docente {doc}: {horas} horas requeridas > {capacidad} bloques semanales"
+        for doc, horas in horas_por_docente.items()
+        if horas > capacidad
+    ]
+
+
+class PipelineGeneracion:
+    """
+    Una ejecución de generación de horario.
+
+    Cada etapa guarda su duración en self.tiempos. Los hooks reciben
+    (evento, etapa, pipeline) con evento "inicio" o "fin".
+    """
+
+    def __init__(self, sb, data, progress_callback=None, hooks=None):
+        data = data or {}
+        self.sb = sb
+        self.docentes = data.get("docentes", [])
+        self.asignaciones = data.get("asignaciones", {})
+        self.restricciones = data.get("restricciones", {})
+        self.horas_curso_grado = data.get("horas_curso_grado", {})
+        self.nivel = data.get("nivel", "Secundaria")
+        self.overwrite = bool(data.get("overwrite", False))  # por defecto NO sobrescribe
+        self.version = data.get("version") or data.get("version_num") or 1
+        self.num_bloques = _num_bloques_from_version(self.version)
+        self.num_dias = data.get("num_dias") or NUM_DIAS
+        # Grados/secciones en el orden de las columnas; sin lista, los del resultado
+        self.grados = data.get("grados")
+        self.opciones_solver = data.get("opciones_solver") or {}
+        # Aulas del request; si no vienen se leen de la tabla 'aulas'
+        self.aulas = data.get("aulas")
+
+        self.progress_callback = progress_callback
+        self.hooks = list(hooks or [])
+        self.tiempos = {}
+        self.avisos = []
+
+        self.patrones_division = {}
+        self.huella = None
+        self.pregenerado = False
+        self.resultado = None
+        self.asignacion_aulas = None
+        self.nueva_version = None
+        self.registros = []
+        self.payload = None
+
+    # --- Infraestructura ---
+
+    def faltan_datos(self):
+        return not self.docentes or not self.asignaciones or not self.horas_curso_grado
+
+    def clave(self):
+        """
+        Clave de single-flight: huella de la entrada tal como llegó, más lo
+        que la huella del modelo no ve pero cambia el resultado (docentes con
+        su aula, columnas de grados, aulas) y overwrite.
+        None si la entrada no se puede normalizar (validar dará el error).
+        """
+        try:
+            huella = huella_instancia(
+                self.asignaciones, self.restricciones, self.horas_curso_grado,
+                self.nivel, self.version, None, self.opciones_solver, self.num_dias,
+            )
+            salida = json.dumps(
+                {
+                    "docentes": sorted(self.docentes, key=lambda d: str(d.get("id"))),
+                    "grados": self.grados,
+                    "aulas": self.aulas,
+                },
+                sort_keys=True,
+                default=str,
+            )
+        except Exception:
+            return None
+        extra = hashlib.sha256(salida.encode("utf-8")).hexdigest()[:16]
+        return f"{huella}:{extra}:{int(self.overwrite)}"
+
+    def _progreso(self, pct, stage=""):
+        if self.progress_callback:
+            self.progress_callback(pct, stage)
+
+    def _emitir(self, evento, etapa):
+        for hook in self.hooks:
+            hook(evento, etapa, self)
+
+    def _correr_etapa(self, etapa):
+        pct, stage = _PROGRESO_ETAPA[etapa]
+        self._progreso(pct, stage)
+        self._emitir("inicio", etapa)
+        t0 = time.perf_counter()
+        getattr(self, "_etapa_" + etapa)()
+        self.tiempos[etapa] = round(time.perf_counter() - t0, 4)
+        self._emitir("fin", etapa)
+
+    def ejecutar(self):
+        for etapa in ETAPAS:
+            self._correr_etapa(etapa)
+        print("[PIPELINE] tiempos por etapa:", self.tiempos)
+        return self.payload
+
+    def preparar(self):
+        """Solo cargar, validar y prechequeo: la entrada lista para resolver (escenarios.py)."""
+        for etapa in ETAPAS[:ETAPAS.index("resolver")]:
+            self._correr_etapa(etapa)
+        return self
+
+    # --- Etapas ---
+
+    def _etapa_cargar(self):
+        print("[INFO] Generando horario para nivel: " + str(self.nivel))
+        restricciones = self.restricciones or {}
+        print("[API][DEBUG] restricciones keys:", restricciones.keys())
+        print("[API][DEBUG] tiene disponibilidad?:", "disponibilidad" in restricciones)
+
+        if not restricciones.get("disponibilidad"):
+            # Solo la disponibilidad viene de la BD; el resto (reglas) es del request
+            self.restricciones = dict(restricciones, **construir_restricciones_disponibilidad(self.sb, self.nivel))
+            print("[API][DEBUG] disponibilidad cargada desde BD. docentes:", list(self.restricciones.get("disponibilidad", {}).keys())[:5])
+        else:
+            # Una sola conversión a máscaras (el request puede traer dicts, base64 o enteros)
+            mascaras = mascaras_disponibilidad(restricciones["disponibilidad"])
+            self.restricciones = dict(restricciones, disponibilidad=mascaras)
+            print("[API][DEBUG] disponibilidad docentes:", list(mascaras.keys())[:5])
+        self.patrones_division = cargar_patrones_division(self.sb, self.nivel, self.version)
+
+    def _etapa_validar(self):
+        if self.faltan_datos():
+            raise ValueError("Faltan datos requeridos para generar el horario.")
+        try:
+            int(self.version)
+        except Exception:
+            raise ValueError(f"Version invalida: {self.version!r}")
+        if not isinstance(self.asignaciones, dict) or not isinstance(self.horas_curso_grado, dict):
+            raise ValueError("asignaciones y horas_curso_grado deben ser objetos {curso: {grado: ...}}.")
+        try:
+            self.num_dias = int(self.num_dias)
+            if self.grados is not None:
+                self.grados = [int(g) for g in self.grados]
+        except (TypeError, ValueError):
+            raise ValueError("num_dias debe ser un entero y grados una lista de ids.")
+        if not 1 <= self.num_dias <= len(DIAS):
+            raise ValueError(f"num_dias fuera de rango (1-{len(DIAS)}): {self.num_dias}")
+        # Preset desconocido -> error antes de construir el modelo
+        resolver_opciones(self.opciones_solver)
+
+    def _etapa_prechequeo(self):
+        # Chequeo barato previo al solver: horas de cada docente vs. celdas de la semana.
+        # No bloquea (el solver decide), pero deja avisos para el log y la respuesta.
+        self.avisos.extend(
+            avisos_capacidad(self.asignaciones, self.horas_curso_grado, self.num_bloques, self.num_dias)
+        )
+        for aviso in self.avisos:
+            print("[PRECHEQUEO]", aviso)
+
+    def _etapa_resolver(self):
+        # Si la pre-generación ya resolvió exactamente esta entrada, se usa tal cual
+        self.huella = huella_instancia(
+            self.asignaciones, self.restricciones, self.horas_curso_grado,
+            self.nivel, self.version, self.patrones_division, self.opciones_solver, self.num_dias,
+        )
+        pregenerado = tomar_pregenerado(self.sb, self.huella)
+        if pregenerado is not None:
+            print("[PREGEN] usando horario pre-generado", self.huella[:12])
+            self.pregenerado = True
+            self.resultado = pregenerado
+            return
+        self.resultado = generar_horario(
+            self.docentes,
+            self.asignaciones,
+            self.restricciones,
+            self.horas_curso_grado,
+            nivel=self.nivel,
+            version=self.version,
+            patrones_division=self.patrones_division,
+            progress_callback=self.progress_callback,
+            opciones_solver=self.opciones_solver,
+            num_dias=self.num_dias,
+        )
+
+    def _etapa_aulas(self):
+        # Fase posterior al solver: aula por clase, celda por celda. Los choques
+        # vuelven como cortes y se re-resuelve partiendo del horario actual.
+        if self.aulas is None:
+            self.aulas = cargar_aulas(self.sb, self.nivel, self.version)
+        if not self.aulas or self.resultado.get("status") not in ("OPTIMAL", "FEASIBLE"):
+            return
+        cortes = []
+        self.asignacion_aulas = asignar_aulas(self.resultado, self.docentes, self.aulas)
+        for ronda in range(1, MAX_RONDAS_AULAS + 1):
+            if not self.asignacion_aulas["cortes"]:
+                break
+            cortes += self.asignacion_aulas["cortes"]
+            print(f"[AULAS] ronda {ronda}: re-resolviendo con {len(cortes)} cortes")
+            opciones = dict(
+                self.opciones_solver, motor="monolitico", cortes=cortes, pista=pista_de_resultado(self.resultado)
+            )
+            nuevo = generar_horario(
+                self.docentes,
+                self.asignaciones,
+                self.restricciones,
+                self.horas_curso_grado,
+                nivel=self.nivel,
+                version=self.version,
+                patrones_division=self.patrones_division,
+                opciones_solver=opciones,
+                num_dias=self.num_dias,
+            )
+            if nuevo.get("status") not in ("OPTIMAL", "FEASIBLE"):
+                print("[AULAS] sin solucion con los cortes; se conserva el horario anterior")
+                break
+            self.resultado = nuevo
+            self.asignacion_aulas = asignar_aulas(self.resultado, self.docentes, self.aulas)
+        for choque in self.asignacion_aulas["choques"]:
+            self.avisos.append(
+                f"Choque de aulas {choque['tipo']} en {DIAS[choque['dia']]} bloque {choque['bloque'] + 1}: "
+                f"{len(choque['sin_aula'])} clase(s) sin aula"
+            )
+
+    def _etapa_persistir(self):
+        anterior = ultimo_numero_horario(self.sb, self.nivel)
+        self.nueva_version = (anterior or 0) + 1
+        # Prepara registros para tabla 'horarios' (derivados de la matriz del resultado)
+        self.registros = registros_horarios(self.resultado, self.nivel, self.nueva_version, dias=DIAS)
+        if not guardar_cambios(self.sb, self.registros, self.nivel, self.nueva_version, anterior, self.overwrite):
+            # Nada persistido: otro proceso puede crear esta versión; no cachear vistas vacías
+            return
+        # Índices por docente/curso/grado de esta versión, listos para las vistas
+        guardar_indice(
+            self.nivel,
+            self.nueva_version,
+            construir_indice(self.registros, self.num_bloques, self.grados_salida(), dias=DIAS[:self.num_dias]),
+        )
+        # Y el índice de conflictos para validar ediciones manuales (/validar-movimiento)
+        reglas = ReglasHorario(
+            self.num_bloques,
+            num_dias=self.num_dias,
+            nivel=self.nivel,
+            version=self.version,
+            disponibilidad=self.restricciones.get("disponibilidad"),
+            horas_curso_grado=self.horas_curso_grado,
+            patrones_division=self.patrones_division,
+            reglas=self.restricciones.get("reglas"),
+        )
+        guardar_indice_conflictos(
+            self.nivel, self.nueva_version, self.version,
+            IndiceConflictos(celdas_de_registros(self.registros), reglas),
+        )
+
+    def grados_salida(self):
+        """Columnas del horario: la lista del request o el eje de grados del resultado."""
+        return self.grados if self.grados is not None else list(self.resultado["grados"])
+
+    def _etapa_renderizar(self):
+        # Devuelve matriz para el front (num_dias x NUM_BLOQUES x grados); "grados" da el id de cada columna
+        grados = self.grados_salida()
+        self.payload = {
+            "horario": construir_horario_lista(self.resultado, grados),
+            "grados": grados,
+            "asignaciones_exitosas": self.resultado.get("asignaciones_exitosas", 0),
+            "asignaciones_fallidas": self.resultado.get("asignaciones_fallidas", 0),
+            "total_bloques_asignados": self.resultado.get("total_bloques_asignados", 0),
+            "version": self.nueva_version,
+            "avisos": self.avisos,
+            "tiempos": self.tiempos,
+            "pregenerado": self.pregenerado,
+        }
+        if self.asignacion_aulas is not None:
+            # Las aulas no tienen columna en 'horarios': solo viajan en la respuesta
+            self.payload["aulas"] = self.asignacion_aulas["asignadas"]
+            self.payload["choques_aulas"] = self.asignacion_aulas["choques"]
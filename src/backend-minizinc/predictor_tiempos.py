@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# predictor_tiempos.py
+#
+# Predictor del tiempo de resolución para dimensionar cada request: límite
+# de tiempo, núcleos y motor según el tamaño y la holgura de la instancia,
+# en vez de los 30 s / 8 núcleos fijos de configuracion_solver.DEFAULTS.
+#
+# - Cada generación registra sus características y lo observado (status,
+#   segundos) como una línea [SOLVER-STATS] en el log y, con
+#   HISTORIAL_SOLVER=ruta.jsonl, también en ese archivo.
+# - El modelo es una regresión lineal (ridge) sobre log(segundos); se
+#   entrena offline y se guarda en JSON (MODELO_TIEMPOS, por defecto
+#   modelo_tiempos.json junto a este archivo). Sin modelo entrenado se usan
+#   los defaults de siempre.
+# - Lo que el request fija explícitamente en opciones_solver no se toca;
+#   opciones_solver={"auto": false} lo desactiva.
+#
+# Reentrenar:
+#   python predictor_tiempos.py recolectar --salida historial.jsonl
+#   python predictor_tiempos.py entrenar historial.jsonl logs/app.log --salida modelo_tiempos.json
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from configuracion_solver import DEFAULTS, MOTORES
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+MODELO_DEFAULT = os.path.join(CARPETA, "modelo_tiempos.json")
+
+WORKERS_CANDIDATOS = (1, 2, 4, 8)
+LIMITE_MIN_S = float(os.getenv("LIMITE_MIN_S", "5"))
+LIMITE_MAX_S = float(os.getenv("LIMITE_MAX_S", "300"))
+# Sobre el cuantil alto de la predicción
+FACTOR_LIMITE = 1.5
+# Menos núcleos si la predicción empeora menos que esto (relativo o en
+# segundos): una instancia chica no justifica 8 núcleos por ahorrar 0.1 s
+TOLERANCIA_WORKERS = 1.15
+AHORRO_MIN_S = float(os.getenv("AHORRO_MIN_S", "1"))
+MARCA_LOG = "[SOLVER-STATS]"
+# Opciones que solo respeta el motor monolítico (solver_dos_fases las ignora):
+# con cualquiera de ellas el predictor no elige motor
+SOLO_MONOLITICO = ("pista", "etapas", "cortes")
+
+VARIABLES = (
+    "constante",
+    "log_asignaciones",
+    "log_horas",
+    "densidad",
+    "carga_max",
+    "log_patrones",
+    "version_2",
+    "log2_workers",
+    "log2_workers_x_tamano",
+    "dos_fases",
+)
+
+
+# --- Características de la instancia ---
+
+def caracteristicas(datos, patrones_division, version, nivel, num_bloques):
+    """Rasgos baratos de la instancia a partir de generador_python.normalizar_entrada."""
+    asignaciones = datos["map_asignaciones"]
+    docentes = {a["docente"] for a in asignaciones} | set(datos["docente_ids"])
+    celdas = datos["num_dias"] * num_bloques
+    bloqueos = datos["bloqueos_por_docente"]
+
+    horas_docente = {}
+    for a in asignaciones:
+        horas_docente[a["docente"]] = horas_docente.get(a["docente"], 0) + a["horas"]
+    # Peor docente: horas que dicta sobre celdas libres (>1 = infactible)
+    carga_max = 0.0
+    for doc, horas in horas_docente.items():
+        libres = celdas - bloqueos.get(doc, 0)
+        carga_max = max(carga_max, horas / libres if libres > 0 else 2.0)
+
+    patrones = sum(len(v) if isinstance(v, (list, dict)) else 1 for v in (patrones_division or {}).values())
+    return {
+        "asignaciones": len(asignaciones),
+        "docentes": len(docentes),
+        "grados": len({a["grado"] for a in asignaciones}),
+        "horas": datos["total_horas_requeridas"],
+        "densidad": round(1 - sum(bloqueos.values()) / (celdas * len(docentes)), 4) if docentes else 1.0,
+        "carga_max": round(carga_max, 4),
+        "patrones": patrones,
+        "version": int(version),
+        "nivel": nivel,
+    }
+
+
+def vector(rasgos, workers, motor):
+    return np.array([
+        1.0,
+        math.log1p(rasgos["asignaciones"]),
+        math.log1p(rasgos["horas"]),
+        float(rasgos["densidad"]),
+        min(float(rasgos["carga_max"]), 2.0),
+        math.log1p(rasgos["patrones"]),
+        float(int(rasgos["version"]) == 2),
+        math.log2(max(int(workers), 1)),
+        math.log2(max(int(workers), 1)) * math.log1p(rasgos["asignaciones"]),
+        float(motor == "dos_fases"),
+    ])
+
+
+# --- Historial ---
+
+def fila_historial(rasgos, opciones, resultado, segundos):
+    limite = float(opciones["max_time_in_seconds"])
+    status = resultado.get("status", "UNKNOWN")
+    return {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "caracteristicas": rasgos,
+        "motor": opciones["motor"],
+        "num_search_workers": int(opciones["num_search_workers"]),
+        "max_time_in_seconds": limite,
+        "auto": bool(opciones.get("auto")),
+        "status": status,
+        "segundos": round(segundos, 4),
+        # Cortada por el límite: el tiempo real es mayor que el observado
+        "censurada": status == "UNKNOWN" or segundos >= 0.95 * limite,
+    }
+
+
+_historial_lock = threading.Lock()
+
+
+def registrar_corrida(rasgos, opciones, resultado, segundos):
+    fila = fila_historial(rasgos, opciones, resultado, segundos)
+    print(MARCA_LOG, json.dumps(fila, ensure_ascii=False))
+    ruta = os.getenv("HISTORIAL_SOLVER")
+    if ruta:
+        try:
+            with _historial_lock, open(ruta, "a", encoding="utf-8") as f:
+                f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[WARN] No se pudo escribir el historial del solver: {e}")
+    return fila
+
+
+def leer_historial(rutas):
+    """Filas de archivos JSONL y de logs con líneas [SOLVER-STATS]."""
+    filas = []
+    for ruta in rutas:
+        with open(ruta, encoding="utf-8", errors="replace") as f:
+            for linea in f:
+                linea = linea.strip()
+                if MARCA_LOG in linea:
+                    linea = linea.split(MARCA_LOG, 1)[1].strip()
+                if not linea.startswith("{"):
+                    continue
+                try:
+                    fila = json.loads(linea)
+                except ValueError:
+                    continue
+                if "caracteristicas" in fila and "segundos" in fila:
+                    filas.append(fila)
+    return filas
+
+
+# --- Modelo ---
+
+def ajustar(filas, ridge=1e-2, iteraciones=5):
+    """
+    Ridge sobre log(segundos). Las corridas censuradas son cotas inferiores:
+    en cada iteración su objetivo sube a la predicción si esta las supera.
+    """
+    if len(filas) < len(VARIABLES):
+        raise ValueError(f"Se necesitan al menos {len(VARIABLES)} corridas para entrenar ({len(filas)} dadas)")
+    X = np.array([vector(f["caracteristicas"], f["num_search_workers"], f["motor"]) for f in filas])
+    observado = np.log(np.maximum([f["segundos"] for f in filas], 1e-3))
+    censurada = np.array([bool(f.get("censurada")) for f in filas])
+    penalidad = ridge * np.eye(len(VARIABLES))
+    penalidad[0, 0] = 0.0  # la constante no se regulariza
+
+    y = observado.copy()
+    for _ in range(iteraciones):
+        coef = np.linalg.solve(X.T @ X + penalidad, X.T @ y)
+        y = np.where(censurada, np.maximum(observado, X @ coef), observado)
+    residuos = (observado - X @ coef)[~censurada]
+    return {
+        "variables": list(VARIABLES),
+        "coeficientes": [round(float(c), 6) for c in coef],
+        # Cuantil 90 del error: margen sobre la predicción para fijar el límite
+        "margen": round(float(np.quantile(residuos, 0.9)), 4) if residuos.size else 0.0,
+        "error_mediano": round(float(np.median(np.abs(residuos))), 4) if residuos.size else None,
+        "muestras": len(filas),
+        "censuradas": int(censurada.sum()),
+        "entrenado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def predecir_segundos(modelo, rasgos, workers, motor):
+    return math.exp(float(np.dot(modelo["coeficientes"], vector(rasgos, workers, motor))))
+
+
+def sugerir(modelo, rasgos, cpus=None, motores=MOTORES):
+    """
+    Núcleos y motor con menor tiempo predicho (con menos núcleos si la
+    diferencia es chica) y el límite de tiempo correspondiente.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    workers = [w for w in WORKERS_CANDIDATOS if w <= cpus] or [1]
+    candidatos = [
+        (predecir_segundos(modelo, rasgos, w, m), w, m)
+        for m in motores
+        for w in workers
+    ]
+    mejor = min(c[0] for c in candidatos)
+    aceptables = [c for c in candidatos if c[0] <= max(mejor * TOLERANCIA_WORKERS, mejor + AHORRO_MIN_S)]
+    prediccion, w, motor = min(aceptables, key=lambda c: (c[1], c[2] != DEFAULTS["motor"], c[0]))
+    limite = prediccion * math.exp(modelo.get("margen", 0.0)) * FACTOR_LIMITE
+    return {
+        "max_time_in_seconds": round(min(max(limite, LIMITE_MIN_S), LIMITE_MAX_S), 1),
+        "num_search_workers": w,
+        "motor": motor,
+        "prediccion_s": round(prediccion, 3),
+    }
+
+
+_modelo = {"ruta": None, "mtime": None, "modelo": None}
+_modelo_lock = threading.Lock()
+
+
+def modelo_actual():
+    """Modelo entrenado (se relee si el archivo cambia) o None."""
+    ruta = os.getenv("MODELO_TIEMPOS", MODELO_DEFAULT)
+    try:
+        mtime = os.path.getmtime(ruta)
+    except OSError:
+        return None
+    with _modelo_lock:
+        if _modelo["ruta"] != ruta or _modelo["mtime"] != mtime:
+            with open(ruta, encoding="utf-8") as f:
+                modelo = json.load(f)
+            if modelo.get("variables") != list(VARIABLES):
+                print(f"[WARN] {ruta} se entrenó con otras variables; reentrenar. Se usan los defaults.")
+                modelo = None
+            _modelo.update(ruta=ruta, mtime=mtime, modelo=modelo)
+        return _modelo["modelo"]
+
+
+def ajustar_opciones(opciones_solver, rasgos, modelo=None):
+    """opciones_solver con límite, núcleos y motor sugeridos donde el request no los fija."""
+    opciones = dict(opciones_solver or {})
+    if not opciones.pop("auto", True):
+        return opciones
+    modelo = modelo or modelo_actual()
+    if modelo is None:
+        return opciones
+    if any(opciones.get(clave) for clave in SOLO_MONOLITICO):
+        opciones.setdefault("motor", "monolitico")
+    motores = (opciones["motor"],) if "motor" in opciones else MOTORES
+    sugerencia = sugerir(modelo, rasgos, motores=motores)
+    for clave in ("max_time_in_seconds", "num_search_workers", "motor"):
+        opciones.setdefault(clave, sugerencia[clave])
+    opciones["auto"] = True
+    print(
+        f"[AUTO] predicción {sugerencia['prediccion_s']}s -> límite {opciones['max_time_in_seconds']}s, "
+        f"{opciones['num_search_workers']} núcleo(s), motor {opciones['motor']}"
+    )
+    return opciones
+
+
+# --- CLI: recolectar desde el benchmark y entrenar ---
+
+def recolectar(salida, instancias, densidades, semillas, workers, motores, max_time):
+    """Corre el benchmark sintético en cada combinación y agrega las corridas al historial."""
+    from benchmark_generador import ejecutar_caso, instancia_sintetica
+
+    os.environ["HISTORIAL_SOLVER"] = salida
+    for nombre in instancias:
+        for densidad in densidades:
+            for semilla in semillas:
+                instancia = instancia_sintetica(nombre, densidad=densidad, semilla=semilla)
+                for motor in motores:
+                    for w in workers:
+                        opciones = {"motor": motor, "num_search_workers": w, "max_time_in_seconds": max_time, "auto": False}
+                        t0 = time.perf_counter()
+                        caso = ejecutar_caso(instancia, opciones)
+                        print(
+                            f"[PREDICTOR] {nombre} d={densidad} s={semilla} {motor} w={w}: "
+                            f"{caso['status']} {time.perf_counter() - t0:.2f}s"
+                        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predictor de tiempos del solver")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    rec = sub.add_parser("recolectar", help="genera historial con el benchmark sintético")
+    rec.add_argument("--salida", required=True)
+    rec.add_argument("--instancias", default="pequena,mediana,grande")
+    rec.add_argument("--densidades", default="0.7,0.85,1.0")
+    rec.add_argument("--semillas", default="0,1")
+    rec.add_argument("--workers", default="1,2,4,8")
+    rec.add_argument("--motores", default=",".join(MOTORES))
+    rec.add_argument("--max-time", type=float, default=60.0)
+
+    ent = sub.add_parser("entrenar", help="ajusta el modelo desde historiales JSONL y/o logs")
+    ent.add_argument("fuentes", nargs="+")
+    ent.add_argument("--salida", default=MODELO_DEFAULT)
+
+    args = parser.parse_args()
+    if args.comando == "recolectar":
+        recolectar(
+            args.salida,
+            args.instancias.split(","),
+            [float(d) for d in args.densidades.split(",")],
+            [int(s) for s in args.semillas.split(",")],
+            [int(w) for w in args.workers.split(",")],
+            args.motores.split(","),
+            args.max_time,
+        )
+    else:
+        modelo = ajustar(leer_historial(args.fuentes))
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(modelo, f, indent=2)
+        print(
+            f"[PREDICTOR] {modelo['muestras']} corridas ({modelo['censuradas']} censuradas), "
+            f"error mediano x{math.exp(modelo['error_mediano'] or 0):.2f} -> {args.salida}"
+        )
+
+
+if __name__ == "__main__":
+    main()
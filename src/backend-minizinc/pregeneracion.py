@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+# pregeneracion.py
+#
+# Pre-generación especulativa: cuando cambian los datos de entrada de un
+# nivel/versión se resuelve en segundo plano (baja prioridad) y el resultado
+# queda en la tabla horario_pregenerados bajo la huella de la instancia
+# (sql/horario_pregenerados.sql). Si luego llega un "Generar" con exactamente
+# esa entrada, el pipeline lo usa y se salta el solver, ya corra en el
+# proceso web o en un worker de la cola.
+#
+# Disparadores:
+# - vigilar_auditoria(): sondeo de audit_logs con una marca de agua
+#   (created_at). Sondean todos los procesos (cada uno invalida sus caches),
+#   pero solo el que tiene el lock PREGENERACION_LOCK.lider programa
+# - POST /pregenerar: webhook (p. ej. Database Webhooks de Supabase)
+# Ambos pasan por programar(), que aplica un debounce por (nivel, versión).
+# Al vencer, con COLA_TRABAJOS se encola un trabajo para worker_solver.py
+# (los nodos web no resuelven); sin cola se resuelve aquí, un proceso por
+# host a la vez, y se omite si la huella ya está guardada.
+
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cola_trabajos import obtener_cola
+from configuracion_solver import resolver_opciones
+from generador_python import NUM_DIAS, generar_horario, normalizar_entrada, obtener_patron
+from salida_horario import horario_desde_matriz
+from telemetria import contar_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin locks entre procesos
+    fcntl = None
+
+# Tablas cuyo cambio invalida un horario
+TABLAS_ENTRADA = (
+    "asignaciones",
+    "docentes",
+    "horas_curso_grado",
+    "horas_curso_grado_division",
+    "restricciones_docente",
+    "restricciones_overrides",
+)
+
+# Parámetros que no cambian qué horarios son válidos: no entran en la huella
+PARAMETROS_EJECUCION = ("max_time_in_seconds", "num_search_workers", "random_seed", "cache_modelo", "tiempo_etapa_s")
+
+DEBOUNCE_S = float(os.getenv("PREGENERACION_DEBOUNCE", "20"))
+INTERVALO_S = float(os.getenv("PREGENERACION_INTERVALO", "30"))
+WORKERS = int(os.getenv("PREGENERACION_WORKERS", "2"))
+NICE = 10
+LOCK = os.getenv("PREGENERACION_LOCK", os.path.join(tempfile.gettempdir(), "horario-pregeneracion"))
+
+TABLA = "horario_pregenerados"
+TABLA_OBJETIVOS = "pregeneracion_objetivos"
+
+
+def huella_instancia(
+    asignaciones, restricciones, horas_curso_grado, nivel, version, patrones_division=None, opciones_solver=None,
+    num_dias=NUM_DIAS,
+):
+    """
+    SHA-256 de la entrada ya normalizada (la misma que ve el modelo), así
+    campos cosméticos o el orden de las claves no cambian la huella.
+    """
+    version = int(version)
+    num_bloques = 7 if version == 1 else 8
+    datos = normalizar_entrada([], asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias)
+    reqs = sorted(datos["map_asignaciones"], key=lambda r: (r["curso"], r["grado"]))
+    opciones = {k: v for k, v in resolver_opciones(opciones_solver).items() if k not in PARAMETROS_EJECUCION}
+    canonica = {
+        "nivel": nivel,
+        "version": version,
+        "dias": int(num_dias),
+        "asignaciones": [
+            [r["curso"], r["grado"], r["docente"], r["horas"], obtener_patron(patrones_division, r)] for r in reqs
+        ],
+        "bloqueos": sorted(datos["bloqueos"]),
+        "limitar_carga_docente_grado": datos["r_limitar_docente_grado"],
+        "opciones": opciones,
+    }
+    texto = json.dumps(canonica, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def es_reutilizable(resultado):
+    return (
+        resultado.get("status") in ("OPTIMAL", "FEASIBLE")
+        and resultado.get("asignaciones_fallidas", 0) == 0
+        and "matriz_cursos" in resultado
+    )
+
+
+def _a_json(resultado):
+    """Resultado sin numpy: las matrices van como listas; 'horario' se rehace al leer."""
+    datos = {}
+    for clave, valor in resultado.items():
+        if clave == "horario":
+            continue
+        if isinstance(valor, np.ndarray):
+            valor = {"ndarray": valor.tolist(), "dtype": str(valor.dtype), "shape": list(valor.shape)}
+        datos[clave] = valor
+    return datos
+
+
+def _desde_json(datos):
+    resultado = {}
+    for clave, valor in datos.items():
+        if isinstance(valor, dict) and "ndarray" in valor:
+            valor = np.array(valor["ndarray"], dtype=valor["dtype"]).reshape(valor["shape"])
+        resultado[clave] = valor
+    resultado["horario"] = horario_desde_matriz(resultado["matriz_cursos"], resultado["grados"])
+    return resultado
+
+
+def guardar_pregenerado(sb, huella, nivel, version, resultado):
+    fila = {"huella": huella, "nivel": nivel, "version_num": int(version), "resultado": _a_json(resultado)}
+    sb.table(TABLA).upsert(fila, on_conflict="huella").execute()
+    # La entrada nueva deja obsoleta la anterior del mismo (nivel, versión)
+    sb.table(TABLA).delete().eq("nivel", nivel).eq("version_num", int(version)).neq("huella", huella).execute()
+
+
+def hay_pregenerado(sb, huella):
+    return bool(sb.table(TABLA).select("huella").eq("huella", huella).limit(1).execute().data)
+
+
+def tomar_pregenerado(sb, huella):
+    """
+    Devuelve y consume el resultado pre-generado (o None). Se consume para
+    que un segundo "Generar" con la misma entrada produzca otro horario; el
+    DELETE devuelve la fila a un solo proceso aunque la pidan varios.
+    """
+    try:
+        filas = sb.table(TABLA).delete().eq("huella", huella).execute().data or []
+    except Exception as e:
+        print(f"[PREGEN][WARN] no se pudo leer {TABLA}: {e!r}")
+        filas = []
+    contar_cache("pregenerado", bool(filas))
+    return _desde_json(filas[0]["resultado"]) if filas else None
+
+
+def _bajar_prioridad():
+    try:
+        os.nice(NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+def _resolver_instancia(instancia, opciones_solver):
+    """Corre en el proceso de baja prioridad (o en el worker de la cola)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return generar_horario(
+            [dict(d) for d in instancia["docentes"]],
+            instancia["asignaciones"],
+            instancia["restricciones"],
+            instancia["horas_curso_grado"],
+            nivel=instancia["nivel"],
+            version=instancia["version"],
+            patrones_division=instancia.get("patrones_division"),
+            opciones_solver=opciones_solver,
+            num_dias=instancia.get("num_dias", NUM_DIAS),
+        )
+
+
+class _LockArchivo:
+    """
+    Lock exclusivo entre los procesos del host (lockf: es del proceso, un
+    fork no lo hereda aunque herede el archivo); sin fcntl siempre se concede.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._archivo = None
+
+    def tomar(self, bloquear=True):
+        if fcntl is None or self._archivo is not None:
+            return True
+        archivo = open(self.ruta, "a")
+        try:
+            fcntl.lockf(archivo, fcntl.LOCK_EX | (0 if bloquear else fcntl.LOCK_NB))
+        except OSError:
+            archivo.close()
+            return False
+        self._archivo = archivo
+        return True
+
+    def soltar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+class PreGenerador:
+    """
+    Cola con debounce de (nivel, versión) a pre-generar y un hilo que la
+    atiende de a una instancia: la encola para los workers o la resuelve en
+    un proceso con nice.
+    """
+
+    def __init__(self, obtener_sb, debounce=DEBOUNCE_S, workers=WORKERS, obtener_cola=obtener_cola,
+                 aparte=True, lock=LOCK):
+        # obtener_sb(): cliente de Supabase, pedido recién al pre-generar
+        self.obtener_sb = obtener_sb
+        self.debounce = debounce
+        self.workers = workers
+        # obtener_cola(): cola compartida o None; aparte=False resuelve en este proceso (worker)
+        self.obtener_cola = obtener_cola
+        self.aparte = aparte
+        self.lock = lock
+        self.objetivos = set()
+        self._pendientes = {}  # (nivel, version) -> instante en que vence el debounce
+        self._cond = threading.Condition()
+        self._pool = None
+        self._hilo = None
+        self._auditoria = None
+        self._lider = _LockArchivo(f"{lock}.lider")
+        self._resolviendo = _LockArchivo(f"{lock}.resolver")
+        self._pid = os.getpid()
+        # Funciones f(nivel) a llamar cuando cambian los datos de entrada (nivel None = todos)
+        self.al_cambiar = []
+        self.estadisticas = {"programadas": 0, "encoladas": 0, "resueltas": 0, "descartadas": 0, "errores": 0}
+
+    def _en_este_proceso(self):
+        """
+        Tras un fork (gunicorn --preload) el objeto llega copiado: sus hilos y
+        su pool no corren en este proceso y los locks pudieron quedar tomados.
+        Se rehacen; objetivos y pendientes se conservan.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._cond = threading.Condition()
+            self._pool = None
+            self._hilo = None
+            self._auditoria = None
+            self._lider = _LockArchivo(f"{self.lock}.lider")
+            self._resolviendo = _LockArchivo(f"{self.lock}.resolver")
+
+    def registrar_objetivo(self, nivel, version):
+        """(nivel, versión) que se vuelven a pre-generar ante cambios sin destino explícito."""
+        self._en_este_proceso()
+        clave = (nivel, int(version))
+        with self._cond:
+            if clave in self.objetivos:
+                return
+            self.objetivos.add(clave)
+        # Se comparte en la BD: el proceso que vigila audit_logs no es necesariamente este
+        try:
+            self.obtener_sb().table(TABLA_OBJETIVOS).upsert(
+                {"nivel": nivel, "version_num": int(version)}, on_conflict="nivel,version_num"
+            ).execute()
+        except Exception as e:
+            print(f"[PREGEN][WARN] no se pudo guardar el objetivo {nivel} v{version}: {e!r}")
+
+    def _cargar_objetivos(self):
+        try:
+            filas = self.obtener_sb().table(TABLA_OBJETIVOS).select("nivel,version_num").execute().data or []
+        except Exception as e:
+            print(f"[PREGEN][WARN] no se pudieron leer los objetivos: {e!r}")
+            return
+        with self._cond:
+            self.objetivos.update((f["nivel"], int(f["version_num"])) for f in filas)
+
+    def hook(self, evento, etapa, pipeline):
+        # Hook del pipeline: lo que se genera a mano pasa a ser objetivo
+        if evento == "inicio" and etapa == "resolver":
+            self.registrar_objetivo(pipeline.nivel, pipeline.version)
+
+    def programar(self, nivel=None, version=None):
+        """Programa (o re-programa, reiniciando el debounce) la pre-generación."""
+        self._en_este_proceso()
+        if nivel is None or version is None:
+            self._cargar_objetivos()
+        with self._cond:
+            if nivel is not None and version is not None:
+                claves = [(nivel, int(version))]
+            else:
+                claves = [(n, v) for (n, v) in self.objetivos if nivel is None or n == nivel]
+            vence = time.monotonic() + self.debounce
+            for clave in claves:
+                self._pendientes[clave] = vence
+            self.estadisticas["programadas"] += len(claves)
+            self._cond.notify()
+        return claves
+
+    def datos_cambiaron(self, nivel=None, version=None, pregenerar=True):
+        """Avisa a al_cambiar y, con pregenerar, programa la pre-generación de lo afectado."""
+        for funcion in self.al_cambiar:
+            funcion(nivel)
+        return self.programar(nivel, version) if pregenerar else []
+
+    def iniciar(self):
+        self._en_este_proceso()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._bucle, daemon=True, name="pregeneracion")
+            self._hilo.start()
+
+    def _siguiente(self):
+        with self._cond:
+            while True:
+                ahora = time.monotonic()
+                vencidas = [c for c, t in self._pendientes.items() if t <= ahora]
+                if vencidas:
+                    clave = min(vencidas, key=self._pendientes.get)
+                    del self._pendientes[clave]
+                    return clave
+                espera = min(self._pendientes.values()) - ahora if self._pendientes else None
+                self._cond.wait(timeout=espera)
+
+    def _bucle(self):
+        while True:
+            nivel, version = self._siguiente()
+            try:
+                self._despachar(nivel, version)
+            except Exception as e:
+                self.estadisticas["errores"] += 1
+                print(f"[PREGEN][ERROR] {nivel} v{version}: {e!r}")
+
+    def _despachar(self, nivel, version):
+        cola = self.obtener_cola() if self.obtener_cola else None
+        if cola is not None:
+            # Lo resuelve un worker_solver; la clave une los pedidos de todos los nodos web
+            trabajo_id, nuevo = cola.encolar(
+                {"pregenerar": {"nivel": nivel, "version": version}}, f"pregenerar:{nivel}:{version}"
+            )
+            self.estadisticas["encoladas"] += nuevo
+            print(f"[PREGEN] {nivel} v{version}: {'encolado' if nuevo else 'ya en cola'} ({trabajo_id})")
+            return
+        # De a un proceso por host: el siguiente ya encuentra la huella guardada
+        self._resolviendo.tomar()
+        try:
+            self.pregenerar(nivel, version)
+        finally:
+            self._resolviendo.soltar()
+
+    def pregenerar(self, nivel, version):
+        from pipeline_horario import cargar_instancia
+
+        sb = self.obtener_sb()
+        inst = cargar_instancia(sb, nivel, version)
+        if not inst["docentes"] or not inst["asignaciones"] or not inst["horas_curso_grado"]:
+            print(f"[PREGEN] {nivel} v{version}: sin datos, se omite")
+            return None
+        huella = huella_instancia(
+            inst["asignaciones"], inst["restricciones"], inst["horas_curso_grado"],
+            nivel, version, inst["patrones_division"], num_dias=inst.get("num_dias", NUM_DIAS),
+        )
+        if hay_pregenerado(sb, huella):
+            return huella
+
+        t0 = time.perf_counter()
+        opciones = {"num_search_workers": self.workers}
+        if self.aparte:
+            if self._pool is None:
+                # spawn: un fork de este proceso (con hilos de OR-Tools, SSE, ...) puede colgarse
+                self._pool = ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_bajar_prioridad
+                )
+            resultado = self._pool.submit(_resolver_instancia, inst, opciones).result()
+        else:
+            resultado = _resolver_instancia(inst, opciones)
+        segundos = time.perf_counter() - t0
+        if not es_reutilizable(resultado):
+            self.estadisticas["descartadas"] += 1
+            print(f"[PREGEN] {nivel} v{version}: {resultado.get('status')} en {segundos:.1f}s, descartado")
+            return None
+        guardar_pregenerado(sb, huella, nivel, version, resultado)
+        self.estadisticas["resueltas"] += 1
+        print(f"[PREGEN] {nivel} v{version}: listo en {segundos:.1f}s (huella {huella[:12]})")
+        return huella
+
+    def vigilar_auditoria(self, intervalo=INTERVALO_S):
+        """
+        Sondea audit_logs; cualquier cambio nuevo en TABLAS_ENTRADA avisa a
+        al_cambiar y, si este proceso tiene el lock de líder, programa los
+        objetivos. Los demás reintentan tomarlo en cada cambio por si el
+        líder terminó.
+        """
+        self._en_este_proceso()
+        if self._auditoria is not None and self._auditoria.is_alive():
+            return
+
+        def ultima_marca():
+            rows = (
+                self.obtener_sb().table("audit_logs")
+                .select("created_at")
+                .in_("table_name", list(TABLAS_ENTRADA))
+                .order("created_at", desc=True)
+                .limit(1)
+                .execute()
+                .data
+                or []
+            )
+            return rows[0]["created_at"] if rows else None
+
+        def bucle():
+            marca = None
+            while True:
+                try:
+                    nueva = ultima_marca()
+                    if marca is not None and nueva is not None and nueva > marca:
+                        print(f"[PREGEN] cambios en datos de entrada ({nueva})")
+                        self.datos_cambiaron(pregenerar=self._lider.tomar(bloquear=False))
+                    marca = nueva or marca
+                except Exception as e:
+                    print(f"[PREGEN][WARN] no se pudo leer audit_logs: {e!r}")
+                time.sleep(intervalo)
+
+        self._auditoria = threading.Thread(target=bucle, daemon=True, name="pregeneracion-auditoria")
+        self._auditoria.start()
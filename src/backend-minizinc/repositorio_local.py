@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# repositorio_local.py
+#
+# Repositorio local con la misma interfaz que el cliente de Supabase que usa
+# el backend (sb.table(...).select/insert/upsert/update/delete + filtros +
+# execute().data), guardado en SQLite (":memory:" o un archivo). Sirve para
+# tests y pruebas de carga sin una Supabase real: HORARIO_DB=memoria o
+# HORARIO_DB=sqlite:///ruta.db (ver arranque.obtener_supabase).
+#
+# Cubre solo lo que usa este backend: filtros eq/neq/lt/lte/gt/gte/in_/is_,
+# not_, or_ con grupos and(...), order, limit. Cada tabla guarda filas JSON;
+# las claves únicas se declaran en UNICOS, como en la base real (o por
+# cliente, ClienteLocal(unicos=...), para probar esquemas sin ese índice).
+
+import json
+import sqlite3
+import threading
+
+UNICOS = {
+    "horarios": ("grado_id", "dia", "bloque"),
+    "horario_generaciones": ("nivel", "version_num", "generation_index"),
+    "horario_versiones": ("nivel", "version_num"),
+    "horario_pregenerados": ("huella",),
+    "pregeneracion_objetivos": ("nivel", "version_num"),
+}
+
+
+class ErrorLocal(Exception):
+    """Errores con el mismo código que devolvería PostgREST (p. ej. 23505)."""
+
+
+class Respuesta:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+def _valor_filtro(texto):
+    # Los filtros de or_ vienen como texto (formato PostgREST)
+    if texto in ("null", "true", "false"):
+        return {"null": None, "true": True, "false": False}[texto]
+    for tipo in (int, float):
+        try:
+            return tipo(texto)
+        except ValueError:
+            pass
+    return texto
+
+
+def _partir(texto):
+    """Separa por comas de primer nivel (respeta paréntesis)."""
+    partes, nivel, actual = [], 0, ""
+    for c in texto:
+        if c == "," and nivel == 0:
+            partes.append(actual)
+            actual = ""
+            continue
+        nivel += c == "("
+        nivel -= c == ")"
+        actual += c
+    if actual:
+        partes.append(actual)
+    return [p.strip() for p in partes if p.strip()]
+
+
+_OPERADORES = {"eq": "=", "neq": "!=", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+
+
+def _col(nombre):
+    return f"json_extract(datos, '$.{nombre}')"
+
+
+def _sql_condicion(col, op, valor):
+    if op == "is":
+        if valor is None:
+            return f"{_col(col)} IS NULL", []
+        return f"{_col(col)} = ?", [valor]
+    if op == "in":
+        valores = list(valor)
+        if not valores:
+            return "0", []
+        return f"{_col(col)} IN ({','.join('?' * len(valores))})", valores
+    return f"{_col(col)} {_OPERADORES[op]} ?", [valor]
+
+
+def _sql_or(texto):
+    """or_('and(a.eq.1,b.eq.x),c.gt.2') -> (sql, params)."""
+    condiciones, params = [], []
+    for parte in _partir(texto):
+        if parte.startswith(("and(", "or(")):
+            union = " AND " if parte.startswith("and(") else " OR "
+            interior = parte[parte.index("(") + 1:-1]
+            subs = [_sql_or(p) for p in _partir(interior)]
+            condiciones.append("(" + union.join(s for s, _ in subs) + ")")
+            params += [v for _, ps in subs for v in ps]
+            continue
+        col, op, valor = parte.split(".", 2)
+        sql, ps = _sql_condicion(col, op, _valor_filtro(valor))
+        condiciones.append(sql)
+        params += ps
+    return "(" + " OR ".join(condiciones) + ")", params
+
+
+class _Negacion:
+    def __init__(self, consulta):
+        self._consulta = consulta
+
+    def __getattr__(self, nombre):
+        self._consulta._negar = True
+        return getattr(self._consulta, nombre)
+
+
+class Consulta:
+    """Builder encadenable; execute() corre la operación en SQLite."""
+
+    def __init__(self, cliente, tabla):
+        self._cliente = cliente
+        self._tabla = tabla
+        self._operacion = "select"
+        self._columnas = None
+        self._filas = None
+        self._valores = None
+        self._conflicto = None
+        self._where = []
+        self._params = []
+        self._orden = []
+        self._limite = None
+        self._negar = False
+
+    # --- Operaciones ---
+
+    def select(self, columnas="*", **_):
+        self._operacion = "select"
+        if columnas.strip() != "*":
+            self._columnas = [c.strip() for c in columnas.split(",") if c.strip()]
+        return self
+
+    def insert(self, filas, **_):
+        self._operacion = "insert"
+        self._filas = filas if isinstance(filas, list) else [filas]
+        return self
+
+    def upsert(self, filas, on_conflict=None, **_):
+        self._operacion = "upsert"
+        self._filas = filas if isinstance(filas, list) else [filas]
+        if isinstance(on_conflict, str):
+            on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        self._conflicto = tuple(on_conflict or self._cliente.unicos.get(self._tabla, ()))
+        return self
+
+    def update(self, valores, **_):
+        self._operacion = "update"
+        self._valores = dict(valores)
+        return self
+
+    def delete(self, **_):
+        self._operacion = "delete"
+        return self
+
+    # --- Filtros ---
+
+    def _filtro(self, sql, params):
+        if self._negar:
+            sql = f"NOT ({sql})"
+            self._negar = False
+        self._where.append(sql)
+        self._params += params
+        return self
+
+    @property
+    def not_(self):
+        return _Negacion(self)
+
+    def eq(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "eq", valor))
+
+    def neq(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "neq", valor))
+
+    def lt(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "lt", valor))
+
+    def lte(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "lte", valor))
+
+    def gt(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "gt", valor))
+
+    def gte(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "gte", valor))
+
+    def in_(self, col, valores):
+        return self._filtro(*_sql_condicion(col, "in", valores))
+
+    def is_(self, col, valor):
+        return self._filtro(*_sql_condicion(col, "is", _valor_filtro(str(valor).lower())))
+
+    def or_(self, filtros, **_):
+        return self._filtro(*_sql_or(filtros))
+
+    def order(self, col, desc=False, **_):
+        self._orden.append(f"{_col(col)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n, **_):
+        self._limite = int(n)
+        return self
+
+    # --- Ejecución ---
+
+    def execute(self):
+        with self._cliente._lock:
+            conexion = self._cliente._conexion
+            with conexion:
+                return Respuesta(getattr(self, "_ejecutar_" + self._operacion)(conexion))
+
+    def _seleccionar(self, conexion):
+        sql = "SELECT id, datos FROM filas WHERE tabla = ?"
+        if self._where:
+            sql += " AND " + " AND ".join(self._where)
+        if self._orden:
+            sql += " ORDER BY " + ", ".join(self._orden)
+        if self._limite is not None:
+            sql += f" LIMIT {self._limite}"
+        return [(i, json.loads(d)) for i, d in conexion.execute(sql, [self._tabla] + self._params)]
+
+    def _proyectar(self, fila):
+        if self._columnas is None:
+            return fila
+        return {c: fila.get(c) for c in self._columnas}
+
+    def _ejecutar_select(self, conexion):
+        return [self._proyectar(f) for _, f in self._seleccionar(conexion)]
+
+    def _existente(self, conexion, fila, columnas):
+        if not columnas or any(c not in fila for c in columnas):
+            return None
+        where = " AND ".join(f"{_col(c)} = ?" for c in columnas)
+        return conexion.execute(
+            f"SELECT id, datos FROM filas WHERE tabla = ? AND {where}",
+            [self._tabla] + [fila[c] for c in columnas],
+        ).fetchone()
+
+    def _insertar(self, conexion, fila):
+        fila = dict(fila)
+        cursor = conexion.execute("INSERT INTO filas (tabla, datos) VALUES (?, ?)", (self._tabla, json.dumps(fila)))
+        if "id" not in fila:
+            # Como una columna serial: el id es el de la fila en SQLite
+            fila["id"] = cursor.lastrowid
+            conexion.execute("UPDATE filas SET datos = ? WHERE id = ?", (json.dumps(fila), cursor.lastrowid))
+        return fila
+
+    def _ejecutar_insert(self, conexion):
+        unicos = self._cliente.unicos.get(self._tabla)
+        salida = []
+        for fila in self._filas:
+            if self._existente(conexion, fila, unicos):
+                raise ErrorLocal(f"23505: duplicate key value violates unique constraint on {self._tabla}")
+            salida.append(self._insertar(conexion, fila))
+        return salida
+
+    def _ejecutar_upsert(self, conexion):
+        if set(self._conflicto) != set(self._cliente.unicos.get(self._tabla, ())):
+            raise ErrorLocal("42P10: there is no unique or exclusion constraint matching the ON CONFLICT specification")
+        salida = []
+        for fila in self._filas:
+            existente = self._existente(conexion, fila, self._conflicto)
+            if existente is None:
+                salida.append(self._insertar(conexion, fila))
+                continue
+            nueva = dict(json.loads(existente[1]), **fila)
+            conexion.execute("UPDATE filas SET datos = ? WHERE id = ?", (json.dumps(nueva), existente[0]))
+            salida.append(nueva)
+        return salida
+
+    def _ejecutar_update(self, conexion):
+        salida = []
+        for i, fila in self._seleccionar(conexion):
+            fila.update(self._valores)
+            conexion.execute("UPDATE filas SET datos = ? WHERE id = ?", (json.dumps(fila), i))
+            salida.append(fila)
+        return salida
+
+    def _ejecutar_delete(self, conexion):
+        filas = self._seleccionar(conexion)
+        conexion.executemany("DELETE FROM filas WHERE id = ?", [(i,) for i, _ in filas])
+        return [f for _, f in filas]
+
+
+class ClienteLocal:
+    """Stand-in de supabase.Client sobre SQLite (ruta ':memory:' por defecto)."""
+
+    def __init__(self, ruta=":memory:", unicos=None):
+        self.ruta = ruta
+        self.unicos = dict(UNICOS, **(unicos or {}))
+        self._lock = threading.RLock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS filas (id INTEGER PRIMARY KEY, tabla TEXT NOT NULL, datos TEXT NOT NULL)"
+            )
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS filas_tabla_idx ON filas (tabla)")
+
+    def table(self, nombre):
+        return Consulta(self, nombre)
+
+    from_ = table
+
+    def cargar(self, tablas):
+        """{tabla: [filas]} -> inserta todo (semilla para tests y pruebas de carga)."""
+        for nombre, filas in tablas.items():
+            if filas:
+                self.table(nombre).insert(filas).execute()
+        return self
+
+
+def cliente_desde_url(url):
+    """'memoria' / ':memory:' / 'sqlite:///ruta.db' / 'ruta.db' -> ClienteLocal."""
+    if url in ("memoria", ":memory:"):
+        return ClienteLocal()
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return ClienteLocal(url)
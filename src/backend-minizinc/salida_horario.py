@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# salida_horario.py
+#
+# Construcción de la salida a partir de la solución del solver.
+# Todo se deriva de una única matriz densa (dia x bloque x grado) que se
+# llena en una sola pasada sobre los valores de las variables x.
+
+import numpy as np
+
+# Nombres de día tal como se guardan en 'horarios'; el horario usa los
+# primeros num_dias (5 por defecto, 6 con sábado)
+DIAS_BD = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+NUM_DIAS = 5
+
+
+def grados_de_nivel(nivel, presentes=None):
+    """
+    Eje de grados (grupos) del nivel. Sin datos o si los grados presentes
+    caben en el rango histórico (Primaria 6-11, Secundaria 1-5) se usa ese
+    rango, con las columnas de siempre; si no (varias secciones por grado),
+    los grados presentes ordenados.
+    """
+    historicos = list(range(6, 12)) if nivel == "Primaria" else list(range(1, 6))
+    presentes = {int(g) for g in presentes or ()}
+    if presentes <= set(historicos):
+        return historicos
+    return sorted(presentes)
+
+
+def extraer_valores(solver, x_idx):
+    """
+    Lee de una vez todas las variables x de la solución.
+    x_idx: array (asignacion, dia, bloque) con los índices de las variables en el proto.
+    Devuelve un array 0/1 con la misma forma.
+    """
+    if x_idx.size == 0:
+        return np.zeros(x_idx.shape, dtype=np.int8)
+    solucion = np.asarray(solver.ResponseProto().solution, dtype=np.int8)
+    return solucion[x_idx]
+
+
+def construir_matrices(valores, map_asignaciones, grados_ids):
+    """
+    valores: array 0/1 (asignacion, dia, bloque).
+    Devuelve (matriz_asignacion, grados) donde matriz_asignacion[d, b, g] es
+    idx_asignacion + 1 (0 = vacío) y grados es el eje de grados usado.
+    """
+    num_asig, num_dias, num_bloques = valores.shape
+    grados = list(grados_ids)
+    extra = sorted({req["grado"] for req in map_asignaciones} - set(grados))
+    grados += extra
+    pos_grado = {g: i for i, g in enumerate(grados)}
+
+    matriz = np.zeros((num_dias, num_bloques, len(grados)), dtype=np.int32)
+    if num_asig == 0:
+        return matriz, grados
+
+    a, d, b = np.nonzero(valores)
+    col_grado = np.fromiter(
+        (pos_grado[req["grado"]] for req in map_asignaciones),
+        dtype=np.int32,
+        count=num_asig,
+    )
+    matriz[d, b, col_grado[a]] = a + 1
+    return matriz, grados
+
+
+def _tabla(map_asignaciones, campo):
+    # tabla[0] = 0 para las celdas vacías; tabla[idx + 1] = valor de la asignación
+    return np.array([0] + [req[campo] for req in map_asignaciones], dtype=np.int64)
+
+
+def matriz_cursos(matriz_asignacion, map_asignaciones):
+    return _tabla(map_asignaciones, "curso")[matriz_asignacion]
+
+
+def matriz_docentes(matriz_asignacion, map_asignaciones):
+    return _tabla(map_asignaciones, "docente")[matriz_asignacion]
+
+
+def horario_desde_matriz(cursos, grados):
+    """Formato histórico {dia: {bloque: {grado: curso}}} a partir de la matriz."""
+    num_dias, num_bloques, _ = cursos.shape
+    horario = {d: {b: {} for b in range(num_bloques)} for d in range(num_dias)}
+    for d, b, g in zip(*np.nonzero(cursos)):
+        horario[int(d)][int(b)][grados[g]] = int(cursos[d, b, g])
+    return horario
+
+
+def horario_lista(resultado, grados_ids):
+    """Matriz para el front: dias x bloques x grados_ids (0 = vacío)."""
+    cursos = resultado["matriz_cursos"]
+    pos = {g: i for i, g in enumerate(resultado["grados"])}
+    columnas = [pos.get(g, -1) for g in grados_ids]
+    salida = np.zeros(cursos.shape[:2] + (len(columnas),), dtype=cursos.dtype)
+    for j, c in enumerate(columnas):
+        if c >= 0:
+            salida[:, :, j] = cursos[:, :, c]
+    return salida.tolist()
+
+
+def registros_horarios(resultado, nivel, version_num, dias=DIAS_BD):
+    """Filas para la tabla 'horarios', una por celda ocupada."""
+    cursos = resultado["matriz_cursos"]
+    docentes = resultado["matriz_docentes"]
+    grados = resultado["grados"]
+    registros = []
+    for d, b, g in zip(*np.nonzero(cursos)):
+        if d >= len(dias):
+            continue
+        registros.append({
+            "docente_id": int(docentes[d, b, g]),
+            "curso_id": int(cursos[d, b, g]),
+            "grado_id": int(grados[g]),
+            "dia": dias[d],
+            "bloque": int(b),
+            "nivel": nivel,
+            "version_num": int(version_num),
+        })
+    return registros
+
+
+def vista_por_docente(resultado):
+    """{docente_id: [(dia, bloque, grado, curso), ...]} ordenado por dia/bloque."""
+    cursos = resultado["matriz_cursos"]
+    docentes = resultado["matriz_docentes"]
+    grados = resultado["grados"]
+    vista = {}
+    for d, b, g in zip(*np.nonzero(cursos)):
+        vista.setdefault(int(docentes[d, b, g]), []).append(
+            (int(d), int(b), int(grados[g]), int(cursos[d, b, g]))
+        )
+    return vista
+
+
+def metricas(valores, map_asignaciones):
+    """Horas asignadas y déficit por asignación, calculados sobre la matriz de valores."""
+    requeridas = np.array([req["horas"] for req in map_asignaciones], dtype=np.int64)
+    asignadas = valores.reshape(len(map_asignaciones), -1).sum(axis=1) if len(map_asignaciones) else requeridas * 0
+    deficit = np.maximum(requeridas - asignadas, 0)
+    return {
+        "total_requeridos": int(requeridas.sum()),
+        "total_asignados": int(asignadas.sum()),
+        "fallidos": int(deficit.sum()),
+        "deficit_count": int(np.count_nonzero(deficit)),
+    }
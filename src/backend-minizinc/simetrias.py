@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# simetrias.py
+#
+# Detección y ruptura de simetrías del modelo CP-SAT.
+#
+# - Asignaciones intercambiables: mismo docente, mismo grado, mismas horas y
+#   mismo patrón. Intercambiar sus horarios da otra solución válida.
+# - Grados idénticos: mismo perfil completo de (curso, docente, horas, patrón).
+#   Intercambiar los horarios de ambos grados da otra solución válida.
+#
+# En ambos casos se ordena lexicográficamente el vector de horas por día
+# (horas_dia) de los elementos de cada clase.
+
+
+def detectar_grupos_asignaciones(map_asignaciones, clave_extra):
+    """
+    Agrupa índices de asignaciones intercambiables.
+    clave_extra(idx) aporta lo que distingue a una asignación además de
+    (docente, grado, horas): patrón, reglas especiales por curso, etc.
+    Devuelve solo los grupos con 2 o más asignaciones.
+    """
+    grupos = {}
+    for idx, req in enumerate(map_asignaciones):
+        clave = (req["docente"], req["grado"], req["horas"], clave_extra(idx))
+        grupos.setdefault(clave, []).append(idx)
+    return [indices for indices in grupos.values() if len(indices) > 1]
+
+
+def detectar_grados_identicos(map_asignaciones, clave_extra, grupos_asignaciones):
+    """
+    Clases de grados con el mismo perfil de requerimientos.
+    Para cada clase devuelve la lista de índices representantes (uno por grado,
+    el mismo curso en todos). El representante no pertenece a ningún grupo de
+    asignaciones intercambiables, para que ambas rupturas sean compatibles.
+    """
+    en_grupo = {idx for indices in grupos_asignaciones for idx in indices}
+    perfiles = {}
+    por_grado = {}
+    for idx, req in enumerate(map_asignaciones):
+        por_grado.setdefault(req["grado"], []).append(idx)
+    for grado, indices in por_grado.items():
+        perfil = tuple(sorted(
+            (map_asignaciones[i]["curso"], map_asignaciones[i]["docente"], map_asignaciones[i]["horas"], clave_extra(i))
+            for i in indices
+        ))
+        perfiles.setdefault(perfil, []).append(grado)
+
+    clases = []
+    for perfil, grados in perfiles.items():
+        if len(grados) < 2:
+            continue
+        grados = sorted(grados)
+        # Curso representante: el primero cuyo índice no esté en un grupo intercambiable en ningún grado
+        for curso, *_ in perfil:
+            reps = [
+                next(i for i in por_grado[g] if map_asignaciones[i]["curso"] == curso)
+                for g in grados
+            ]
+            if not any(i in en_grupo for i in reps):
+                clases.append(reps)
+                break
+    return clases
+
+
+def agregar_orden_lexicografico(model, horas_dia, indices, num_dias, base):
+    """horas_dia(indices[0]) >=lex horas_dia(indices[1]) >=lex ..."""
+    pesos = [base ** (num_dias - 1 - d) for d in range(num_dias)]
+    for a, b in zip(indices, indices[1:]):
+        model.Add(
+            sum(pesos[d] * horas_dia[(a, d)] for d in range(num_dias))
+            >= sum(pesos[d] * horas_dia[(b, d)] for d in range(num_dias))
+        )
+
+
+def romper_simetrias(model, map_asignaciones, horas_dia, clave_extra, num_dias, num_bloques):
+    """Agrega las restricciones de ruptura y devuelve un resumen para el log."""
+    grupos = detectar_grupos_asignaciones(map_asignaciones, clave_extra)
+    clases = detectar_grados_identicos(map_asignaciones, clave_extra, grupos)
+    base = num_bloques + 1
+    for indices in grupos:
+        agregar_orden_lexicografico(model, horas_dia, indices, num_dias, base)
+    for reps in clases:
+        agregar_orden_lexicografico(model, horas_dia, reps, num_dias, base)
+    return {
+        "grupos_asignaciones": len(grupos),
+        "asignaciones_en_grupos": sum(len(g) for g in grupos),
+        "clases_grados": len(clases),
+        "grados_en_clases": sum(len(c) for c in clases),
+    }
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+# solver_dos_fases.py
+#
+# Motor alternativo en dos fases:
+#   Fase 1: modelo por días. Decide cuántas horas dicta cada asignación cada
+#           día (desglose 2h/3h, patrones, capacidad diaria del docente,
+#           totales por grado, reglas de distribución de la versión 1).
+#   Fase 2: con los días fijos, ubica los bloques dentro de cada día. Cada día
+#           se parte en componentes independientes (grados unidos por docentes
+#           compartidos) que se resuelven en paralelo en un pool de hilos
+#           compartido (CP-SAT libera el GIL; un fork del worker web, que ya
+#           tiene hilos de OR-Tools, pre-generación y SSE, puede colgarse).
+# Si una componente no tiene solución, se reduce a un conjunto mínimo de grados
+# en conflicto y se agrega a la fase 1 un corte que prohíbe esa combinación de
+# horas (en ese día y en los días con la misma disponibilidad); luego se vuelve
+# a resolver.
+
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from configuracion_solver import resolver_opciones
+from generador_python import NUM_DIAS, construir_salida, obtener_patron, preparar_datos
+from simetrias import romper_simetrias
+from telemetria import solver_activo
+
+MAX_ITERACIONES = 200
+TIEMPO_SUBPROBLEMA = 5.0
+# Hilos de fase 2 para todo el proceso: las requests concurrentes comparten el pool
+MAX_HILOS_FASE2 = int(os.getenv("MAX_HILOS_FASE2", str(min(NUM_DIAS, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool_fase2():
+    """Pool de hilos de la fase 2; se crea en el primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_HILOS_FASE2, thread_name_prefix="fase2")
+        return _pool
+
+
+def _valores_permitidos(req, patron, especial, num_bloques):
+    if patron:
+        return sorted({0} | set(patron))
+    tope = 3 if req["horas"] > 2 else num_bloques
+    return [v for v in range(0, tope + 1) if v != 1 or especial]
+
+
+def _modelo_dias(datos, patrones, especiales, patrones_raw, num_bloques, version, opciones):
+    """Fase 1: h[(idx, d)] = horas de la asignación idx el día d."""
+    map_asignaciones = datos["map_asignaciones"]
+    bloqueos = datos["bloqueos"]
+    num_dias = datos["num_dias"]
+    model = cp_model.CpModel()
+    h = {}
+    es_k = {}
+
+    for idx, req in enumerate(map_asignaciones):
+        permitidos = _valores_permitidos(req, patrones[idx], especiales[idx], num_bloques)
+        for d in range(num_dias):
+            h[(idx, d)] = model.NewIntVarFromDomain(cp_model.Domain.FromValues(permitidos), f"h_{idx}_{d}")
+        model.Add(sum(h[(idx, d)] for d in range(num_dias)) == req["horas"])
+        for k in (2, 3) if not patrones[idx] else sorted(set(patrones[idx])):
+            for d in range(num_dias):
+                var = model.NewBoolVar(f"esk_{idx}_{d}_{k}")
+                model.Add(h[(idx, d)] == k).OnlyEnforceIf(var)
+                model.Add(h[(idx, d)] != k).OnlyEnforceIf(var.Not())
+                es_k[(idx, d, k)] = var
+
+        # Desglose de horas (mismas reglas que el modelo monolítico)
+        def _cuenta(k):
+            return sum(es_k[(idx, d, k)] for d in range(num_dias))
+
+        if patrones[idx]:
+            for k, cnt in Counter(patrones[idx]).items():
+                model.Add(_cuenta(k) == cnt)
+        elif req["horas"] == 5:
+            model.Add(_cuenta(3) == 1)
+            model.Add(_cuenta(2) == 1)
+        elif req["horas"] == 4:
+            model.Add(_cuenta(3) == 0)
+            model.Add(_cuenta(2) == 2)
+        elif req["horas"] == 3:
+            model.Add(_cuenta(3) == (0 if especiales[idx] else 1))
+            model.Add(_cuenta(2) == (1 if especiales[idx] else 0))
+        elif req["horas"] == 2:
+            model.Add(_cuenta(2) == 1)
+            model.Add(_cuenta(3) == 0)
+
+    reqs_por_grado, reqs_por_docente, reqs_por_docente_grado = {}, {}, {}
+    for idx, req in enumerate(map_asignaciones):
+        reqs_por_grado.setdefault(req["grado"], []).append(idx)
+        reqs_por_docente.setdefault(req["docente"], []).append(idx)
+        reqs_por_docente_grado.setdefault((req["docente"], req["grado"]), []).append(idx)
+
+    # total[(grado, d)]: sin huecos, el grado ocupa los bloques 0..total-1
+    total = {}
+    for d in range(num_dias):
+        for grado, indices in reqs_por_grado.items():
+            total[(grado, d)] = model.NewIntVar(0, num_bloques, f"total_{grado}_{d}")
+            model.Add(total[(grado, d)] == sum(h[(idx, d)] for idx in indices))
+
+    # Cada clase necesita una ventana continua disponible del docente dentro de
+    # 0..total-1 de su grado: tabla de pares (horas, total) compatibles.
+    tablas = {}
+    for idx, req in enumerate(map_asignaciones):
+        permitidos = _valores_permitidos(req, patrones[idx], especiales[idx], num_bloques)
+        for d in range(num_dias):
+            clave = (req["docente"], d, tuple(permitidos))
+            if clave not in tablas:
+                libre = [(req["docente"], d, b) not in bloqueos for b in range(num_bloques)]
+                tablas[clave] = [
+                    (v, t)
+                    for v in permitidos
+                    for t in range(v, num_bloques + 1)
+                    if v == 0 or any(all(libre[s:s + v]) for s in range(t - v + 1))
+                ]
+            model.AddAllowedAssignments([h[(idx, d)], total[(req["grado"], d)]], tablas[clave])
+
+    for d in range(num_dias):
+        for doc, indices in reqs_por_docente.items():
+            libres = num_bloques - sum(1 for b in range(num_bloques) if (doc, d, b) in bloqueos)
+            model.Add(sum(h[(idx, d)] for idx in indices) <= libres)
+        if datos["r_limitar_docente_grado"]:
+            for indices in reqs_por_docente_grado.values():
+                model.Add(sum(h[(idx, d)] for idx in indices) <= 3)
+
+    if int(version) == 1:
+        for grado, indices in reqs_por_grado.items():
+            sin_patron = [idx for idx in indices if not patrones_raw[idx]]
+            if not sin_patron:
+                continue
+            for d in range(num_dias):
+                model.Add(sum(es_k[(idx, d, 3)] for idx in sin_patron) == 1)
+                total_2h = sum(es_k[(idx, d, 2)] for idx in sin_patron)
+                model.Add(total_2h >= 1)
+                model.Add(total_2h <= 2)
+
+    if opciones["romper_simetrias"]:
+        def _clave(idx):
+            return (tuple(patrones[idx] or ()), especiales[idx])
+
+        romper_simetrias(model, map_asignaciones, h, _clave, num_dias, num_bloques)
+
+    return model, h
+
+
+def _componentes_dia(map_asignaciones, horas_dia):
+    """Grupos de asignaciones del día conectados por grado o por docente compartido."""
+    padre = {}
+
+    def _raiz(n):
+        while padre.setdefault(n, n) != n:
+            padre[n] = padre[padre[n]]
+            n = padre[n]
+        return n
+
+    for idx, horas in horas_dia.items():
+        if horas > 0:
+            req = map_asignaciones[idx]
+            padre[_raiz(("g", req["grado"]))] = _raiz(("d", req["docente"]))
+
+    componentes = {}
+    for idx, horas in horas_dia.items():
+        if horas > 0:
+            componentes.setdefault(_raiz(("g", map_asignaciones[idx]["grado"])), []).append(idx)
+    return list(componentes.values())
+
+
+def _ubicar_clases(clases, bloqueados_por_docente, tiempo):
+    """Inicio de cada clase dentro del día ({idx: bloque}) o None si no hay solución."""
+    model = cp_model.CpModel()
+    total_grado = Counter()
+    for _, grado, _, horas in clases:
+        total_grado[grado] += horas
+
+    inicios = {}
+    por_grado, por_docente = {}, {}
+    for idx, grado, docente, horas in clases:
+        bloqueados = set(bloqueados_por_docente.get(docente, ()))
+        validos = [
+            s for s in range(total_grado[grado] - horas + 1)
+            if not any(b in bloqueados for b in range(s, s + horas))
+        ]
+        if not validos:
+            return None
+        inicio = model.NewIntVarFromDomain(cp_model.Domain.FromValues(validos), f"s_{idx}")
+        intervalo = model.NewFixedSizeIntervalVar(inicio, horas, f"i_{idx}")
+        inicios[idx] = inicio
+        por_grado.setdefault(grado, []).append(intervalo)
+        por_docente.setdefault(docente, []).append(intervalo)
+
+    # Cada grado llena exactamente [0, total): sin huecos por construcción
+    for intervalos in por_grado.values():
+        model.AddNoOverlap(intervalos)
+    for intervalos in por_docente.values():
+        model.AddNoOverlap(intervalos)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(tiempo)
+    solver.parameters.num_search_workers = 1
+    status = solver.Solve(model)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return {idx: solver.Value(v) for idx, v in inicios.items()}
+    if status == cp_model.INFEASIBLE:
+        return None
+    raise TimeoutError("Subproblema de bloques sin resolver en el tiempo asignado")
+
+
+def _resolver_subproblema(sub):
+    """
+    Fase 2 para una componente de un día. sub = {"clases": [(idx, grado, docente, horas)],
+    "bloqueados": {docente: [bloques]}, "tiempo": s}.
+    Devuelve ("ok", {idx: inicio}) o ("conflicto", grados): un conjunto mínimo de
+    grados cuyas clases de ese día ya no tienen solución por sí solas (quitar
+    grados solo relaja el problema, así que el corte sobre ellos es válido).
+    Se ejecuta en un hilo del pool compartido: no toca estado del llamador.
+    """
+    inicios = _ubicar_clases(sub["clases"], sub["bloqueados"], sub["tiempo"])
+    if inicios is not None:
+        return ("ok", inicios)
+    grados = sorted({grado for _, grado, _, _ in sub["clases"]})
+    for grado in list(grados):
+        resto = [g for g in grados if g != grado]
+        if not resto:
+            continue
+        clases = [c for c in sub["clases"] if c[1] in resto]
+        if _ubicar_clases(clases, sub["bloqueados"], sub["tiempo"]) is None:
+            grados = resto
+    return ("conflicto", grados)
+
+
+def generar_horario_dos_fases(
+    docentes,
+    asignaciones,
+    restricciones,
+    horas_curso_grado,
+    nivel="Secundaria",
+    version=1,
+    patrones_division=None,
+    progress_callback=None,
+    opciones_solver=None,
+    num_dias=NUM_DIAS,
+):
+    """
+    Misma entrada y salida que generar_horario_cp, resuelto en dos fases.
+    opciones_solver admite además procesos_fase2: subproblemas en paralelo
+    (default: min(días, núcleos); 1 los resuelve en el hilo del llamador).
+    """
+    print("[2F] Iniciando motor de dos fases...")
+    t0 = time.time()
+    num_bloques = 7 if int(version) == 1 else 8
+    opciones = resolver_opciones(opciones_solver)
+    limite = t0 + float(opciones["max_time_in_seconds"])
+
+    datos = preparar_datos(docentes, asignaciones, restricciones, horas_curso_grado, nivel, num_bloques, num_dias)
+    map_asignaciones = datos["map_asignaciones"]
+    bloqueos = datos["bloqueos"]
+
+    patrones_raw = [obtener_patron(patrones_division, req) for req in map_asignaciones]
+    patrones = [
+        p if p and sum(p) == req["horas"] else None
+        for p, req in zip(patrones_raw, map_asignaciones)
+    ]
+    especiales = [
+        int(version) == 1 and req["horas"] == 3 and req["curso"] in (9, 12)
+        for req in map_asignaciones
+    ]
+
+    bloqueados_dia = {}
+    for doc, d, b in bloqueos:
+        bloqueados_dia.setdefault((doc, d), []).append(b)
+
+    model, h = _modelo_dias(datos, patrones, especiales, patrones_raw, num_bloques, version, opciones)
+    valores = np.zeros((len(map_asignaciones), num_dias, num_bloques), dtype=np.int8)
+    status_name = "UNKNOWN"
+
+    procesos = int(opciones.get("procesos_fase2") or min(num_dias, os.cpu_count() or 1))
+    pool = _pool_fase2() if procesos > 1 and MAX_HILOS_FASE2 > 1 else None
+    try:
+        for iteracion in range(1, MAX_ITERACIONES + 1):
+            restante = limite - time.time()
+            if restante <= 0:
+                break
+            if progress_callback:
+                progress_callback(min(10 + iteracion * 2, 85), f"fase 1 (iteracion {iteracion})")
+
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = restante
+            solver.parameters.num_search_workers = int(opciones["num_search_workers"])
+            if opciones.get("random_seed") is not None:
+                solver.parameters.random_seed = int(opciones["random_seed"])
+            with solver_activo(opciones["num_search_workers"]):
+                status = solver.Solve(model)
+            if status == cp_model.INFEASIBLE:
+                status_name = "INFEASIBLE"
+                break
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                break
+
+            horas = {key: solver.Value(var) for key, var in h.items()}
+            subproblemas = []
+            for d in range(num_dias):
+                horas_dia = {idx: horas[(idx, d)] for idx in range(len(map_asignaciones))}
+                for comp in _componentes_dia(map_asignaciones, horas_dia):
+                    docentes_comp = {map_asignaciones[idx]["docente"] for idx in comp}
+                    subproblemas.append((d, comp, {
+                        "clases": [
+                            (idx, map_asignaciones[idx]["grado"], map_asignaciones[idx]["docente"], horas_dia[idx])
+                            for idx in comp
+                        ],
+                        "bloqueados": {doc: bloqueados_dia.get((doc, d), []) for doc in docentes_comp},
+                        "tiempo": min(TIEMPO_SUBPROBLEMA, max(restante, 0.1)),
+                    }))
+
+            if pool:
+                soluciones = list(pool.map(_resolver_subproblema, [s for _, _, s in subproblemas]))
+            else:
+                soluciones = [_resolver_subproblema(s) for _, _, s in subproblemas]
+
+            fallidas = 0
+            for (d, comp, _), (estado, detalle) in zip(subproblemas, soluciones):
+                if estado == "ok":
+                    inicios = detalle
+                    for idx, s in inicios.items():
+                        valores[idx, d, s:s + horas[(idx, d)]] = 1
+                    continue
+                fallidas += 1
+                _agregar_corte(model, h, map_asignaciones, detalle, d, horas, bloqueados_dia, num_dias)
+
+            print(f"[2F] Iteracion {iteracion}: {len(subproblemas)} subproblemas, {fallidas} sin solucion")
+            if fallidas == 0:
+                status_name = "OPTIMAL"
+                break
+            valores[:] = 0
+    except TimeoutError as e:
+        print("[2F]", e)
+        valores[:] = 0
+
+    if status_name != "OPTIMAL":
+        valores[:] = 0
+    return construir_salida(
+        valores, map_asignaciones, nivel, datos["total_horas_requeridas"], status_name, t0
+    )
+
+
+def _agregar_corte(model, h, map_asignaciones, grados, d, horas, bloqueados_dia, num_dias):
+    """
+    Prohíbe en la fase 1 la combinación de horas que dejó sin solución a esos
+    grados ese día. El subproblema depende solo de las asignaciones de esos
+    grados, así que el corte fija todas ellas (incluidas las que valen 0 ese
+    día). Se replica en los días donde sus docentes tienen exactamente la misma
+    disponibilidad.
+    """
+    grados = set(grados)
+    involucradas = [idx for idx, req in enumerate(map_asignaciones) if req["grado"] in grados]
+    docentes = {map_asignaciones[idx]["docente"] for idx in involucradas if horas[(idx, d)] > 0}
+    combinacion = tuple(horas[(idx, d)] for idx in involucradas)
+    perfil = {doc: sorted(bloqueados_dia.get((doc, d), [])) for doc in docentes}
+    for otro in range(num_dias):
+        if all(sorted(bloqueados_dia.get((doc, otro), [])) == perfil[doc] for doc in docentes):
+            model.AddForbiddenAssignments([h[(idx, otro)] for idx in involucradas], [combinacion])
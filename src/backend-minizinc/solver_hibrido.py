@@ -3,15 +3,22 @@ import json
 import subprocess
 import tempfile
 
+from salida_horario import DIAS_BD, NUM_DIAS
+
 def llamar_minizinc_chuffed(data):
     docentes = data['docentes']
     asignaciones = data['asignaciones']
     restricciones = data['restricciones']
     horas_curso_grado = data['horas_curso_grado']
 
-    NUM_DIAS = 5
+    num_dias = int(data.get('num_dias', NUM_DIAS))
     NUM_BLOQUES = 8
-    NUM_GRADOS = 5
+    # Grados presentes en los datos (ids de grado o de sección), no 1..5 fijo
+    grados = sorted(
+        {int(g) for por_grado in asignaciones.values() for g in por_grado}
+        | {int(g) for por_grado in horas_curso_grado.values() for g in por_grado}
+    )
+    NUM_GRADOS = len(grados)
     NUM_CURSOS = len(asignaciones)
     NUM_DOCENTES = len(docentes)
 
@@ -24,13 +31,13 @@ def llamar_minizinc_chuffed(data):
 
         def matriz3d_bool(nombre, tensor):
             flat = ",".join("true" if val else "false" for d in tensor for fila in d for val in fila)
-            return f"{nombre} = array3d(1..{NUM_DOCENTES}, 1..{NUM_DIAS}, 1..{NUM_BLOQUES}, [{flat}]);\n"
+            return f"{nombre} = array3d(1..{NUM_DOCENTES}, 1..{num_dias}, 1..{NUM_BLOQUES}, [{flat}]);\n"
 
         docente_asignado = [[0] * NUM_GRADOS for _ in range(NUM_CURSOS)]
         for c in range(NUM_CURSOS):
             curso_id = str(c + 1)
             for g in range(NUM_GRADOS):
-                grado = str(g + 1)
+                grado = str(grados[g])
                 if curso_id in asignaciones and grado in asignaciones[curso_id]:
                     docente_asignado[c][g] = asignaciones[curso_id][grado]["docente_id"]
 
@@ -38,11 +45,11 @@ def llamar_minizinc_chuffed(data):
         for c in range(NUM_CURSOS):
             curso_id = str(c + 1)
             for g in range(NUM_GRADOS):
-                grado = str(g + 1)
+                grado = str(grados[g])
                 horas[c][g] = horas_curso_grado.get(curso_id, {}).get(grado, 0)
 
-        disponible = [[[False for _ in range(NUM_BLOQUES)] for _ in range(NUM_DIAS)] for _ in range(NUM_DOCENTES)]
-        dias = ["lunes", "martes", "miércoles", "jueves", "viernes"]
+        disponible = [[[False for _ in range(NUM_BLOQUES)] for _ in range(num_dias)] for _ in range(NUM_DOCENTES)]
+        dias = DIAS_BD[:num_dias]
         for d_idx in range(NUM_DOCENTES):
             docente_id = str(d_idx + 1)
             for dia_idx, dia in enumerate(dias):
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# telemetria.py
+#
+# Métricas Prometheus del backend (se exponen en /metrics). Con varios
+# workers de gunicorn se usa el modo multiproceso de prometheus_client:
+# basta con definir PROMETHEUS_MULTIPROC_DIR antes de arrancar (ver
+# gunicorn.conf.py); cada proceso escribe sus valores ahí y /metrics los
+# agrega.
+
+import os
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+_BUCKETS_SOLVER = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+_BUCKETS_TAMANO = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+HTTP_SEGUNDOS = Histogram(
+    "horario_http_request_seconds",
+    "Latencia de los requests HTTP por endpoint",
+    ["endpoint", "metodo", "status"],
+    buckets=_BUCKETS_SOLVER,
+)
+ETAPA_SEGUNDOS = Histogram(
+    "horario_etapa_seconds",
+    "Duración de cada etapa: las del pipeline y, dentro de resolver, modelo y solver",
+    ["etapa"],
+    buckets=_BUCKETS_SOLVER,
+)
+MODELO_VARIABLES = Histogram("horario_modelo_variables", "Variables del modelo CP-SAT", buckets=_BUCKETS_TAMANO)
+MODELO_RESTRICCIONES = Histogram(
+    "horario_modelo_restricciones", "Restricciones del modelo CP-SAT", buckets=_BUCKETS_TAMANO
+)
+SOLVER_STATUS = Counter("horario_solver_status_total", "Resultados del solver por status", ["status", "motor"])
+TRABAJOS_EN_CURSO = Gauge(
+    "horario_trabajos_en_curso",
+    "Jobs resolviéndose en este proceso (el web no cuenta los que sigue en la cola)",
+    multiprocess_mode="livesum",
+)
+TRABAJOS_PENDIENTES = Gauge(
+    "horario_trabajos_pendientes", "Trabajos esperando un worker en la cola compartida", multiprocess_mode="livemax"
+)
+HILOS_SOLVER = Gauge(
+    "horario_solver_hilos_activos", "Workers de CP-SAT resolviendo en este momento", multiprocess_mode="livesum"
+)
+SUSCRIPTORES_SSE = Gauge(
+    "horario_sse_suscriptores", "Streams SSE abiertos (servidor ASGI)", multiprocess_mode="livesum"
+)
+CACHE = Counter("horario_cache_total", "Consultas a caches internas", ["cache", "resultado"])
+SUPABASE_SEGUNDOS = Histogram(
+    "horario_supabase_seconds",
+    "Latencia de las llamadas a Supabase (hasta recibir la respuesta)",
+    ["tabla", "metodo"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def multiproceso():
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def _registro():
+    if multiproceso():
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return registro
+    return REGISTRY
+
+
+def exportar():
+    """(cuerpo, content-type) para /metrics; en multiproceso agrega todos los workers."""
+    return generate_latest(_registro()), CONTENT_TYPE_LATEST
+
+
+def servir_metricas(puerto, direccion="0.0.0.0"):
+    """/metrics en un hilo propio, para procesos sin Flask (worker_solver.py)."""
+    servidor, _ = start_http_server(puerto, addr=direccion, registry=_registro())
+    return servidor
+
+
+def proceso_terminado(pid):
+    """Para el child_exit de gunicorn: descarta los gauges 'live' del worker."""
+    if multiproceso():
+        multiprocess.mark_process_dead(pid)
+
+
+def contar_cache(cache, acierto):
+    CACHE.labels(cache, "acierto" if acierto else "fallo").inc()
+
+
+@contextmanager
+def trabajo_en_curso():
+    TRABAJOS_EN_CURSO.inc()
+    try:
+        yield
+    finally:
+        TRABAJOS_EN_CURSO.dec()
+
+
+@contextmanager
+def solver_activo(hilos):
+    hilos = max(int(hilos or 1), 1)
+    HILOS_SOLVER.inc(hilos)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        HILOS_SOLVER.dec(hilos)
+        ETAPA_SEGUNDOS.labels("solver").observe(time.perf_counter() - t0)
+
+
+def observar_modelo(proto, segundos):
+    ETAPA_SEGUNDOS.labels("modelo").observe(segundos)
+    MODELO_VARIABLES.observe(len(proto.variables))
+    MODELO_RESTRICCIONES.observe(len(proto.constraints))
+
+
+def observar_pipeline(evento, etapa, pipeline):
+    """Hook de PipelineGeneracion: registra cada etapa al terminar."""
+    if evento == "fin" and etapa in pipeline.tiempos:
+        ETAPA_SEGUNDOS.labels(etapa).observe(pipeline.tiempos[etapa])
+
+
+# --- Instrumentación de Flask y del cliente de Supabase ---
+
+def instrumentar_flask(app):
+    from flask import g, request
+
+    @app.before_request
+    def _inicio_request():
+        g._t0_metricas = time.perf_counter()
+
+    @app.after_request
+    def _fin_request(response):
+        t0 = g.pop("_t0_metricas", None)
+        if t0 is not None and request.path != "/metrics":
+            endpoint = request.url_rule.rule if request.url_rule is not None else "sin_ruta"
+            HTTP_SEGUNDOS.labels(endpoint, request.method, str(response.status_code)).observe(
+                time.perf_counter() - t0
+            )
+        return response
+
+
+def _tabla_de(url):
+    # /rest/v1/<tabla> o /rest/v1/rpc/<funcion>
+    partes = [p for p in urlsplit(str(url)).path.split("/") if p]
+    return partes[-1] if partes else "?"
+
+
+def instrumentar_supabase(cliente):
+    """Mide cada llamada de PostgREST con los event hooks de su sesión httpx."""
+    sesion = cliente.postgrest.session
+
+    def _antes(req):
+        req.extensions["t0_metricas"] = time.perf_counter()
+
+    def _despues(resp):
+        t0 = resp.request.extensions.get("t0_metricas")
+        if t0 is not None:
+            SUPABASE_SEGUNDOS.labels(_tabla_de(resp.request.url), resp.request.method).observe(
+                time.perf_counter() - t0
+            )
+
+    sesion.event_hooks = {
+        "request": list(sesion.event_hooks.get("request", [])) + [_antes],
+        "response": list(sesion.event_hooks.get("response", [])) + [_despues],
+    }
+    return cliente
@@ -0,0 +1,49 @@
+import ast
+import os
+import subprocess
+import sys
+
+import arranque
+
+
+def test_importar_app_no_carga_ortools_ni_supabase():
+    env = {k: v for k, v in os.environ.items() if k not in ("SUPABASE_URL", "SUPABASE_KEY")}
+    codigo = (
+        "import sys, app; "
+        "print(any(m in sys.modules for m in ('ortools.sat.python.cp_model', 'supabase')))"
+    )
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert salida.stdout.strip().endswith("False")
+
+
+def test_pregeneracion_no_arranca_al_importar():
+    # Con --preload el import corre en el master: los hilos arrancan en cada worker
+    env = dict(os.environ, PREGENERACION="1")
+    codigo = (
+        "import threading, app; nombres = lambda: sorted(h.name for h in threading.enumerate()); "
+        "antes = nombres(); app.iniciar_pregeneracion(); print(antes); print(nombres())"
+    )
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    antes, despues = (set(ast.literal_eval(linea)) for linea in salida.stdout.splitlines()[-2:])
+    pregeneracion = {"pregeneracion", "pregeneracion-auditoria"}
+    assert not antes & pregeneracion and pregeneracion <= despues
+
+
+def test_calentar_solver_marca_estado():
+    arranque.calentar(db=False)
+    estado = arranque.estado()
+    assert estado["solver"] and "solver" in estado["tiempos"]
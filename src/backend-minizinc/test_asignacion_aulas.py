@@ -0,0 +1,63 @@
+from collections import Counter
+
+import numpy as np
+
+from asignacion_aulas import asignar_aulas, candidatas_por_docente, emparejar
+from benchmark_generador import instancia_sintetica
+from pipeline_horario import PipelineGeneracion
+from repositorio_local import ClienteLocal
+
+AULAS = [{"id": 1, "tipo": "Teorica"}, {"id": 2, "tipo": "Teorica"}, {"id": 3, "tipo": "Laboratorio"}]
+
+
+def test_emparejar_prefiere_aula_propia():
+    # 10 y 20 comparten el aula 1; 30 está en el laboratorio; 40 no tiene aula
+    docentes = [{"id": 10, "aula_id": 1}, {"id": 20, "aula_id": 1}, {"id": 30, "aula_id": 3}, {"id": 40}]
+    candidatas = candidatas_por_docente(docentes, AULAS)
+    assert sorted(candidatas) == [10, 20, 30]
+    assert candidatas[10] == ("Teorica", [(1, 0), (2, 1)])
+
+    assert emparejar([10, 30], candidatas) == [1, 3]
+    assert sorted(emparejar([10, 20], candidatas)) == [1, 2]
+    # Tres teóricas y dos aulas: una se queda sin aula
+    candidatas[50] = candidatas[10]
+    assert sorted(emparejar([10, 20, 50], candidatas), key=str) == [1, 2, None]
+
+
+def test_choque_devuelve_cortes_para_el_tipo():
+    docentes = [{"id": 10, "aula_id": 3}, {"id": 20, "aula_id": 3}, {"id": 30}]
+    cursos = np.zeros((5, 8, 3), dtype=np.int32)
+    docs = np.zeros((5, 8, 3), dtype=np.int32)
+    # Lunes 0: los dos docentes de laboratorio a la vez; 30 no necesita aula
+    cursos[0, 0], docs[0, 0] = [1, 2, 3], [10, 20, 30]
+    cursos[1, 0, 0], docs[1, 0, 0] = 1, 10
+    resultado = {"matriz_cursos": cursos, "matriz_docentes": docs, "grados": [1, 2, 3]}
+
+    aulas = asignar_aulas(resultado, docentes, AULAS)
+    assert len(aulas["asignadas"]) == 3
+    (choque,) = aulas["choques"]
+    assert (choque["dia"], choque["bloque"], choque["tipo"], choque["aulas"]) == (0, 0, "Laboratorio", 1)
+    # Empate: uno de los dos se queda sin aula
+    (sin_aula,) = choque["sin_aula"]
+    assert sin_aula["docente_id"] in (10, 20) and sin_aula["aula_id"] is None
+    assert len(aulas["cortes"]) == 40
+    assert aulas["cortes"][0] == {"dia": 0, "bloque": 0, "docentes": [10, 20], "max": 1}
+    assert asignar_aulas(resultado, docentes, AULAS, paralelo=4) == aulas
+
+
+def test_pipeline_resuelve_choques_con_cortes():
+    inst = instancia_sintetica("pequena")
+    docentes = [dict(d) for d in inst["docentes"]]
+    laboratorio = {d["id"] for d in docentes[:4]}
+    for d in docentes[:4]:
+        d["aula_id"] = 3
+    data = dict(
+        inst, docentes=docentes, aulas=AULAS,
+        opciones_solver={"max_time_in_seconds": 10, "num_search_workers": 1, "auto": False},
+    )
+    payload = PipelineGeneracion(ClienteLocal(), data).ejecutar()
+
+    assert payload["choques_aulas"] == [] and payload["asignaciones_fallidas"] == 0
+    assert {f["aula_id"] for f in payload["aulas"]} == {3}
+    por_celda = Counter((f["dia"], f["bloque"]) for f in payload["aulas"] if f["docente_id"] in laboratorio)
+    assert max(por_celda.values()) == 1
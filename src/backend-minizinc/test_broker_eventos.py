@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import asgi
+from broker_eventos import BrokerEventos
+from trabajos import esperar_trabajo, lanzar_o_unirse, obtener_trabajo
+
+
+def _job_en_espera():
+    liberar = threading.Event()
+
+    def tarea(progress_cb):
+        progress_cb(10, "cargando")
+        liberar.wait(5)
+        return {"version": 3}
+
+    return lanzar_o_unirse(tarea)[0], liberar
+
+
+def test_un_oyente_por_job_para_todos_los_suscriptores():
+    job_id, liberar = _job_en_espera()
+
+    async def _escenario():
+        broker = BrokerEventos()
+        suscripciones = [broker.suscribir(job_id) for _ in range(50)]
+        assert broker.suscribir("no-existe") is None
+        assert len(obtener_trabajo(job_id)["oyentes"]) == 1
+
+        liberar.set()
+        canal = suscripciones[0][0]
+        for _, cola in suscripciones:
+            indices = [await asyncio.wait_for(cola.get(), 5) for _ in range(2)]
+            assert [canal.eventos[i][0] for i in indices] == ["progress", "done"]
+        # Serializado una sola vez para todos
+        assert canal.sse(1, "json") is canal.sse(1, "json")
+
+        for _, cola in suscripciones:
+            broker.desuscribir(job_id, cola)
+        assert broker.canales() == 0
+
+    asyncio.run(_escenario())
+    assert obtener_trabajo(job_id)["oyentes"] == []
+
+
+def test_stream_sse_asgi():
+    job_id, liberar = _job_en_espera()
+
+    async def _pedir(path):
+        enviados = []
+
+        async def receive():
+            await asyncio.sleep(3600)
+
+        async def send(mensaje):
+            enviados.append(mensaje)
+
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": b"",
+                 "headers": [(b"origin", b"http://localhost:5173")]}
+        await asyncio.wait_for(asgi.app(scope, receive, send), 10)
+        return enviados
+
+    async def _escenario():
+        no_encontrado = await _pedir("/generar-horario-general-job/nada/events")
+        assert no_encontrado[0]["status"] == 404
+
+        tarea = asyncio.ensure_future(_pedir(f"/generar-horario-general-job/{job_id}/events"))
+        await asyncio.sleep(0.1)
+        liberar.set()
+        return await tarea
+
+    enviados = asyncio.run(_escenario())
+    inicio, cuerpo = enviados[0], b"".join(m.get("body", b"") for m in enviados[1:])
+    assert inicio["status"] == 200
+    assert (b"access-control-allow-origin", b"http://localhost:5173") in inicio["headers"]
+    assert cuerpo.startswith(b"event: progress\n") and b"event: done\n" in cuerpo
+    assert esperar_trabajo(job_id, timeout=5)["status"] == "done"
@@ -0,0 +1,53 @@
+import pytest
+
+from codec_horario import (
+    FORMATO_JSON,
+    a_almacenamiento,
+    a_texto,
+    codificar,
+    decodificar,
+    empaquetar_payload,
+    formatos_disponibles,
+    horario_de,
+    negociar,
+)
+
+HORARIO = [[[(d * 8 + b) * 5 + g for g in range(5)] for b in range(8)] for d in range(5)]
+
+
+@pytest.mark.parametrize("formato", formatos_disponibles())
+def test_ida_y_vuelta(formato):
+    datos = codificar(HORARIO, formato)
+    assert datos[:2] == b"HZ"
+    assert decodificar(datos) == HORARIO
+    assert horario_de(a_texto(HORARIO, formato)) == HORARIO
+    assert horario_de(HORARIO) is HORARIO
+    guardado = a_almacenamiento(HORARIO, [6, 7, 8, 9, 10], formato)
+    assert guardado["formato"] == formato and guardado["grados"] == [6, 7, 8, 9, 10]
+    assert horario_de(guardado) == HORARIO
+
+
+def test_valida_rango_y_forma():
+    with pytest.raises(ValueError):
+        codificar([[[70000]]])
+    with pytest.raises(ValueError):
+        codificar([[1, 2]])
+    with pytest.raises(ValueError):
+        codificar(HORARIO, "u32")
+
+
+def test_negociacion():
+    assert negociar(None) == FORMATO_JSON
+    assert negociar("application/json") == FORMATO_JSON
+    assert negociar("application/x-horario-u16+gzip, application/json") == "u16+gzip"
+    assert negociar("application/x-horario-u16+brotli;q=1, application/x-horario-u16") == "u16"
+    assert negociar("application/x-horario-u16", formato="u16+gzip") == "u16+gzip"
+
+
+def test_empaquetar_no_modifica_el_resultado_compartido():
+    resultado = {"horario": HORARIO, "version": 3}
+    empaquetado = empaquetar_payload(resultado, "u16+gzip")
+    assert resultado["horario"] is HORARIO
+    assert empaquetado["horario_formato"] == "u16+gzip"
+    assert horario_de(empaquetado["horario"]) == HORARIO
+    assert empaquetar_payload(resultado, FORMATO_JSON) is resultado
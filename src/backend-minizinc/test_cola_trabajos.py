@@ -0,0 +1,133 @@
+import threading
+import urllib.request
+
+import pytest
+from prometheus_client import REGISTRY
+
+from cola_trabajos import ColaSQLite, tarea_remota
+from telemetria import servir_metricas
+from trabajos import esperar_trabajo, lanzar_o_unirse, suscribir
+from worker_solver import barrer, correr, procesar_uno
+
+
+def test_reclamo_exclusivo_y_clave_compartida(tmp_path):
+    ruta = str(tmp_path / "cola.db")
+    cola_a, cola_b = ColaSQLite(ruta), ColaSQLite(ruta)
+
+    t1, nuevo_1 = cola_a.encolar({"nivel": "Primaria"}, "clave-1")
+    t2, nuevo_2 = cola_b.encolar({"nivel": "Primaria"}, "clave-1")
+    t3, _ = cola_b.encolar({"nivel": "Secundaria"})
+    assert (nuevo_1, nuevo_2) == (True, False) and t1 == t2 != t3
+
+    # Dos workers sobre el mismo archivo nunca reclaman el mismo trabajo
+    reclamados = [cola_a.reclamar("w1"), cola_b.reclamar("w2"), cola_a.reclamar("w3")]
+    assert [r["id"] for r in reclamados[:2]] == [t1, t3]
+    assert reclamados[2] is None
+    assert reclamados[0]["payload"] == {"nivel": "Primaria"}
+
+    assert cola_b.terminar(t1, "w1", {"version": 4})
+    assert cola_a.estado(t1)["resultado"] == {"version": 4}
+    # Terminado, la misma clave vuelve a encolar
+    assert cola_a.encolar({"nivel": "Primaria"}, "clave-1")[1] is True
+
+
+def test_trabajo_sin_latido_vuelve_a_la_cola(tmp_path):
+    cola = ColaSQLite(str(tmp_path / "cola.db"))
+    trabajo_id, _ = cola.encolar({"x": 1})
+    cola.reclamar("caido")
+
+    assert cola.recuperar_vencidos(vencimiento_s=60) == 0
+    assert cola.recuperar_vencidos(vencimiento_s=-1, max_intentos=3) == 1
+    assert cola.estado(trabajo_id)["estado"] == "pendiente"
+
+    # El worker caído ya no puede cerrar el trabajo ni mandar latidos
+    assert cola.reclamar("vivo")["intentos"] == 2
+    assert not cola.latido(trabajo_id, "caido")
+    assert not cola.terminar(trabajo_id, "caido", {"tarde": True})
+    assert cola.latido(trabajo_id, "vivo")
+
+    assert cola.recuperar_vencidos(vencimiento_s=-1, max_intentos=2) == 1
+    info = cola.estado(trabajo_id)
+    assert info["estado"] == "error" and "dejó de responder" in info["error"]
+
+
+def test_worker_publica_progreso_para_el_job_web(tmp_path):
+    cola = ColaSQLite(str(tmp_path / "cola.db"))
+
+    def ejecutar(data, progress_cb):
+        progress_cb(50, "resolviendo")
+        if data.get("falla"):
+            raise ValueError("sin solución")
+        return {"version": data["v"]}
+
+    detener = threading.Event()
+    worker = threading.Thread(target=correr, args=(cola, "w1", detener), kwargs={"sondeo_s": 0.01, "ejecutar": ejecutar})
+    worker.start()
+    try:
+        job_id, _ = lanzar_o_unirse(tarea_remota(cola, {"v": 9}, "cola-ok", sondeo_s=0.01), "cola-ok")
+        eventos = suscribir(job_id)
+        job = esperar_trabajo(job_id, timeout=10)
+        assert job["status"] == "done" and job["result"] == {"version": 9}
+        recibidos = []
+        while not eventos.empty():
+            recibidos.append(eventos.get()[0])
+        assert recibidos[-1] == "done" and "progress" in recibidos
+
+        job_id, _ = lanzar_o_unirse(tarea_remota(cola, {"falla": True}, sondeo_s=0.01))
+        job = esperar_trabajo(job_id, timeout=10)
+        assert job["status"] == "error" and "sin solución" in job["error"]
+    finally:
+        detener.set()
+        worker.join(5)
+
+
+def test_procesar_uno_con_cola_vacia(tmp_path):
+    cola = ColaSQLite(str(tmp_path / "cola.db"))
+    assert procesar_uno(cola, "w1", ejecutar=lambda data, cb: pytest.fail("no debería correr")) is False
+
+
+def test_barrido_limpia_terminados_y_cuenta_pendientes(tmp_path):
+    cola = ColaSQLite(str(tmp_path / "cola.db"))
+    listo, _ = cola.encolar({"x": 1})
+    cola.encolar({"x": 2})
+    cola.encolar({"x": 3})
+    cola.reclamar("w1")
+    cola.publicar(listo, "progress", {"progress": 50})
+    cola.terminar(listo, "w1", {"ok": True})
+    assert cola.pendientes() == 2
+
+    # Dentro de la retención no se borra nada
+    assert cola.limpiar_terminados(retencion_s=60) == 0
+    barrer(cola, retencion_s=-1)
+    assert cola.estado(listo) is None and cola.eventos(listo) == []
+    assert REGISTRY.get_sample_value("horario_trabajos_pendientes") == 2
+
+
+def test_el_web_no_cuenta_como_en_curso_lo_que_sigue_en_la_cola(tmp_path):
+    cola = ColaSQLite(str(tmp_path / "cola.db"))
+    job_id, _ = lanzar_o_unirse(tarea_remota(cola, {"v": 1}, sondeo_s=0.01))
+    # Nadie lo reclama: el job web queda esperando al worker
+    assert esperar_trabajo(job_id, timeout=0.2) is None
+    assert (REGISTRY.get_sample_value("horario_trabajos_en_curso") or 0) == 0
+
+    detener = threading.Event()
+    worker = threading.Thread(
+        target=correr, args=(cola, "w1", detener),
+        kwargs={"sondeo_s": 0.01, "ejecutar": lambda data, cb: data},
+    )
+    worker.start()
+    try:
+        assert esperar_trabajo(job_id, timeout=10)["result"] == {"v": 1}
+    finally:
+        detener.set()
+        worker.join(5)
+
+
+def test_worker_sirve_sus_metricas():
+    servidor = servir_metricas(0, "127.0.0.1")
+    try:
+        puerto = servidor.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/metrics", timeout=5) as respuesta:
+            assert b"horario_trabajos_pendientes" in respuesta.read()
+    finally:
+        servidor.shutdown()
@@ -0,0 +1,64 @@
+from app import ANALISIS, app
+from benchmark_generador import instancia_sintetica
+from cuellos_botella import analizar_cuellos
+from disponibilidad import bit
+from repositorio_local import ClienteLocal
+
+
+def _instancia(mascara_10):
+    # Un grado: curso 1 (5h, docente 10) y curso 2 (4h, docente 20 sin restricciones)
+    return {
+        "docentes": [{"id": 10}, {"id": 20}],
+        "asignaciones": {"1": {"1": {"docente_id": 10}}, "2": {"1": {"docente_id": 20}}},
+        "horas_curso_grado": {"1": {"1": 5}, "2": {"1": 4}},
+        "restricciones": {"disponibilidad": {10: mascara_10}},
+        "nivel": "Secundaria",
+        "version": 2,
+        "opciones_solver": {"max_time_in_seconds": 10},
+    }
+
+
+def test_holguras_y_celda_que_destraba():
+    # 5h = 3h + 2h, pero solo tiene lunes 0-2 y martes 0
+    resultado = analizar_cuellos(ClienteLocal(), _instancia(bit(0, 0) | bit(0, 1) | bit(0, 2) | bit(1, 0)))
+
+    docente = resultado["docentes"][0]
+    assert docente == {"docente_id": 10, "horas": 5, "libres": 4, "holgura": -1, "saturacion": 1.25}
+    assert resultado["grados"][0]["cobertura"] == 40 and resultado["grados"][0]["holgura"] == 31
+
+    assert resultado["status"] == "INFEASIBLE" and resultado["relajado_factible"]
+    assert {"tipo": "liberar", "docente_id": 10, "dia": "martes", "bloques": [1]} in resultado["nucleo"]
+    destraban = [{k: v for k, v in f.items() if k != "segundos"} for f in resultado["desbloquean"]]
+    assert destraban == [{"tipo": "liberar", "docente_id": 10, "dia": "martes", "bloques": [1]}]
+    assert resultado["sondeos"] <= len(resultado["nucleo"])
+
+
+def test_instancia_factible_sin_sondeos():
+    resultado = analizar_cuellos(ClienteLocal(), dict(instancia_sintetica("pequena"), opciones_solver={"max_time_in_seconds": 10}))
+    assert resultado["factible"] and "nucleo" not in resultado
+    holguras = [f["holgura"] for f in resultado["docentes"]]
+    assert holguras == sorted(holguras)
+
+
+def test_tope_de_tiempo_corta_los_sondeos():
+    instancia = _instancia(bit(0, 0) | bit(0, 1) | bit(0, 2) | bit(1, 0))
+    resultado = analizar_cuellos(ClienteLocal(), instancia, tiempo_total_s=0)
+    assert resultado["sin_tiempo"] and resultado["status"] == "UNKNOWN" and "nucleo" not in resultado
+    # Las holguras no usan el solver: salen igual
+    assert resultado["docentes"][0]["holgura"] == -1
+
+
+def test_endpoint_va_por_el_sistema_de_jobs(monkeypatch):
+    cliente = app.test_client()
+    assert cliente.post("/cuellos-botella", json={"nivel": "Secundaria"}).status_code == 400
+
+    llamadas = []
+
+    def _analisis(sb, data):
+        llamadas.append(data)
+        raise TypeError("bug")
+
+    # Un error dentro del análisis ya no se disfraza de 400
+    monkeypatch.setitem(ANALISIS, "cuellos", _analisis)
+    assert cliente.post("/cuellos-botella", json=_instancia(bit(0, 0))).status_code == 500
+    assert len(llamadas) == 1
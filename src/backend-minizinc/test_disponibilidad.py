@@ -0,0 +1,79 @@
+import pytest
+
+from benchmark_generador import instancia_sintetica
+from disponibilidad import (
+    a_mascara,
+    bit,
+    bloqueos_desde_mascaras,
+    mascara_a_base64,
+    mascara_desde_dict,
+    mascaras_disponibilidad,
+)
+from generador_python import normalizar_entrada
+from pipeline_horario import PipelineGeneracion
+from pregeneracion import huella_instancia
+from repositorio_local import ClienteLocal
+
+CELDAS = {"lunes-0": True, "lunes-1": True, "miércoles-3": True, "viernes-7": True, "martes-2": False}
+
+
+def test_formatos_equivalentes():
+    mascara = mascara_desde_dict(CELDAS)
+    assert mascara == bit(0, 0) | bit(0, 1) | bit(2, 3) | bit(4, 7)
+    assert a_mascara(mascara_a_base64(mascara)) == mascara
+    assert a_mascara(mascara) == mascara
+    with pytest.raises(ValueError):
+        a_mascara(True)
+
+    bloqueos = {fmt: bloqueos_desde_mascaras(mascaras_disponibilidad({"7": v}), 5, 8) for fmt, v in (
+        ("dict", CELDAS), ("int", mascara), ("base64", mascara_a_base64(mascara)),
+    )}
+    assert bloqueos["dict"] == bloqueos["int"] == bloqueos["base64"]
+    assert len(bloqueos["dict"]) == 5 * 8 - 4
+    assert (7, 2, 3) not in bloqueos["dict"]
+
+    # Sábado: la máscara crece un byte y sigue siendo compatible
+    sabado = mascara_desde_dict(dict(CELDAS, **{"sábado-1": True}))
+    assert sabado == mascara | bit(5, 1)
+    assert a_mascara(mascara_a_base64(sabado)) == sabado
+    assert len(bloqueos_desde_mascaras({7: sabado}, 6, 8)) == 6 * 8 - 5
+
+
+def test_sin_restricciones_y_docente_sin_bloques():
+    assert mascaras_disponibilidad({"1": {}, "2": None, "x": 5}) == {}
+    # Dict con entradas pero ninguna permitida: el docente queda sin bloques (formato histórico)
+    assert mascaras_disponibilidad({"3": {"lunes-0": False}}) == {3: 0}
+    assert len(bloqueos_desde_mascaras({3: 0}, 5, 7)) == 35
+
+
+def test_entrada_y_huella_no_dependen_del_formato():
+    inst = instancia_sintetica("pequena", grados=(1, 2))
+    docentes = sorted({v["docente_id"] for gs in inst["asignaciones"].values() for v in gs.values()})
+    celdas = {f"{dia}-{b}": True for dia in ("lunes", "martes", "miércoles") for b in range(8)}
+    disp_dict = {str(docentes[0]): celdas}
+    disp_b64 = {str(docentes[0]): mascara_a_base64(mascara_desde_dict(celdas))}
+
+    def datos(disp):
+        restricciones = dict(inst["restricciones"], disponibilidad=disp)
+        entrada = normalizar_entrada([], inst["asignaciones"], restricciones, inst["horas_curso_grado"], "Secundaria", 8)
+        huella = huella_instancia(inst["asignaciones"], restricciones, inst["horas_curso_grado"], "Secundaria", 2)
+        return entrada["bloqueos"], huella
+
+    assert datos(disp_dict) == datos(disp_b64)
+    assert len(datos(disp_dict)[0]) == 2 * 8
+
+
+def test_disponibilidad_de_la_bd_conserva_reglas():
+    inst = instancia_sintetica("pequena", grados=(1, 2))
+    sb = ClienteLocal()
+    sb.table("restricciones_docente").insert({"docente_id": 7, "dia": "lunes", "bloque": 0, "nivel": "Secundaria"}).execute()
+    reglas = {"limitar_carga_docente_grado": False}
+
+    def restricciones(disponibilidad):
+        data = dict(inst, restricciones={"disponibilidad": disponibilidad, "reglas": reglas})
+        return PipelineGeneracion(sb, data).preparar().restricciones
+
+    # Vacía: se lee de la BD, sin perder las reglas del request
+    assert restricciones({}) == {"disponibilidad": {"7": bit(0, 0)}, "reglas": reglas}
+    # Docentes con {} (lo que manda el front): sin restricciones, no se lee la BD
+    assert restricciones({"7": {}}) == {"disponibilidad": {}, "reglas": reglas}
@@ -0,0 +1,87 @@
+import pytest
+
+from app import ANALISIS, app
+from benchmark_generador import instancia_sintetica
+from disponibilidad import bit
+from escenarios import SIN_TIEMPO, EscenarioInvalido, aplicar_cambios, evaluar_escenarios
+from repositorio_local import ClienteLocal
+
+
+def test_aplicar_cambios_no_toca_la_base():
+    base = {
+        "asignaciones": {"3": {"2": {"docente_id": 7}}},
+        "horas_curso_grado": {"3": {"2": 4}},
+        "restricciones": {"disponibilidad": {7: bit(4, 0) | bit(4, 1) | bit(0, 0)}},
+    }
+    variante = aplicar_cambios(base, [
+        {"tipo": "bloquear", "docente_id": 7, "dia": "Viernes"},
+        {"tipo": "liberar", "docente_id": 9, "dia": "lunes", "bloques": [0]},
+        {"tipo": "horas", "curso_id": 3, "grado_id": 2, "horas": 5},
+        {"tipo": "docente", "curso_id": 3, "grado_id": 2, "docente_id": 8},
+    ], num_bloques=8)
+
+    assert variante["restricciones"]["disponibilidad"][7] == bit(0, 0)
+    # Docente sin máscara: semana completa, y liberar no cambia nada
+    assert variante["restricciones"]["disponibilidad"][9] == sum(bit(d, b) for d in range(5) for b in range(8))
+    assert variante["horas_curso_grado"]["3"]["2"] == 5
+    assert variante["asignaciones"]["3"]["2"] == {"docente_id": 8}
+    assert base["horas_curso_grado"]["3"]["2"] == 4 and 9 not in base["restricciones"]["disponibilidad"]
+
+    with pytest.raises(ValueError):
+        aplicar_cambios(base, [{"tipo": "mover"}], 8)
+    with pytest.raises(ValueError):
+        aplicar_cambios(base, [{"tipo": "bloquear", "docente_id": 7, "dia": "domingo"}], 8)
+    # Campos faltantes o no numéricos también son errores del request
+    with pytest.raises(EscenarioInvalido):
+        aplicar_cambios(base, [{"tipo": "horas", "curso_id": 3, "grado_id": 2}], 8)
+    with pytest.raises(EscenarioInvalido):
+        aplicar_cambios(base, [{"tipo": "liberar", "docente_id": None, "dia": "lunes"}], 8)
+
+
+def test_escenarios_contra_la_base():
+    inst = instancia_sintetica("pequena")
+    doc = inst["docentes"][0]["id"]
+    data = dict(inst, opciones_solver={"max_time_in_seconds": 10}, escenarios=[
+        {"nombre": "sin cambios"},
+        {"nombre": "sin docente", "cambios": [
+            {"tipo": "bloquear", "docente_id": doc, "dia": dia}
+            for dia in ("lunes", "martes", "miércoles", "jueves", "viernes")
+        ]},
+    ])
+    resultado = evaluar_escenarios(ClienteLocal(), data, paralelo=2)
+
+    assert resultado["base"]["factible"]
+    igual, sin_docente = resultado["escenarios"]
+    # Partiendo de la base y conservando lo posible: sin cambios, ninguna celda se mueve
+    assert igual["factible"] and igual["celdas_cambiadas"] == 0
+    assert igual["cambios"] == {"set": [], "del": []}
+    assert sin_docente["nombre"] == "sin docente" and not sin_docente["factible"]
+    assert "cambios" not in sin_docente
+
+
+def test_escenarios_invalidos():
+    with pytest.raises(ValueError):
+        evaluar_escenarios(ClienteLocal(), dict(instancia_sintetica("pequena"), escenarios=[]))
+
+
+def test_escenarios_con_tope_de_tiempo():
+    data = dict(instancia_sintetica("pequena"), escenarios=[{"nombre": "a"}, {"nombre": "b"}])
+    resultado = evaluar_escenarios(ClienteLocal(), data, paralelo=2, tiempo_total_s=0)
+
+    assert resultado["base"]["status"] == SIN_TIEMPO
+    assert [(e["nombre"], e["status"]) for e in resultado["escenarios"]] == [("a", SIN_TIEMPO), ("b", SIN_TIEMPO)]
+
+
+def test_endpoint_solo_los_errores_del_request_son_400(monkeypatch):
+    cliente = app.test_client()
+    data = dict(instancia_sintetica("pequena"), escenarios=[{"cambios": [{"tipo": "horas", "curso_id": 1}]}])
+    respuesta = cliente.post("/escenarios", json=data)
+    assert respuesta.status_code == 400 and "horas" in respuesta.get_json()["error"]
+
+    # Un KeyError dentro del análisis es un error interno, no del request
+    def _falla(sb, data):
+        raise KeyError("bug")
+
+    monkeypatch.setitem(ANALISIS, "escenarios", _falla)
+    respuesta = cliente.post("/escenarios", json=dict(data, escenarios=[{"nombre": "ok"}]))
+    assert respuesta.status_code == 500
@@ -0,0 +1,21 @@
+from benchmark_generador import instancia_sintetica
+from esqueleto_modelo import estadisticas, limpiar_esqueletos
+from salida_horario import registros_horarios
+
+
+def test_misma_forma_reusa_esqueleto_y_respeta_nueva_disponibilidad(generar):
+    limpiar_esqueletos()
+    antes = dict(estadisticas)
+    primera = instancia_sintetica("pequena", grados=(1, 2, 3), densidad=1.0)
+    segunda = instancia_sintetica("pequena", grados=(1, 2, 3), densidad=0.8, semilla=3)
+
+    assert generar(primera)["status"] == "OPTIMAL"
+    resultado = generar(segunda)
+    assert estadisticas["fallos"] == antes["fallos"] + 1
+    assert estadisticas["aciertos"] == antes["aciertos"] + 1
+
+    # Mismo veredicto que construyendo el modelo desde cero
+    assert resultado["status"] == generar(segunda, cache_modelo=False)["status"] == "OPTIMAL"
+    disponibilidad = segunda["restricciones"]["disponibilidad"]
+    for r in registros_horarios(resultado, "Secundaria", 1, dias=["lunes", "martes", "miercoles", "jueves", "viernes"]):
+        assert disponibilidad[str(r["docente_id"])].get(f"{r['dia']}-{r['bloque']}")
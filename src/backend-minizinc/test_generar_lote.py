@@ -0,0 +1,46 @@
+import json
+
+from benchmark_generador import instancia_sintetica
+from codec_horario import horario_de
+from generar_lote import armar_trabajos, correr_lote, guardar_en_archivos, guardar_en_supabase
+from repositorio_local import ClienteLocal
+from versiones_horario import cargar_version, celdas_de_registros
+
+
+def test_lote_en_pool_genera_cada_indice(tmp_path):
+    instancias = [
+        instancia_sintetica("pequena", grados=(1, 2), densidad=1.0, version=2),
+        instancia_sintetica("pequena", grados=(1, 2), densidad=1.0, version=3),
+    ]
+    trabajos = armar_trabajos(instancias, generaciones=2, opciones_solver={"preset": "base", "max_time_in_seconds": 10})
+    assert sorted(t["opciones_solver"]["random_seed"] for t in trabajos) == [0, 0, 1, 1]
+
+    resultados, resumen = correr_lote(trabajos, procesos=2)
+    assert [(r["version"], r["generation_index"]) for r in resultados] == [(2, 1), (2, 2), (3, 1), (3, 2)]
+    assert all(r["status"] in ("OPTIMAL", "FEASIBLE") and r["fallidos"] == 0 for r in resultados)
+    assert resumen["trabajos"] == 4
+
+    guardar_en_archivos(resultados, resumen, tmp_path)
+    guardado = json.loads((tmp_path / "secundaria_v2_g1.json").read_text(encoding="utf-8"))
+    assert guardado["registros"] and guardado["horario"]
+
+
+def test_horarios_del_lote_se_versionan():
+    inst = instancia_sintetica("pequena", grados=(1, 2), densidad=1.0)
+    resultado, = correr_lote(armar_trabajos([inst], opciones_solver={"max_time_in_seconds": 10}), procesos=1)[0]
+    sb = ClienteLocal()
+    guardar_en_supabase(sb, [resultado], escribir_horarios=True)
+    guardado = sb.table("horario_generaciones").select("horario").execute().data[0]["horario"]
+    assert horario_de(guardado) == resultado["horario"]
+    # Una columna por grado, para reconstruir el eje sin adivinarlo por nivel
+    assert guardado["grados"] == resultado["grados"] and len(guardado["grados"]) == len(resultado["horario"][0][0])
+    # La segunda corrida pierde una celda: debe borrarse, no quedar de la versión 1
+    menos = dict(resultado, registros=resultado["registros"][1:])
+    guardar_en_supabase(sb, [menos], escribir_horarios=True)
+
+    filas = sb.table("horarios").select("*").eq("nivel", "Secundaria").execute().data
+    assert {f["version_num"] for f in filas} == {2}
+    assert celdas_de_registros(filas) == celdas_de_registros(menos["registros"])
+    versiones = sb.table("horario_versiones").select("version_num").eq("nivel", "Secundaria").execute().data
+    assert sorted(v["version_num"] for v in versiones) == [1, 2]
+    assert cargar_version(sb, "Secundaria", 1) == celdas_de_registros(resultado["registros"])
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from benchmark_generador import instancia_sintetica
+from configuracion_solver import resolver_opciones
+from generador_python import pista_de_resultado
+from optimizacion_etapas import medir
+
+
+def test_medir():
+    # Docente 1: lunes bloques 0 y 3 (2 huecos); docente 2: 2h el lunes y 1h el martes
+    valores = np.zeros((3, 5, 8), dtype=np.int8)
+    valores[0, 0, [0, 3]] = 1
+    valores[1, 0, [1, 2]] = 1
+    valores[2, 1, 0] = 1
+    asignaciones = [{"docente": 1}, {"docente": 2}, {"docente": 2}]
+    assert medir(valores, asignaciones) == {"huecos_docentes": 2, "balance_diario": 4}
+
+
+def test_etapas_mejoran_sin_empeorar(generar):
+    resultado = generar(instancia_sintetica("pequena"), etapas=True, tiempo_etapa_s=5)
+
+    factibilidad, huecos, balance = resultado["etapas"]
+    assert factibilidad["etapa"] == "factibilidad" and resultado["status"] in ("OPTIMAL", "FEASIBLE")
+    assert [huecos["etapa"], balance["etapa"]] == ["huecos_docentes", "balance_diario"]
+    for etapa in (huecos, balance):
+        assert etapa["valor"] <= etapa["inicial"] and etapa["segundos"] < 6
+    # La etapa de balance no deshace lo ganado en huecos
+    assert resultado["calidad"]["huecos_docentes"] <= huecos["valor"]
+    assert resultado["calidad"]["balance_diario"] == balance["valor"]
+    assert resultado["asignaciones_fallidas"] == 0
+
+
+def test_pista_es_el_primer_nivel(generar):
+    inst = instancia_sintetica("pequena")
+    base = generar(inst)
+    resultado = generar(inst, pista=pista_de_resultado(base), etapas=["huecos_docentes"], tiempo_etapa_s=5)
+    # Conservar la pista manda: los huecos solo se reducen sin mover celdas
+    assert np.array_equal(resultado["matriz_cursos"], base["matriz_cursos"])
+
+
+def test_etapa_desconocida():
+    assert resolver_opciones({"etapas": True})["etapas"] == ("huecos_docentes", "balance_diario")
+    assert resolver_opciones({})["etapas"] == ()
+    with pytest.raises(ValueError):
+        resolver_opciones({"etapas": ["huecos_docentes", "ventanas"]})
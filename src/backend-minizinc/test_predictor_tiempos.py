@@ -0,0 +1,80 @@
+import json
+import math
+import random
+
+from benchmark_generador import ejecutar_caso, instancia_sintetica
+from predictor_tiempos import ajustar, ajustar_opciones, leer_historial, predecir_segundos, sugerir
+
+
+def _rasgos(asignaciones, densidad=0.85):
+    return {"asignaciones": asignaciones, "docentes": asignaciones // 3, "grados": 5, "horas": asignaciones * 3,
+            "densidad": densidad, "carga_max": 0.6, "patrones": 0, "version": 2, "nivel": "Secundaria"}
+
+
+def _historial(n=80, semilla=0):
+    # Tiempo ~ asignaciones^1.5, con rendimiento decreciente de los núcleos
+    rnd = random.Random(semilla)
+    filas = []
+    for _ in range(n):
+        rasgos = _rasgos(rnd.choice([10, 20, 40, 80, 160]), rnd.choice([0.7, 0.85, 1.0]))
+        workers = rnd.choice([1, 2, 4, 8])
+        segundos = 0.002 * rasgos["asignaciones"] ** 1.5 / workers ** 0.3 * math.exp(rnd.gauss(0, 0.1))
+        filas.append({"caracteristicas": rasgos, "motor": "monolitico", "num_search_workers": workers,
+                      "segundos": segundos, "censurada": False})
+    return filas
+
+
+def test_ajuste_y_sugerencia():
+    modelo = ajustar(_historial())
+    assert modelo["muestras"] == 80 and modelo["error_mediano"] < 0.2
+    assert 0.5 < predecir_segundos(modelo, _rasgos(80), 1, "monolitico") / (0.002 * 80 ** 1.5) < 2
+
+    chica = sugerir(modelo, _rasgos(10), cpus=8, motores=("monolitico",))
+    grande = sugerir(modelo, _rasgos(160), cpus=8, motores=("monolitico",))
+    assert chica["num_search_workers"] < grande["num_search_workers"]
+    assert chica["max_time_in_seconds"] == 5.0
+    assert grande["max_time_in_seconds"] > grande["prediccion_s"]
+    assert sugerir(modelo, _rasgos(160), cpus=2, motores=("monolitico",))["num_search_workers"] <= 2
+
+
+def test_censuradas_suben_la_prediccion():
+    filas = _historial()
+    grandes = [f for f in filas if f["caracteristicas"]["asignaciones"] == 160]
+    for f in grandes:
+        f["segundos"], f["censurada"] = f["segundos"] * 0.3, True
+    sin_corregir = ajustar([dict(f, censurada=False) for f in filas])
+    corregido = ajustar(filas)
+    rasgos = grandes[0]["caracteristicas"]
+    assert predecir_segundos(corregido, rasgos, 4, "monolitico") > predecir_segundos(sin_corregir, rasgos, 4, "monolitico")
+
+
+def test_respeta_opciones_explicitas():
+    modelo = ajustar(_historial())
+    opciones = ajustar_opciones({"max_time_in_seconds": 12}, _rasgos(40), modelo)
+    assert opciones["max_time_in_seconds"] == 12 and opciones["auto"] is True
+    assert "num_search_workers" in opciones and "motor" in opciones
+    assert ajustar_opciones({"auto": False}, _rasgos(40), modelo) == {}
+
+
+def test_pista_etapas_y_cortes_fuerzan_monolitico():
+    # Historial donde dos_fases es mucho más rápido: sin esas opciones lo elige
+    filas = _historial()
+    filas += [dict(f, motor="dos_fases", segundos=f["segundos"] / 10) for f in filas]
+    modelo = ajustar(filas)
+    assert ajustar_opciones({}, _rasgos(160), modelo)["motor"] == "dos_fases"
+    for opciones in ({"pista": [[1, 0, 0, 2]]}, {"etapas": True}, {"cortes": [{"max": 1}]}):
+        assert ajustar_opciones(opciones, _rasgos(160), modelo)["motor"] == "monolitico"
+
+
+def test_generacion_queda_en_el_historial(tmp_path, monkeypatch):
+    ruta = tmp_path / "historial.jsonl"
+    monkeypatch.setenv("HISTORIAL_SOLVER", str(ruta))
+    ejecutar_caso(instancia_sintetica("pequena"), {"max_time_in_seconds": 5, "num_search_workers": 1, "auto": False})
+
+    fila = json.loads(ruta.read_text(encoding="utf-8").splitlines()[-1])
+    assert fila["caracteristicas"]["asignaciones"] == 40 and fila["num_search_workers"] == 1
+    assert fila["status"] in ("OPTIMAL", "FEASIBLE")
+
+    log = tmp_path / "app.log"
+    log.write_text("[CP-SAT] otra cosa\n[SOLVER-STATS] " + json.dumps(fila) + "\n", encoding="utf-8")
+    assert len(leer_historial([str(ruta), str(log)])) == 2
@@ -0,0 +1,143 @@
+import copy
+import multiprocessing
+import threading
+
+import numpy as np
+
+import pregeneracion
+import worker_solver
+from benchmark_generador import instancia_sintetica
+from cola_trabajos import ColaSQLite
+from pregeneracion import PreGenerador, guardar_pregenerado, hay_pregenerado, huella_instancia, tomar_pregenerado
+from repositorio_local import ClienteLocal
+
+
+def _huella(inst, opciones=None):
+    return huella_instancia(
+        inst["asignaciones"], inst["restricciones"], inst["horas_curso_grado"],
+        inst["nivel"], inst["version"], inst.get("patrones_division"), opciones,
+    )
+
+
+def test_huella_ignora_forma_y_parametros_de_ejecucion():
+    inst = instancia_sintetica("pequena", grados=(1, 2))
+    base = _huella(inst)
+
+    # Mismas asignaciones con campos extra e ids como enteros
+    otra = copy.deepcopy(inst)
+    otra["asignaciones"] = {
+        int(c): {int(g): dict(v, nombre="x") for g, v in gs.items()} for c, gs in otra["asignaciones"].items()
+    }
+    assert _huella(otra, {"max_time_in_seconds": 5, "num_search_workers": 1}) == base
+
+    otra["horas_curso_grado"]["1"]["1"] += 1
+    assert _huella(otra) != base
+    assert _huella(inst, {"preset": "base"}) != base
+
+
+def test_pregenerado_compartido_se_consume_una_vez(tmp_path):
+    # Dos procesos (web y worker) sobre la misma base
+    ruta = str(tmp_path / "base.db")
+    web, worker = ClienteLocal(ruta), ClienteLocal(ruta)
+    cursos = np.zeros((5, 8, 2), dtype=np.int64)
+    cursos[0, 0, 1] = 7
+    resultado = {"status": "OPTIMAL", "grados": [1, 2], "matriz_cursos": cursos, "matriz_docentes": cursos * 0}
+    guardar_pregenerado(worker, "viejo", "Secundaria", 1, resultado)
+    guardar_pregenerado(worker, "h1", "Secundaria", 1, resultado)
+    assert not hay_pregenerado(web, "viejo")
+
+    tomado = tomar_pregenerado(web, "h1")
+    assert tomado["status"] == "OPTIMAL" and tomado["horario"][0][0] == {2: 7}
+    assert tomado["matriz_cursos"].dtype == np.int64 and np.array_equal(tomado["matriz_cursos"], cursos)
+    assert tomar_pregenerado(worker, "h1") is None
+
+
+def test_con_cola_los_nodos_web_encolan_una_vez(tmp_path):
+    cola = ColaSQLite(str(tmp_path / "cola.db"))
+    nodos = [PreGenerador(obtener_sb=None, obtener_cola=lambda: cola, lock=str(tmp_path / "pg")) for _ in range(2)]
+    for pg in nodos:
+        pg._despachar("Secundaria", 1)
+    trabajo = cola.reclamar("w1")
+    assert trabajo["payload"] == {"pregenerar": {"nivel": "Secundaria", "version": 1}}
+    assert cola.reclamar("w1") is None
+    assert [pg.estadisticas["encoladas"] for pg in nodos] == [1, 0]
+
+
+def test_worker_resuelve_la_pregeneracion(monkeypatch):
+    pedidas = []
+    monkeypatch.setattr(PreGenerador, "pregenerar", lambda self, n, v: pedidas.append((n, v, self.aparte)) or "h")
+    resultado = worker_solver.ejecutar_generacion({"pregenerar": {"nivel": "Primaria", "version": 2}}, None)
+    assert resultado == {"huella": "h"} and pedidas == [("Primaria", 2, False)]
+
+
+def _tomar_lider(lock, cola):
+    cola.put(PreGenerador(obtener_sb=None, lock=lock)._lider.tomar(bloquear=False))
+
+
+def test_un_solo_lider_por_host(tmp_path):
+    if pregeneracion.fcntl is None:
+        return
+    ctx = multiprocessing.get_context("spawn")
+    lock, cola = str(tmp_path / "pg"), ctx.SimpleQueue()
+    lider = PreGenerador(obtener_sb=None, lock=lock)._lider
+    assert lider.tomar(bloquear=False)
+    for esperado in (False, True):
+        otro = ctx.Process(target=_tomar_lider, args=(lock, cola))
+        otro.start()
+        otro.join(timeout=60)
+        assert cola.get() is esperado
+        lider.soltar()
+
+
+def test_programar_sin_destino_usa_objetivos_y_reinicia_debounce():
+    pg = PreGenerador(obtener_sb=None, debounce=60)
+    pg.registrar_objetivo("Secundaria", 1)
+    pg.registrar_objetivo("Primaria", 2)
+    assert sorted(pg.programar()) == [("Primaria", 2), ("Secundaria", 1)]
+    vence = pg._pendientes[("Secundaria", 1)]
+    assert pg.programar("Secundaria") == [("Secundaria", 1)]
+    assert pg._pendientes[("Secundaria", 1)] >= vence
+    assert len(pg._pendientes) == 2
+
+
+class _Registrador(PreGenerador):
+    """pregenerar() solo anota (nivel, versión, pid) en una cola entre procesos."""
+
+    def __init__(self, cola):
+        super().__init__(obtener_sb=None, debounce=0)
+        self.cola = cola
+        self.hechas = threading.Semaphore(0)
+
+    def pregenerar(self, nivel, version):
+        self.cola.put((nivel, version, multiprocessing.current_process().pid))
+        self.hechas.release()
+
+
+def _en_hijo(pg):
+    # En el worker vence el debounce del pendiente heredado y llega otro por /pregenerar
+    pg._pendientes = dict.fromkeys(pg._pendientes, 0)
+    pg.iniciar()
+    pg.programar("Primaria", 2)
+    for _ in range(2):
+        pg.hechas.acquire(timeout=10)
+
+
+def test_iniciar_despues_de_fork_atiende_la_cola():
+    ctx = multiprocessing.get_context("fork")
+    cola = ctx.SimpleQueue()
+    pg = _Registrador(cola)
+    pg.iniciar()  # hilo en el "master", como con --preload
+    pg.programar("Secundaria", 1)
+    assert cola.get()[:2] == ("Secundaria", 1)
+    pg.hechas.acquire()
+    # Pendiente que el master no llega a atender antes del fork
+    pg.debounce = 60
+    pg.programar("Secundaria", 3)
+    pg.debounce = 0
+
+    hijo = ctx.Process(target=_en_hijo, args=(pg,))
+    hijo.start()
+    hijo.join(timeout=20)
+    resueltas = [cola.get() for _ in range(2) if not cola.empty()]
+    assert {(n, v) for n, v, _ in resueltas} == {("Secundaria", 3), ("Primaria", 2)}
+    assert {pid for _, _, pid in resueltas} == {hijo.pid}
@@ -0,0 +1,91 @@
+import pytest
+
+from indice_horario import construir_indice, invalidar_indice, obtener_indice
+from pipeline_horario import cargar_registros_horario
+from repositorio_local import ClienteLocal, ErrorLocal
+from versiones_horario import (
+    cargar_celdas_actuales,
+    cargar_version_guardada,
+    escribir_cambios,
+    guardar_version,
+    limpiar_versiones,
+    registros_de_celdas,
+)
+
+
+def _fila(g, dia, b, curso, version=1):
+    return {"grado_id": g, "dia": dia, "bloque": b, "curso_id": curso, "docente_id": 9,
+            "nivel": "Secundaria", "version_num": version}
+
+
+def test_filtros_y_claves_unicas():
+    sb = ClienteLocal()
+    sb.table("horarios").insert([_fila(1, "lunes", 0, 3), _fila(1, "miércoles", 2, 4), _fila(2, "lunes", 0, 5, 2)]).execute()
+
+    ultima = sb.table("horarios").select("version_num").eq("nivel", "Secundaria").not_.is_("version_num", "null")
+    assert ultima.order("version_num", desc=True).limit(1).execute().data == [{"version_num": 2}]
+    assert len(sb.table("horarios").select("*").in_("curso_id", [3, 5]).execute().data) == 2
+    borradas = sb.table("horarios").delete().or_("and(grado_id.eq.1,dia.eq.miércoles,bloque.eq.2)").execute().data
+    assert [f["curso_id"] for f in borradas] == [4]
+
+    with pytest.raises(ErrorLocal, match="23505"):
+        sb.table("horarios").insert(_fila(1, "lunes", 0, 7)).execute()
+    sb.table("horarios").upsert(_fila(1, "lunes", 0, 7, 3), on_conflict="grado_id,dia,bloque").execute()
+    assert sorted(f["curso_id"] for f in sb.table("horarios").select("curso_id").execute().data) == [5, 7]
+
+
+def test_versiones_por_diferencias_sobre_repositorio_local():
+    limpiar_versiones()
+    sb = ClienteLocal()
+    comunes = {(3, "jueves", b): (5, 6) for b in range(8)}
+    v1 = {**comunes, (1, "lunes", 1): (3, 9), (2, "martes", 0): (4, 8)}
+    v2 = {**comunes, (1, "lunes", 1): (6, 7), (2, "viernes", 7): (4, 8)}
+
+    escribir_cambios(sb, "Secundaria", 1, {}, v1)
+    guardar_version(sb, "Secundaria", 1, None, None, v1)
+    delta = escribir_cambios(sb, "Secundaria", 2, cargar_celdas_actuales(sb, "Secundaria", 1), v2, anterior=1)
+    fila = guardar_version(sb, "Secundaria", 2, 1, v1, v2)
+
+    assert len(delta["set"]) == 2 and len(delta["del"]) == 1
+    assert fila["base_version"] == 1
+    filas = sb.table("horarios").select("*").eq("nivel", "Secundaria").execute().data
+    assert {f["version_num"] for f in filas} == {2}
+    assert cargar_celdas_actuales(sb, "Secundaria") == v2
+
+    limpiar_versiones()
+    assert cargar_version_guardada(sb, "Secundaria", 1) == v1
+    assert cargar_version_guardada(sb, "Secundaria", 2) == v2
+
+    # Las vistas de una versión anterior la reconstruyen (en 'horarios' ya no tiene filas)
+    invalidar_indice("Secundaria")
+    indice = obtener_indice("Secundaria", 1, cargar=lambda: cargar_registros_horario(sb, "Secundaria", 1))
+    assert indice["docentes"][9] == [
+        {"dia": "lunes", "bloque": 1, "grado_id": 1, "curso_id": 3, "version_num": 1}
+    ]
+    # Una versión que no existe no queda cacheada vacía
+    assert obtener_indice("Secundaria", 9, cargar=lambda: []) == construir_indice([])
+    assert obtener_indice("Secundaria", 9) is None
+
+
+def test_escribir_cambios_no_toca_otras_versiones():
+    limpiar_versiones()
+    # Tabla con UNIQUE por celda y versión: conviven varias versiones y el upsert por celda no aplica
+    sb = ClienteLocal(unicos={"horarios": ("grado_id", "dia", "bloque", "version_num")})
+    v1 = {(1, "lunes", 0): (3, 9), (1, "lunes", 1): (4, 8)}
+    v2 = {(1, "lunes", 0): (5, 7)}
+    sb.table("horarios").insert(registros_de_celdas(v1, "Secundaria", 1)).execute()
+    with pytest.raises(ErrorLocal, match="42P10"):
+        escribir_cambios(sb, "Secundaria", 2, v1, v2, anterior=1)
+    # Falló antes de borrar o mover filas de la versión 1
+    assert cargar_celdas_actuales(sb, "Secundaria", 1) == v1
+
+    # Con el índice por celda: solo se borra y se mueve la versión anterior
+    sb = ClienteLocal()
+    sb.table("horarios").insert(registros_de_celdas({(2, "martes", 0): (6, 5)}, "Secundaria", 0)).execute()
+    sb.table("horarios").insert(registros_de_celdas(v1, "Secundaria", 1)).execute()
+    escribir_cambios(sb, "Secundaria", 2, v1, {**v2, (1, "lunes", 1): (4, 8)}, anterior=1)
+    assert cargar_celdas_actuales(sb, "Secundaria", 0) == {(2, "martes", 0): (6, 5)}
+    assert cargar_celdas_actuales(sb, "Secundaria", 2) == {**v2, (1, "lunes", 1): (4, 8)}
+    escribir_cambios(sb, "Secundaria", 3, cargar_celdas_actuales(sb, "Secundaria", 2), v2, anterior=2, overwrite=True)
+    assert cargar_celdas_actuales(sb, "Secundaria", 3) == v2
+    assert cargar_celdas_actuales(sb, "Secundaria", 2) == {}
@@ -0,0 +1,96 @@
+import numpy as np
+
+from benchmark_generador import instancia_sintetica
+from pipeline_horario import PipelineGeneracion
+from repositorio_local import ClienteLocal
+from validacion_horario import obtener_indice_conflictos
+from indice_horario import obtener_indice
+from salida_horario import (
+    construir_matrices,
+    grados_de_nivel,
+    horario_lista,
+    matriz_cursos,
+    matriz_docentes,
+    metricas,
+    registros_horarios,
+    vista_por_docente,
+)
+
+MAP_ASIGNACIONES = [
+    {"curso": 16, "grado": 6, "docente": 75, "horas": 2},
+    {"curso": 17, "grado": 7, "docente": 80, "horas": 3},
+]
+
+
+def _resultado(valores):
+    matriz, grados = construir_matrices(valores, MAP_ASIGNACIONES, [6, 7, 8])
+    return {
+        "grados": grados,
+        "matriz_cursos": matriz_cursos(matriz, MAP_ASIGNACIONES),
+        "matriz_docentes": matriz_docentes(matriz, MAP_ASIGNACIONES),
+    }
+
+
+def test_salida_desde_matriz():
+    valores = np.zeros((2, 5, 7), dtype=np.int8)
+    valores[0, 0, 0:2] = 1  # curso 16 el lunes, bloques 0-1
+    valores[1, 2, 3] = 1    # curso 17 el miercoles, bloque 3
+    resultado = _resultado(valores)
+
+    lista = horario_lista(resultado, [6, 7, 8])
+    assert len(lista) == 5 and len(lista[0]) == 7
+    assert lista[0][0] == [16, 0, 0]
+    assert lista[2][3] == [0, 17, 0]
+
+    registros = registros_horarios(resultado, "Primaria", 3)
+    assert len(registros) == 3
+    assert {"docente_id": 80, "curso_id": 17, "grado_id": 7, "dia": "miércoles",
+            "bloque": 3, "nivel": "Primaria", "version_num": 3} in registros
+
+    assert vista_por_docente(resultado)[75] == [(0, 0, 6, 16), (0, 1, 6, 16)]
+
+    resumen = metricas(valores, MAP_ASIGNACIONES)
+    assert resumen["total_asignados"] == 3
+    assert resumen["fallidos"] == 2
+    assert resumen["deficit_count"] == 1
+
+
+def test_grados_de_nivel_con_secciones():
+    assert grados_de_nivel("Primaria") == [6, 7, 8, 9, 10, 11]
+    assert grados_de_nivel("Secundaria", {2, 4}) == [1, 2, 3, 4, 5]
+    # Secciones (1A, 1B, ...) fuera del rango histórico: los ids presentes
+    assert grados_de_nivel("Secundaria", {"102", 101, 201}) == [101, 102, 201]
+
+
+def test_pipeline_secciones_y_sabado():
+    secciones = (101, 102, 103, 201, 202, 203)
+    inst = instancia_sintetica("pequena", grados=secciones, densidad=1.0)
+    # Todos pueden el sábado; el docente del curso de 3h en 101/102, solo el sábado
+    sabado = str(inst["asignaciones"]["4"]["101"]["docente_id"])
+    disponibilidad = {
+        doc: dict(celdas, **{f"sábado-{b}": True for b in range(8)})
+        for doc, celdas in inst["restricciones"]["disponibilidad"].items()
+    }
+    disponibilidad[sabado] = {f"sábado-{b}": True for b in range(8)}
+    data = dict(
+        inst, restricciones={"disponibilidad": disponibilidad}, num_dias=6,
+        opciones_solver={"max_time_in_seconds": 10, "num_search_workers": 1, "auto": False},
+    )
+    sb = ClienteLocal()
+    payload = PipelineGeneracion(sb, data).ejecutar()
+
+    assert payload["grados"] == list(secciones) and payload["asignaciones_fallidas"] == 0
+    assert len(payload["horario"]) == 6 and len(payload["horario"][5][0]) == len(secciones)
+    filas = sb.table("horarios").select("*").eq("version_num", payload["version"]).execute().data
+    assert {f["dia"] for f in filas if f["docente_id"] == int(sabado)} == {"sábado"}
+
+
+def test_sin_registros_no_cachea_indices():
+    # Nada persistido: otro proceso puede crear esa versión; no debe quedar un índice vacío
+    pipeline = PipelineGeneracion(ClienteLocal(), {"nivel": "Primaria", "version": 1})
+    pipeline.resultado = _resultado(np.zeros((2, 5, 7), dtype=np.int8))
+    pipeline._etapa_persistir()
+
+    assert pipeline.registros == []
+    assert obtener_indice("Primaria", pipeline.nueva_version) is None
+    assert obtener_indice_conflictos("Primaria", pipeline.nueva_version, 1) is None
@@ -0,0 +1,44 @@
+from generador_python import clave_simetria
+from simetrias import detectar_grados_identicos, detectar_grupos_asignaciones
+
+MAP_ASIGNACIONES = [
+    {"curso": 1, "grado": 1, "docente": 10, "horas": 4},
+    {"curso": 2, "grado": 1, "docente": 20, "horas": 2},
+    {"curso": 3, "grado": 1, "docente": 20, "horas": 2},
+    {"curso": 1, "grado": 2, "docente": 10, "horas": 4},
+    {"curso": 2, "grado": 2, "docente": 20, "horas": 2},
+    {"curso": 3, "grado": 2, "docente": 20, "horas": 2},
+    {"curso": 1, "grado": 3, "docente": 11, "horas": 4},
+]
+
+
+def _sin_patron(idx):
+    return ()
+
+
+def test_grupos_de_asignaciones_intercambiables():
+    grupos = detectar_grupos_asignaciones(MAP_ASIGNACIONES, _sin_patron)
+    assert sorted(grupos) == [[1, 2], [4, 5]]
+
+
+def test_el_patron_distingue_asignaciones():
+    grupos = detectar_grupos_asignaciones(MAP_ASIGNACIONES, lambda idx: idx)
+    assert grupos == []
+
+
+def test_grados_identicos_usan_representante_fuera_de_grupos():
+    grupos = detectar_grupos_asignaciones(MAP_ASIGNACIONES, _sin_patron)
+    clases = detectar_grados_identicos(MAP_ASIGNACIONES, _sin_patron, grupos)
+    # Grados 1 y 2 son idénticos; el representante es el curso 1 (no intercambiable)
+    assert clases == [[0, 3]]
+
+
+def test_patron_que_no_suma_no_es_intercambiable_con_sin_patron():
+    # Cursos 2 y 3: mismo docente, grado y horas; el 3 tiene un patrón que no suma 2
+    patrones = {"3-1": "3+1"}
+    reqs = MAP_ASIGNACIONES[:3]
+    grupos = detectar_grupos_asignaciones(reqs, lambda idx: clave_simetria(patrones, reqs[idx], 1))
+    assert grupos == []
+    # Sin patrones siguen agrupadas
+    grupos = detectar_grupos_asignaciones(reqs, lambda idx: clave_simetria({}, reqs[idx], 1))
+    assert grupos == [[1, 2]]
@@ -0,0 +1,63 @@
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import solver_dos_fases
+
+from benchmark_generador import instancia_sintetica
+from generador_python import generar_horario
+from salida_horario import registros_horarios
+
+
+def test_dos_fases_respeta_horas_y_choques():
+    inst = instancia_sintetica("pequena", grados=(1, 2, 3), densidad=1.0)
+    resultado = generar_horario(
+        inst["docentes"],
+        inst["asignaciones"],
+        inst["restricciones"],
+        inst["horas_curso_grado"],
+        nivel=inst["nivel"],
+        version=inst["version"],
+        opciones_solver={"preset": "base", "motor": "dos_fases", "procesos_fase2": 1},
+    )
+    assert resultado["status"] == "OPTIMAL"
+    assert resultado["asignaciones_fallidas"] == 0
+
+    registros = registros_horarios(resultado, inst["nivel"], 1)
+    horas = Counter((r["curso_id"], r["grado_id"]) for r in registros)
+    for curso, grados in inst["horas_curso_grado"].items():
+        for grado, h in grados.items():
+            assert horas[(int(curso), int(grado))] == h
+
+    # Un docente nunca está en dos grados a la vez
+    celdas_docente = Counter((r["docente_id"], r["dia"], r["bloque"]) for r in registros)
+    assert max(celdas_docente.values()) == 1
+
+    # Sin huecos: cada grado ocupa los bloques 0..n-1 de cada día
+    por_grado_dia = {}
+    for r in registros:
+        por_grado_dia.setdefault((r["grado_id"], r["dia"]), []).append(r["bloque"])
+    for bloques in por_grado_dia.values():
+        assert sorted(bloques) == list(range(len(bloques)))
+
+
+def test_fase2_en_pool_de_hilos_compartido(monkeypatch):
+    monkeypatch.setattr(solver_dos_fases, "MAX_HILOS_FASE2", 2)
+    monkeypatch.setattr(solver_dos_fases, "_pool", None)
+    inst = instancia_sintetica("pequena", grados=(1, 2, 3), densidad=1.0)
+
+    def resolver(_):
+        return generar_horario(
+            inst["docentes"], inst["asignaciones"], inst["restricciones"], inst["horas_curso_grado"],
+            nivel=inst["nivel"], version=inst["version"],
+            opciones_solver={"preset": "base", "motor": "dos_fases", "procesos_fase2": 4, "auto": False},
+        )
+
+    # Dos requests a la vez: sin procesos hijos y con un único pool de 2 hilos
+    with ThreadPoolExecutor(max_workers=2) as requests:
+        resultados = list(requests.map(resolver, range(2)))
+    assert [r["status"] for r in resultados] == ["OPTIMAL", "OPTIMAL"]
+    assert not multiprocessing.active_children()
+    assert 0 < len([h for h in threading.enumerate() if h.name.startswith("fase2")]) <= 2
+    solver_dos_fases._pool.shutdown()
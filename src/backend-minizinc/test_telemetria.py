@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from flask import Flask
+from prometheus_client import REGISTRY
+
+from telemetria import contar_cache, exportar, instrumentar_flask, observar_pipeline, solver_activo, _tabla_de
+
+
+def _valor(nombre, **labels):
+    return REGISTRY.get_sample_value(nombre, labels) or 0
+
+
+def test_latencia_por_endpoint():
+    app = Flask(__name__)
+    instrumentar_flask(app)
+
+    @app.route("/horarios/<nivel>")
+    def horarios(nivel):
+        return nivel
+
+    antes = _valor("horario_http_request_seconds_count", endpoint="/horarios/<nivel>", metodo="GET", status="200")
+    cliente = app.test_client()
+    cliente.get("/horarios/Primaria")
+    cliente.get("/horarios/Secundaria")
+    despues = _valor("horario_http_request_seconds_count", endpoint="/horarios/<nivel>", metodo="GET", status="200")
+    assert despues - antes == 2
+
+
+def test_etapas_cache_y_solver():
+    antes = _valor("horario_etapa_seconds_count", etapa="resolver")
+    observar_pipeline("fin", "resolver", SimpleNamespace(tiempos={"resolver": 1.5}))
+    observar_pipeline("inicio", "resolver", SimpleNamespace(tiempos={}))
+    assert _valor("horario_etapa_seconds_count", etapa="resolver") - antes == 1
+
+    aciertos = _valor("horario_cache_total", cache="prueba", resultado="acierto")
+    contar_cache("prueba", True)
+    assert _valor("horario_cache_total", cache="prueba", resultado="acierto") - aciertos == 1
+
+    with solver_activo(4):
+        assert _valor("horario_solver_hilos_activos") >= 4
+    cuerpo, tipo = exportar()
+    assert b"horario_solver_hilos_activos" in cuerpo
+    assert tipo.startswith("text/plain")
+
+
+def test_tabla_de_url_postgrest():
+    assert _tabla_de("https://x.supabase.co/rest/v1/horarios?nivel=eq.Primaria") == "horarios"
@@ -0,0 +1,46 @@
+import threading
+
+from benchmark_generador import instancia_sintetica
+from pipeline_horario import PipelineGeneracion
+from trabajos import esperar_trabajo, lanzar_o_unirse, suscribir
+
+
+def test_pedidos_identicos_comparten_job_y_eventos():
+    liberar = threading.Event()
+    ejecuciones = []
+
+    def tarea(progress_cb):
+        ejecuciones.append(1)
+        progress_cb(50, "resolviendo")
+        liberar.wait(5)
+        return {"version": 7}
+
+    job_a, nuevo_a = lanzar_o_unirse(tarea, "clave-x")
+    job_b, nuevo_b = lanzar_o_unirse(tarea, "clave-x")
+    otro, nuevo_otro = lanzar_o_unirse(lambda cb: {"version": 8}, "clave-y")
+    assert (nuevo_a, nuevo_b, nuevo_otro) == (True, False, True)
+    assert job_a == job_b != otro
+
+    cola_1, cola_2 = suscribir(job_a), suscribir(job_a)
+    liberar.set()
+    assert esperar_trabajo(job_a, timeout=5)["result"] == {"version": 7}
+    assert len(ejecuciones) == 1
+    for cola in (cola_1, cola_2):
+        eventos = [cola.get(timeout=1)[0] for _ in range(2)]
+        assert eventos == ["progress", "done"]
+
+    # Terminado el job, la misma clave vuelve a lanzar
+    job_c, nuevo_c = lanzar_o_unirse(lambda cb: {}, "clave-x")
+    assert nuevo_c and job_c != job_a
+
+
+def test_clave_distingue_docentes_grados_y_aulas():
+    inst = instancia_sintetica("pequena", grados=(1, 2))
+
+    def clave(**cambios):
+        return PipelineGeneracion(None, dict(inst, **cambios)).clave()
+
+    base = clave()
+    assert clave(docentes=list(reversed(inst["docentes"]))) == base
+    con_aula = [dict(inst["docentes"][0], aula_id=3)] + inst["docentes"][1:]
+    assert len({base, clave(docentes=con_aula), clave(grados=[2, 1]), clave(aulas=[{"id": 3}])}) == 4
@@ -0,0 +1,94 @@
+from disponibilidad import bit
+from validacion_horario import (
+    IndiceConflictos, ReglasHorario, guardar_indice_conflictos, invalidar_indices_conflictos,
+    obtener_indice_conflictos, validar_lote,
+)
+
+# Grado 1: curso 1 (docente 10, 5h = 2 + 3) y curso 2 (docente 20, 4h = 2 + 2).
+# Grado 2: curso 3 (docente 10, 2h) el miércoles.
+CELDAS = {
+    (1, "lunes", 0): (1, 10), (1, "lunes", 1): (1, 10), (1, "lunes", 2): (2, 20), (1, "lunes", 3): (2, 20),
+    (1, "martes", 0): (1, 10), (1, "martes", 1): (1, 10), (1, "martes", 2): (1, 10),
+    (1, "martes", 3): (2, 20), (1, "martes", 4): (2, 20),
+    (2, "miércoles", 0): (3, 10), (2, "miércoles", 1): (3, 10),
+}
+
+
+def _reglas():
+    sin_viernes = sum(bit(d, b) for d in range(4) for b in range(8))
+    return ReglasHorario(
+        8,
+        disponibilidad={10: sin_viernes},
+        horas_curso_grado={"1": {"1": 5}, "2": {"1": 4}, "3": {"2": 2}},
+    )
+
+
+def _reglas_rotas(resultado):
+    return sorted(c["regla"] for c in resultado["conflictos"])
+
+
+def test_movimientos_y_reglas():
+    indice = IndiceConflictos(CELDAS, _reglas())
+    lunes0, lunes2 = {"dia": "lunes", "bloque": 0}, {"dia": "lunes", "bloque": 2}
+
+    assert indice.validar(1, lunes0, lunes0)["valido"]
+    assert _reglas_rotas(indice.validar(1, lunes0, lunes2)) == ["grado_ocupado", "huecos"]
+    # Intercambio: el grado queda igual, pero el curso 2 queda partido el lunes
+    intercambio = indice.validar(1, lunes0, lunes2, intercambiar=True)
+    assert intercambio["intercambio"] and intercambio["conflictos"] == [
+        {"regla": "contiguidad", "curso_id": 2, "dia": "lunes"}
+    ]
+
+    a_miercoles = indice.validar(1, lunes0, ("miércoles", 0))
+    assert _reglas_rotas(a_miercoles) == ["choque_docente", "huecos", "patron"]
+    assert a_miercoles["conflictos"][0] == {"regla": "choque_docente", "curso_id": 1, "docente_id": 10, "grado_id": 2}
+    assert "disponibilidad" in _reglas_rotas(indice.validar(1, ("martes", 2), ("viernes", 0)))
+
+
+def test_previos_se_aplican_y_se_deshacen():
+    indice = IndiceConflictos(CELDAS, _reglas())
+    antes = dict(indice.celdas), dict(indice.docente)
+    # Tras cambiar lunes 0 <-> 2, cambiar lunes 3 <-> 1 deja cada curso en un tramo
+    resultado = indice.validar(
+        1, ("lunes", 3), ("lunes", 1), intercambiar=True, previos=[(1, ("lunes", 0), ("lunes", 2))]
+    )
+    assert resultado["valido"], resultado
+    assert (dict(indice.celdas), dict(indice.docente)) == antes
+
+
+def test_lote_vectorizado():
+    reglas = _reglas()
+    registros = [
+        {"grado_id": g, "dia": dia, "bloque": b, "curso_id": c, "docente_id": t}
+        for (g, dia, b), (c, t) in CELDAS.items()
+    ]
+    assert validar_lote(registros, reglas) == {"valido": True, "conflictos": [], "resumen": {}}
+
+    # Docente 10 también en el grado 2 el lunes 0, y el viernes no está disponible
+    registros += [
+        {"grado_id": 2, "dia": "lunes", "bloque": 0, "curso_id": 3, "docente_id": 10},
+        {"grado_id": 2, "dia": "viernes", "bloque": 0, "curso_id": 3, "docente_id": 10},
+    ]
+    resultado = validar_lote(registros, reglas)
+    assert resultado["resumen"] == {
+        "choque_docente": 1, "disponibilidad": 1, "patron": 1, "horas_totales": 1,
+    }
+    assert {"regla": "choque_docente", "docente_id": 10, "dia": "lunes", "bloque": 0} in resultado["conflictos"]
+
+
+def test_cache_por_dias_e_invalidacion():
+    cinco = IndiceConflictos(CELDAS, _reglas())
+    seis = IndiceConflictos(CELDAS, ReglasHorario(8, num_dias=6))
+    guardar_indice_conflictos("Secundaria", 7, 2, cinco)
+    guardar_indice_conflictos("Secundaria", 7, 2, seis)
+    guardar_indice_conflictos("Primaria", 7, 2, cinco)
+    assert obtener_indice_conflictos("Secundaria", 7, 2) is cinco
+    assert obtener_indice_conflictos("Secundaria", 7, 2, num_dias=6) is seis
+
+    # Un cambio de datos de Secundaria no toca los índices de Primaria
+    invalidar_indices_conflictos("Secundaria")
+    assert obtener_indice_conflictos("Secundaria", 7, 2) is None
+    assert obtener_indice_conflictos("Secundaria", 7, 2, num_dias=6) is None
+    assert obtener_indice_conflictos("Primaria", 7, 2) is cinco
+    invalidar_indices_conflictos()
+    assert obtener_indice_conflictos("Primaria", 7, 2) is None
@@ -0,0 +1,62 @@
+from app import app
+from arranque import obtener_supabase
+from versiones_horario import (
+    aplicar_delta,
+    cambios_entre,
+    celdas_de_registros,
+    diferencia,
+    guardar_version,
+    reconstruir,
+)
+
+V1 = {(1, "lunes", 0): (10, 100), (1, "lunes", 1): (10, 100), (2, "martes", 3): (20, 200)}
+V2 = {(1, "lunes", 0): (10, 100), (1, "lunes", 1): (11, 101), (3, "viernes", 7): (30, 300)}
+V3 = {**V2, (2, "martes", 3): (20, 200)}
+
+
+def test_diferencia_solo_lo_que_cambio():
+    delta = diferencia(V1, V2)
+    assert delta == {
+        "set": [[1, "lunes", 1, 11, 101], [3, "viernes", 7, 30, 300]],
+        "del": [[2, "martes", 3]],
+    }
+    assert aplicar_delta(V1, delta) == V2
+    assert diferencia(V2, V2) == {"set": [], "del": []}
+
+
+def test_reconstruye_desde_base_y_deltas():
+    filas = [
+        {"version_num": 3, "base_version": 2, "cambios": diferencia(V2, V3)},
+        {"version_num": 1, "base_version": None, "cambios": diferencia({}, V1)},
+        {"version_num": 2, "base_version": 1, "cambios": diferencia(V1, V2)},
+    ]
+    assert reconstruir(filas, 1) == V1
+    assert reconstruir(filas, 2) == V2
+    assert reconstruir(filas, 3) == V3
+    assert reconstruir(filas, 4) is None
+    # Si falta una versión intermedia la cadena queda rota
+    assert reconstruir([filas[0], filas[1]], 3) is None
+
+
+def test_cambios_entre_versiones():
+    registros = [
+        {"grado_id": g, "dia": dia, "bloque": b, "curso_id": c, "docente_id": d}
+        for (g, dia, b), (c, d) in V1.items()
+    ]
+    assert celdas_de_registros(registros) == V1
+    cambios = cambios_entre(V1, V2, dias=["lunes", "martes", "miércoles", "jueves", "viernes"])
+    assert [(c["dia"], c["bloque"]) for c in cambios] == [("lunes", 1), ("martes", 3), ("viernes", 7)]
+    assert cambios[1]["despues"] is None
+    assert cambios[2]["antes"] is None
+
+
+def test_diff_de_version_inexistente_es_404():
+    sb = obtener_supabase()
+    guardar_version(sb, "Diff", 1, None, None, V1)
+    guardar_version(sb, "Diff", 2, 1, V1, V2)
+    cliente = app.test_client()
+
+    respuesta = cliente.get("/horarios/Diff/diff?from=1&to=2")
+    assert respuesta.status_code == 200 and respuesta.get_json()["total"] == 3
+    assert cliente.get("/horarios/Diff/diff?from=1&to=9").status_code == 404
+    assert cliente.get("/horarios/Diff/diff?from=1").status_code == 400
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# trabajos.py
+#
+# Jobs en memoria: el endpoint con progreso (SSE) y el endpoint síncrono
+# comparten este mismo sistema; el síncrono solo lanza y espera.
+#
+# Single-flight: un job lanzado con clave (huella de la instancia) absorbe a
+# los pedidos idénticos que lleguen mientras está en curso. Todos reciben el
+# mismo resultado y, vía suscribir(), el mismo stream de eventos.
+#
+# suscribir() da una Queue por cliente (endpoint SSE de Flask); escuchar()
+# registra un callback y lo usa broker_eventos.py para servir a todos los
+# clientes async de un job con un único oyente.
+
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from queue import Queue
+
+from telemetria import contar_cache, trabajo_en_curso
+
+_jobs = {}
+_en_curso = {}  # clave -> job_id de los jobs con clave aún corriendo
+_jobs_lock = threading.Lock()
+
+
+def push_event(job_id, event, payload):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if not job:
+            return
+        job["eventos"].append((event, payload))
+        for q in job["suscriptores"]:
+            q.put((event, payload))
+        for oyente in job["oyentes"]:
+            oyente(event, payload)
+
+
+def suscribir(job_id):
+    """Cola de eventos del job; un suscriptor tardío recibe primero lo ya emitido."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if not job:
+            return None
+        q = Queue()
+        for evento in job["eventos"]:
+            q.put(evento)
+        job["suscriptores"].append(q)
+        return q
+
+
+def desuscribir(job_id, q):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job and q in job["suscriptores"]:
+            job["suscriptores"].remove(q)
+
+
+def escuchar(job_id, oyente):
+    """
+    Registra oyente(evento, payload) para el job: recibe lo ya emitido y
+    cada evento nuevo. Se llama con el lock tomado, así que no debe
+    bloquear (el broker async solo agenda en su loop). False si no existe.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if not job:
+            return False
+        for evento, payload in job["eventos"]:
+            oyente(evento, payload)
+        job["oyentes"].append(oyente)
+        return True
+
+
+def dejar_de_escuchar(job_id, oyente):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job and oyente in job["oyentes"]:
+            job["oyentes"].remove(oyente)
+
+
+def _cleanup_job(job_id, delay=300):
+    def _drop():
+        time.sleep(delay)
+        with _jobs_lock:
+            _jobs.pop(job_id, None)
+    t = threading.Thread(target=_drop, daemon=True)
+    t.start()
+
+
+def obtener_trabajo(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def lanzar_o_unirse(tarea, clave=None):
+    """
+    Ejecuta tarea(progress_cb) en un hilo, salvo que ya haya un job en curso
+    con la misma clave: en ese caso no lanza nada y devuelve ese job.
+    Devuelve (job_id, nuevo).
+    """
+    with _jobs_lock:
+        if clave is not None and clave in _en_curso:
+            job_id = _en_curso[clave]
+            _jobs[job_id]["solicitudes"] += 1
+            print(f"[SINGLE-FLIGHT] pedido unido al job {job_id} ({_jobs[job_id]['solicitudes']} solicitudes)")
+            contar_cache("trabajos", True)
+            return job_id, False
+        job_id = str(uuid.uuid4())
+        _jobs[job_id] = {
+            "eventos": [],
+            "suscriptores": [],
+            "oyentes": [],
+            "clave": clave,
+            "solicitudes": 1,
+            "status": "running",
+            "result": None,
+            "error": None,
+            "fin": threading.Event(),
+        }
+        if clave is not None:
+            _en_curso[clave] = job_id
+            contar_cache("trabajos", False)
+
+    def _progress_cb(pct, stage=""):
+        push_event(job_id, "progress", {"progress": int(pct), "stage": stage})
+        try:
+            print(f"[PROGRESS] {int(pct)}% {stage}", flush=True)
+        except Exception:
+            pass
+
+    def _run():
+        job = _jobs[job_id]
+        try:
+            with nullcontext() if getattr(tarea, "remota", False) else trabajo_en_curso():
+                payload = tarea(_progress_cb)
+            with _jobs_lock:
+                job["status"] = "done"
+                job["result"] = payload
+            push_event(job_id, "done", {"result": payload})
+        except Exception as e:
+            with _jobs_lock:
+                job["status"] = "error"
+                job["error"] = str(e)
+                job["exception"] = e
+            push_event(job_id, "error", {"error": str(e)})
+        finally:
+            # Terminado el job, un pedido idéntico vuelve a generar (otro horario)
+            with _jobs_lock:
+                if clave is not None and _en_curso.get(clave) == job_id:
+                    del _en_curso[clave]
+            job["fin"].set()
+            _cleanup_job(job_id, delay=300)
+
+    t = threading.Thread(target=_run, daemon=True)
+    t.start()
+    return job_id, True
+
+
+def lanzar_trabajo(tarea, clave=None):
+    """
+    Ejecuta tarea(progress_cb) en un hilo y devuelve el job_id.
+    El resultado (o el error) queda en el job y se publica como evento 'done'/'error'.
+    """
+    return lanzar_o_unirse(tarea, clave)[0]
+
+
+def esperar_trabajo(job_id, timeout=None):
+    """Bloquea hasta que el job termine. Devuelve el job o None si venció el timeout."""
+    job = obtener_trabajo(job_id)
+    if not job:
+        return None
+    if not job["fin"].wait(timeout):
+        return None
+    return job
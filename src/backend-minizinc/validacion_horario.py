@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+# validacion_horario.py
+#
+# Validación de ediciones manuales sobre un horario guardado
+# (POST /validar-movimiento). Por versión se arma un índice de conflictos
+# con máscaras de bits en el mismo formato que la disponibilidad (un byte
+# por día, bit b = bloque b): ocupación por docente, por grado, por
+# asignación (curso, grado) y por docente-grado. "¿Puede la clase de
+# (grado, día, bloque) pasar a (día', bloque')?" se responde con unas pocas
+# operaciones de bits sobre esas máscaras, sin recorrer el horario.
+#
+# Reglas (las mismas del generador):
+#   grado_ocupado      el grado ya tiene clase en el destino
+#   choque_docente     el docente dicta en otro grado en el destino
+#   disponibilidad     el destino no está en la disponibilidad del docente
+#   huecos             el día del grado no queda continuo desde el bloque 0
+#   contiguidad        la asignación queda partida en dos tramos en un día
+#   max_docente_grado  más de 3 horas del docente en el grado en un día
+#   horas_dia          día de 1 hora o más de 3 (asignaciones sin patrón)
+#   patron             las horas por día no siguen el patrón de la asignación
+#
+# Un movimiento solo informa las reglas que rompe él: lo que ya estaba roto
+# en la versión guardada no se le atribuye. validar_lote revisa un horario
+# manual completo de una pasada con numpy.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from disponibilidad import BITS_POR_DIA, bit, indice_dia, mascaras_disponibilidad
+from salida_horario import DIAS_BD
+from telemetria import contar_cache
+
+NUM_DIAS = 5  # default; ReglasHorario(num_dias=...) para semanas con sábado
+MAX_INDICES = 32
+# Las reglas salen de los datos de entrada (disponibilidad, horas, patrones):
+# un cambio las invalida (invalidar_indices_conflictos, desde el vigilante de
+# audit_logs o el webhook de pre-generación). Sin vigilante, el TTL acota
+# cuánto puede durar un índice desactualizado.
+TTL_INDICE_S = float(os.getenv("INDICE_CONFLICTOS_TTL_S", "300"))
+# Horas por día sin patrón explícito (desglose del generador)
+DESGLOSE = {5: (2, 3), 4: (2, 2), 3: (3,), 2: (2,)}
+
+_indices = OrderedDict()
+_indices_lock = threading.Lock()
+
+
+def _byte(mascara, d):
+    return (mascara >> (d * BITS_POR_DIA)) & 0xFF
+
+
+def _un_tramo(v):
+    # Un solo tramo de unos (o ninguno): sumar el bit más bajo lo "cierra"
+    return v & (v + (v & -v)) == 0
+
+
+def _desde_cero(v):
+    # Bloques 0..k-1 ocupados y nada después
+    return v & (v + 1) == 0
+
+
+class ReglasHorario:
+    """Disponibilidad, horas, patrones y reglas de una instancia (nivel, versión de datos)."""
+
+    def __init__(self, num_bloques, nivel="Secundaria", version=2, disponibilidad=None,
+                 horas_curso_grado=None, patrones_division=None, reglas=None, num_dias=NUM_DIAS):
+        self.num_bloques = int(num_bloques)
+        self.num_dias = int(num_dias)
+        self.version = int(version)
+        # Primaria: el generador asume disponibilidad total
+        self.mascaras = {} if nivel == "Primaria" else mascaras_disponibilidad(disponibilidad or {})
+        self.completa = sum(bit(d, b) for d in range(self.num_dias) for b in range(self.num_bloques))
+        self.horas_requeridas = {
+            (int(c), int(g)): int(h)
+            for c, grados in (horas_curso_grado or {}).items()
+            for g, h in grados.items()
+            if int(h) > 0
+        }
+        self.patrones = patrones_division or {}
+        reglas = reglas or {}
+        self.limitar_docente_grado = bool(reglas.get("limitar_carga_docente_grado", True))
+
+    @classmethod
+    def desde_instancia(cls, instancia):
+        """Desde la entrada del generador (pipeline_horario.cargar_instancia o un request)."""
+        version = int(instancia.get("version") or 1)
+        restricciones = instancia.get("restricciones") or {}
+        return cls(
+            7 if version == 1 else 8,
+            nivel=instancia.get("nivel", "Secundaria"),
+            version=version,
+            disponibilidad=restricciones.get("disponibilidad"),
+            horas_curso_grado=instancia.get("horas_curso_grado"),
+            patrones_division=instancia.get("patrones_division"),
+            reglas=restricciones.get("reglas"),
+            num_dias=instancia.get("num_dias") or NUM_DIAS,
+        )
+
+    def mascara(self, docente):
+        return self.mascaras.get(docente, self.completa)
+
+    def especial(self, curso, horas):
+        # Versión 1: cursos 9 y 12 de 3h se dictan 2h + 1h
+        return self.version == 1 and horas == 3 and curso in (9, 12)
+
+    def esperado(self, curso, grado, horas):
+        """Horas por día esperadas (ordenadas) o None si solo rigen tope y días de 1h."""
+        patron = self.patrones.get(f"{curso}-{grado}")
+        if patron and sum(patron) == horas:
+            return tuple(sorted(patron))
+        if self.especial(curso, horas):
+            return (1, 2)
+        return DESGLOSE.get(horas)
+
+
+class IndiceConflictos:
+    """Máscaras de ocupación de una versión guardada, para validar movimientos en O(1)."""
+
+    def __init__(self, celdas, reglas):
+        """celdas: {(grado_id, dia, bloque): (curso_id, docente_id)} (versiones_horario)."""
+        self.reglas = reglas
+        self.celdas = {}
+        self.docente = {}
+        self.grado = {}
+        self.asignacion = {}
+        self.docente_grado = {}
+        self._lock = threading.Lock()
+        for (g, dia, b), (curso, doc) in celdas.items():
+            d = indice_dia(dia)
+            if d is None or not 0 <= int(b) < reglas.num_bloques:
+                continue
+            self._ocupar(int(g), d, int(b), int(curso), int(doc), True)
+
+    def _ocupar(self, g, d, b, curso, doc, ocupar):
+        m = bit(d, b)
+        for tabla, clave in (
+            (self.docente, doc), (self.grado, g), (self.asignacion, (curso, g)), (self.docente_grado, (doc, g)),
+        ):
+            tabla[clave] = tabla.get(clave, 0) | m if ocupar else tabla.get(clave, 0) & ~m
+        if ocupar:
+            self.celdas[(g, d, b)] = (curso, doc)
+        else:
+            self.celdas.pop((g, d, b), None)
+
+    def _mascaras(self, g, movidas):
+        """
+        Máscaras que cambian si se mueven las clases [((curso, doc), desde, hasta), ...]
+        del grado: primero se liberan todos los orígenes y después se ocupan los
+        destinos (así un intercambio deja el grado igual). También devuelve,
+        por clase movida, si su docente queda ocupado en el destino.
+        """
+        tablas = {"grado": self.grado, "asignacion": self.asignacion, "docente_grado": self.docente_grado,
+                  "docente": self.docente}
+        nuevas = {}
+
+        def _claves(curso, doc):
+            return (("grado", g), ("asignacion", (curso, g)), ("docente_grado", (doc, g)), ("docente", doc))
+
+        for (curso, doc), desde, _ in movidas:
+            for clave in _claves(curso, doc):
+                nuevas[clave] = nuevas.get(clave, tablas[clave[0]].get(clave[1], 0)) & ~bit(*desde)
+        ocupado = [bool(nuevas[("docente", doc)] & bit(*hasta)) for (_, doc), _, hasta in movidas]
+        for (curso, doc), _, hasta in movidas:
+            for clave in _claves(curso, doc):
+                nuevas[clave] |= bit(*hasta)
+        return nuevas, ocupado
+
+    def _roturas(self, g, lecciones, mascara, dias):
+        """Reglas rotas por el grado y por las asignaciones de esas clases en esos días."""
+        rotas = set()
+        for d in dias:
+            if not _desde_cero(_byte(mascara("grado", g), d)):
+                rotas.add(("huecos", None, d))
+        for curso, doc in lecciones:
+            m_asig, m_dg = mascara("asignacion", (curso, g)), mascara("docente_grado", (doc, g))
+            for d in dias:
+                if not _un_tramo(_byte(m_asig, d)):
+                    rotas.add(("contiguidad", curso, d))
+                if self.reglas.limitar_docente_grado and _byte(m_dg, d).bit_count() > 3:
+                    rotas.add(("max_docente_grado", curso, d))
+            por_dia = [_byte(m_asig, d).bit_count() for d in range(self.reglas.num_dias)]
+            horas = self.reglas.horas_requeridas.get((curso, g), sum(por_dia))
+            esperado = self.reglas.esperado(curso, g, horas)
+            if esperado is not None:
+                if tuple(sorted(h for h in por_dia if h)) != esperado:
+                    rotas.add(("patron", curso, None))
+                continue
+            tope = 3 if horas > 2 else self.reglas.num_bloques
+            for d in dias:
+                if por_dia[d] > tope or (por_dia[d] == 1 and not self.reglas.especial(curso, horas)):
+                    rotas.add(("horas_dia", curso, d))
+        return rotas
+
+    def _validar(self, g, desde, hasta, intercambiar):
+        if (g, *desde) not in self.celdas:
+            raise ValueError(f"No hay clase en grado {g}, {DIAS_BD[desde[0]]} bloque {desde[1]}.")
+        if not 0 <= hasta[1] < self.reglas.num_bloques:
+            raise ValueError(f"Bloque fuera de rango: {hasta[1]}.")
+        leccion = self.celdas[(g, *desde)]
+        otra = self.celdas.get((g, *hasta)) if hasta != desde else None
+        conflictos = []
+        if otra is not None and not intercambiar:
+            # Se informa y el resto se valida como si solo se moviera esta clase
+            conflictos.append({"regla": "grado_ocupado", "curso_id": otra[0]})
+            otra = None
+        movidas = [(leccion, desde, hasta)] if hasta != desde else []
+        if otra is not None:
+            movidas.append((otra, hasta, desde))
+
+        nuevas, ocupado = self._mascaras(g, movidas)
+        for ((curso, doc), _, destino), choque in zip(movidas, ocupado):
+            m = bit(*destino)
+            if choque:
+                otro = next(
+                    (og for og in self.grado if og != g and self.docente_grado.get((doc, og), 0) & m), None
+                )
+                conflictos.append({"regla": "choque_docente", "curso_id": curso, "docente_id": doc, "grado_id": otro})
+            if not self.reglas.mascara(doc) & m:
+                conflictos.append({"regla": "disponibilidad", "curso_id": curso, "docente_id": doc,
+                                   "dia": DIAS_BD[destino[0]], "bloque": destino[1]})
+
+        # Antes y después solo sobre lo que cambia: días de origen y destino
+        tablas = {"grado": self.grado, "asignacion": self.asignacion, "docente_grado": self.docente_grado}
+        lecciones = [lec for lec, _, _ in movidas]
+        dias = {desde[0], hasta[0]}
+        antes = self._roturas(g, lecciones, lambda t, k: tablas[t].get(k, 0), dias)
+        despues = self._roturas(g, lecciones, lambda t, k: nuevas.get((t, k), tablas[t].get(k, 0)), dias)
+        for regla, curso, dia in sorted(despues - antes, key=lambda r: (r[0], r[1] or 0, -1 if r[2] is None else r[2])):
+            conflicto = {"regla": regla}
+            if curso is not None:
+                conflicto["curso_id"] = curso
+            if dia is not None:
+                conflicto["dia"] = DIAS_BD[dia]
+            conflictos.append(conflicto)
+        return {
+            "valido": not conflictos,
+            "curso_id": leccion[0],
+            "docente_id": leccion[1],
+            "intercambio": otra is not None,
+            "conflictos": conflictos,
+        }
+
+    def validar(self, grado, desde, hasta, intercambiar=False, previos=()):
+        """
+        ¿La clase del grado en desde=(dia, bloque) puede pasar a hasta? Con
+        intercambiar, si hasta está ocupada las dos clases se cambian de lugar.
+        previos: movimientos ya hechos en la edición y no guardados, como
+        [(grado, desde, hasta), ...] (a una celda ocupada = intercambio); se
+        aplican, se valida y se deshacen.
+        """
+        nd = self.reglas.num_dias
+        g, desde, hasta = int(grado), _celda(desde, nd), _celda(hasta, nd)
+        with self._lock:
+            hechos = []
+            try:
+                for pg, pdesde, phasta in previos:
+                    hechos.append(self._mover(int(pg), _celda(pdesde, nd), _celda(phasta, nd)))
+                return self._validar(g, desde, hasta, intercambiar)
+            finally:
+                for pg, movidas in reversed(hechos):
+                    self._reubicar(pg, [(lec, phasta, pdesde) for lec, pdesde, phasta in movidas])
+
+    def _reubicar(self, g, movidas):
+        for lec, desde, _ in movidas:
+            self._ocupar(g, *desde, *lec, False)
+        for lec, _, hasta in movidas:
+            self._ocupar(g, *hasta, *lec, True)
+
+    def _mover(self, g, desde, hasta):
+        lec = self.celdas.get((g, *desde))
+        if lec is None:
+            raise ValueError(f"Movimiento previo sin clase en origen: grado {g}, {DIAS_BD[desde[0]]} bloque {desde[1]}.")
+        movidas = [(lec, desde, hasta)]
+        otra = self.celdas.get((g, *hasta))
+        if otra is not None and hasta != desde:
+            movidas.append((otra, hasta, desde))
+        self._reubicar(g, movidas)
+        return g, movidas
+
+
+def _celda(celda, num_dias=NUM_DIAS):
+    """{"dia": "lunes", "bloque": 0} o (dia, bloque) -> (índice de día, bloque)."""
+    dia, bloque = (celda["dia"], celda["bloque"]) if isinstance(celda, dict) else celda
+    d = dia if isinstance(dia, int) else indice_dia(dia)
+    if d is None or not 0 <= d < num_dias:
+        raise ValueError(f"Día inválido: {dia!r}")
+    return d, int(bloque)
+
+
+def validar_lote(registros, reglas):
+    """
+    Valida un horario manual completo (filas {grado_id, dia, bloque, curso_id,
+    docente_id}) en una pasada vectorizada. Informa todas las reglas rotas,
+    más horas_totales si una asignación no suma sus horas requeridas.
+    """
+    nb, nd = reglas.num_bloques, reglas.num_dias
+    if not registros:
+        return {"valido": True, "conflictos": [], "resumen": {}}
+    g = np.array([int(r["grado_id"]) for r in registros])
+    d = np.array([_celda(r, nd)[0] for r in registros])
+    b = np.array([int(r["bloque"]) for r in registros])
+    c = np.array([int(r["curso_id"]) for r in registros])
+    t = np.array([int(r["docente_id"]) for r in registros])
+    if ((b < 0) | (b >= nb)).any():
+        raise ValueError(f"Bloque fuera de rango (0-{nb - 1}).")
+
+    grados, gi = np.unique(g, return_inverse=True)
+    docentes, ti = np.unique(t, return_inverse=True)
+    asigs, ai = np.unique(np.stack([c, g], axis=1), axis=0, return_inverse=True)
+    ai = ai.ravel()
+
+    def _contar(forma, *indices):
+        cuenta = np.zeros(forma, dtype=np.int32)
+        np.add.at(cuenta, indices, 1)
+        return cuenta
+
+    por_grado = _contar((len(grados), nd, nb), gi, d, b)
+    por_docente = _contar((len(docentes), nd, nb), ti, d, b)
+    por_asig = _contar((len(asigs), nd, nb), ai, d, b) > 0
+    por_docente_grado = _contar((len(docentes), len(grados), nd), ti, gi, d)
+
+    # Disponibilidad: máscaras -> [docente, día, bloque]
+    mascaras = np.array([reglas.mascara(int(doc)) for doc in docentes], dtype=np.uint64)
+    desplazamientos = (np.arange(nd)[:, None] * BITS_POR_DIA + np.arange(nb)[None, :]).astype(np.uint64)
+    libre = ((mascaras[:, None, None] >> desplazamientos[None]) & np.uint64(1)).astype(bool)
+
+    conflictos = []
+
+    def _agregar(regla, filas):
+        conflictos.extend(dict(fila, regla=regla) for fila in filas)
+
+    _agregar("grado_ocupado", (
+        {"grado_id": int(grados[x]), "dia": DIAS_BD[y], "bloque": int(z)}
+        for x, y, z in zip(*np.nonzero(por_grado > 1))
+    ))
+    _agregar("choque_docente", (
+        {"docente_id": int(docentes[x]), "dia": DIAS_BD[y], "bloque": int(z)}
+        for x, y, z in zip(*np.nonzero(por_docente > 1))
+    ))
+    _agregar("disponibilidad", (
+        {"docente_id": int(t[i]), "grado_id": int(g[i]), "dia": DIAS_BD[d[i]], "bloque": int(b[i])}
+        for i in np.nonzero(~libre[ti, d, b])[0]
+    ))
+    ocupado = por_grado > 0
+    huecos = (ocupado[:, :, 1:] & ~ocupado[:, :, :-1]).any(axis=2)
+    _agregar("huecos", ({"grado_id": int(grados[x]), "dia": DIAS_BD[y]} for x, y in zip(*np.nonzero(huecos))))
+
+    inicios = por_asig.copy()
+    inicios[:, :, 1:] &= ~por_asig[:, :, :-1]
+    _agregar("contiguidad", (
+        {"curso_id": int(asigs[x][0]), "grado_id": int(asigs[x][1]), "dia": DIAS_BD[y]}
+        for x, y in zip(*np.nonzero(inicios.sum(axis=2) > 1))
+    ))
+    if reglas.limitar_docente_grado:
+        _agregar("max_docente_grado", (
+            {"docente_id": int(docentes[x]), "grado_id": int(grados[y]), "dia": DIAS_BD[z]}
+            for x, y, z in zip(*np.nonzero(por_docente_grado > 3))
+        ))
+
+    # Horas por día de cada asignación contra su patrón (ordenado, con ceros a la izquierda)
+    por_dia = por_asig.sum(axis=2)
+    totales = por_dia.sum(axis=1)
+    requeridas = np.array([reglas.horas_requeridas.get((int(cu), int(gr)), -1) for cu, gr in asigs])
+    horas = np.where(requeridas >= 0, requeridas, totales)
+    esperados = np.zeros((len(asigs), nd), dtype=np.int64)
+    con_patron = np.zeros(len(asigs), dtype=bool)
+    for x, (cu, gr) in enumerate(asigs):
+        esperado = reglas.esperado(int(cu), int(gr), int(horas[x]))
+        if esperado is not None and len(esperado) <= nd:
+            esperados[x, nd - len(esperado):] = esperado
+            con_patron[x] = True
+    _agregar("patron", (
+        {"curso_id": int(asigs[x][0]), "grado_id": int(asigs[x][1])}
+        for x in np.nonzero(con_patron & (np.sort(por_dia, axis=1) != esperados).any(axis=1))[0]
+    ))
+    tope = np.where(horas > 2, 3, nb)
+    especial = np.array([reglas.especial(int(cu), int(horas[x])) for x, (cu, _) in enumerate(asigs)], dtype=bool)
+    mal_dia = ~con_patron[:, None] & ((por_dia > tope[:, None]) | ((por_dia == 1) & ~especial[:, None]))
+    _agregar("horas_dia", (
+        {"curso_id": int(asigs[x][0]), "grado_id": int(asigs[x][1]), "dia": DIAS_BD[y]}
+        for x, y in zip(*np.nonzero(mal_dia))
+    ))
+    _agregar("horas_totales", (
+        {"curso_id": int(asigs[x][0]), "grado_id": int(asigs[x][1]),
+         "horas": int(totales[x]), "requeridas": int(requeridas[x])}
+        for x in np.nonzero((requeridas >= 0) & (totales != requeridas))[0]
+    ))
+
+    resumen = {}
+    for conflicto in conflictos:
+        resumen[conflicto["regla"]] = resumen.get(conflicto["regla"], 0) + 1
+    return {"valido": not conflictos, "conflictos": conflictos, "resumen": resumen}
+
+
+# --- Cache por (nivel, versión del horario, versión de datos, días) ---
+
+def guardar_indice_conflictos(nivel, horario_version, version, indice):
+    clave = (nivel, int(horario_version), int(version), indice.reglas.num_dias)
+    with _indices_lock:
+        _indices[clave] = (indice, time.monotonic())
+        _indices.move_to_end(clave)
+        while len(_indices) > MAX_INDICES:
+            _indices.popitem(last=False)
+
+
+def obtener_indice_conflictos(nivel, horario_version, version, cargar=None, num_dias=NUM_DIAS):
+    """
+    Índice cacheado; si no está (o venció) y se pasa cargar() ->
+    (celdas, instancia), lo construye y lo guarda.
+    """
+    clave = (nivel, int(horario_version), int(version), int(num_dias))
+    with _indices_lock:
+        indice, guardado = _indices.get(clave, (None, None))
+        if indice is not None and time.monotonic() - guardado > TTL_INDICE_S:
+            del _indices[clave]
+            indice = None
+        if indice is not None:
+            _indices.move_to_end(clave)
+    contar_cache("conflictos", indice is not None)
+    if indice is not None or cargar is None:
+        return indice
+    celdas, instancia = cargar()
+    indice = IndiceConflictos(celdas, ReglasHorario.desde_instancia(instancia))
+    guardar_indice_conflictos(nivel, horario_version, version, indice)
+    return indice
+
+
+def invalidar_indices_conflictos(nivel=None):
+    """Descarta los índices del nivel (o todos): cambiaron los datos de entrada."""
+    with _indices_lock:
+        for clave in [k for k in _indices if nivel is None or k[0] == nivel]:
+            _indices.pop(clave, None)
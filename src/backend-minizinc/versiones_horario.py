@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# versiones_horario.py
+#
+# Versionado por diferencias. Un horario es un mapa de celdas
+# (grado_id, dia, bloque) -> (curso_id, docente_id). Al regenerar:
+#   - en 'horarios' solo se escriben las celdas que cambiaron (upsert de las
+#     nuevas/modificadas, delete de las que quedaron vacías) y las demás
+#     pasan a la nueva versión con un único UPDATE. Deletes y UPDATE tocan
+#     solo las filas de la versión anterior, y van después del upsert: en
+#     una tabla sin UNIQUE por celda el upsert falla (42P10) sin haber
+#     borrado nada;
+#   - en 'horario_versiones' se guarda una base completa cada INTERVALO_BASE
+#     versiones y, entre bases, solo el delta contra la versión anterior.
+# Cualquier versión se reconstruye aplicando los deltas sobre su base.
+
+import threading
+from collections import OrderedDict
+
+from telemetria import contar_cache
+
+INTERVALO_BASE = 10
+LOTE_BORRADO = 100  # celdas por DELETE (el filtro va en la URL)
+MAX_RECONSTRUIDAS = 32
+
+_reconstruidas = OrderedDict()
+_reconstruidas_lock = threading.Lock()
+
+
+# --- Celdas y diferencias (puro) ---
+
+def celdas_de_registros(registros):
+    """Filas de 'horarios' -> {(grado_id, dia, bloque): (curso_id, docente_id)}."""
+    return {
+        (int(r["grado_id"]), r["dia"], int(r["bloque"])): (int(r["curso_id"]), int(r["docente_id"]))
+        for r in registros
+    }
+
+
+def diferencia(antes, despues):
+    """
+    Delta que lleva de 'antes' a 'despues':
+    {"set": [[grado, dia, bloque, curso, docente], ...], "del": [[grado, dia, bloque], ...]}.
+    """
+    cambios = [
+        [g, dia, b, curso, docente]
+        for (g, dia, b), (curso, docente) in despues.items()
+        if antes.get((g, dia, b)) != (curso, docente)
+    ]
+    borrados = [[g, dia, b] for (g, dia, b) in antes if (g, dia, b) not in despues]
+    return {"set": sorted(cambios), "del": sorted(borrados)}
+
+
+def aplicar_delta(celdas, delta):
+    """Aplica un delta (o una base: solo "set") sobre una copia de las celdas."""
+    nuevas = dict(celdas)
+    for g, dia, b in delta.get("del", []):
+        nuevas.pop((g, dia, b), None)
+    for g, dia, b, curso, docente in delta.get("set", []):
+        nuevas[(g, dia, b)] = (curso, docente)
+    return nuevas
+
+
+def reconstruir(filas, version_num):
+    """
+    filas: registros de 'horario_versiones' desde la última base <= version_num
+    (cualquier orden). Devuelve las celdas de esa versión o None si la cadena
+    está incompleta (falta la base o un delta no parte de la versión previa).
+    """
+    celdas = None
+    ultima = None
+    for f in sorted(filas, key=lambda f: int(f["version_num"])):
+        v = int(f["version_num"])
+        if v > int(version_num):
+            break
+        if f.get("base_version") is None:
+            celdas = aplicar_delta({}, f["cambios"])
+        elif celdas is not None and int(f["base_version"]) == ultima:
+            celdas = aplicar_delta(celdas, f["cambios"])
+        else:
+            celdas = None
+        ultima = v
+    return celdas if ultima == int(version_num) else None
+
+
+def cambios_entre(antes, despues, dias=None):
+    """Lista de celdas distintas entre dos versiones, lista para el endpoint /diff."""
+    orden_dia = {dia: i for i, dia in enumerate(dias or [])}
+    claves = sorted(
+        set(antes) | set(despues),
+        key=lambda k: (orden_dia.get(k[1], len(orden_dia)), k[2], k[0]),
+    )
+    salida = []
+    for g, dia, b in claves:
+        a, d = antes.get((g, dia, b)), despues.get((g, dia, b))
+        if a == d:
+            continue
+        salida.append({
+            "grado_id": g,
+            "dia": dia,
+            "bloque": b,
+            "antes": {"curso_id": a[0], "docente_id": a[1]} if a else None,
+            "despues": {"curso_id": d[0], "docente_id": d[1]} if d else None,
+        })
+    return salida
+
+
+def registros_de_celdas(celdas, nivel, version_num):
+    return [
+        {
+            "docente_id": docente,
+            "curso_id": curso,
+            "grado_id": g,
+            "dia": dia,
+            "bloque": b,
+            "nivel": nivel,
+            "version_num": int(version_num),
+        }
+        for (g, dia, b), (curso, docente) in celdas.items()
+    ]
+
+
+# --- Persistencia ---
+
+def _filtro_celdas(claves):
+    # PostgREST: or=(and(grado_id.eq.1,dia.eq.lunes,bloque.eq.0),...)
+    return ",".join(f"and(grado_id.eq.{g},dia.eq.{dia},bloque.eq.{b})" for g, dia, b in claves)
+
+
+def cargar_celdas_actuales(sb, nivel, version_num=None):
+    """Lo que hoy hay en 'horarios' para el nivel, o solo para una versión."""
+    consulta = sb.table("horarios").select("docente_id,curso_id,grado_id,dia,bloque,version_num").eq("nivel", nivel)
+    if version_num is not None:
+        consulta = consulta.eq("version_num", int(version_num))
+    return celdas_de_registros(consulta.execute().data or [])
+
+
+def escribir_cambios(sb, nivel, version_num, actuales, nuevas, anterior=None, overwrite=False):
+    """
+    Lleva 'horarios' de 'actuales' (las celdas de la versión 'anterior') a
+    'nuevas' escribiendo solo lo que cambió. Con overwrite se reescriben
+    todas las celdas en vez de mover las que no cambiaron.
+    Devuelve el delta aplicado.
+    """
+    delta = diferencia(actuales, nuevas)
+    escribir = diferencia({}, nuevas)["set"] if overwrite else delta["set"]
+    if escribir:
+        celdas = {(g, dia, b): (curso, docente) for g, dia, b, curso, docente in escribir}
+        sb.table("horarios").upsert(
+            registros_de_celdas(celdas, nivel, version_num), on_conflict="grado_id,dia,bloque"
+        ).execute()
+    if anterior is not None:
+        for i in range(0, len(delta["del"]), LOTE_BORRADO):
+            lote = delta["del"][i:i + LOTE_BORRADO]
+            sb.table("horarios").delete().eq("nivel", nivel).eq("version_num", int(anterior)).or_(
+                _filtro_celdas(lote)
+            ).execute()
+        if not overwrite:
+            # Las celdas sin cambios solo cambian de versión: un UPDATE, sin reenviar filas
+            sb.table("horarios").update({"version_num": int(version_num)}).eq("nivel", nivel).eq(
+                "version_num", int(anterior)
+            ).execute()
+    print(
+        f"[VERSIONES] {nivel} v{version_num}: {len(escribir)} celdas escritas, "
+        f"{len(delta['del'])} borradas, {len(nuevas) - len(escribir)} sin cambios"
+    )
+    return delta
+
+
+def guardar_version(sb, nivel, version_num, anterior, celdas_anterior, celdas):
+    """
+    Registra la versión en 'horario_versiones'. celdas_anterior son las de
+    'anterior' tal como quedaron guardadas (None si no están): sin ellas, cada
+    INTERVALO_BASE versiones o si el delta no es más chico, se guarda base.
+    """
+    delta = diferencia(celdas_anterior or {}, celdas)
+    es_base = (
+        anterior is None
+        or celdas_anterior is None
+        or int(version_num) % INTERVALO_BASE == 0
+        or len(delta["set"]) + len(delta["del"]) >= len(celdas)
+    )
+    fila = {
+        "nivel": nivel,
+        "version_num": int(version_num),
+        "base_version": None if es_base else int(anterior),
+        "cambios": diferencia({}, celdas) if es_base else delta,
+    }
+    sb.table("horario_versiones").upsert(fila, on_conflict="nivel,version_num").execute()
+    recordar(nivel, version_num, celdas)
+    return fila
+
+
+def cargar_version_guardada(sb, nivel, version_num):
+    """Celdas de una versión desde la cache o 'horario_versiones' (base + deltas); None si no está."""
+    celdas = recordada(nivel, version_num)
+    if celdas is not None:
+        return celdas
+    base = (
+        sb.table("horario_versiones")
+        .select("version_num")
+        .eq("nivel", nivel)
+        .is_("base_version", "null")
+        .lte("version_num", int(version_num))
+        .order("version_num", desc=True)
+        .limit(1)
+        .execute()
+        .data
+        or []
+    )
+    if not base:
+        return None
+    filas = (
+        sb.table("horario_versiones")
+        .select("version_num,base_version,cambios")
+        .eq("nivel", nivel)
+        .gte("version_num", int(base[0]["version_num"]))
+        .lte("version_num", int(version_num))
+        .execute()
+        .data
+        or []
+    )
+    celdas = reconstruir(filas, version_num)
+    if celdas is not None:
+        recordar(nivel, version_num, celdas)
+    return celdas
+
+
+def cargar_version(sb, nivel, version_num):
+    """Como cargar_version_guardada, con las filas de 'horarios' para versiones previas al versionado."""
+    celdas = cargar_version_guardada(sb, nivel, version_num)
+    if celdas is not None:
+        return celdas
+    filas = (
+        sb.table("horarios")
+        .select("docente_id,curso_id,grado_id,dia,bloque")
+        .eq("nivel", nivel)
+        .eq("version_num", int(version_num))
+        .execute()
+        .data
+        or []
+    )
+    return celdas_de_registros(filas)
+
+
+# --- Cache de versiones reconstruidas ---
+
+def recordar(nivel, version_num, celdas):
+    clave = (nivel, int(version_num))
+    with _reconstruidas_lock:
+        _reconstruidas[clave] = celdas
+        _reconstruidas.move_to_end(clave)
+        while len(_reconstruidas) > MAX_RECONSTRUIDAS:
+            _reconstruidas.popitem(last=False)
+
+
+def recordada(nivel, version_num):
+    clave = (nivel, int(version_num))
+    with _reconstruidas_lock:
+        celdas = _reconstruidas.get(clave)
+        if celdas is not None:
+            _reconstruidas.move_to_end(clave)
+    contar_cache("versiones", celdas is not None)
+    return celdas
+
+
+def limpiar_versiones():
+    with _reconstruidas_lock:
+        _reconstruidas.clear()
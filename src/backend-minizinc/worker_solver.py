@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# worker_solver.py
+#
+# Worker de generación: reclama trabajos de la cola compartida
+# (cola_trabajos.py), corre el pipeline y publica progreso y resultado para
+# que el backend web los reenvíe por SSE. Se escala sumando procesos o
+# nodos; cada uno resuelve un trabajo a la vez (CP-SAT ya usa varios hilos).
+# También resuelve las pre-generaciones que encolan los nodos web
+# (pregeneracion.py; el resultado queda en la BD, donde lo busca el pipeline)
+# y los análisis de /escenarios y /cuellos-botella, que solo devuelven su resultado.
+#
+# Uso:
+#   COLA_TRABAJOS=supabase python worker_solver.py
+#   python worker_solver.py --cola sqlite:///tmp/cola.db --id nodo-1
+#
+# Mientras resuelve manda un latido cada COLA_LATIDO_S; entre trabajos
+# devuelve a la cola los que quedaron sin latido (workers caídos), borra los
+# terminados hace más de COLA_RETENCION_S y actualiza el gauge de pendientes.
+# Sus métricas se sirven en /metrics en WORKER_METRICAS_PUERTO (0 = no).
+
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from cola_trabajos import LATIDO_S, MAX_INTENTOS, RETENCION_S, SONDEO_S, VENCIMIENTO_S, cola_desde_url
+from telemetria import TRABAJOS_PENDIENTES, servir_metricas, trabajo_en_curso
+
+METRICAS_PUERTO = int(os.getenv("WORKER_METRICAS_PUERTO", "9101"))
+
+
+def ejecutar_generacion(data, progress_cb):
+    from arranque import obtener_supabase
+
+    if "pregenerar" in data:
+        # Encolado por pregeneracion.PreGenerador: se resuelve aquí y queda en horario_pregenerados
+        from pregeneracion import PreGenerador
+
+        destino = data["pregenerar"]
+        pregenerador = PreGenerador(obtener_supabase, obtener_cola=None, aparte=False)
+        return {"huella": pregenerador.pregenerar(destino["nivel"], destino["version"])}
+
+    if "analisis" in data:
+        # Encolado por app._tarea_analisis: escenarios o cuellos (no persisten nada)
+        from cuellos_botella import analizar_cuellos
+        from escenarios import evaluar_escenarios
+
+        analisis = {"escenarios": evaluar_escenarios, "cuellos": analizar_cuellos}
+        return analisis[data["analisis"]["tipo"]](obtener_supabase(), data["analisis"]["data"])
+
+    from pipeline_horario import PipelineGeneracion
+    from telemetria import observar_pipeline
+
+    pipeline = PipelineGeneracion(obtener_supabase(), data, progress_callback=progress_cb, hooks=[observar_pipeline])
+    return pipeline.ejecutar()
+
+
+def procesar_uno(cola, worker_id, ejecutar=ejecutar_generacion, latido_s=LATIDO_S):
+    """Reclama y resuelve un trabajo. Devuelve False si la cola estaba vacía."""
+    trabajo = cola.reclamar(worker_id)
+    if trabajo is None:
+        return False
+    trabajo_id = trabajo["id"]
+    print(f"[WORKER] {worker_id} tomó {trabajo_id} (intento {trabajo['intentos']})", flush=True)
+
+    parar = threading.Event()
+
+    def _latir():
+        while not parar.wait(latido_s):
+            try:
+                if not cola.latido(trabajo_id, worker_id):
+                    print(f"[WORKER] WARN: {trabajo_id} fue reasignado; el resultado se descartará", flush=True)
+                    return
+            except Exception as e:
+                print(f"[WORKER] WARN: latido fallido: {e!r}", flush=True)
+
+    def _progress_cb(pct, stage=""):
+        try:
+            cola.publicar(trabajo_id, "progress", {"progress": int(pct), "stage": stage})
+        except Exception as e:
+            print(f"[WORKER] WARN: no se pudo publicar el progreso: {e!r}", flush=True)
+
+    hilo = threading.Thread(target=_latir, daemon=True, name=f"latido-{trabajo_id[:8]}")
+    hilo.start()
+    t0 = time.perf_counter()
+    try:
+        with trabajo_en_curso():
+            resultado = ejecutar(trabajo["payload"], _progress_cb)
+        propio = cola.terminar(trabajo_id, worker_id, resultado)
+        estado = "listo"
+    except Exception as e:
+        traceback.print_exc()
+        propio = cola.fallar(trabajo_id, worker_id, e)
+        estado = "error"
+    finally:
+        parar.set()
+        hilo.join()
+    if propio:
+        print(f"[WORKER] {trabajo_id} {estado} en {time.perf_counter() - t0:.2f}s", flush=True)
+    else:
+        print(f"[WORKER] WARN: {trabajo_id} ya no era de {worker_id}; resultado descartado", flush=True)
+    return True
+
+
+def barrer(cola, vencimiento_s=VENCIMIENTO_S, max_intentos=MAX_INTENTOS, retencion_s=RETENCION_S):
+    """Mantenimiento entre trabajos: vencidos a la cola, terminados viejos fuera, gauge de pendientes."""
+    recuperados = cola.recuperar_vencidos(vencimiento_s, max_intentos)
+    if recuperados:
+        print(f"[WORKER] {recuperados} trabajo(s) sin latido devueltos a la cola", flush=True)
+    try:
+        borrados = cola.limpiar_terminados(retencion_s)
+        if borrados:
+            print(f"[WORKER] {borrados} trabajo(s) terminado(s) borrados con sus eventos", flush=True)
+        TRABAJOS_PENDIENTES.set(cola.pendientes())
+    except Exception as e:
+        print(f"[WORKER] WARN: mantenimiento de la cola fallido: {e!r}", flush=True)
+
+
+def correr(cola, worker_id, detener=None, una_vez=False, sondeo_s=SONDEO_S,
+           vencimiento_s=VENCIMIENTO_S, max_intentos=MAX_INTENTOS, ejecutar=ejecutar_generacion):
+    """Bucle del worker; con una_vez vuelve en cuanto la cola queda vacía."""
+    detener = detener or threading.Event()
+    ultimo_barrido = None
+    while not detener.is_set():
+        if ultimo_barrido is None or time.monotonic() - ultimo_barrido >= vencimiento_s / 2:
+            barrer(cola, vencimiento_s, max_intentos)
+            ultimo_barrido = time.monotonic()
+        if procesar_uno(cola, worker_id, ejecutar):
+            continue
+        if una_vez:
+            return
+        detener.wait(sondeo_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de generación de horarios")
+    parser.add_argument("--cola", default=os.getenv("COLA_TRABAJOS"), help="supabase | sqlite:///ruta.db")
+    parser.add_argument("--id", default=f"{socket.gethostname()}-{os.getpid()}", help="identificador del worker")
+    parser.add_argument("--una-vez", action="store_true", help="termina cuando la cola queda vacía")
+    parser.add_argument("--metricas-puerto", type=int, default=METRICAS_PUERTO, help="puerto de /metrics (0 = no servir)")
+    args = parser.parse_args()
+    if not args.cola:
+        parser.error("indicar --cola o COLA_TRABAJOS")
+
+    from arranque import calentar_solver
+
+    calentar_solver()
+    cola = cola_desde_url(args.cola)
+    if args.metricas_puerto:
+        try:
+            servir_metricas(args.metricas_puerto)
+            print(f"[WORKER] métricas en :{args.metricas_puerto}/metrics", flush=True)
+        except OSError as e:
+            # Otro worker del mismo host ya tiene el puerto: se resuelve igual, sin métricas propias
+            print(f"[WORKER] WARN: no se pudo servir /metrics en {args.metricas_puerto}: {e!r}", flush=True)
+
+    # SIGTERM (deploy, escalado): termina el trabajo actual y sale
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+    print(f"[WORKER] {args.id} escuchando {args.cola}", flush=True)
+    try:
+        correr(cola, args.id, detener, una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
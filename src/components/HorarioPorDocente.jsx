@@ -10,6 +10,7 @@ import { useDocentes } from "../context(CONTROLLER)/DocenteContext";
 import { supabase } from "../supabaseClient";
 import { Download, FileSpreadsheet, Printer, User } from "lucide-react";
 import { listSharedScheduleGenerations } from "../services/sharedScheduleHistoryService";
+import { obtenerHorarioDocente } from "../services/horarioService";
 
 const DIAS_KEYS = ["lunes", "martes", "miercoles", "jueves", "viernes"]; // L-V
 const DIAS_UI = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"];
@@ -52,6 +53,7 @@ const normalizeScheduleEntry = (entry) => {
       horario: entry.horario,
       createdAt: entry.createdAt || entry.created_at || null,
       durationMs: Number(entry.durationMs ?? entry.duration_ms ?? null) || null,
+      grados: Array.isArray(entry.grados) ? entry.grados : null,
     };
   }
   return null;
@@ -77,6 +79,15 @@ const formatGenerationDuration = (value) => {
   return `${minutes} min ${seconds.toFixed(1)} s`;
 };
 
+// Eje de grados como salida_horario.grados_de_nivel: el rango histórico del
+// nivel si los grados presentes caben en él; si no (secciones), los presentes.
+const gradosDeNivel = (nivel, presentes = []) => {
+  const historicos = nivel === "Primaria" ? [6, 7, 8, 9, 10, 11] : [1, 2, 3, 4, 5];
+  const ids = [...new Set(presentes.map(Number).filter(Number.isFinite))];
+  if (ids.every((g) => historicos.includes(g))) return historicos;
+  return ids.sort((a, b) => a - b);
+};
+
 const getScheduleSignature = (horario) =>
   Array.isArray(horario) ? horario.flat(2).join(".") : "";
 
@@ -164,8 +175,14 @@ export default function HorarioPorDocente() {
               (entry.createdAt && localEntry.createdAt === entry.createdAt) ||
               getScheduleSignature(localEntry.horario) === getScheduleSignature(entry.horario)
             );
-            return matchLocal?.durationMs
-              ? { ...entry, durationMs: matchLocal.durationMs }
+            // El historial compartido no guarda la duración (se toma del local); las
+            // columnas sí, salvo en filas antiguas
+            return matchLocal
+              ? {
+                  ...entry,
+                  durationMs: matchLocal.durationMs ?? entry.durationMs,
+                  grados: entry.grados ?? matchLocal.grados,
+                }
               : entry;
           });
           localStorage.setItem(storageKey, JSON.stringify(combinado));
@@ -246,15 +263,21 @@ export default function HorarioPorDocente() {
   }, [asignaciones]);
 
   const horarioLocalDocente = useMemo(() => {
-    const horarioSeleccionado = historialGeneraciones[indiceSeleccionado]?.horario;
+    const generacion = historialGeneraciones[indiceSeleccionado];
+    const horarioSeleccionado = generacion?.horario;
     if (!Array.isArray(horarioSeleccionado) || !docenteId) return [];
+    // Columnas: las del payload; en entradas antiguas, el eje derivado de las asignaciones
+    const columnas = generacion.grados?.length
+      ? generacion.grados
+      : gradosDeNivel(nivel, (asignaciones || []).map((a) => a.grado_id));
 
     const filas = [];
     horarioSeleccionado.forEach((bloquesDia, diaIndex) => {
       (bloquesDia || []).forEach((bloqueCursos, bloqueIndex) => {
         (bloqueCursos || []).forEach((cursoId, gradoIndex) => {
           if (!cursoId) return;
-          const gradoId = nivel === "Primaria" ? gradoIndex + 6 : gradoIndex + 1;
+          const gradoId = columnas[gradoIndex];
+          if (gradoId === undefined) return;
           const docenteAsignado = asignacionMap.get(`${cursoId}-${gradoId}`);
           if (Number(docenteAsignado) !== Number(docenteId)) return;
 
@@ -269,7 +292,7 @@ export default function HorarioPorDocente() {
     });
 
     return filas;
-  }, [historialGeneraciones, indiceSeleccionado, docenteId, asignacionMap, nivel]);
+  }, [historialGeneraciones, indiceSeleccionado, docenteId, asignacionMap, asignaciones, nivel]);
 
   const horarioMostrado = horarioLocalDocente.length > 0 ? horarioLocalDocente : horarioActual;
 
@@ -283,6 +306,14 @@ export default function HorarioPorDocente() {
       }
 
       setLoading(true);
+      // Primero el índice cacheado del backend; si no responde, consulta directa a Supabase
+      const filasIndice = await obtenerHorarioDocente(nivel, version, docenteId);
+      if (filasIndice) {
+        setHorarioActual(filasIndice);
+        setLoading(false);
+        return;
+      }
+
       const { data, error } = await supabase
         .from("horarios")
         .select("version_num, dia, bloque, curso_id, grado_id")
@@ -43,6 +43,23 @@ const getColorPorDocente = (nombreDocente) => {
 const esHorarioVacio = (horario) =>
   !horario?.some(dia => dia.some(bloque => bloque.some(curso => curso > 0)));
 
+// Eje de grados como salida_horario.grados_de_nivel (igual que en
+// HorarioPorDocente.jsx): el rango histórico del nivel si los grados
+// presentes caben en él; si no (secciones), los presentes.
+const gradosHistoricos = (nivel) => (nivel === "Primaria" ? [6, 7, 8, 9, 10, 11] : [1, 2, 3, 4, 5]);
+const gradosDeNivel = (nivel, presentes = []) => {
+  const historicos = gradosHistoricos(nivel);
+  const ids = [...new Set(presentes.map(Number).filter(Number.isFinite))];
+  if (ids.every((g) => historicos.includes(g))) return historicos;
+  return ids.sort((a, b) => a - b);
+};
+
+// "1°", "2°"... dentro del rango histórico; fuera de él (secciones), el id
+const etiquetaGrado = (nivel, gradoId) => {
+  const posicion = gradosHistoricos(nivel).indexOf(Number(gradoId));
+  return posicion >= 0 ? `${posicion + 1}°` : `Grado ${gradoId}`;
+};
+
 const normalizeScheduleEntry = (entry, fallbackCreatedAt = null) => {
   if (Array.isArray(entry)) {
     return {
@@ -56,6 +73,8 @@ const normalizeScheduleEntry = (entry, fallbackCreatedAt = null) => {
       horario: entry.horario,
       createdAt: entry.createdAt || entry.created_at || fallbackCreatedAt,
       durationMs: Number(entry.durationMs ?? entry.duration_ms ?? null) || null,
+      // Id de grado/sección de cada columna (payload "grados"); null en entradas antiguas
+      grados: Array.isArray(entry.grados) ? entry.grados : null,
     };
   }
   return null;
@@ -129,22 +148,24 @@ async function cargarHorarioDesdeBD(nivel, version) {
 
   const dias = ["lunes", "martes", "miercoles", "jueves", "viernes"];
   const maxBloque = Math.max(...data.map((r) => r.bloque));
-  const maxGrado = Math.max(...data.map((r) => r.grado_id));
+  // Una columna por grado presente (o el rango histórico del nivel)
+  const grados = gradosDeNivel(nivel, data.map((r) => r.grado_id));
+  const columna = new Map(grados.map((g, i) => [g, i]));
 
   const horario = Array.from({ length: 5 }, () =>
     Array.from({ length: maxBloque + 1 }, () =>
-      Array.from({ length: maxGrado }, () => 0)
+      Array.from({ length: grados.length }, () => 0)
     )
   );
 
   data.forEach((r) => {
     const d = dias.indexOf(normalize(r.dia || ""));
     const b = r.bloque;
-    const g = nivel === "Primaria" ? r.grado_id - 6 : r.grado_id - 1;
-    if (d >= 0 && b >= 0 && g >= 0) horario[d][b][g] = r.curso_id;
+    const g = columna.get(Number(r.grado_id));
+    if (d >= 0 && b >= 0 && g !== undefined) horario[d][b][g] = r.curso_id;
   });
 
-  return horario;
+  return { horario, grados };
 }
 
 const HorarioTable = () => {
@@ -194,9 +215,6 @@ const HorarioTable = () => {
   const version = Number(params.get("version")) || 1;
   const nivel = params.get("nivel") || "Secundaria";
   const storageKey = `historialHorarios:${nivel}:${version}`;
-  const grados = (nivel === "Primaria")
-    ? ["1°", "2°", "3°", "4°", "5°", "6°"]
-    : ["1°", "2°", "3°", "4°", "5°"];
   const docentesPorVersion = useMemo(
     () => (docentes || []).filter((d) => d.nivel === nivel && d.version_num === version),
     [docentes, nivel, version]
@@ -213,6 +231,15 @@ const HorarioTable = () => {
   // Horario visible: puntero actual del historial de ediciÃ³n
   const horarioVisible = historyStack[historyPointer];
   const generacionSeleccionada = historialGeneraciones[indiceSeleccionado] || null;
+  // Id de grado de cada columna: los del payload ("grados"); solo las entradas
+  // antiguas, que no los traen, usan el rango histórico del nivel
+  const gradosIds = useMemo(
+    () => (generacionSeleccionada?.grados?.length
+      ? generacionSeleccionada.grados.map(Number)
+      : gradosHistoricos(nivel)),
+    [generacionSeleccionada, nivel]
+  );
+  const grados = useMemo(() => gradosIds.map((id) => etiquetaGrado(nivel, id)), [gradosIds, nivel]);
   const getScheduleOptionKey = (scheduleEntry, index) => {
     const horario = scheduleEntry?.horario;
     if (!Array.isArray(horario)) return `schedule-${index}`;
@@ -269,8 +296,14 @@ const HorarioTable = () => {
               (entry.createdAt && localEntry.createdAt === entry.createdAt) ||
               getScheduleSignature(localEntry.horario) === getScheduleSignature(entry.horario)
             );
-            return matchLocal?.durationMs
-              ? { ...entry, durationMs: matchLocal.durationMs }
+            // El historial compartido no guarda la duración (se toma del local); las
+            // columnas sí, salvo en filas antiguas
+            return matchLocal
+              ? {
+                  ...entry,
+                  durationMs: matchLocal.durationMs ?? entry.durationMs,
+                  grados: entry.grados ?? matchLocal.grados,
+                }
               : entry;
           });
           localStorage.setItem(storageKey, JSON.stringify(combinado));
@@ -315,14 +348,15 @@ const HorarioTable = () => {
       const horarioBD = await cargarHorarioDesdeBD(nivel, version);
       if (horarioBD) {
         const entry = {
-          horario: horarioBD,
+          horario: horarioBD.horario,
           createdAt: new Date().toISOString(),
+          grados: horarioBD.grados,
         };
         setHistorialGeneraciones([entry]);
         setIndiceSeleccionado(0);
-        setHistoryStack([horarioBD]);
+        setHistoryStack([horarioBD.horario]);
         setHistoryPointer(0);
-        setHorarioGeneral(horarioBD);
+        setHorarioGeneral(horarioBD.horario);
         persistHistorial([entry]);
       }
     })();
@@ -471,7 +505,7 @@ const HorarioTable = () => {
   const indicesGradosVisibles = grados.map((_, idx) => idx);
 
   const obtenerInfoDocente = (cursoId, gradoIndex) => {
-    const gradoId = (nivel === "Primaria") ? (gradoIndex + 6) : (gradoIndex + 1);
+    const gradoId = gradosIds[gradoIndex];
     const asignacion = asignacionesDesdeDB.find(
       a => a.curso_id === cursoId && a.grado_id === gradoId
     );
@@ -520,7 +554,7 @@ const HorarioTable = () => {
   };
 
   const obtenerDocenteIdPorCursoYGrado = (cursoId, gradoIndex) => {
-    const gradoId = (nivel === "Primaria") ? (gradoIndex + 6) : (gradoIndex + 1);
+    const gradoId = gradosIds[gradoIndex];
     const asignacion = asignacionesDesdeDB.find(
       a => a.curso_id === cursoId && a.grado_id === gradoId
     );
@@ -568,7 +602,7 @@ const HorarioTable = () => {
 
   const handleCeldaVaciaClick = (diaIndex, bloqueIndex, gradoIndex) => {
     if (!horarioVisible) return;
-    const gradoId = (nivel === "Primaria") ? (gradoIndex + 6) : (gradoIndex + 1);
+    const gradoId = gradosIds[gradoIndex];
 
     const cursosConHorasFaltantes = Object.entries(horasCursosPorVersion || {})
       .filter(([_, horasPorGrado]) => {
@@ -780,6 +814,7 @@ const HorarioTable = () => {
           horario: horarioOptimizado,
           createdAt: new Date().toISOString(),
           durationMs,
+          grados: resultado.grados,
         },
       ];
       if (nuevoHistorial.length > 5) nuevoHistorial.shift(); // mÃ¡x 5 versiones
@@ -805,15 +840,12 @@ const HorarioTable = () => {
       return { asignados: 0, totales: 0, porcentaje: "0.0" };
     }
 
-    const gradoIdBase = (nivel === "Primaria") ? 6 : 1;
-
     // 1) Requeridas por par (curso, grado) + total
     const requeridasPorPar = new Map();
     let totales = 0;
     for (const [cursoIdStr, byGrado] of Object.entries(horasCursosPorVersion || {})) {
       const cursoId = Number(cursoIdStr);
-      for (let i = 0; i < grados.length; i++) {
-        const gradoId = gradoIdBase + i;
+      for (const gradoId of gradosIds) {
         const req = byGrado?.[gradoId] || 0;
         if (req > 0) {
           requeridasPorPar.set(`${cursoId}-${gradoId}`, req);
@@ -831,7 +863,7 @@ const HorarioTable = () => {
         for (let g = 0; g < (bloque?.length || 0); g++) {
           const cursoId = bloque[g] || 0;
           if (cursoId > 0) {
-            const gradoId = gradoIdBase + g;
+            const gradoId = gradosIds[g];
             const key = `${cursoId}-${gradoId}`;
             if (requeridasPorPar.has(key)) {
               asignadasPorPar.set(key, (asignadasPorPar.get(key) || 0) + 1);
@@ -850,7 +882,7 @@ const HorarioTable = () => {
 
     const porcentaje = totales > 0 ? ((asignados / totales) * 100).toFixed(1) : "0.0";
     return { asignados, totales, porcentaje };
-  }, [horarioVisible, horasCursosPorVersion, grados, nivel]);
+  }, [horarioVisible, horasCursosPorVersion, gradosIds]);
 
   const actualizarHistorialDeEdicion = (nuevoHorario) => {
     const nuevoStack = historyStack.slice(0, historyPointer + 1);
@@ -1530,9 +1562,7 @@ const exportarExcel = () => {
               </thead>
               <tbody>
                 {cursosDesdeDB.map(curso => {
-                  const gradoIdBase = (nivel === "Primaria") ? 6 : 1;
-                  const horasFaltantesRow = grados.map((_, gradoIndex) => {
-                    const gradoId = gradoIdBase + gradoIndex;
+                  const horasFaltantesRow = gradosIds.map((gradoId, gradoIndex) => {
                     const esperadas = horasCursosPorVersion?.[curso.id]?.[gradoId] || 0;
                     const asignadas = contarHorasAsignadas(curso.id, gradoIndex);
                     const faltantes = esperadas - asignadas;
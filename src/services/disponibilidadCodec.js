@@ -0,0 +1,52 @@
+// src/services/disponibilidadCodec.js
+// Disponibilidad de docentes como máscara de bits (mismo formato que
+// backend-minizinc/disponibilidad.py): 5 bytes, byte d = día d
+// (lunes..viernes), bit b = bloque b disponible, enviado en base64.
+// Un docente sin entrada o con {} no tiene restricciones. El {} se envía
+// tal cual: si todos los mapas quedaran fuera, disponibilidad llegaría
+// vacía y el backend la leería de la BD en lugar de "sin restricciones".
+
+const DIAS = ["lunes", "martes", "miercoles", "jueves", "viernes"];
+const BITS_POR_DIA = 8;
+
+const normalizarDia = (texto) =>
+  String(texto ?? "")
+    .normalize("NFD")
+    .replace(/[\u0300-\u036f]/g, "")
+    .trim()
+    .toLowerCase();
+
+/** { "lunes-0": true, "miércoles-3": true, ... } -> base64 de 5 bytes */
+export function codificarCeldas(celdas = {}) {
+  const bytes = new Uint8Array(DIAS.length);
+  for (const [clave, permitido] of Object.entries(celdas || {})) {
+    if (!permitido) continue;
+    const corte = clave.lastIndexOf("-");
+    const d = DIAS.indexOf(normalizarDia(clave.slice(0, corte)));
+    const b = Number(clave.slice(corte + 1));
+    if (d < 0 || !Number.isInteger(b) || b < 0 || b >= BITS_POR_DIA) continue;
+    bytes[d] |= 1 << b;
+  }
+  return btoa(String.fromCharCode(...bytes));
+}
+
+/** { [docenteId]: { "dia-bloque": true } } -> { [docenteId]: "base64" } */
+export function codificarDisponibilidad(disponibilidadMap = {}) {
+  const out = {};
+  for (const [docenteId, celdas] of Object.entries(disponibilidadMap || {})) {
+    if (typeof celdas === "string" || typeof celdas === "number") {
+      out[docenteId] = celdas; // ya viene codificada
+    } else if (celdas && Object.keys(celdas).length) {
+      out[docenteId] = codificarCeldas(celdas);
+    } else if (celdas) {
+      out[docenteId] = {};
+    }
+  }
+  return out;
+}
+
+/** Copia de 'restricciones' con la disponibilidad ya codificada. */
+export function restriccionesCompactas(restricciones = {}) {
+  if (!restricciones?.disponibilidad) return restricciones;
+  return { ...restricciones, disponibilidad: codificarDisponibilidad(restricciones.disponibilidad) };
+}
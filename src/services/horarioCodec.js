@@ -0,0 +1,105 @@
+// src/services/horarioCodec.js
+// Horario empaquetado (mismo formato que backend-minizinc/codec_horario.py):
+//   cabecera 8 bytes LE: "HZ" | version u8 | compresion u8 (0 nada, 1 gzip, 2 zstd)
+//                        | dias u8 | bloques u8 | grados u16
+//   cuerpo: dias*bloques*grados uint16 LE (dia, bloque, grado), 0 = vacío.
+// En JSON viaja como base64. Los componentes siempre reciben la lista anidada.
+// horario_generaciones guarda {formato, datos (base64), grados (id de cada columna)}.
+
+const VERSION = 1;
+const CABECERA = 8;
+const COMPRESION = { "": 0, gzip: 1, zstd: 2 };
+
+const hayGzip = typeof DecompressionStream !== "undefined" && typeof CompressionStream !== "undefined";
+
+/** Formato que pide el front: gzip si el navegador lo soporta nativamente. */
+export const FORMATO_HORARIO = hayGzip ? "u16+gzip" : "u16";
+export const ACCEPT_HORARIO = `application/x-horario-${FORMATO_HORARIO}, application/json`;
+
+const base64ABytes = (texto) => Uint8Array.from(atob(texto), (c) => c.charCodeAt(0));
+
+const bytesABase64 = (bytes) => {
+  let binario = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binario += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binario);
+};
+
+const pasarPor = async (bytes, stream) =>
+  new Uint8Array(await new Response(new Blob([bytes]).stream().pipeThrough(stream)).arrayBuffer());
+
+/** Texto base64, {formato, datos, grados} o lista (tal cual) -> lista dias x bloques x grados. */
+export async function decodificarHorario(valor) {
+  if (typeof valor?.datos === "string") valor = valor.datos;
+  if (typeof valor !== "string") return valor;
+  const datos = base64ABytes(valor);
+  const vista = new DataView(datos.buffer);
+  if (datos[0] !== 0x48 || datos[1] !== 0x5a || datos[2] !== VERSION) {
+    throw new Error("Horario codificado inválido.");
+  }
+  const compresion = datos[3];
+  const dias = datos[4];
+  const bloques = datos[5];
+  const grados = vista.getUint16(6, true);
+
+  let cuerpo = datos.subarray(CABECERA);
+  if (compresion === COMPRESION.gzip) {
+    cuerpo = await pasarPor(cuerpo, new DecompressionStream("gzip"));
+  } else if (compresion !== COMPRESION[""]) {
+    throw new Error("Compresión de horario no soportada en el navegador.");
+  }
+
+  const celdas = new DataView(cuerpo.buffer, cuerpo.byteOffset, cuerpo.byteLength);
+  const horario = [];
+  let i = 0;
+  for (let d = 0; d < dias; d++) {
+    const fila = [];
+    for (let b = 0; b < bloques; b++) {
+      const bloque = new Array(grados);
+      for (let g = 0; g < grados; g++, i += 2) bloque[g] = celdas.getUint16(i, true);
+      fila.push(bloque);
+    }
+    horario.push(fila);
+  }
+  return horario;
+}
+
+/** Lista dias x bloques x grados -> texto base64 (gzip si el navegador lo soporta). */
+export async function codificarHorario(horario) {
+  const dias = horario.length;
+  const bloques = horario[0]?.length || 0;
+  const grados = horario[0]?.[0]?.length || 0;
+  const cuerpo = new Uint8Array(dias * bloques * grados * 2);
+  const celdas = new DataView(cuerpo.buffer);
+  let i = 0;
+  for (let d = 0; d < dias; d++) {
+    for (let b = 0; b < bloques; b++) {
+      for (let g = 0; g < grados; g++, i += 2) celdas.setUint16(i, Number(horario[d]?.[b]?.[g]) || 0, true);
+    }
+  }
+
+  const comprimido = hayGzip ? await pasarPor(cuerpo, new CompressionStream("gzip")) : cuerpo;
+  const datos = new Uint8Array(CABECERA + comprimido.length);
+  const vista = new DataView(datos.buffer);
+  datos.set([0x48, 0x5a, VERSION, hayGzip ? COMPRESION.gzip : COMPRESION[""], dias, bloques]);
+  vista.setUint16(6, grados, true);
+  datos.set(comprimido, CABECERA);
+  return bytesABase64(datos);
+}
+
+/** Valor para horario_generaciones.horario (como codec_horario.a_almacenamiento). */
+export async function empaquetarParaGuardar(horario, grados = null) {
+  return {
+    formato: FORMATO_HORARIO,
+    datos: await codificarHorario(horario),
+    grados: Array.isArray(grados) ? grados : null,
+  };
+}
+
+/** Resultado del backend con 'horario' ya como lista anidada. */
+export async function resultadoConHorario(resultado) {
+  if (typeof resultado?.horario !== "string") return resultado;
+  const { horario_formato: _formato, ...resto } = resultado;
+  return { ...resto, horario: await decodificarHorario(resultado.horario) };
+}
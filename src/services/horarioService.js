@@ -12,6 +12,8 @@ import {
   markAsignacion,
   isReglaActiva,
 } from "./restriccionesService";
+import { restriccionesCompactas } from "./disponibilidadCodec";
+import { ACCEPT_HORARIO, FORMATO_HORARIO, resultadoConHorario } from "./horarioCodec";
 
 /**
  * Envía al backend el pedido de generación de horario.
@@ -30,11 +32,11 @@ export const enviarDznAlServidor = async (
 
     const response = await fetch(`${baseURL}/generar-horario-general`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", Accept: ACCEPT_HORARIO },
       body: JSON.stringify({
         docentes,
         asignaciones,
-        restricciones,
+        restricciones: restriccionesCompactas(restricciones),
         horas_curso_grado: horasCursos,
         nivel,
         version,
@@ -42,7 +44,7 @@ export const enviarDznAlServidor = async (
       }),
     });
 
-    const data = await response.json();
+    const data = await resultadoConHorario(await response.json());
 
     if (response.ok) {
       console.log("✅ Horario generado correctamente:", data);
@@ -73,7 +75,7 @@ export async function generarHorarioConProgreso({
     body: JSON.stringify({
       docentes,
       asignaciones,
-      restricciones,
+      restricciones: restriccionesCompactas(restricciones),
       horas_curso_grado: horasCursos,
       nivel,
       version,
@@ -87,7 +89,7 @@ export async function generarHorarioConProgreso({
   }
 
   const jobId = data.job_id;
-  const eventsUrl = `${baseURL}/generar-horario-general-job/${jobId}/events`;
+  const eventsUrl = `${baseURL}/generar-horario-general-job/${jobId}/events?formato=${encodeURIComponent(FORMATO_HORARIO)}`;
 
   return await new Promise((resolve, reject) => {
     const es = new EventSource(eventsUrl);
@@ -115,7 +117,7 @@ export async function generarHorarioConProgreso({
       cleanup();
       try {
         const payload = JSON.parse(evt.data);
-        resolve(payload?.result || null);
+        resultadoConHorario(payload?.result || null).then(resolve, reject);
       } catch (e) {
         reject(e);
       }
@@ -140,6 +142,24 @@ export async function generarHorarioConProgreso({
   });
 }
 
+/**
+ * Horario de un docente para una versión, servido desde el índice cacheado
+ * del backend. Devuelve filas { dia, bloque, curso_id, grado_id, version_num }
+ * o null si el backend no responde (el llamador puede caer a Supabase).
+ */
+export async function obtenerHorarioDocente(nivel, version, docenteId) {
+  try {
+    const url = `${baseURL}/horarios/${encodeURIComponent(nivel)}/${Number(version)}/docente/${Number(docenteId)}`;
+    const response = await fetch(url);
+    if (!response.ok) return null;
+    const data = await response.json();
+    return Array.isArray(data?.horario) ? data.horario : null;
+  } catch (error) {
+    console.error("❌ Error obteniendo horario del docente:", error?.message || error);
+    return null;
+  }
+}
+
 /* ============================================================================
  * 1) API de alto nivel: arma las REGLAS por nivel y llama al backend
  *    - Lee reglas efectivas (overrides + defaults)
@@ -1,4 +1,5 @@
 import { supabase } from "../supabaseClient";
+import { decodificarHorario, empaquetarParaGuardar } from "./horarioCodec";
 
 export const MAX_SHARED_SCHEDULES = 5;
 const TABLE_NAME = "horario_generaciones";
@@ -12,6 +13,7 @@ const normalizeEntry = (entry) => {
     return {
       horario: entry.horario,
       createdAt: entry.createdAt || entry.created_at || null,
+      grados: Array.isArray(entry.grados) ? entry.grados : null,
     };
   }
   return null;
@@ -27,9 +29,16 @@ export async function listSharedScheduleGenerations(nivel, versionNum) {
 
   if (error) throw error;
 
-  return (data || [])
-    .map((row) => normalizeEntry({ horario: row.horario, created_at: row.created_at }))
-    .filter(Boolean);
+  // 'horario' viene como {formato, datos, grados}; las filas antiguas, como
+  // texto base64 o lista anidada y sin grados
+  const filas = await Promise.all(
+    (data || []).map(async (row) => ({
+      horario: await decodificarHorario(row.horario),
+      grados: row.horario?.grados ?? null,
+      created_at: row.created_at,
+    }))
+  );
+  return filas.map(normalizeEntry).filter(Boolean);
 }
 
 export async function saveSharedScheduleGenerations(nivel, versionNum, schedules) {
@@ -48,13 +57,15 @@ export async function saveSharedScheduleGenerations(nivel, versionNum, schedules
 
   if (sanitized.length === 0) return [];
 
-  const rows = sanitized.map((entry, index) => ({
-    nivel,
-    version_num: versionNum,
-    generation_index: index + 1,
-    horario: entry.horario,
-    created_at: entry.createdAt || new Date().toISOString(),
-  }));
+  const rows = await Promise.all(
+    sanitized.map(async (entry, index) => ({
+      nivel,
+      version_num: versionNum,
+      generation_index: index + 1,
+      horario: await empaquetarParaGuardar(entry.horario, entry.grados),
+      created_at: entry.createdAt || new Date().toISOString(),
+    }))
+  );
 
   const { error: insertError } = await supabase
     .from(TABLE_NAME)